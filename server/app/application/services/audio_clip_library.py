@@ -0,0 +1,162 @@
+# AudioClipLibrary
+#
+# A persistent store of synthesized word and phrase clips for the word-by-word audio sections. # Ein persistenter Speicher synthetisierter Wort- und Phrasenclips für die Wort-für-Wort-Audioabschnitte.
+# Keeps every unique (text, lang, voice, rate) clip once so repeated vocabulary is never synthesized again. # Behält jeden eindeutigen (Text, Sprache, Stimme, Rate)-Clip einmal, damit wiederholtes Vokabular nie erneut synthetisiert wird.
+#
+# Usage:
+# library = AudioClipLibrary() # Creates a clip library in the shared audio directory. # Erstellt eine Clip-Bibliothek im gemeinsamen Audioverzeichnis.
+# clip = library.get("ich", "de-DE", "en-US-JennyMultilingualNeural", "0.8") # Returns cached MP3 bytes or None. # Gibt zwischengespeicherte MP3-Bytes oder None zurück.
+# library.put("ich", "de-DE", "en-US-JennyMultilingualNeural", "0.8", audio_bytes) # Stores a freshly synthesized clip. # Speichert einen frisch synthetisierten Clip.
+# pause = library.silence(300) # Returns 300 ms of silent MP3 frames. # Gibt 300 ms stille MP3-Frames zurück.
+#
+# EN: Lets the TTS service assemble word-by-word audio from cached clips and generated silence instead of synthesizing it on every request.
+# DE: Ermöglicht dem TTS-Dienst, Wort-für-Wort-Audio aus zwischengespeicherten Clips und erzeugter Stille zusammenzusetzen, statt es bei jeder Anfrage zu synthetisieren.
+
+import hashlib # For building stable clip keys. # Zum Erstellen stabiler Clip-Schlüssel.
+import os # For file system operations. # Für Dateisystemoperationen.
+import re # For collapsing whitespace in clip texts. # Zum Zusammenfassen von Leerzeichen in Cliptexten.
+import threading # For guarding the in-memory cache across executor threads. # Zum Schutz des In-Memory-Caches über Executor-Threads hinweg.
+import uuid # For unique temporary file names during atomic writes. # Für eindeutige temporäre Dateinamen bei atomaren Schreibvorgängen.
+from collections import OrderedDict # For the in-memory LRU cache. # Für den In-Memory-LRU-Cache.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+
+MPEG1_BITRATES = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320] # Layer III bitrate table for MPEG-1 in kbps. # Layer-III-Bitratentabelle für MPEG-1 in kbps.
+MPEG2_BITRATES = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160] # Layer III bitrate table for MPEG-2 in kbps. # Layer-III-Bitratentabelle für MPEG-2 in kbps.
+MPEG1_SAMPLE_RATES = [44100, 48000, 32000] # MPEG-1 sample rates by header index. # MPEG-1-Abtastraten nach Header-Index.
+MPEG2_SAMPLE_RATES = [22050, 24000, 16000] # MPEG-2 sample rates by header index. # MPEG-2-Abtastraten nach Header-Index.
+
+
+def mp3_silence(duration_ms: int, sample_rate: int = 16000, bitrate_kbps: int = 32) -> bytes: # Builds silent mono MP3 frames for a pause. # Erstellt stille Mono-MP3-Frames für eine Pause.
+    """Return silent Layer III mono frames that can be concatenated with synthesized MP3 clips"""
+    if sample_rate in MPEG1_SAMPLE_RATES: # Checks for an MPEG-1 sample rate. # Prüft auf eine MPEG-1-Abtastrate.
+        version_bits, samples_per_frame, slot_factor = 0b11, 1152, 144000 # MPEG-1 frame layout. # MPEG-1-Frame-Layout.
+        bitrate_index = MPEG1_BITRATES.index(bitrate_kbps) # Looks up the bitrate header index. # Sucht den Bitraten-Header-Index.
+        rate_index = MPEG1_SAMPLE_RATES.index(sample_rate) # Looks up the sample rate header index. # Sucht den Abtastraten-Header-Index.
+        side_info_bytes = 17 # Side information size for MPEG-1 mono. # Größe der Seiteninformation für MPEG-1 Mono.
+    else: # Otherwise uses MPEG-2 (lower sample rates). # Andernfalls wird MPEG-2 verwendet (niedrigere Abtastraten).
+        version_bits, samples_per_frame, slot_factor = 0b10, 576, 72000 # MPEG-2 frame layout. # MPEG-2-Frame-Layout.
+        bitrate_index = MPEG2_BITRATES.index(bitrate_kbps) # Looks up the bitrate header index. # Sucht den Bitraten-Header-Index.
+        rate_index = MPEG2_SAMPLE_RATES.index(sample_rate) # Looks up the sample rate header index. # Sucht den Abtastraten-Header-Index.
+        side_info_bytes = 9 # Side information size for MPEG-2 mono. # Größe der Seiteninformation für MPEG-2 Mono.
+
+    frame_length = slot_factor * bitrate_kbps // sample_rate # Computes the frame size in bytes without padding. # Berechnet die Framegröße in Bytes ohne Auffüllung.
+    header = bytes([ # Builds the 4-byte frame header. # Erstellt den 4-Byte-Frame-Header.
+        0xFF, # First eight sync bits. # Erste acht Synchronisationsbits.
+        0xE0 | (version_bits << 3) | (0b01 << 1) | 0x01, # Remaining sync bits, version, Layer III and no CRC. # Restliche Sync-Bits, Version, Layer III und kein CRC.
+        (bitrate_index << 4) | (rate_index << 2), # Bitrate and sample rate without padding. # Bitrate und Abtastrate ohne Auffüllung.
+        0xC0, # Single channel (mono), no emphasis. # Einzelkanal (Mono), keine Betonung.
+    ])
+    frame = header + bytes(side_info_bytes) + bytes(frame_length - 4 - side_info_bytes) # Zeroed side info and main data decode to silence. # Genullte Seiteninformation und Hauptdaten werden als Stille dekodiert.
+
+    frame_ms = samples_per_frame * 1000 / sample_rate # Duration of a single frame in milliseconds. # Dauer eines einzelnen Frames in Millisekunden.
+    frame_count = max(1, int(round(duration_ms / frame_ms))) # Number of frames closest to the requested pause. # Anzahl der Frames, die der gewünschten Pause am nächsten kommt.
+    return frame * frame_count # Returns the concatenated silent frames. # Gibt die verketteten stillen Frames zurück.
+
+
+def strip_id3(audio: bytes) -> bytes: # Removes a leading ID3v2 tag so clips can be concatenated. # Entfernt ein führendes ID3v2-Tag, damit Clips verkettet werden können.
+    """Drop a leading ID3v2 tag from MP3 data"""
+    if len(audio) > 10 and audio[:3] == b"ID3": # Checks for the ID3v2 magic bytes. # Prüft auf die ID3v2-Magic-Bytes.
+        size = (audio[6] << 21) | (audio[7] << 14) | (audio[8] << 7) | audio[9] # Decodes the synchsafe tag size. # Dekodiert die Synchsafe-Taggröße.
+        return audio[10 + size:] # Returns the data after the tag. # Gibt die Daten nach dem Tag zurück.
+    return audio # Returns unchanged data when no tag is present. # Gibt unveränderte Daten zurück, wenn kein Tag vorhanden ist.
+
+
+class AudioClipLibrary: # Defines the AudioClipLibrary class. # Definiert die AudioClipLibrary-Klasse.
+    def __init__( # Initializes the clip library. # Initialisiert die Clip-Bibliothek.
+        self,
+        clip_dir: Optional[str] = None, # Optional directory for clip files. # Optionales Verzeichnis für Clipdateien.
+        max_memory_clips: Optional[int] = None, # Optional size of the in-memory LRU. # Optionale Größe des In-Memory-LRU.
+    ):
+        self.clip_dir = clip_dir or os.path.join(self._get_temp_directory(), "clips") # Stores clips next to the generated audio files. # Speichert Clips neben den erzeugten Audiodateien.
+        os.makedirs(self.clip_dir, exist_ok=True) # Creates the clip directory if it doesn't exist. # Erstellt das Clip-Verzeichnis, falls es nicht existiert.
+        self.max_memory_clips = max_memory_clips or int(os.getenv("TTS_CLIP_MEMORY_ITEMS", "2048")) # Limits clips kept in memory. # Begrenzt die im Speicher gehaltenen Clips.
+        self._memory = OrderedDict() # In-memory LRU of recently used clips. # In-Memory-LRU kürzlich verwendeter Clips.
+        self._silence = {} # Cache of generated silence by duration and format. # Cache erzeugter Stille nach Dauer und Format.
+        self._lock = threading.Lock() # Guards the in-memory structures. # Schützt die In-Memory-Strukturen.
+        self.hits = 0 # Number of clip lookups served from the library. # Anzahl der aus der Bibliothek bedienten Clip-Abfragen.
+        self.misses = 0 # Number of clip lookups that needed synthesis. # Anzahl der Clip-Abfragen, die eine Synthese benötigten.
+
+    def _get_temp_directory(self) -> str: # Defines method to get the audio directory. # Definiert Methode zum Abrufen des Audioverzeichnisses.
+        """Return the shared TTS audio directory"""
+        if os.name == "nt": # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            return os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Uses the Windows temp directory. # Verwendet das Windows-Temp-Verzeichnis.
+        return "/tmp/tts_audio" # Uses the Unix audio directory. # Verwendet das Unix-Audioverzeichnis.
+
+    @staticmethod
+    def clip_key( # Builds the key for a clip. # Erstellt den Schlüssel für einen Clip.
+        text: str, lang: str, voice: str, rate: str, output_format: str = "mp3" # Clip attributes that change the audio. # Clip-Attribute, die das Audio verändern.
+    ) -> str: # Returns a hex digest. # Gibt einen Hex-Digest zurück.
+        """Return a stable key for (text, lang, voice, rate, format)"""
+        normalized = re.sub(r"\s+", " ", text.strip()) # Collapses whitespace so spacing variants share a clip. # Fasst Leerzeichen zusammen, damit Abstandsvarianten einen Clip teilen.
+        raw = "\x1f".join([normalized, lang, voice, rate, output_format]) # Joins the attributes with a unit separator. # Verbindet die Attribute mit einem Einheitentrennzeichen.
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest() # Hashes the attributes into a file-safe key. # Hasht die Attribute in einen dateisicheren Schlüssel.
+
+    def _clip_path(self, key: str) -> str: # Builds the file path for a clip key. # Erstellt den Dateipfad für einen Clip-Schlüssel.
+        return os.path.join(self.clip_dir, key[:2], f"{key}.clip") # Shards clips into subdirectories by key prefix. # Verteilt Clips nach Schlüsselpräfix auf Unterverzeichnisse.
+
+    def _remember(self, key: str, audio: bytes) -> None: # Adds a clip to the in-memory LRU. # Fügt einen Clip zum In-Memory-LRU hinzu.
+        with self._lock: # Locks the in-memory cache. # Sperrt den In-Memory-Cache.
+            self._memory[key] = audio # Stores the clip. # Speichert den Clip.
+            self._memory.move_to_end(key) # Marks the clip as most recently used. # Markiert den Clip als zuletzt verwendet.
+            while len(self._memory) > self.max_memory_clips: # Evicts clips beyond the limit. # Entfernt Clips über dem Limit.
+                self._memory.popitem(last=False) # Drops the least recently used clip. # Verwirft den am längsten nicht verwendeten Clip.
+
+    def get( # Looks up a clip. # Sucht einen Clip.
+        self, text: str, lang: str, voice: str, rate: str, output_format: str = "mp3" # Clip attributes. # Clip-Attribute.
+    ) -> Optional[bytes]: # Returns audio bytes or None. # Gibt Audio-Bytes oder None zurück.
+        """Return the cached clip audio or None when it has not been synthesized yet"""
+        key = self.clip_key(text, lang, voice, rate, output_format) # Builds the clip key. # Erstellt den Clip-Schlüssel.
+        with self._lock: # Locks the in-memory cache. # Sperrt den In-Memory-Cache.
+            audio = self._memory.get(key) # Checks memory first. # Prüft zuerst den Speicher.
+            if audio is not None: # If the clip is in memory. # Wenn der Clip im Speicher ist.
+                self._memory.move_to_end(key) # Marks it as most recently used. # Markiert ihn als zuletzt verwendet.
+                self.hits += 1 # Counts the hit. # Zählt den Treffer.
+                return audio # Returns the clip. # Gibt den Clip zurück.
+
+        try: # Tries to read the clip from disk. # Versucht, den Clip von der Festplatte zu lesen.
+            with open(self._clip_path(key), "rb") as f: # Opens the clip file. # Öffnet die Clipdatei.
+                audio = f.read() # Reads the clip bytes. # Liest die Clip-Bytes.
+        except FileNotFoundError: # The clip has not been stored yet. # Der Clip wurde noch nicht gespeichert.
+            with self._lock: # Locks the counters. # Sperrt die Zähler.
+                self.misses += 1 # Counts the miss. # Zählt den Fehltreffer.
+            return None # Signals that synthesis is needed. # Signalisiert, dass eine Synthese nötig ist.
+
+        self._remember(key, audio) # Promotes the clip into memory. # Übernimmt den Clip in den Speicher.
+        with self._lock: # Locks the counters. # Sperrt die Zähler.
+            self.hits += 1 # Counts the hit. # Zählt den Treffer.
+        return audio # Returns the clip. # Gibt den Clip zurück.
+
+    def put( # Stores a clip. # Speichert einen Clip.
+        self, text: str, lang: str, voice: str, rate: str, audio: bytes, output_format: str = "mp3" # Clip attributes and audio. # Clip-Attribute und Audio.
+    ) -> None:
+        """Store a synthesized clip on disk and in memory"""
+        if not audio: # Ignores empty synthesis results. # Ignoriert leere Syntheseergebnisse.
+            return
+        key = self.clip_key(text, lang, voice, rate, output_format) # Builds the clip key. # Erstellt den Clip-Schlüssel.
+        path = self._clip_path(key) # Gets the clip file path. # Holt den Clip-Dateipfad.
+        os.makedirs(os.path.dirname(path), exist_ok=True) # Creates the shard directory. # Erstellt das Shard-Verzeichnis.
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp" # Writes to a unique temporary file first. # Schreibt zuerst in eine eindeutige temporäre Datei.
+        with open(tmp_path, "wb") as f: # Opens the temporary file. # Öffnet die temporäre Datei.
+            f.write(audio) # Writes the clip bytes. # Schreibt die Clip-Bytes.
+        os.replace(tmp_path, path) # Atomically publishes the clip for other requests and workers. # Veröffentlicht den Clip atomar für andere Anfragen und Worker.
+        self._remember(key, audio) # Keeps the clip in memory. # Behält den Clip im Speicher.
+
+    def silence( # Returns silent audio for a pause. # Gibt stilles Audio für eine Pause zurück.
+        self, duration_ms: int, sample_rate: int = 16000, bitrate_kbps: int = 32 # Pause length and MP3 format. # Pausenlänge und MP3-Format.
+    ) -> bytes: # Returns MP3 frames. # Gibt MP3-Frames zurück.
+        """Return memoized silent MP3 frames for the given pause"""
+        key = (duration_ms, sample_rate, bitrate_kbps) # Keys silence by duration and format. # Verschlüsselt Stille nach Dauer und Format.
+        frames = self._silence.get(key) # Looks up memoized silence. # Sucht memoisierte Stille.
+        if frames is None: # If not generated yet. # Wenn noch nicht erzeugt.
+            frames = mp3_silence(duration_ms, sample_rate, bitrate_kbps) # Generates the silent frames. # Erzeugt die stillen Frames.
+            self._silence[key] = frames # Memoizes them. # Memoisiert sie.
+        return frames # Returns the silent frames. # Gibt die stillen Frames zurück.
+
+    def stats(self) -> dict: # Returns usage statistics. # Gibt Nutzungsstatistiken zurück.
+        """Return hit and miss counters for monitoring"""
+        with self._lock: # Locks the counters. # Sperrt die Zähler.
+            return { # Returns the statistics. # Gibt die Statistiken zurück.
+                "hits": self.hits, # Clip lookups served from the library. # Aus der Bibliothek bediente Clip-Abfragen.
+                "misses": self.misses, # Clip lookups that needed synthesis. # Clip-Abfragen, die eine Synthese benötigten.
+                "memory_clips": len(self._memory), # Clips currently held in memory. # Aktuell im Speicher gehaltene Clips.
+            }
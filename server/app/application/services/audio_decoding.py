@@ -0,0 +1,74 @@
+# Audio Decoding
+#
+# Converts uploaded clips to 16 kHz mono WAV in a pool of worker processes, so several clips decode in parallel without holding the event loop or the GIL. # Wandelt hochgeladene Clips in einem Pool von Worker-Prozessen in 16-kHz-Mono-WAV um, sodass mehrere Clips parallel dekodieren, ohne die Ereignisschleife oder die GIL zu belegen.
+# The module imports nothing of the server, so a spawned worker process starts quickly. # Das Modul importiert nichts vom Server, damit ein gestarteter Worker-Prozess schnell startet.
+#
+# Usage:
+# wav = await decode("mp3", data) # Returns the WAV bytes of an MP3 upload. # Gibt die WAV-Bytes eines MP3-Uploads zurück.
+# STT_DECODE_PROCESSES=2 # Worker processes per server worker. # Worker-Prozesse pro Server-Worker.
+#
+# EN: A batch of compressed clips costs the time of the slowest decode, not the sum of all of them.
+# DE: Ein Stapel komprimierter Clips kostet die Zeit der langsamsten Dekodierung, nicht die Summe aller.
+
+import asyncio # For awaiting the pool. # Zum Abwarten des Pools.
+import io # For decoding in memory. # Zum Dekodieren im Speicher.
+import multiprocessing # For the spawn start method. # Für die Startmethode spawn.
+import os # For configuration and the process id. # Für die Konfiguration und die Prozess-ID.
+import threading # For creating the pool once. # Zum einmaligen Erstellen des Pools.
+from concurrent.futures import ProcessPoolExecutor # For the decode processes. # Für die Dekodierprozesse.
+from concurrent.futures.process import BrokenProcessPool # Raised when a decode process died. # Ausgelöst, wenn ein Dekodierprozess abgestürzt ist.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+STT_DECODE_PROCESSES = int(os.getenv("STT_DECODE_PROCESSES", str(min(4, os.cpu_count() or 1)))) # Decode processes per server worker. # Dekodierprozesse pro Server-Worker.
+DECODABLE_FORMATS = ("mp3", "aac", "ogg", "m4a", "mp4") # Formats pydub converts; WAV needs no conversion. # Formate, die pydub umwandelt; WAV braucht keine Umwandlung.
+MAX_CLIP_SECONDS = float(os.getenv("UPLOAD_MAX_SECONDS", "120")) # Longest clip recognized. # Längster erkannter Clip.
+
+_pool: Optional[ProcessPoolExecutor] = None # Pool of this server worker. # Pool dieses Server-Workers.
+_pool_pid: Optional[int] = None # Process that created the pool; a forked worker creates its own. # Prozess, der den Pool erstellt hat; ein geforkter Worker erstellt seinen eigenen.
+_pool_lock = threading.Lock() # Guards pool creation. # Schützt die Poolerstellung.
+
+
+class ClipTooLong(ValueError): # Raised for a clip longer than MAX_CLIP_SECONDS; answered with 413. # Ausgelöst für einen Clip länger als MAX_CLIP_SECONDS; mit 413 beantwortet.
+    pass
+
+
+def decode_to_wav(ext: str, data: bytes) -> bytes: # Runs in a decode process. # Läuft in einem Dekodierprozess.
+    """Return 16 kHz mono 16-bit WAV bytes of a compressed clip; raises ValueError for undecodable input"""
+    if ext not in DECODABLE_FORMATS: # Checks if the format is supported. # Prüft, ob das Format unterstützt wird.
+        raise ValueError(f"Unsupported conversion format: {ext}")
+    from pydub import AudioSegment # Imported in the decode process only. # Nur im Dekodierprozess importiert.
+    try:
+        sound = AudioSegment.from_file(io.BytesIO(data), format=ext) # Decodes with ffmpeg. # Dekodiert mit ffmpeg.
+    except Exception: # ffmpeg rejected the file. # ffmpeg hat die Datei abgelehnt.
+        raise ValueError(f"Invalid {ext.upper()} file structure") from None
+    if sound.duration_seconds > MAX_CLIP_SECONDS: # A small compressed file can hold hours of audio. # Eine kleine komprimierte Datei kann Stunden an Audio enthalten.
+        raise ClipTooLong(f"Audio longer than {MAX_CLIP_SECONDS:.0f} seconds")
+    output = io.BytesIO()
+    sound.export(output, format="wav", parameters=["-ar", "16000", "-ac", "1", "-bits_per_raw_sample", "16"]) # Same settings as SpeechService._convert_to_wav. # Dieselben Einstellungen wie SpeechService._convert_to_wav.
+    return output.getvalue()
+
+
+def _decode_pool() -> ProcessPoolExecutor: # Returns the pool of this process. # Gibt den Pool dieses Prozesses zurück.
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid(): # Created on first use in each server worker. # In jedem Server-Worker bei der ersten Verwendung erstellt.
+            _pool = ProcessPoolExecutor( # Spawned, because forking a threaded server worker can copy held locks. # Gestartet statt geforkt, da das Forken eines Server-Workers mit Threads gehaltene Sperren kopieren kann.
+                max_workers=STT_DECODE_PROCESSES, mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+async def decode(ext: str, data: bytes) -> bytes: # Decodes one clip in the pool. # Dekodiert einen Clip im Pool.
+    """Return the WAV bytes of a clip, decoded in a worker process; WAV uploads are returned as they are"""
+    global _pool
+    if ext == "wav": # Read directly by the recognizer. # Direkt vom Erkenner gelesen.
+        return data
+    pool = _decode_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, decode_to_wav, ext, data)
+    except BrokenProcessPool: # A decode process crashed; the next clip gets a new pool. # Ein Dekodierprozess ist abgestürzt; der nächste Clip erhält einen neuen Pool.
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise ValueError(f"Decoding the {ext.upper()} file crashed") from None
@@ -0,0 +1,138 @@
+# Audio Formats
+#
+# A registry of the audio output formats the TTS service can produce. # Ein Verzeichnis der Audio-Ausgabeformate, die der TTS-Dienst erzeugen kann.
+# Maps short format names to Azure output formats, media types and file extensions, and negotiates the format per client. # Ordnet kurze Formatnamen Azure-Ausgabeformaten, Medientypen und Dateierweiterungen zu und handelt das Format pro Client aus.
+#
+# Usage:
+# audio_format = negotiate_audio_format(None, "application/json, audio/ogg") # Picks "opus-16k" from the Accept header. # Wählt "opus-16k" aus dem Accept-Header.
+# details = get_audio_format(audio_format) # Returns the registry entry. # Gibt den Verzeichniseintrag zurück.
+# media_type = media_type_for_filename("speech_20240101_120000.ogg") # Returns "audio/ogg". # Gibt "audio/ogg" zurück.
+#
+# EN: Lets mobile clients ask for compact Opus audio and desktop clients for higher quality MP3 without changing the synthesis pipeline.
+# DE: Ermöglicht mobilen Clients kompaktes Opus-Audio und Desktop-Clients MP3 in höherer Qualität anzufordern, ohne die Synthese-Pipeline zu ändern.
+
+import os # For reading the default format from the environment. # Zum Lesen des Standardformats aus der Umgebung.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+
+AUDIO_FORMATS = { # Supported output formats by name. # Unterstützte Ausgabeformate nach Namen.
+    "mp3-16k-32": { # Default format: 16kHz 32kbps mono MP3. # Standardformat: 16kHz 32kbps Mono-MP3.
+        "sdk_format": "Audio16Khz32KBitRateMonoMp3", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/mpeg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".mp3", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 16000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": 32, # Bitrate in kbps. # Bitrate in kbps.
+        "concatenable": True, # MP3 frames can be joined byte-wise. # MP3-Frames können byteweise verbunden werden.
+    },
+    "mp3-24k-48": { # Balanced MP3 for desktop playback. # Ausgewogenes MP3 für die Desktop-Wiedergabe.
+        "sdk_format": "Audio24Khz48KBitRateMonoMp3", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/mpeg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".mp3", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 24000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": 48, # Bitrate in kbps. # Bitrate in kbps.
+        "concatenable": True, # MP3 frames can be joined byte-wise. # MP3-Frames können byteweise verbunden werden.
+    },
+    "mp3-24k-96": { # Higher quality MP3 for desktop playback. # MP3 höherer Qualität für die Desktop-Wiedergabe.
+        "sdk_format": "Audio24Khz96KBitRateMonoMp3", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/mpeg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".mp3", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 24000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": 96, # Bitrate in kbps. # Bitrate in kbps.
+        "concatenable": True, # MP3 frames can be joined byte-wise. # MP3-Frames können byteweise verbunden werden.
+    },
+    "mp3-48k-192": { # Highest quality MP3. # MP3 höchster Qualität.
+        "sdk_format": "Audio48Khz192KBitRateMonoMp3", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/mpeg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".mp3", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 48000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": 192, # Bitrate in kbps. # Bitrate in kbps.
+        "concatenable": True, # MP3 frames can be joined byte-wise. # MP3-Frames können byteweise verbunden werden.
+    },
+    "opus-16k": { # Compact Opus in an Ogg container for mobile clients. # Kompaktes Opus in einem Ogg-Container für mobile Clients.
+        "sdk_format": "Ogg16Khz16BitMonoOpus", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/ogg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".ogg", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 16000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": None, # Variable bitrate chosen by the encoder. # Variable Bitrate, vom Encoder gewählt.
+        "concatenable": False, # Ogg pages carry stream state and can't be joined byte-wise. # Ogg-Seiten tragen Stream-Zustand und können nicht byteweise verbunden werden.
+    },
+    "opus-24k": { # Opus in an Ogg container with wider bandwidth. # Opus in einem Ogg-Container mit größerer Bandbreite.
+        "sdk_format": "Ogg24Khz16BitMonoOpus", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/ogg", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".ogg", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 24000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": None, # Variable bitrate chosen by the encoder. # Variable Bitrate, vom Encoder gewählt.
+        "concatenable": False, # Ogg pages carry stream state and can't be joined byte-wise. # Ogg-Seiten tragen Stream-Zustand und können nicht byteweise verbunden werden.
+    },
+    "webm-opus-16k": { # Compact Opus in a WebM container for browsers. # Kompaktes Opus in einem WebM-Container für Browser.
+        "sdk_format": "Webm16Khz16BitMonoOpus", # Azure SpeechSynthesisOutputFormat member. # Azure-SpeechSynthesisOutputFormat-Mitglied.
+        "media_type": "audio/webm", # Media type served to clients. # An Clients ausgelieferter Medientyp.
+        "extension": ".webm", # File extension of generated files. # Dateierweiterung erzeugter Dateien.
+        "sample_rate": 16000, # Sample rate in Hz. # Abtastrate in Hz.
+        "bitrate_kbps": None, # Variable bitrate chosen by the encoder. # Variable Bitrate, vom Encoder gewählt.
+        "concatenable": False, # WebM clusters can't be joined byte-wise. # WebM-Cluster können nicht byteweise verbunden werden.
+    },
+}
+
+DEFAULT_AUDIO_FORMAT = os.getenv("TTS_AUDIO_FORMAT", "mp3-16k-32") # Format used when the client expresses no preference. # Format, wenn der Client keine Präferenz angibt.
+if DEFAULT_AUDIO_FORMAT not in AUDIO_FORMATS: # Guards against a misconfigured default. # Schützt vor einem falsch konfigurierten Standard.
+    raise ValueError(f"Unknown TTS_AUDIO_FORMAT: {DEFAULT_AUDIO_FORMAT}") # Fails fast at startup. # Schlägt beim Start sofort fehl.
+
+
+def get_audio_format(name: Optional[str] = None) -> dict: # Returns a registry entry. # Gibt einen Verzeichniseintrag zurück.
+    """Return the registry entry for a format name, or the default format"""
+    return AUDIO_FORMATS[name or DEFAULT_AUDIO_FORMAT] # Looks up the format. # Sucht das Format.
+
+
+def _parse_accept(accept: str) -> list[tuple[str, float]]: # Parses an Accept header. # Analysiert einen Accept-Header.
+    """Return (media type, quality) pairs from an Accept header, best first"""
+    ranges = [] # Initializes the list of media ranges. # Initialisiert die Liste der Medienbereiche.
+    for position, part in enumerate(accept.split(",")): # Walks each media range. # Durchläuft jeden Medienbereich.
+        fields = [f.strip() for f in part.split(";")] # Splits the media type from its parameters. # Trennt den Medientyp von seinen Parametern.
+        media_type = fields[0].lower() # Normalizes the media type. # Normalisiert den Medientyp.
+        if not media_type: # Skips empty entries. # Überspringt leere Einträge.
+            continue
+        quality = 1.0 # Default quality. # Standardqualität.
+        for param in fields[1:]: # Looks for the q parameter. # Sucht den q-Parameter.
+            if param.lower().startswith("q="): # Checks for the quality parameter. # Prüft auf den Qualitätsparameter.
+                try: # Tries to parse the quality. # Versucht, die Qualität zu analysieren.
+                    quality = float(param[2:]) # Reads the quality value. # Liest den Qualitätswert.
+                except ValueError: # Ignores malformed values. # Ignoriert fehlerhafte Werte.
+                    quality = 0.0 # Treats malformed values as not acceptable. # Behandelt fehlerhafte Werte als nicht akzeptabel.
+        ranges.append((media_type, quality, position)) # Keeps the original position for stable ordering. # Behält die ursprüngliche Position für eine stabile Sortierung.
+    ranges.sort(key=lambda r: (-r[1], r[2])) # Orders by quality, then header order. # Sortiert nach Qualität, dann Header-Reihenfolge.
+    return [(media_type, quality) for media_type, quality, _ in ranges] # Returns the ordered ranges. # Gibt die geordneten Bereiche zurück.
+
+
+def negotiate_audio_format( # Chooses the audio format for a request. # Wählt das Audioformat für eine Anfrage.
+    requested: Optional[str] = None, # Explicit format name from the request. # Expliziter Formatname aus der Anfrage.
+    accept: Optional[str] = None, # Accept header from the request. # Accept-Header aus der Anfrage.
+) -> str: # Returns a registered format name. # Gibt einen registrierten Formatnamen zurück.
+    """Pick the output format from an explicit parameter, then the Accept header, then the default"""
+    if requested: # An explicit parameter wins. # Ein expliziter Parameter hat Vorrang.
+        if requested not in AUDIO_FORMATS: # Checks if the format is known. # Prüft, ob das Format bekannt ist.
+            raise ValueError( # Raises for unknown formats. # Löst bei unbekannten Formaten einen Fehler aus.
+                f"Unsupported audio format '{requested}'. Supported: {', '.join(AUDIO_FORMATS)}" # Lists the supported names. # Listet die unterstützten Namen auf.
+            )
+        return requested # Returns the requested format. # Gibt das angeforderte Format zurück.
+
+    for media_type, quality in _parse_accept(accept or ""): # Walks the accepted media types, best first. # Durchläuft die akzeptierten Medientypen, beste zuerst.
+        if quality <= 0 or not media_type.startswith("audio/"): # Only positive audio ranges choose a format. # Nur positive Audiobereiche wählen ein Format.
+            continue
+        if media_type == "audio/*": # Any audio is fine. # Jedes Audio ist in Ordnung.
+            return DEFAULT_AUDIO_FORMAT # Uses the default format. # Verwendet das Standardformat.
+        if AUDIO_FORMATS[DEFAULT_AUDIO_FORMAT]["media_type"] == media_type: # Prefers the default when it matches. # Bevorzugt den Standard, wenn er passt.
+            return DEFAULT_AUDIO_FORMAT # Uses the default format. # Verwendet das Standardformat.
+        for name, details in AUDIO_FORMATS.items(): # Finds the first format with this media type. # Findet das erste Format mit diesem Medientyp.
+            if details["media_type"] == media_type: # Checks the media type. # Prüft den Medientyp.
+                return name # Returns the matching format. # Gibt das passende Format zurück.
+
+    return DEFAULT_AUDIO_FORMAT # Falls back to the default format. # Fällt auf das Standardformat zurück.
+
+
+def media_type_for_filename(filename: str) -> str: # Returns the media type of a generated file. # Gibt den Medientyp einer erzeugten Datei zurück.
+    """Return the media type matching the extension of a generated audio file"""
+    extension = os.path.splitext(filename)[1].lower() # Gets the file extension. # Holt die Dateierweiterung.
+    for details in AUDIO_FORMATS.values(): # Walks the registry. # Durchläuft das Verzeichnis.
+        if details["extension"] == extension: # Checks the extension. # Prüft die Erweiterung.
+            return details["media_type"] # Returns the matching media type. # Gibt den passenden Medientyp zurück.
+    return "application/octet-stream" # Unknown files are served as binary. # Unbekannte Dateien werden als Binärdaten ausgeliefert.
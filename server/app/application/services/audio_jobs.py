@@ -0,0 +1,193 @@
+# AudioJobQueue
+#
+# Runs audio syntheses as background jobs, so a translation can be returned as soon as Gemini's response is parsed. # Führt Audiosynthesen als Hintergrund-Jobs aus, damit eine Übersetzung zurückgegeben werden kann, sobald Geminis Antwort geparst ist.
+# Jobs wait in a bounded priority queue for a fixed number of workers; their status is written next to the audio files, so any worker process can answer a poll. # Jobs warten in einer begrenzten Prioritätswarteschlange auf eine feste Anzahl von Workern; ihr Status wird neben die Audiodateien geschrieben, sodass jeder Worker-Prozess eine Abfrage beantworten kann.
+#
+# Usage:
+# job_id = await audio_jobs.submit(lambda: tts.text_to_speech(ssml), priority="high") # Queues a synthesis; None when the queue is full. # Reiht eine Synthese ein; None, wenn die Warteschlange voll ist.
+# job = await audio_jobs.wait(job_id, timeout=20) # Long-polls until the job is done or failed. # Wartet per Long-Polling, bis der Job fertig oder fehlgeschlagen ist.
+# AUDIO_JOB_WORKERS=4 AUDIO_JOB_QUEUE_SIZE=256 # Concurrent and queued jobs per worker process. # Gleichzeitige und wartende Jobs pro Worker-Prozess.
+#
+# EN: The user reads the translation while the audio is synthesized; perceived latency drops to the Gemini time.
+# DE: Der Benutzer liest die Übersetzung, während das Audio synthetisiert wird; die wahrgenommene Latenz sinkt auf die Gemini-Zeit.
+
+import asyncio # For the queue and the workers. # Für die Warteschlange und die Worker.
+import contextvars # For starting workers outside any request's context. # Zum Starten von Workern außerhalb des Kontexts einer Anfrage.
+import itertools # For FIFO order within a priority. # Für FIFO-Reihenfolge innerhalb einer Priorität.
+import json # For the status files. # Für die Statusdateien.
+import logging # For job logging. # Für das Job-Logging.
+import os # For configuration and files. # Für Konfiguration und Dateien.
+import time # For timestamps and expiry. # Für Zeitstempel und Ablauf.
+import uuid # For job ids. # Für Job-IDs.
+from typing import Awaitable, Callable, Optional # For type hinting. # Für Typhinweise.
+
+from prometheus_client import Counter, Gauge, Histogram # For queue metrics. # Für Warteschlangenmetriken.
+
+from ...infrastructure.deadline import deadline_scope # Gives each job its own budget. # Gibt jedem Job ein eigenes Budget.
+from ...infrastructure.observability.request_timing import run_in_executor # For status file I/O off the event loop. # Für Statusdatei-E/A außerhalb der Ereignisschleife.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+AUDIO_JOB_WORKERS = int(os.getenv("AUDIO_JOB_WORKERS", "4")) # Jobs synthesized at once per worker process. # Gleichzeitig synthetisierte Jobs pro Worker-Prozess.
+AUDIO_JOB_QUEUE_SIZE = int(os.getenv("AUDIO_JOB_QUEUE_SIZE", "256")) # Jobs waiting per worker process. # Wartende Jobs pro Worker-Prozess.
+AUDIO_JOB_TIMEOUT_SECONDS = float(os.getenv("AUDIO_JOB_TIMEOUT_SECONDS", "120")) # Budget of one synthesis. # Budget einer Synthese.
+AUDIO_JOB_TTL_SECONDS = float(os.getenv("AUDIO_JOB_TTL_SECONDS", "600")) # How long finished jobs can be polled. # Wie lange fertige Jobs abgefragt werden können.
+PRIORITIES = {"high": 0, "normal": 1, "low": 2} # Lower runs first. # Niedriger läuft zuerst.
+FINISHED = ("done", "failed") # Final states. # Endzustände.
+
+QUEUE_DEPTH = Gauge( # Jobs waiting for a worker. # Auf einen Worker wartende Jobs.
+    "speak_audio_job_queue_depth", "Audio jobs waiting for a worker", multiprocess_mode="livesum"
+)
+QUEUE_WAIT = Histogram( # Time from submission to start. # Zeit von der Übermittlung bis zum Start.
+    "speak_audio_job_wait_seconds", "Time an audio job waited for a worker", ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+JOBS = Counter("speak_audio_jobs_total", "Audio jobs by outcome", ["status"]) # done, failed or rejected. # done, failed oder rejected.
+
+
+class AudioJobQueue: # Defines the AudioJobQueue class. # Definiert die AudioJobQueue-Klasse.
+    def __init__(self, directory: Optional[str] = None, workers: int = AUDIO_JOB_WORKERS, max_queue: int = AUDIO_JOB_QUEUE_SIZE): # Initializes the queue. # Initialisiert die Warteschlange.
+        self.directory = directory or os.path.join(self._get_temp_directory(), "audio_jobs") # Status files of all worker processes. # Statusdateien aller Worker-Prozesse.
+        os.makedirs(self.directory, exist_ok=True) # Creates the directory if it doesn't exist. # Erstellt das Verzeichnis, falls es nicht existiert.
+        self.workers = workers # Number of worker tasks. # Anzahl der Worker-Tasks.
+        self.max_queue = max_queue # Queue bound. # Warteschlangengrenze.
+        self._queue = None # Created inside the running event loop. # Wird innerhalb der laufenden Ereignisschleife erstellt.
+        self._tasks = [] # Worker tasks. # Worker-Tasks.
+        self._jobs = {} # Job id -> status of the jobs of this process. # Job-ID -> Status der Jobs dieses Prozesses.
+        self._finished = {} # Job id -> event set when the job ends. # Job-ID -> Ereignis, das beim Ende des Jobs gesetzt wird.
+        self._sequence = itertools.count() # Tie-breaker keeping submission order. # Gleichstandsauflösung, die die Übermittlungsreihenfolge erhält.
+        self._submitted = 0 # Jobs since the last cleanup. # Jobs seit der letzten Bereinigung.
+
+    def _get_temp_directory(self) -> str: # Defines method to get the audio directory. # Definiert Methode zum Abrufen des Audioverzeichnisses.
+        """Return the shared TTS audio directory"""
+        if os.name == "nt": # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            return os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Uses the Windows temp directory. # Verwendet das Windows-Temp-Verzeichnis.
+        return "/tmp/tts_audio" # Uses the Unix audio directory. # Verwendet das Unix-Audioverzeichnis.
+
+    def _path(self, job_id: str) -> str: # Status file of a job. # Statusdatei eines Jobs.
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _write(self, job: dict) -> None: # Publishes a job's status to every worker process. # Veröffentlicht den Status eines Jobs für jeden Worker-Prozess.
+        temp_path = self._path(job["job_id"]) + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(temp_path, self._path(job["job_id"])) # Readers never see a partial file. # Leser sehen nie eine halbe Datei.
+
+    def _read(self, job_id: str) -> Optional[dict]: # Reads a job's status. # Liest den Status eines Jobs.
+        try:
+            with open(self._path(job_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError): # Unknown or expired job. # Unbekannter oder abgelaufener Job.
+            return None
+
+    def _remove(self, job_id: str) -> None: # Deletes the status file of a job that never ran. # Löscht die Statusdatei eines Jobs, der nie lief.
+        try:
+            os.remove(self._path(job_id))
+        except OSError: # Never written. # Nie geschrieben.
+            pass
+
+    def _cleanup(self) -> None: # Removes status files of expired jobs. # Entfernt Statusdateien abgelaufener Jobs.
+        cutoff = time.time() - AUDIO_JOB_TTL_SECONDS
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError: # Another worker removed it first. # Ein anderer Worker hat sie zuerst entfernt.
+                pass
+
+    def _start_workers(self) -> None: # Creates the queue and workers on first use. # Erstellt Warteschlange und Worker bei der ersten Verwendung.
+        if self._queue is not None:
+            return
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queue) # Bounded, so a burst can't pile up unbounded work. # Begrenzt, damit sich bei einem Ansturm keine unbegrenzte Arbeit ansammelt.
+        loop = asyncio.get_running_loop()
+        for _ in range(self.workers): # An empty context, so workers don't inherit the first request's deadline or timings. # Ein leerer Kontext, damit Worker weder Frist noch Zeiten der ersten Anfrage erben.
+            self._tasks.append(contextvars.Context().run(loop.create_task, self._worker()))
+
+    async def submit( # Queues a synthesis. # Reiht eine Synthese ein.
+        self, synthesize: Callable[[], Awaitable[Optional[str]]], priority: str = "normal",
+    ) -> Optional[str]:
+        """Queue synthesize() and return the job id, or None when the queue is full"""
+        self._start_workers()
+        now = time.time()
+        for job_id, job in list(self._jobs.items()): # Forgets expired jobs. # Vergisst abgelaufene Jobs.
+            if job["status"] in FINISHED and now - job["finished"] > AUDIO_JOB_TTL_SECONDS:
+                del self._jobs[job_id], self._finished[job_id]
+
+        if self._queue.full(): # Sheds load; the translation is returned without audio. # Wirft Last ab; die Übersetzung wird ohne Audio zurückgegeben.
+            return self._reject()
+        job = {"job_id": uuid.uuid4().hex, "status": "queued", "priority": priority, "audio_path": None, "error": None, "created": now, "finished": None}
+        self._jobs[job["job_id"]] = job # The in-memory status is the source of truth; the file only mirrors it. # Der Status im Speicher ist maßgeblich; die Datei spiegelt ihn nur.
+        self._finished[job["job_id"]] = asyncio.Event()
+        try: # Written before a worker can pick the job up, so "queued" never overwrites a later status. # Geschrieben, bevor ein Worker den Job aufnehmen kann, damit "queued" nie einen späteren Status überschreibt.
+            await run_in_executor(self._write, dict(job)) # Visible to polls on other worker processes. # Sichtbar für Abfragen auf anderen Worker-Prozessen.
+        except OSError as e: # Polls on this process still see the job. # Abfragen auf diesem Prozess sehen den Job trotzdem.
+            logger.warning("Could not write status of audio job %s: %s", job["job_id"], e)
+        try:
+            self._queue.put_nowait((PRIORITIES.get(priority, PRIORITIES["normal"]), next(self._sequence), job["job_id"], synthesize))
+        except asyncio.QueueFull: # Other requests filled the queue while the status was written. # Andere Anfragen haben die Warteschlange gefüllt, während der Status geschrieben wurde.
+            del self._jobs[job["job_id"]], self._finished[job["job_id"]]
+            await run_in_executor(self._remove, job["job_id"])
+            return self._reject()
+        QUEUE_DEPTH.inc()
+        self._submitted += 1
+        if self._submitted >= 256: # Cleans up in batches. # Bereinigt in Stapeln.
+            self._submitted = 0
+            await run_in_executor(self._cleanup)
+        return job["job_id"]
+
+    def _reject(self) -> None: # Counts a job the full queue turned away. # Zählt einen Job, den die volle Warteschlange abgewiesen hat.
+        JOBS.labels("rejected").inc()
+        logger.warning("Audio job queue full, skipping audio")
+
+    async def _worker(self) -> None: # Runs queued jobs one at a time. # Führt eingereihte Jobs nacheinander aus.
+        while True:
+            _, _, job_id, synthesize = await self._queue.get()
+            QUEUE_DEPTH.dec()
+            job = self._jobs[job_id]
+            QUEUE_WAIT.labels(job["priority"]).observe(time.time() - job["created"])
+            job["status"] = "running"
+            try:
+                try:
+                    await run_in_executor(self._write, dict(job))
+                except OSError as e: # The job still runs; only other processes miss the update. # Der Job läuft trotzdem; nur andere Prozesse verpassen die Aktualisierung.
+                    logger.warning("Could not write status of audio job %s: %s", job_id, e)
+                with deadline_scope(AUDIO_JOB_TIMEOUT_SECONDS): # Upstream calls of the job respect its budget. # Upstream-Aufrufe des Jobs respektieren sein Budget.
+                    audio_path = await synthesize()
+                job["status"], job["audio_path"] = ("done", audio_path) if audio_path else ("failed", None)
+                job["error"] = None if audio_path else "Audio generation failed"
+            except asyncio.CancelledError: # Shutdown. # Herunterfahren.
+                raise
+            except Exception as e: # Deadline, overload or synthesis errors. # Frist-, Überlast- oder Synthesefehler.
+                logger.warning("Audio job %s failed: %s", job_id, e)
+                job["status"], job["error"] = "failed", getattr(e, "detail", None) or str(e)
+            finally:
+                self._queue.task_done()
+            job["finished"] = time.time()
+            JOBS.labels(job["status"]).inc()
+            try:
+                await run_in_executor(self._write, dict(job))
+            except OSError as e: # Polls on this process still see the result. # Abfragen auf diesem Prozess sehen das Ergebnis trotzdem.
+                logger.warning("Could not write status of audio job %s: %s", job_id, e)
+            self._finished[job_id].set() # Wakes long-polls on this process. # Weckt Long-Polls auf diesem Prozess.
+
+    async def wait(self, job_id: str, timeout: float = 0.0) -> Optional[dict]: # Returns a job's status. # Gibt den Status eines Jobs zurück.
+        """Return the job's status, waiting up to timeout seconds for it to finish; None for unknown jobs"""
+        job = self._jobs.get(job_id)
+        if job is not None: # Submitted by this process. # Von diesem Prozess übermittelt.
+            if job["status"] not in FINISHED and timeout > 0:
+                try:
+                    await asyncio.wait_for(self._finished[job_id].wait(), timeout)
+                except asyncio.TimeoutError: # Still running; the client polls again. # Läuft noch; der Client fragt erneut ab.
+                    pass
+            return dict(job)
+
+        loop = asyncio.get_running_loop() # Submitted by another worker process. # Von einem anderen Worker-Prozess übermittelt.
+        deadline = loop.time() + timeout
+        while True:
+            job = await run_in_executor(self._read, job_id)
+            if job is None or job["status"] in FINISHED or loop.time() >= deadline:
+                return job
+            await asyncio.sleep(min(0.25, deadline - loop.time())) # Polls the shared status file. # Fragt die gemeinsame Statusdatei ab.
+
+    def status(self) -> dict: # Current load. # Aktuelle Last.
+        return {"workers": self.workers, "queued": self._queue.qsize() if self._queue else 0, "max_queue": self.max_queue}
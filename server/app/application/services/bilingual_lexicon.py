@@ -0,0 +1,178 @@
+# BilingualLexicon
+#
+# A German/English-Spanish lexicon learned from the word pairs of past Gemini responses, stored in a SQLite file shared by every worker. # Ein Deutsch/Englisch-Spanisch-Lexikon, gelernt aus den Wortpaaren früherer Gemini-Antworten, gespeichert in einer von allen Workern geteilten SQLite-Datei.
+# Each worker keeps an in-memory index of it and answers one-word prompts through the Spanish pivot. # Jeder Worker hält einen In-Memory-Index davon und beantwortet Ein-Wort-Eingaben über das Spanische als Brücke.
+#
+# Usage:
+# lexicon = BilingualLexicon() # Opens the lexicon next to the generated audio files. # Öffnet das Lexikon neben den erzeugten Audiodateien.
+# lexicon.learn(word_pairs) # Counts the (source, Spanish, is_german) pairs of a fresh response. # Zählt die (Quelle, Spanisch, is_german)-Paare einer frischen Antwort.
+# lexicon.lookup("Freund", "de") # Returns [("Freund", "friend", "amigo")] once the pairs are confident, else None. # Gibt [("Freund", "friend", "amigo")] zurück, sobald die Paare sicher sind, sonst None.
+#
+# EN: A single word no longer costs a full eight-section generation once the lexicon has seen it often enough.
+# DE: Ein einzelnes Wort kostet keine vollständige Generierung mit acht Abschnitten mehr, sobald das Lexikon es oft genug gesehen hat.
+
+import logging # For reporting lexicon errors. # Zum Melden von Lexikonfehlern.
+import os # For configuration and the process id. # Für die Konfiguration und die Prozess-ID.
+import re # For normalizing words. # Zum Normalisieren von Wörtern.
+import sqlite3 # For the shared lexicon file. # Für die gemeinsame Lexikondatei.
+import threading # For one connection per thread and the index lock. # Für eine Verbindung pro Thread und die Indexsperre.
+import time # For refresh timestamps. # Für Aktualisierungszeitstempel.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+LEXICON_MAX_WORDS = int(os.getenv("LEXICON_MAX_WORDS", "1")) # Longest prompt answered from the lexicon; longer ones would be word-by-word glosses, not translations. # Längste aus dem Lexikon beantwortete Eingabe; längere wären Wort-für-Wort-Glossen, keine Übersetzungen.
+LEXICON_MIN_COUNT = int(os.getenv("LEXICON_MIN_COUNT", "3")) # Responses a word must have been seen in. # Antworten, in denen ein Wort gesehen worden sein muss.
+LEXICON_MIN_CONFIDENCE = float(os.getenv("LEXICON_MIN_CONFIDENCE", "0.8")) # Share of the most common translation, multiplied over all words. # Anteil der häufigsten Übersetzung, multipliziert über alle Wörter.
+LEXICON_REFRESH_SECONDS = float(os.getenv("LEXICON_REFRESH_SECONDS", "30")) # How often a worker picks up other workers' pairs. # Wie oft ein Worker die Paare anderer Worker übernimmt.
+LANGUAGES = ("de", "en") # Source languages of the word pairs; the targets are Spanish. # Quellsprachen der Wortpaare; die Ziele sind Spanisch.
+
+SCHEMA = ( # One row per pair, clustered on its key. # Eine Zeile pro Paar, nach ihrem Schlüssel gruppiert.
+    "CREATE TABLE IF NOT EXISTS pairs (language TEXT NOT NULL, source TEXT NOT NULL, target TEXT NOT NULL, "
+    "count INTEGER NOT NULL, updated REAL NOT NULL, PRIMARY KEY (language, source, target)) WITHOUT ROWID"
+)
+INDEX = "CREATE INDEX IF NOT EXISTS pairs_updated ON pairs (updated)" # For incremental refreshes. # Für inkrementelle Aktualisierungen.
+PUNCTUATION = ".,;:!?¡¿\"'«»„“”()" # Stripped from learned words, which the model writes with their sentence punctuation. # Von gelernten Wörtern entfernt, die das Modell mit ihrer Satzzeichensetzung schreibt.
+REFRESH_OVERLAP_SECONDS = 5.0 # Re-reads recent rows, in case a slower writer committed an older timestamp. # Liest neuere Zeilen erneut, falls ein langsamerer Schreiber einen älteren Zeitstempel festgeschrieben hat.
+
+
+def normalize(text: str) -> str: # Builds the lookup form of a word or phrase. # Erstellt die Suchform eines Wortes oder einer Phrase.
+    return " ".join(re.sub(r"[^\w\s'-]", " ", text.lower()).split())
+
+
+class BilingualLexicon: # Defines the BilingualLexicon class. # Definiert die BilingualLexicon-Klasse.
+    def __init__(self, path: Optional[str] = None): # Initializes the lexicon. # Initialisiert das Lexikon.
+        self.path = path or os.getenv("LEXICON_PATH") or os.path.join(self._get_temp_directory(), "lexicon.sqlite3") # Stored next to the audio clips. # Neben den Audioclips gespeichert.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True) # Creates the directory if it doesn't exist. # Erstellt das Verzeichnis, falls es nicht existiert.
+        self._local = threading.local() # Connection of the current thread. # Verbindung des aktuellen Threads.
+        self._lock = threading.Lock() # Guards the index against a refresh in the thread pool. # Schützt den Index vor einer Aktualisierung im Thread-Pool.
+        self._forward = {language: {} for language in LANGUAGES} # Language -> source word -> {(source, target): count}. # Sprache -> Quellwort -> {(Quelle, Ziel): Anzahl}.
+        self._reverse = {language: {} for language in LANGUAGES} # Language -> Spanish word -> {(source, target): count}. # Sprache -> spanisches Wort -> {(Quelle, Ziel): Anzahl}.
+        self._seen = 0.0 # Newest update applied to the index. # Neueste in den Index übernommene Änderung.
+        self._refreshed = None # Monotonic time of the last refresh. # Monotone Zeit der letzten Aktualisierung.
+
+    def _get_temp_directory(self) -> str: # Defines method to get the audio directory. # Definiert Methode zum Abrufen des Audioverzeichnisses.
+        """Return the shared TTS audio directory"""
+        if os.name == "nt": # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            return os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Uses the Windows temp directory. # Verwendet das Windows-Temp-Verzeichnis.
+        return "/tmp/tts_audio" # Uses the Unix audio directory. # Verwendet das Unix-Audioverzeichnis.
+
+    def _connection(self) -> sqlite3.Connection: # Returns the connection of this thread and process. # Gibt die Verbindung dieses Threads und Prozesses zurück.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid(): # SQLite connections must not cross threads or a fork. # SQLite-Verbindungen dürfen weder Threads noch einen Fork überqueren.
+            connection = sqlite3.connect(self.path, timeout=5.0) # Waits up to 5 s for another worker's write. # Wartet bis zu 5 s auf den Schreibvorgang eines anderen Workers.
+            connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer and vice versa. # Leser blockieren den Schreiber nicht und umgekehrt.
+            connection.execute("PRAGMA synchronous=NORMAL") # Losing the last counts after a power cut is acceptable. # Der Verlust der letzten Zählungen nach einem Stromausfall ist akzeptabel.
+            connection.execute(SCHEMA)
+            connection.execute(INDEX)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def learn(self, word_pairs: list[tuple[str, str, bool]]) -> None: # Counts the pairs of one response. # Zählt die Paare einer Antwort.
+        """Add one observation of every pair for all workers, then refresh this worker's index; runs in the thread pool"""
+        rows = {( # Each pair counts once per response. # Jedes Paar zählt einmal pro Antwort.
+            "de" if is_german else "en", source.strip(PUNCTUATION), target.strip(PUNCTUATION),
+        ) for source, target, is_german in word_pairs}
+        rows = [row + (time.time(),) for row in rows if row[1] and row[2]]
+        if not rows: # Nothing to learn. # Nichts zu lernen.
+            return
+        try:
+            connection = self._connection()
+            with connection: # Commits the batch. # Bestätigt den Stapel.
+                connection.executemany(
+                    "INSERT INTO pairs VALUES (?, ?, ?, 1, ?) "
+                    "ON CONFLICT (language, source, target) DO UPDATE SET count = count + 1, updated = excluded.updated",
+                    rows,
+                )
+        except sqlite3.Error as e: # Another worker held the lock too long. # Ein anderer Worker hielt die Sperre zu lange.
+            logger.warning("Lexicon write failed: %s", e)
+            return
+        self.refresh()
+
+    def stale(self) -> bool: # Whether other workers' pairs may be missing. # Ob Paare anderer Worker fehlen könnten.
+        return self._refreshed is None or time.monotonic() - self._refreshed > LEXICON_REFRESH_SECONDS
+
+    def refresh(self) -> None: # Loads pairs changed since the last refresh. # Lädt seit der letzten Aktualisierung geänderte Paare.
+        """Apply rows updated since the last refresh to the in-memory index; runs in the thread pool"""
+        try:
+            rows = self._connection().execute(
+                "SELECT language, source, target, count, updated FROM pairs WHERE updated >= ?",
+                (self._seen - REFRESH_OVERLAP_SECONDS,),
+            ).fetchall()
+        except sqlite3.Error as e: # Locked too long or corrupted. # Zu lange gesperrt oder beschädigt.
+            logger.warning("Lexicon refresh failed: %s", e)
+            return
+        with self._lock: # Counts are absolute, so re-applying a row is harmless. # Zählungen sind absolut, daher ist erneutes Anwenden einer Zeile harmlos.
+            for language, source, target, count, updated in rows:
+                if language not in self._forward: # Ignores unknown languages. # Ignoriert unbekannte Sprachen.
+                    continue
+                self._forward[language].setdefault(normalize(source), {})[(source, target)] = count
+                self._reverse[language].setdefault(normalize(target), {})[(source, target)] = count
+                self._seen = max(self._seen, updated)
+        self._refreshed = time.monotonic()
+
+    @staticmethod
+    def _best(entries: Optional[dict]) -> Optional[tuple[tuple[str, str], float, int]]: # Picks the most common pair. # Wählt das häufigste Paar.
+        """Return (pair, share of all observations, observations) of the most common pair"""
+        if not entries:
+            return None
+        pair, count = max(entries.items(), key=lambda item: item[1])
+        total = sum(entries.values())
+        return pair, count / total, total
+
+    def _resolve(self, word: str, language: str) -> Optional[tuple[tuple[str, str, str], float, int]]: # Translates one word. # Übersetzt ein Wort.
+        """Return ((German, English, Spanish), confidence, observations) for a word of the given language"""
+        if language == "es": # A Spanish word is looked up on both sides. # Ein spanisches Wort wird auf beiden Seiten gesucht.
+            german, english = self._best(self._reverse["de"].get(word)), self._best(self._reverse["en"].get(word))
+            if not german or not english:
+                return None
+            return (german[0][0], english[0][0], german[0][1]), german[1] * english[1], min(german[2], english[2])
+
+        forward = self._best(self._forward[language].get(word)) # Source word to Spanish. # Quellwort zu Spanisch.
+        if not forward:
+            return None
+        other = "en" if language == "de" else "de"
+        backward = self._best(self._reverse[other].get(normalize(forward[0][1]))) # Spanish to the other language. # Spanisch zur anderen Sprache.
+        if not backward:
+            return None
+        source, spanish = forward[0]
+        words = (source, backward[0][0], spanish) if language == "de" else (backward[0][0], source, spanish)
+        return words, forward[1] * backward[1], min(forward[2], backward[2])
+
+    def lookup(self, text: str, source_lang: Optional[str] = None) -> Optional[list[tuple[str, str, str]]]: # Answers a one-word prompt. # Beantwortet eine Ein-Wort-Eingabe.
+        """Return (German, English, Spanish) per word when every word is known with enough observations and confidence, else None; source_lang is tried first, then the other languages"""
+        words = normalize(text).split()
+        if not words or len(words) > LEXICON_MAX_WORDS: # Phrases need word order and grammar, which per-word entries don't have. # Phrasen brauchen Wortstellung und Grammatik, die Einträge pro Wort nicht haben.
+            return None
+        language = (source_lang or "")[:2].lower()
+        languages = LANGUAGES + ("es",)
+
+        answers = []
+        with self._lock: # Reads a consistent index. # Liest einen konsistenten Index.
+            if language in languages: # The stated language wins when it covers the word. # Die angegebene Sprache gewinnt, wenn sie das Wort abdeckt.
+                resolved = [self._resolve(word, language) for word in words]
+                if all(resolved): # Every word is covered. # Jedes Wort ist abgedeckt.
+                    answers.append(resolved)
+            if not answers: # A German "suche" sent with the default "en" must resolve one other way only. # Ein deutsches "suche" mit dem Standard "en" darf nur auf eine andere Weise auflösbar sein.
+                for candidate in languages:
+                    if candidate == language:
+                        continue
+                    resolved = [self._resolve(word, candidate) for word in words]
+                    if all(resolved):
+                        answers.append(resolved)
+        if len(answers) != 1: # Unknown or ambiguous. # Unbekannt oder mehrdeutig.
+            return None
+
+        confidence = 1.0
+        for _, share, observations in answers[0]:
+            if observations < LEXICON_MIN_COUNT: # Seen too rarely. # Zu selten gesehen.
+                return None
+            confidence *= share
+        if confidence < LEXICON_MIN_CONFIDENCE: # Too ambiguous as a whole. # Insgesamt zu mehrdeutig.
+            return None
+        return [words for words, _, _ in answers[0]]
+
+    def stats(self) -> dict: # Returns usage statistics. # Gibt Nutzungsstatistiken zurück.
+        """Return the number of indexed source words per language for monitoring"""
+        with self._lock:
+            return {language: len(self._forward[language]) for language in LANGUAGES}
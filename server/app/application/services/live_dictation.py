@@ -0,0 +1,163 @@
+# Live Dictation
+#
+# Feeds audio frames into an Azure push-stream recognizer while they are captured and hands back its partial and final hypotheses as they arrive. # Speist Audio-Frames während der Aufnahme in einen Azure-Push-Stream-Erkenner und gibt seine Teil- und Endhypothesen beim Eintreffen zurück.
+# The SDK fires its events on its own threads; they reach the event loop through a queue, in order. # Das SDK feuert seine Ereignisse in eigenen Threads; sie erreichen die Ereignisschleife der Reihe nach über eine Warteschlange.
+#
+# Usage:
+# session = DictationSession(speech_config, "es-ES", 16000); await session.start() # Starts continuous recognition on a push stream. # Startet die kontinuierliche Erkennung auf einem Push-Stream.
+# session.write(frame) # Pushes 16-bit mono PCM; False once the session is full. # Schiebt 16-Bit-Mono-PCM; False, sobald die Sitzung voll ist.
+# session.finish() # Ends the audio; the last final result follows. # Beendet das Audio; das letzte Endergebnis folgt.
+# await asyncio.wait_for(receive(), session.receive_timeout()) # Waits no longer than the idle and session limits allow; session.expire() on timeout. # Wartet nicht länger, als Leerlauf- und Sitzungsgrenze erlauben; bei Zeitüberschreitung session.expire().
+# async for event in session.events(): ... # {"type": "partial" | "final" | "error", ...} until the recognizer stops. # {"type": "partial" | "final" | "error", ...}, bis der Erkenner stoppt.
+# await session.close() # Stops recognition and releases the recognizer. # Stoppt die Erkennung und gibt den Erkenner frei.
+#
+# EN: A speaker sees their words while still talking, instead of after uploading the whole recording.
+# DE: Sprecher sehen ihre Wörter schon beim Sprechen, statt erst nach dem Hochladen der ganzen Aufnahme.
+
+import asyncio # For the event queue. # Für die Ereigniswarteschlange.
+import logging # For cleanup warnings. # Für Bereinigungswarnungen.
+import os # For configuration. # Für die Konfiguration.
+import time # For session timings. # Für Sitzungszeiten.
+from typing import AsyncIterator, Optional # For type hinting. # Für Typhinweise.
+
+import azure.cognitiveservices.speech as speechsdk # Azure Speech SDK with push streams. # Azure Speech SDK mit Push-Streams.
+from prometheus_client import Counter, Gauge, Histogram # For dictation metrics. # Für Diktatmetriken.
+
+from ...infrastructure.observability.request_timing import run_in_executor # Blocking SDK calls run in the thread pool. # Blockierende SDK-Aufrufe laufen im Thread-Pool.
+
+DICTATION_MAX_SECONDS = float(os.getenv("DICTATION_MAX_SECONDS", "300")) # Longest audio of one session. # Längstes Audio einer Sitzung.
+DICTATION_IDLE_SECONDS = float(os.getenv("DICTATION_IDLE_SECONDS", "10")) # Longest pause between two messages of the client. # Längste Pause zwischen zwei Nachrichten des Clients.
+DICTATION_SESSION_SECONDS = float(os.getenv("DICTATION_SESSION_SECONDS", str(DICTATION_MAX_SECONDS + 60))) # Longest wall-clock time of one session, however little audio it pushed. # Längste Echtzeit einer Sitzung, wie wenig Audio sie auch geschoben hat.
+DICTATION_FLUSH_SECONDS = float(os.getenv("DICTATION_FLUSH_SECONDS", "10")) # Longest wait for the last final result after the audio ended. # Längste Wartezeit auf das letzte Endergebnis nach dem Ende des Audios.
+DICTATION_SAMPLE_RATES = (8000, 16000) # PCM rates the push stream accepts. # PCM-Raten, die der Push-Stream annimmt.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+ACTIVE_SESSIONS = Gauge( # Open dictation sessions. # Offene Diktatsitzungen.
+    "speak_dictation_sessions_active", "Open live dictation sessions", multiprocess_mode="livesum"
+)
+EVENTS = Counter( # Hypotheses sent to clients. # An Clients gesendete Hypothesen.
+    "speak_dictation_events_total", "Live dictation events", ["type"]
+)
+FIRST_PARTIAL_SECONDS = Histogram( # Time from the first frame to the first partial hypothesis. # Zeit vom ersten Frame bis zur ersten Teilhypothese.
+    "speak_dictation_first_partial_seconds", "Time from the first audio frame to the first partial result",
+    buckets=(0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5),
+)
+
+
+class DictationSession: # One continuous recognition fed frame by frame. # Eine kontinuierliche Erkennung, Frame für Frame gespeist.
+    """Push captured PCM into an Azure recognizer and queue its hypotheses for the event loop"""
+
+    def __init__(self, speech_config, language: str, sample_rate: int = 16000): # Builds the stream and the recognizer. # Erstellt den Stream und den Erkenner.
+        if sample_rate not in DICTATION_SAMPLE_RATES: # Other rates would be misread as noise. # Andere Raten würden als Rauschen fehlgelesen.
+            raise ValueError(f"Unsupported sample rate: {sample_rate}") # Closes the socket with 1003. # Schließt den Socket mit 1003.
+        self._loop = asyncio.get_running_loop() # Loop the SDK threads report to. # Schleife, an die die SDK-Threads berichten.
+        self._events: asyncio.Queue = asyncio.Queue() # Hypotheses in arrival order; None ends the session. # Hypothesen in Ankunftsreihenfolge; None beendet die Sitzung.
+        self.max_bytes = int(DICTATION_MAX_SECONDS * sample_rate * 2) # 16-bit mono. # 16 Bit mono.
+        self.received = 0 # Audio bytes pushed so far. # Bisher geschobene Audio-Bytes.
+        self.finished_at: Optional[float] = None # When the audio ended. # Wann das Audio endete.
+        self.expires = time.perf_counter() + DICTATION_SESSION_SECONDS # Wall-clock end of the session. # Echtzeit-Ende der Sitzung.
+        self._first_frame: Optional[float] = None # When the first frame arrived. # Wann der erste Frame ankam.
+        self._started = False # Whether the session counts as active. # Ob die Sitzung als aktiv zählt.
+
+        stream_format = speechsdk.audio.AudioStreamFormat(samples_per_second=sample_rate, bits_per_sample=16, channels=1) # 16-bit mono PCM at the client's rate. # 16-Bit-Mono-PCM mit der Rate des Clients.
+        self._stream = speechsdk.audio.PushAudioInputStream(stream_format=stream_format) # Stream the frames are pushed into. # Stream, in den die Frames geschoben werden.
+        self._recognizer = speechsdk.SpeechRecognizer( # The language is set per session; the shared config stays untouched. # Die Sprache wird pro Sitzung gesetzt; die gemeinsame Konfiguration bleibt unberührt.
+            speech_config=speech_config, audio_config=speechsdk.audio.AudioConfig(stream=self._stream), language=language, # Reads from the push stream. # Liest aus dem Push-Stream.
+        )
+        self._recognizer.recognizing.connect(self._on_recognizing) # Partial hypotheses. # Teilhypothesen.
+        self._recognizer.recognized.connect(self._on_recognized) # Final results. # Endergebnisse.
+        self._recognizer.canceled.connect(self._on_canceled) # End of stream or errors. # Ende des Streams oder Fehler.
+        self._recognizer.session_stopped.connect(lambda evt: self._put(None)) # Recognition stopped. # Die Erkennung wurde gestoppt.
+
+    def _put(self, event: Optional[dict]) -> None: # Called on SDK threads. # Wird in SDK-Threads aufgerufen.
+        try: # Hands the event to the loop. # Übergibt das Ereignis an die Schleife.
+            self._loop.call_soon_threadsafe(self._events.put_nowait, event) # Keeps the order of the SDK callbacks. # Behält die Reihenfolge der SDK-Callbacks bei.
+        except RuntimeError: # The loop is already closed. # Die Schleife ist bereits geschlossen.
+            pass # Nobody is listening any more. # Niemand hört mehr zu.
+
+    def _on_recognizing(self, evt) -> None: # Partial hypothesis of the current phrase. # Teilhypothese der aktuellen Phrase.
+        if evt.result.text: # Skips empty hypotheses. # Überspringt leere Hypothesen.
+            self._put({"type": "partial", "text": evt.result.text}) # Text of the phrase so far. # Bisheriger Text der Phrase.
+
+    def _on_recognized(self, evt) -> None: # Final result of a phrase. # Endergebnis einer Phrase.
+        if evt.result.reason == speechsdk.ResultReason.RecognizedSpeech and evt.result.text: # Silence ends as NoMatch. # Stille endet als NoMatch.
+            self._put({"type": "final", "text": evt.result.text}) # Text of the completed phrase. # Text der abgeschlossenen Phrase.
+
+    def _on_canceled(self, evt) -> None: # End of the stream, or a service error. # Ende des Streams oder ein Dienstfehler.
+        details = evt.cancellation_details # Why recognition was canceled. # Warum die Erkennung abgebrochen wurde.
+        if details.reason != speechsdk.CancellationReason.EndOfStream: # Closing the stream ends as EndOfStream. # Das Schließen des Streams endet als EndOfStream.
+            logger.warning(f"Live dictation canceled: {details.error_details}") # Logs the service error. # Protokolliert den Dienstfehler.
+            self._put({"type": "error", "detail": "Speech recognition failed"}) # Tells the client without the internal details. # Teilt es dem Client ohne die internen Details mit.
+        self._put(None) # Ends the event stream. # Beendet den Ereignisstrom.
+
+    async def start(self) -> None: # Starts recognition. # Startet die Erkennung.
+        await run_in_executor(lambda: self._recognizer.start_continuous_recognition_async().get()) # Waits until the recognizer listens. # Wartet, bis der Erkenner zuhört.
+        self._started = True # Stopped and counted down in close(). # In close() gestoppt und heruntergezählt.
+        ACTIVE_SESSIONS.inc() # Counts the open session. # Zählt die offene Sitzung.
+
+    def write(self, frame: bytes) -> bool: # Pushes one frame. # Schiebt einen Frame.
+        """Push a frame of PCM; returns False and ends the audio once the session reached DICTATION_MAX_SECONDS"""
+        if self.finished_at is not None: # The audio already ended. # Das Audio ist bereits beendet.
+            return False # Refuses the frame. # Lehnt den Frame ab.
+        if self.received + len(frame) > self.max_bytes: # Recognizes what arrived so far, then stops. # Erkennt das bisher Angekommene und stoppt dann.
+            self._events.put_nowait({"type": "error", "detail": f"Dictation longer than {DICTATION_MAX_SECONDS:.0f} seconds"}) # Tells the client why its audio stops here. # Teilt dem Client mit, warum sein Audio hier endet.
+            self.finish() # Closes the stream. # Schließt den Stream.
+            return False # Refuses the frame. # Lehnt den Frame ab.
+        if self._first_frame is None: # First frame of the session. # Erster Frame der Sitzung.
+            self._first_frame = time.perf_counter() # Starts the first-partial timer. # Startet den Timer bis zur ersten Teilhypothese.
+        self.received += len(frame) # Counts toward DICTATION_MAX_SECONDS. # Zählt zu DICTATION_MAX_SECONDS.
+        self._stream.write(frame) # Copied into the SDK's buffer; doesn't block. # In den Puffer des SDK kopiert; blockiert nicht.
+        return True # Pushed. # Geschoben.
+
+    def finish(self) -> None: # Ends the audio. # Beendet das Audio.
+        if self.finished_at is None: # Closes the stream only once. # Schließt den Stream nur einmal.
+            self.finished_at = time.perf_counter() # Starts the flush time. # Startet die Abschlusszeit.
+            self._stream.close() # The recognizer flushes the last phrase and stops. # Der Erkenner schließt die letzte Phrase ab und stoppt.
+
+    def abort(self, detail: Optional[str] = None) -> None: # Ends the session without waiting for results. # Beendet die Sitzung, ohne auf Ergebnisse zu warten.
+        if detail: # Tells a client that is still connected why. # Teilt einem noch verbundenen Client den Grund mit.
+            self._events.put_nowait({"type": "error", "detail": detail}) # Queued ahead of the end. # Vor dem Ende eingereiht.
+        self.finish() # Closes the stream. # Schließt den Stream.
+        self._events.put_nowait(None) # Ends events() now. # Beendet events() sofort.
+
+    def receive_timeout(self) -> float: # Longest wait for the client's next message. # Längste Wartezeit auf die nächste Nachricht des Clients.
+        """Seconds until the client counts as idle or the session reaches DICTATION_SESSION_SECONDS, whichever is first"""
+        return max(0.0, min(DICTATION_IDLE_SECONDS, self.expires - time.perf_counter())) # Never negative. # Nie negativ.
+
+    def expire(self) -> None: # Ends a silent or overlong session. # Beendet eine stille oder zu lange Sitzung.
+        """Abort a session whose client went quiet or that ran past its wall-clock limit, so it frees its slot and recognizer"""
+        if time.perf_counter() >= self.expires: # The wall-clock limit ran out. # Die Echtzeitgrenze ist abgelaufen.
+            self.abort(f"Dictation session longer than {DICTATION_SESSION_SECONDS:.0f} seconds") # Ends the overlong session. # Beendet die zu lange Sitzung.
+        else: # The client went quiet. # Der Client ist verstummt.
+            self.abort(f"No audio for {DICTATION_IDLE_SECONDS:.0f} seconds") # Ends the idle session. # Beendet die Sitzung im Leerlauf.
+
+    async def events(self) -> AsyncIterator[dict]: # Hypotheses until the recognizer stops. # Hypothesen, bis der Erkenner stoppt.
+        """Yield partial, final and error events in order; ends when recognition stopped or the flush time after finish() ran out"""
+        while True: # Until None or the flush time. # Bis None oder bis zur Abschlusszeit.
+            try: # Waits for the next event. # Wartet auf das nächste Ereignis.
+                event = await asyncio.wait_for(self._events.get(), 0.5) # Wakes up to check the flush time. # Wacht auf, um die Abschlusszeit zu prüfen.
+            except asyncio.TimeoutError: # Nothing new yet. # Noch nichts Neues.
+                if self.finished_at is not None and time.perf_counter() - self.finished_at > DICTATION_FLUSH_SECONDS: # The last final result never came. # Das letzte Endergebnis kam nie.
+                    return # Gives up on it. # Gibt es auf.
+                continue # Keeps waiting. # Wartet weiter.
+            if event is None: # Recognition stopped. # Die Erkennung wurde gestoppt.
+                return # Ends the stream of events. # Beendet den Ereignisstrom.
+            if event["type"] == "partial" and self._first_frame is not None: # First partial of the session. # Erste Teilhypothese der Sitzung.
+                FIRST_PARTIAL_SECONDS.observe(time.perf_counter() - self._first_frame) # Records the first-partial latency. # Erfasst die Latenz bis zur ersten Teilhypothese.
+                self._first_frame = None # Measured once per session. # Einmal pro Sitzung gemessen.
+            EVENTS.labels(event["type"]).inc() # Counts the event by type. # Zählt das Ereignis nach Typ.
+            yield event # Hands it to the route. # Übergibt es an die Route.
+
+    async def close(self) -> None: # Stops recognition and drops the callbacks. # Stoppt die Erkennung und entfernt die Callbacks.
+        self.finish() # Ends the audio if the client didn't. # Beendet das Audio, falls der Client es nicht tat.
+        try: # Stopping may fail after a service error. # Das Stoppen kann nach einem Dienstfehler fehlschlagen.
+            await run_in_executor(lambda: self._recognizer.stop_continuous_recognition_async().get()) # Blocks until the recognizer stopped. # Blockiert, bis der Erkenner gestoppt hat.
+        except Exception as e: # Cleanup errors must not hide the result. # Bereinigungsfehler dürfen das Ergebnis nicht verdecken.
+            logger.warning(f"Dictation cleanup failed: {str(e)}") # Logs the cleanup error. # Protokolliert den Bereinigungsfehler.
+        finally: # Always releases the callbacks. # Gibt die Callbacks immer frei.
+            for signal in (self._recognizer.recognizing, self._recognizer.recognized, self._recognizer.canceled, self._recognizer.session_stopped): # Every connected signal. # Jedes verbundene Signal.
+                signal.disconnect_all() # Breaks the reference cycle through the callbacks. # Bricht den Referenzzyklus über die Callbacks auf.
+            if self._started: # Counted in start(). # In start() gezählt.
+                ACTIVE_SESSIONS.dec() # Counts the closed session. # Zählt die geschlossene Sitzung.
+                self._started = False # Counted down only once. # Nur einmal heruntergezählt.
@@ -12,17 +12,23 @@
 # DE: Verwendet Azure Speech Services für die Erkennung von Aktivierungswörtern und Googles Spracherkennung für die Textumwandlung.
 
 from ...domain.entities.translation import Translation # Imports Translation entity from domain layer. # Importiert die Translation-Entität aus der Domain-Schicht.
-from ..services.translation_service import TranslationService # Imports the TranslationService for text translation. # Importiert den TranslationService für Textübersetzungen.
-from pydub import AudioSegment # Imports AudioSegment for audio file manipulation. # Importiert AudioSegment für die Manipulation von Audiodateien.
 import speech_recognition as sr # Imports speech_recognition library for audio processing. # Importiert die speech_recognition-Bibliothek für die Audioverarbeitung.
 import azure.cognitiveservices.speech as speechsdk # Imports Azure Speech SDK for cloud-based speech recognition. # Importiert Azure Speech SDK für cloudbasierte Spracherkennung.
 import tempfile # Imports tempfile for creating temporary files. # Importiert tempfile zum Erstellen temporärer Dateien.
+import io # Imports io for reading decoded clips from memory. # Importiert io zum Lesen dekodierter Clips aus dem Speicher.
+import time # Imports time for per-clip timings. # Importiert time für Zeitmessungen pro Clip.
 import os # Imports os module for file system operations. # Importiert das os-Modul für Dateisystemoperationen.
 import asyncio # Imports asyncio for asynchronous programming. # Importiert asyncio für asynchrone Programmierung.
+from contextlib import asynccontextmanager # Imports asynccontextmanager for dictation sessions. # Importiert asynccontextmanager für Diktatsitzungen.
 from fastapi import HTTPException # Imports HTTPException for API error handling. # Importiert HTTPException für API-Fehlerbehandlung.
 import logging # Imports logging for application logging. # Importiert logging für Anwendungsprotokollierung.
+from ...infrastructure.observability.metrics import stage_timer, timed, upstream_call # Imports stage latency metrics. # Importiert Stufenlatenz-Metriken.
+from ...infrastructure.admission import admit # Imports per-upstream admission control. # Importiert die Zulassungssteuerung pro Upstream.
+from ...infrastructure.deadline import DeadlineExceeded, bounded, check_deadline, remaining # Imports the request deadline. # Importiert die Frist der Anfrage.
+from ...infrastructure.observability.request_timing import run_in_executor # Imports the context-preserving thread pool helper. # Importiert den kontexterhaltenden Thread-Pool-Helfer.
+from .audio_decoding import MAX_CLIP_SECONDS, ClipTooLong, decode # Imports decoding in the process pool and the clip length cap. # Importiert das Dekodieren im Prozess-Pool und die Clip-Längengrenze.
+from .live_dictation import DictationSession # Imports push-stream recognition for live dictation. # Importiert Push-Stream-Erkennung für Live-Diktat.
 
-logging.basicConfig(level=logging.DEBUG) # Configures basic logging with DEBUG level. # Konfiguriert grundlegende Protokollierung mit DEBUG-Level.
 logger = logging.getLogger(__name__) # Creates a logger instance for this module. # Erstellt eine Logger-Instanz für dieses Modul.
 
 
@@ -57,13 +63,27 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
             "audio/wav", "audio/aac", "audio/mpeg", "audio/ogg",
             "audio/mp4", "audio/x-m4a"
         ]
-        
-        self.translation_service = TranslationService() # Creates a translation service instance. # Erstellt eine Instanz des Übersetzungsdienstes.
+
+    def warm_up(self) -> None: # Defines method to load deferred resources. # Definiert eine Methode zum Laden verzögerter Ressourcen.
+        """Import pydub ahead of the first compressed upload"""
+        import pydub # Deferred import used by _convert_to_wav. # Verzögerter Import, der von _convert_to_wav verwendet wird.
+
+    @asynccontextmanager # Makes dictation() an async with block. # Macht dictation() zu einem async-with-Block.
+    async def dictation(self, language: str, sample_rate: int = 16000): # Defines method to open a live dictation session. # Definiert Methode zum Öffnen einer Live-Diktatsitzung.
+        """Hold an Azure dictation slot and a running push-stream recognition for the duration of the block"""
+        async with admit("azure_dictation"): # Waits for a dictation slot or answers 429. # Wartet auf einen Diktatplatz oder antwortet mit 429.
+            session = DictationSession(self.speech_config, language, sample_rate) # Creates the push stream and the recognizer. # Erstellt den Push-Stream und den Erkenner.
+            try: # Closes the session even if it failed to start. # Schließt die Sitzung, auch wenn ihr Start fehlschlug.
+                await session.start() # Starts continuous recognition. # Startet die kontinuierliche Erkennung.
+                yield session # Hands the running session to the route. # Übergibt die laufende Sitzung an die Route.
+            finally: # Runs however the block ends. # Läuft, wie auch immer der Block endet.
+                await session.close() # Stops the recognizer on every path, including disconnects. # Stoppt den Erkenner auf jedem Pfad, auch bei Verbindungsabbrüchen.
 
     async def process_command(self, audio_path: str) -> str: # Defines method to process audio for wake word detection. # Definiert eine Methode zur Verarbeitung von Audio für die Erkennung von Aktivierungswörtern.
         """Process audio for wake word detection using Azure Speech Services"""
         working_path = audio_path # Sets the initial working path to the input path. # Setzt den anfänglichen Arbeitspfad auf den Eingabepfad.
         converted_path = None # Initializes converted path variable to None. # Initialisiert die Variable für den konvertierten Pfad mit None.
+        speech_recognizer = None # Initializes recognizer to None for cleanup in finally block. # Initialisiert den Erkenner mit None für die Bereinigung im Finally-Block.
         
         try: # Begins a try block for error handling. # Beginnt einen Try-Block für die Fehlerbehandlung.
             # Convert to WAV if needed
@@ -72,6 +92,7 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
                 working_path = converted_path # Updates working path to the converted file. # Aktualisiert den Arbeitspfad auf die konvertierte Datei.
 
             # Set up Azure speech recognition
+            check_deadline("recognition") # Skips recognition for a request that is already too late. # Überspringt die Erkennung für eine bereits zu späte Anfrage.
             audio_config = speechsdk.AudioConfig(filename=working_path) # Creates audio configuration with the file path. # Erstellt eine Audiokonfiguration mit dem Dateipfad.
             speech_recognizer = speechsdk.SpeechRecognizer( # Creates a speech recognizer with the configurations. # Erstellt einen Spracherkenner mit den Konfigurationen.
                 speech_config=self.speech_config, # Sets the speech configuration. # Setzt die Sprachkonfiguration.
@@ -90,23 +111,23 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
 
             speech_recognizer.recognized.connect(handle_result) # Connects the result handler to the recognized event. # Verbindet den Ergebnishandler mit dem Erkennungsereignis.
             
-            # Start recognition
-            speech_recognizer.start_continuous_recognition() # Starts continuous recognition. # Startet die kontinuierliche Erkennung.
-            
-            # Wait for result with timeout
-            timeout = 5  # 5 seconds timeout # Sets a 5-second timeout. # Setzt ein 5-Sekunden-Timeout.
-            start_time = asyncio.get_event_loop().time() # Gets the current time. # Holt die aktuelle Zeit.
+            async with admit("azure_stt"): # Waits for a recognition slot or answers 429. # Wartet auf einen Erkennungsplatz oder antwortet mit 429.
+                with upstream_call("azure_stt"): # Records Azure recognition latency and errors. # Erfasst Azure-Erkennungslatenz und -Fehler.
+                    # Start recognition
+                    speech_recognizer.start_continuous_recognition() # Starts continuous recognition. # Startet die kontinuierliche Erkennung.
             
-            while not done: # Loops until done flag is set or timeout occurs. # Schleife, bis die Fertig-Flagge gesetzt ist oder Timeout eintritt.
-                if asyncio.get_event_loop().time() - start_time > timeout: # Checks if timeout has occurred. # Prüft, ob ein Timeout eingetreten ist.
-                    speech_recognizer.stop_continuous_recognition() # Stops recognition if timeout. # Stoppt die Erkennung bei Timeout.
-                    raise HTTPException( # Raises an HTTP exception for timeout. # Löst eine HTTP-Ausnahme für Timeout aus.
-                        status_code=408, # Sets 408 Request Timeout status code. # Setzt den Statuscode 408 Request Timeout.
-                        detail="Recognition timeout" # Sets error detail message. # Setzt die detaillierte Fehlermeldung.
-                    )
-                await asyncio.sleep(0.1) # Waits for 0.1 seconds before checking again. # Wartet 0,1 Sekunden, bevor erneut geprüft wird.
+                    # Wait for result with timeout
+                    timeout = bounded(5)  # 5 seconds timeout # Sets a 5-second timeout, shortened by the request's deadline. # Setzt ein 5-Sekunden-Timeout, verkürzt durch die Frist der Anfrage.
+                    start_time = asyncio.get_event_loop().time() # Gets the current time. # Holt die aktuelle Zeit.
             
-            speech_recognizer.stop_continuous_recognition() # Stops recognition after getting result. # Stoppt die Erkennung nach Erhalt des Ergebnisses.
+                    while not done: # Loops until done flag is set or timeout occurs. # Schleife, bis die Fertig-Flagge gesetzt ist oder Timeout eintritt.
+                        if asyncio.get_event_loop().time() - start_time > timeout: # Checks if timeout has occurred. # Prüft, ob ein Timeout eingetreten ist.
+                            check_deadline("recognition result") # 504 when the request's budget ran out. # 504, wenn das Budget der Anfrage aufgebraucht ist.
+                            raise HTTPException( # Raises an HTTP exception for timeout. # Löst eine HTTP-Ausnahme für Timeout aus.
+                                status_code=408, # Sets 408 Request Timeout status code. # Setzt den Statuscode 408 Request Timeout.
+                                detail="Recognition timeout" # Sets error detail message. # Setzt die detaillierte Fehlermeldung.
+                            )
+                        await asyncio.sleep(0.1) # Waits for 0.1 seconds before checking again. # Wartet 0,1 Sekunden, bevor erneut geprüft wird.
 
             # Check if recognized text matches any wake words
             if recognized_text in self.WAKE_WORDS: # Checks if text is a wake word command. # Prüft, ob der Text ein Aktivierungswort-Befehl ist.
@@ -114,6 +135,8 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
             
             return "UNKNOWN_COMMAND" # Returns unknown command if no wake word is matched. # Gibt unbekannten Befehl zurück, wenn kein Aktivierungswort übereinstimmt.
 
+        except HTTPException: # Keeps 408 and 429 instead of turning them into 500. # Behält 408 und 429, statt sie in 500 umzuwandeln.
+            raise # Re-raises unchanged. # Löst unverändert erneut aus.
         except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
             logger.error(f"Command processing error: {str(e)}") # Logs the error. # Protokolliert den Fehler.
             raise HTTPException( # Raises an HTTP exception with error details. # Löst eine HTTP-Ausnahme mit Fehlerdetails aus.
@@ -121,13 +144,20 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
                 detail=f"Command processing failed: {str(e)}" # Sets error detail message. # Setzt die detaillierte Fehlermeldung.
             )
         finally: # Finally block to ensure cleanup happens. # Finally-Block, um sicherzustellen, dass die Bereinigung stattfindet.
+            if speech_recognizer: # Stops and disconnects the recognizer on every path, including errors and cancellation. # Stoppt und trennt den Erkenner auf jedem Pfad, auch bei Fehlern und Abbruch.
+                try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
+                    speech_recognizer.stop_continuous_recognition() # Ends the recognition session and releases the audio file. # Beendet die Erkennungssitzung und gibt die Audiodatei frei.
+                    speech_recognizer.recognized.disconnect_all() # Breaks the reference cycle through the callback. # Bricht den Referenzzyklus über den Callback auf.
+                except Exception as e: # Cleanup errors must not hide the result. # Bereinigungsfehler dürfen das Ergebnis nicht verdecken.
+                    logger.warning(f"Recognizer cleanup failed: {str(e)}") # Logs the cleanup failure. # Protokolliert den Bereinigungsfehler.
             # Cleanup temporary files
             await self._cleanup_temp_files(converted_path) # Cleans up any temporary files. # Bereinigt alle temporären Dateien.
 
+    @timed("speech", "convert") # Records audio conversion time. # Erfasst die Audiokonvertierungszeit.
     async def _convert_to_wav(self, audio_path: str) -> str: # Defines a private method to convert audio to WAV format. # Definiert eine private Methode zur Konvertierung von Audio in das WAV-Format.
         """Convert any audio format to WAV using pydub"""
         try: # Begins a try block for error handling. # Beginnt einen Try-Block für die Fehlerbehandlung.
-            logger.debug(f"Converting {audio_path} to WAV") # Logs conversion attempt. # Protokolliert den Konvertierungsversuch.
+            logger.debug("Converting %s to WAV", audio_path) # Logs conversion attempt. # Protokolliert den Konvertierungsversuch.
             
             ext = os.path.splitext(audio_path)[1].lower().replace(".", "") # Extracts and normalizes file extension. # Extrahiert und normalisiert die Dateierweiterung.
             if ext not in ["mp3", "aac", "ogg", "m4a", "mp4"]: # Checks if the format is supported. # Prüft, ob das Format unterstützt wird.
@@ -137,6 +167,7 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
                 )
 
             try: # Nested try block for file loading. # Verschachtelter Try-Block für das Laden von Dateien.
+                from pydub import AudioSegment # Imported on first conversion; most uploads are already WAV. # Beim ersten Konvertieren importiert; die meisten Uploads sind bereits WAV.
                 sound = AudioSegment.from_file(audio_path, format=ext) # Loads audio file with pydub. # Lädt Audiodatei mit pydub.
             except Exception as e: # Catches exceptions during file loading. # Fängt Ausnahmen während des Ladens der Datei ab.
                 logger.error(f"Error loading {ext} file: {str(e)}") # Logs the error. # Protokolliert den Fehler.
@@ -144,6 +175,8 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
                     status_code=400, # Sets 400 Bad Request status code. # Setzt den Statuscode 400 Bad Request.
                     detail=f"Invalid {ext.upper()} file structure" # Sets error detail message. # Setzt die detaillierte Fehlermeldung.
                 )
+            if sound.duration_seconds > MAX_CLIP_SECONDS: # A small compressed file can hold hours of audio. # Eine kleine komprimierte Datei kann Stunden an Audio enthalten.
+                raise HTTPException(status_code=413, detail=f"Audio longer than {MAX_CLIP_SECONDS:.0f} seconds") # Rejects it before the export decodes it all. # Lehnt sie ab, bevor der Export alles dekodiert.
 
             wav_path = f"{os.path.splitext(audio_path)[0]}.wav" # Creates path for the WAV file. # Erstellt Pfad für die WAV-Datei.
             sound.export(wav_path, format="wav", parameters=[ # Exports audio to WAV format with specific parameters. # Exportiert Audio ins WAV-Format mit bestimmten Parametern.
@@ -154,6 +187,8 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
             
             return wav_path # Returns the path to the converted WAV file. # Gibt den Pfad zur konvertierten WAV-Datei zurück.
             
+        except HTTPException: # Keeps 400 and 413 instead of turning them into 500. # Behält 400 und 413, statt sie in 500 umzuwandeln.
+            raise # Re-raises unchanged. # Löst unverändert erneut aus.
         except Exception as e: # Catches any exceptions not caught in nested try blocks. # Fängt alle Ausnahmen ab, die nicht in verschachtelten Try-Blöcken gefangen wurden.
             logger.error(f"Conversion error: {str(e)}") # Logs the error. # Protokolliert den Fehler.
             raise HTTPException(status_code=500, detail=f"Audio conversion failed: {str(e)}") # Raises HTTP exception with error details. # Löst eine HTTP-Ausnahme mit Fehlerdetails aus.
@@ -164,10 +199,56 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
             try: # Try block for each file deletion. # Try-Block für jede Dateilöschung.
                 if f and os.path.exists(f): # Checks if the file exists. # Prüft, ob die Datei existiert.
                     os.remove(f) # Removes the file. # Entfernt die Datei.
-                    logger.debug(f"Cleaned up file: {f}") # Logs successful cleanup. # Protokolliert erfolgreiche Bereinigung.
+                    logger.debug("Cleaned up file: %s", f) # Logs successful cleanup. # Protokolliert erfolgreiche Bereinigung.
             except Exception as e: # Catches exceptions during file deletion. # Fängt Ausnahmen während der Dateilöschung ab.
                 logger.error(f"Error cleaning up file {f}: {str(e)}") # Logs the error. # Protokolliert den Fehler.
 
+    async def _recognize_google(self, recognizer: sr.Recognizer, audio) -> str: # Defines method for one Google recognition. # Definiert Methode für eine Google-Erkennung.
+        """Recognize Spanish speech under the google_stt admission limit and the request's deadline"""
+        check_deadline("recognition") # Skips recognition for a request that is already too late. # Überspringt die Erkennung für eine bereits zu späte Anfrage.
+        async with admit("google_stt"): # Waits for a recognition slot or answers 429. # Wartet auf einen Erkennungsplatz oder antwortet mit 429.
+            with upstream_call("google_stt"): # Records Google recognition latency and errors. # Erfasst Google-Erkennungslatenz und -Fehler.
+                try: # Runs in the thread pool, so a disconnect or the deadline can cancel the wait. # Läuft im Thread-Pool, damit ein Verbindungsabbruch oder die Frist das Warten abbrechen kann.
+                    return await asyncio.wait_for(run_in_executor( # Uses Google's API for Spanish recognition. # Verwendet Googles API für spanische Erkennung.
+                        lambda: recognizer.recognize_google(audio, language="es-ES") # Blocking HTTP call. # Blockierender HTTP-Aufruf.
+                    ), remaining()) # Waits no longer than the request's budget. # Wartet nicht länger als das Budget der Anfrage.
+                except asyncio.TimeoutError: # The request's budget ran out. # Das Budget der Anfrage ist aufgebraucht.
+                    raise DeadlineExceeded("recognition result") # Answers 504. # Antwortet mit 504.
+
+    def _read_clip(self, wav: bytes) -> tuple: # Defines method to prepare one clip of a batch. # Definiert Methode zum Vorbereiten eines Clips eines Stapels.
+        """Return (recognizer, audio) of a WAV clip, with a recognizer of its own so concurrent noise calibrations don't interfere"""
+        recognizer = sr.Recognizer() # Same settings as the shared recognizer. # Dieselben Einstellungen wie der gemeinsame Erkenner.
+        recognizer.energy_threshold = self.recognizer.energy_threshold # Copies the energy threshold. # Kopiert die Energieschwelle.
+        recognizer.dynamic_energy_threshold = self.recognizer.dynamic_energy_threshold # Copies the dynamic threshold setting. # Kopiert die Einstellung der dynamischen Schwelle.
+        with sr.AudioFile(io.BytesIO(wav)) as source: # Reads the clip from memory. # Liest den Clip aus dem Speicher.
+            recognizer.adjust_for_ambient_noise(source, duration=0.5) # Adjusts for background noise. # Passt sich an Hintergrundgeräusche an.
+            return recognizer, recognizer.record(source) # Records the whole clip. # Nimmt den ganzen Clip auf.
+
+    async def transcribe_clip(self, ext: str, data: bytes) -> dict: # Defines method to transcribe one clip of a batch. # Definiert Methode zum Transkribieren eines Clips eines Stapels.
+        """Decode a clip in the process pool and recognize it; returns its text and stage timings in milliseconds"""
+        started = time.perf_counter() # Start of the clip. # Beginn des Clips.
+        try: # Decoding and reading errors. # Dekodier- und Lesefehler.
+            with stage_timer("speech", "convert"): # Records audio conversion time. # Erfasst die Audiokonvertierungszeit.
+                wav = await decode(ext, data) # Parallel with the other clips of the batch. # Parallel zu den anderen Clips des Stapels.
+            decoded = time.perf_counter() # End of decoding. # Ende der Dekodierung.
+            recognizer, audio = await run_in_executor(self._read_clip, wav) # Reads the WAV in the thread pool. # Liest die WAV im Thread-Pool.
+        except ClipTooLong as e: # Too long to recognize. # Zu lang für die Erkennung.
+            raise HTTPException(status_code=413, detail=str(e)) # Payload too large. # Nutzlast zu groß.
+        except ValueError as e: # Unsupported or broken file. # Nicht unterstützte oder defekte Datei.
+            raise HTTPException(status_code=400, detail=str(e)) # Bad request. # Ungültige Anfrage.
+        except (EOFError, AssertionError) as e: # SpeechRecognition rejects malformed WAV data. # SpeechRecognition lehnt fehlerhafte WAV-Daten ab.
+            raise HTTPException(status_code=400, detail=f"Invalid WAV file structure: {e}") # Bad request. # Ungültige Anfrage.
+        try: # Recognition errors. # Erkennungsfehler.
+            text = await self._recognize_google(recognizer, audio) # Recognizes under the Google admission limit. # Erkennt unter der Google-Zulassungsgrenze.
+        except sr.UnknownValueError: # Nothing intelligible in the clip. # Nichts Verständliches im Clip.
+            raise HTTPException(status_code=422, detail="No speech recognized") # Unprocessable clip. # Nicht verarbeitbarer Clip.
+        except sr.RequestError as e: # Google's service failed. # Googles Dienst ist fehlgeschlagen.
+            raise HTTPException(status_code=502, detail=f"Recognition failed: {e}") # Bad gateway. # Fehlerhaftes Gateway.
+        return {"text": text, "timings": { # Text and stage timings of the clip. # Text und Stufenzeiten des Clips.
+            "decode_ms": round((decoded - started) * 1000, 1), # Decoding in the process pool. # Dekodierung im Prozess-Pool.
+            "recognition_ms": round((time.perf_counter() - decoded) * 1000, 1), # Reading and recognition. # Lesen und Erkennung.
+        }}
+
     async def process_audio(self, audio_file_path: str) -> str: # Defines method to process audio and return recognized text. # Definiert eine Methode zur Verarbeitung von Audio und Rückgabe von erkanntem Text.
         """Process audio file and return recognized text only"""
         working_path = audio_file_path # Sets the initial working path. # Setzt den anfänglichen Arbeitspfad.
@@ -187,9 +268,7 @@ class SpeechService: # Defines the SpeechService class. # Definiert die SpeechSe
             with sr.AudioFile(working_path) as source: # Opens WAV file for recognition. # Öffnet WAV-Datei für die Erkennung.
                 self.recognizer.adjust_for_ambient_noise(source, duration=0.5) # Adjusts for background noise. # Passt sich an Hintergrundgeräusche an.
                 audio = self.recognizer.record(source) # Records audio from the file. # Nimmt Audio aus der Datei auf.
-                text = self.recognizer.recognize_google(audio, language="es-ES") # Uses Google's API for Spanish recognition. # Verwendet Googles API für spanische Erkennung.
-                
-            return text # Returns the recognized text. # Gibt den erkannten Text zurück.
+            return await self._recognize_google(self.recognizer, audio) # Returns the recognized text. # Gibt den erkannten Text zurück.
 
         finally: # Finally block to ensure cleanup. # Finally-Block für die Sicherstellung der Bereinigung.
             # Cleanup converted files
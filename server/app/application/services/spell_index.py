@@ -0,0 +1,227 @@
+# SpellIndex
+#
+# A symmetric-delete (SymSpell-style) spelling correction index for English, German and Spanish. # Ein Symmetric-Delete-Rechtschreibkorrekturindex (SymSpell-Stil) für Englisch, Deutsch und Spanisch.
+# Precomputes every delete of every dictionary word into a compact file that is loaded by memory map. # Berechnet jede Löschvariante jedes Wörterbuchworts vorab in eine kompakte Datei, die per Memory-Map geladen wird.
+#
+# Usage:
+# python -m app.application.services.spell_index build /app/spell_index en de es # Builds the index files from the pyspellchecker dictionaries. # Erstellt die Indexdateien aus den pyspellchecker-Wörterbüchern.
+# index = SpellIndex.open("de") # Opens (or builds on first use) the German index. # Öffnet (oder erstellt bei erster Verwendung) den deutschen Index.
+# index.correct_text("Ich habe Hungr") # Corrects a whole sentence in one call. # Korrigiert einen ganzen Satz in einem Aufruf.
+#
+# EN: Replaces per-word edit-distance candidate generation with hash lookups of precomputed deletes and memoized results.
+# DE: Ersetzt die wortweise Kandidatenerzeugung per Editierdistanz durch Hash-Lookups vorberechneter Löschvarianten und zwischengespeicherte Ergebnisse.
+
+import logging # For logging the one-time index build. # Zum Protokollieren der einmaligen Indexerstellung.
+import mmap # For loading the index without reading it into memory. # Zum Laden des Index, ohne ihn in den Speicher zu lesen.
+import os # For file system operations and configuration. # Für Dateisystemoperationen und Konfiguration.
+import struct # For the binary file header. # Für den binären Datei-Header.
+import sys # For the command line entry point. # Für den Kommandozeilen-Einstiegspunkt.
+import threading # For guarding lazy index loading. # Zum Schutz des verzögerten Indexladens.
+import uuid # For unique temporary file names during atomic writes. # Für eindeutige temporäre Dateinamen bei atomaren Schreibvorgängen.
+import zlib # For the 32-bit delete hashes. # Für die 32-Bit-Löschvarianten-Hashes.
+from array import array # For compact integer arrays while building. # Für kompakte Integer-Arrays beim Erstellen.
+from bisect import bisect_left, bisect_right # For binary search in the sorted hash table. # Für die binäre Suche in der sortierten Hash-Tabelle.
+from functools import lru_cache # For memoizing word lookups. # Zum Zwischenspeichern von Wortsuchen.
+from typing import Iterable, Optional # For type hinting. # Für Typhinweise.
+
+import regex as re # For Unicode-aware word matching. # Für Unicode-fähige Worterkennung.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+MAGIC = b"SYMSPL01" # File signature and format version. # Dateisignatur und Formatversion.
+BYTE_ORDER_MARK = 0x01020304 # Detects files written on a machine with a different byte order. # Erkennt Dateien, die auf einer Maschine mit anderer Byte-Reihenfolge geschrieben wurden.
+HEADER = struct.Struct("=8sIIIIII") # Magic, byte order mark, max distance, prefix length, word count, delete count, word blob size. # Magic, Byte-Order-Markierung, maximale Distanz, Präfixlänge, Wortanzahl, Löschanzahl, Wortblob-Größe.
+SUPPORTED_LANGUAGES = ("en", "de", "es") # Languages with a bundled dictionary. # Sprachen mit mitgeliefertem Wörterbuch.
+WORD_PATTERN = re.compile(r"\b\p{L}+\b") # Matches purely alphabetic words; numbers and mixed tokens are left alone. # Erkennt rein alphabetische Wörter; Zahlen und gemischte Token bleiben unverändert.
+
+
+def _hash(text: str) -> int: # Hashes a word or delete variant. # Hasht ein Wort oder eine Löschvariante.
+    return zlib.crc32(text.encode("utf-8")) # Stable across processes, unlike hash(). # Stabil über Prozesse hinweg, im Gegensatz zu hash().
+
+
+def _deletes(word: str, max_distance: int) -> set: # Generates all delete variants of a word. # Erzeugt alle Löschvarianten eines Worts.
+    """Return the word and every string reachable from it by up to max_distance deletions"""
+    result = {word} # Distance 0 is the word itself. # Distanz 0 ist das Wort selbst.
+    frontier = {word} # Variants produced in the previous round. # In der vorherigen Runde erzeugte Varianten.
+    for _ in range(max_distance): # One round per allowed deletion. # Eine Runde pro erlaubter Löschung.
+        frontier = {item[:i] + item[i + 1:] for item in frontier if len(item) > 1 for i in range(len(item))} # Removes one character. # Entfernt ein Zeichen.
+        result |= frontier # Collects the new variants. # Sammelt die neuen Varianten.
+    return result # Returns all variants. # Gibt alle Varianten zurück.
+
+
+def _edit_distance(a: str, b: str, max_distance: int) -> int: # Computes a bounded Damerau-Levenshtein distance. # Berechnet eine begrenzte Damerau-Levenshtein-Distanz.
+    """Return the optimal string alignment distance, or max_distance + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > max_distance: # Length difference alone is too large. # Der Längenunterschied allein ist zu groß.
+        return max_distance + 1
+    previous_previous = None # Row i - 2 for transpositions. # Zeile i - 2 für Vertauschungen.
+    previous = list(range(len(b) + 1)) # Row i - 1. # Zeile i - 1.
+    for i in range(1, len(a) + 1): # Walks the characters of a. # Durchläuft die Zeichen von a.
+        current = [i] + [0] * len(b) # Starts the current row. # Beginnt die aktuelle Zeile.
+        for j in range(1, len(b) + 1): # Walks the characters of b. # Durchläuft die Zeichen von b.
+            cost = 0 if a[i - 1] == b[j - 1] else 1 # Substitution cost. # Ersetzungskosten.
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost) # Deletion, insertion, substitution. # Löschung, Einfügung, Ersetzung.
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]: # Adjacent transposition. # Vertauschung benachbarter Zeichen.
+                current[j] = min(current[j], previous_previous[j - 2] + 1) # Counts the swap as one edit. # Zählt den Tausch als eine Bearbeitung.
+        if min(current) > max_distance: # Every path already exceeds the bound. # Jeder Pfad überschreitet bereits die Grenze.
+            return max_distance + 1
+        previous_previous, previous = previous, current # Shifts the rows. # Verschiebt die Zeilen.
+    return previous[-1] # Returns the distance. # Gibt die Distanz zurück.
+
+
+def _match_case(original: str, correction: str) -> str: # Applies the casing of the input to a correction. # Überträgt die Schreibweise der Eingabe auf eine Korrektur.
+    if original.isupper() and len(original) > 1: # All uppercase input. # Eingabe komplett in Großbuchstaben.
+        return correction.upper()
+    if original[0].isupper(): # Capitalized input (sentence start or German noun). # Großgeschriebene Eingabe (Satzanfang oder deutsches Nomen).
+        return correction[:1].upper() + correction[1:]
+    return correction # Lowercase input. # Kleingeschriebene Eingabe.
+
+
+def build_index( # Builds an index file from word frequencies. # Erstellt eine Indexdatei aus Worthäufigkeiten.
+    frequencies: dict, path: str, max_distance: int = 2, prefix_length: int = 7 # Words with counts and index settings. # Wörter mit Häufigkeiten und Indexeinstellungen.
+) -> None:
+    """Write a symmetric-delete index for the given {word: count} mapping to path"""
+    words = sorted(word for word in frequencies if word and word.isalpha()) # Keeps alphabetic words in a stable order. # Behält alphabetische Wörter in stabiler Reihenfolge.
+    pairs = [] # (delete hash, word id) entries. # (Löschvarianten-Hash, Wort-ID)-Einträge.
+    for word_id, word in enumerate(words): # Walks the dictionary. # Durchläuft das Wörterbuch.
+        for variant in _deletes(word[:prefix_length], max_distance): # Only the prefix is indexed, which bounds the index size. # Nur das Präfix wird indiziert, was die Indexgröße begrenzt.
+            pairs.append((_hash(variant), word_id)) # Records the variant. # Speichert die Variante.
+    pairs.sort() # Sorts by hash for binary search. # Sortiert nach Hash für binäre Suche.
+
+    blob = bytearray() # Concatenated UTF-8 words. # Verkettete UTF-8-Wörter.
+    offsets = array("I", [0]) # Start offset of every word in the blob. # Startposition jedes Worts im Blob.
+    for word in words: # Serializes the words. # Serialisiert die Wörter.
+        blob += word.encode("utf-8") # Appends the word. # Hängt das Wort an.
+        offsets.append(len(blob)) # Records where the next word starts. # Speichert, wo das nächste Wort beginnt.
+    counts = array("I", (min(int(frequencies[word]), 0xFFFFFFFF) for word in words)) # Word frequencies clipped to 32 bits. # Worthäufigkeiten auf 32 Bit begrenzt.
+    hashes = array("I", (pair[0] for pair in pairs)) # Sorted delete hashes. # Sortierte Löschvarianten-Hashes.
+    word_ids = array("I", (pair[1] for pair in pairs)) # Word id per hash. # Wort-ID pro Hash.
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True) # Creates the target directory. # Erstellt das Zielverzeichnis.
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp" # Writes to a temporary file first. # Schreibt zuerst in eine temporäre Datei.
+    with open(tmp_path, "wb") as f: # Opens the temporary file. # Öffnet die temporäre Datei.
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER_MARK, max_distance, prefix_length, len(words), len(pairs), len(blob))) # Writes the header. # Schreibt den Header.
+        for table in (offsets, counts, hashes, word_ids): # Writes the fixed-width tables. # Schreibt die Tabellen mit fester Breite.
+            table.tofile(f)
+        f.write(blob) # Writes the words last. # Schreibt die Wörter zuletzt.
+    os.replace(tmp_path, path) # Publishes the file atomically. # Veröffentlicht die Datei atomar.
+
+
+class SpellIndex: # Memory-mapped symmetric-delete correction index. # Memory-gemappter Symmetric-Delete-Korrekturindex.
+    _instances = {} # Opened indexes by language. # Geöffnete Indizes nach Sprache.
+    _lock = threading.Lock() # Guards opening and building. # Schützt Öffnen und Erstellen.
+
+    def __init__(self, path: str, cache_size: Optional[int] = None): # Maps an index file. # Mappt eine Indexdatei.
+        self.path = path # Index file path. # Pfad der Indexdatei.
+        with open(path, "rb") as f: # Opens the file read-only. # Öffnet die Datei schreibgeschützt.
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) # Pages are loaded on demand and shared between workers. # Seiten werden bei Bedarf geladen und zwischen Workern geteilt.
+        magic, byte_order, self.max_distance, self.prefix_length, word_count, delete_count, blob_size = HEADER.unpack_from(self._mmap) # Reads the header. # Liest den Header.
+        if magic != MAGIC or byte_order != BYTE_ORDER_MARK: # Rejects foreign or outdated files. # Lehnt fremde oder veraltete Dateien ab.
+            raise ValueError(f"Incompatible spell index: {path}")
+
+        view = memoryview(self._mmap) # Zero-copy view of the file. # Kopierfreie Ansicht der Datei.
+        position = HEADER.size # Tables start after the header. # Tabellen beginnen nach dem Header.
+        tables = [] # Fixed-width tables in file order. # Tabellen fester Breite in Dateireihenfolge.
+        for length in (word_count + 1, word_count, delete_count, delete_count): # Offsets, counts, hashes, word ids. # Positionen, Häufigkeiten, Hashes, Wort-IDs.
+            tables.append(view[position:position + 4 * length].cast("I")) # Interprets the bytes as unsigned 32-bit integers. # Interpretiert die Bytes als vorzeichenlose 32-Bit-Ganzzahlen.
+            position += 4 * length # Moves to the next table. # Wechselt zur nächsten Tabelle.
+        self._offsets, self._counts, self._hashes, self._word_ids = tables # Stores the tables. # Speichert die Tabellen.
+        self._blob = view[position:position + blob_size] # Stores the word blob. # Speichert den Wortblob.
+
+        cache_size = cache_size or int(os.getenv("SPELL_CACHE_SIZE", "50000")) # Memoized words per language. # Zwischengespeicherte Wörter pro Sprache.
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup) # Memoizes corrections per index. # Speichert Korrekturen pro Index zwischen.
+
+    @classmethod
+    def open(cls, lang: str) -> "SpellIndex": # Returns the shared index of a language. # Gibt den gemeinsamen Index einer Sprache zurück.
+        """Open the index for a language, building it from the bundled dictionary when missing"""
+        lang = (lang or "en")[:2].lower() # Accepts codes like "de-DE". # Akzeptiert Codes wie "de-DE".
+        if lang not in SUPPORTED_LANGUAGES: # Checks the language. # Prüft die Sprache.
+            raise ValueError(f"Unsupported spell check language: {lang}")
+        index = cls._instances.get(lang) # Looks up an open index. # Sucht einen geöffneten Index.
+        if index is None: # First use of this language. # Erste Verwendung dieser Sprache.
+            with cls._lock: # Only one thread builds or maps the file. # Nur ein Thread erstellt oder mappt die Datei.
+                index = cls._instances.get(lang) # Re-checks after acquiring the lock. # Prüft erneut nach Erhalt der Sperre.
+                if index is None:
+                    path = index_path(lang) # Gets the file location. # Holt den Dateispeicherort.
+                    if not os.path.exists(path): # Index not precomputed. # Index nicht vorberechnet.
+                        logger.info("Building spell index for '%s' at %s", lang, path) # Logs the one-time build. # Protokolliert die einmalige Erstellung.
+                        build_index(load_dictionary(lang), path) # Builds the index once. # Erstellt den Index einmalig.
+                    index = cls(path) # Maps the file. # Mappt die Datei.
+                    cls._instances[lang] = index # Shares it. # Teilt ihn.
+        return index # Returns the index. # Gibt den Index zurück.
+
+    @classmethod
+    def opened(cls, lang: str) -> Optional["SpellIndex"]: # Returns an index only if it is already open. # Gibt einen Index nur zurück, wenn er bereits geöffnet ist.
+        """Return the index of a language if it is open, without building, mapping or waiting for it"""
+        return cls._instances.get((lang or "en")[:2].lower())
+
+    def _word(self, word_id: int) -> str: # Reads a word from the blob. # Liest ein Wort aus dem Blob.
+        return bytes(self._blob[self._offsets[word_id]:self._offsets[word_id + 1]]).decode("utf-8")
+
+    def _lookup(self, word: str) -> Optional[str]: # Finds the best correction of a lowercase word. # Findet die beste Korrektur eines kleingeschriebenen Worts.
+        """Return the word itself if known, the closest most frequent word otherwise, or None"""
+        prefix = word[:self.prefix_length] # Only prefixes were indexed. # Nur Präfixe wurden indiziert.
+        best, best_distance, best_count = None, self.max_distance + 1, -1 # Best candidate so far. # Bisher bester Kandidat.
+        seen = set() # Word ids already scored. # Bereits bewertete Wort-IDs.
+        for variant in sorted(_deletes(prefix, self.max_distance), key=len, reverse=True): # Fewest deletions first. # Wenigste Löschungen zuerst.
+            if len(prefix) - len(variant) > best_distance: # Remaining variants can't beat the best candidate. # Verbleibende Varianten können den besten Kandidaten nicht schlagen.
+                break
+            key = _hash(variant) # Hashes the variant. # Hasht die Variante.
+            start = bisect_left(self._hashes, key) # Finds the first matching entry. # Findet den ersten passenden Eintrag.
+            end = bisect_right(self._hashes, key, start) # Finds the end of the matching entries. # Findet das Ende der passenden Einträge.
+            for position in range(start, end): # Scores every candidate word. # Bewertet jedes Kandidatenwort.
+                word_id = self._word_ids[position] # Gets the candidate id. # Holt die Kandidaten-ID.
+                if word_id in seen: # Already scored. # Bereits bewertet.
+                    continue
+                seen.add(word_id) # Marks the candidate. # Markiert den Kandidaten.
+                candidate = self._word(word_id) # Reads the candidate. # Liest den Kandidaten.
+                if candidate == word: # Exact match, the word is correct. # Exakter Treffer, das Wort ist korrekt.
+                    return word
+                distance = _edit_distance(word, candidate, min(best_distance, self.max_distance)) # Verifies the real distance (hash collisions and prefixes). # Prüft die echte Distanz (Hash-Kollisionen und Präfixe).
+                count = self._counts[word_id] # Gets the word frequency. # Holt die Worthäufigkeit.
+                if distance < best_distance or (distance == best_distance and count > best_count): # Closer, or equally close and more frequent. # Näher, oder gleich nah und häufiger.
+                    best, best_distance, best_count = candidate, distance, count # Keeps the candidate. # Behält den Kandidaten.
+        return best if best_distance <= self.max_distance else None # Returns the correction. # Gibt die Korrektur zurück.
+
+    def correct_word(self, word: str) -> str: # Corrects a single word. # Korrigiert ein einzelnes Wort.
+        """Return the corrected word with the original casing, or the word unchanged"""
+        if len(word) < 3: # Short words are too ambiguous to correct. # Kurze Wörter sind zu mehrdeutig für eine Korrektur.
+            return word
+        correction = self.lookup(word.lower()) # Memoized lookup. # Zwischengespeicherte Suche.
+        return _match_case(word, correction) if correction else word # Keeps unknown words as typed. # Behält unbekannte Wörter wie eingegeben.
+
+    def correct_words(self, words: Iterable[str]) -> dict: # Corrects many words at once. # Korrigiert viele Wörter auf einmal.
+        """Return {word: correction} for the unique words of a batch"""
+        return {word: self.correct_word(word) for word in set(words)} # Each unique word is looked up once. # Jedes eindeutige Wort wird einmal gesucht.
+
+    def correct_text(self, text: str) -> str: # Corrects a whole sentence or paragraph. # Korrigiert einen ganzen Satz oder Absatz.
+        """Correct every word of a text in one batch, keeping spacing and punctuation"""
+        corrections = self.correct_words(WORD_PATTERN.findall(text)) # Looks up each unique word once. # Sucht jedes eindeutige Wort einmal.
+        return WORD_PATTERN.sub(lambda match: corrections[match.group(0)], text) # Replaces the words in place. # Ersetzt die Wörter an Ort und Stelle.
+
+
+def index_path(lang: str) -> str: # Returns the index file location of a language. # Gibt den Speicherort der Indexdatei einer Sprache zurück.
+    directory = os.getenv("SPELL_INDEX_DIR") or os.path.join( # Uses the configured directory or the temp directory. # Verwendet das konfigurierte Verzeichnis oder das Temp-Verzeichnis.
+        os.environ.get("TEMP", "") if os.name == "nt" else "/tmp", "spell_index" # Writable default location. # Beschreibbarer Standardort.
+    )
+    return os.path.join(directory, f"{lang}.symspell") # One file per language. # Eine Datei pro Sprache.
+
+
+def load_dictionary(lang: str) -> dict: # Loads the word frequencies of a language. # Lädt die Worthäufigkeiten einer Sprache.
+    """Return {word: count} from the pyspellchecker dictionary of a language"""
+    from spellchecker import SpellChecker # Imported lazily; only needed to build an index. # Verzögert importiert; nur zum Erstellen eines Index benötigt.
+    return dict(SpellChecker(language=lang, distance=1).word_frequency.dictionary) # Copies the frequency table. # Kopiert die Häufigkeitstabelle.
+
+
+def main(argv: list) -> int: # Command line entry point. # Kommandozeilen-Einstiegspunkt.
+    if len(argv) < 2 or argv[0] != "build": # Checks the arguments. # Prüft die Argumente.
+        print("Usage: python -m app.application.services.spell_index build <directory> [en de es]")
+        return 2
+    directory, languages = argv[1], argv[2:] or list(SUPPORTED_LANGUAGES) # Target directory and languages. # Zielverzeichnis und Sprachen.
+    for lang in languages: # Builds every requested language. # Erstellt jede angeforderte Sprache.
+        path = os.path.join(directory, f"{lang}.symspell") # Output file. # Ausgabedatei.
+        build_index(load_dictionary(lang), path) # Builds the index. # Erstellt den Index.
+        print(f"Built {path} ({os.path.getsize(path) // 1024} KiB)") # Reports the file size. # Meldet die Dateigröße.
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
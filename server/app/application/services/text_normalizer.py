@@ -0,0 +1,51 @@
+# TextNormalizer
+#
+# A single-pass text normalization stage for prompts and model output. # Eine Textnormalisierungsstufe in einem Durchlauf für Eingaben und Modellausgaben.
+# Restores typed accent placeholders (a´, n~) and applies Unicode NFKC normalization, skipping pure-ASCII text. # Stellt getippte Akzent-Platzhalter (a´, n~) wieder her und wendet Unicode-NFKC-Normalisierung an, wobei reiner ASCII-Text übersprungen wird.
+#
+# Usage:
+# normalize_text("Espan~a est´a") # Returns "España está" after one pass. # Gibt nach einem Durchlauf "España está" zurück.
+# to_ascii("Müller") # Returns "Muller". # Gibt "Muller" zurück.
+#
+# EN: Replaces the per-pattern regex loop and the separate NFKD/NFKC passes of TranslationService with one precompiled stage.
+# DE: Ersetzt die Regex-Schleife pro Muster und die getrennten NFKD/NFKC-Durchläufe des TranslationService durch eine vorkompilierte Stufe.
+
+import re # For the precompiled accent alternation. # Für die vorkompilierte Akzent-Alternation.
+import unicodedata # For Unicode normalization. # Für Unicode-Normalisierung.
+from typing import Union # For type hinting. # Für Typhinweise.
+
+ACCENT_PLACEHOLDERS = { # Maps placeholder notations to accented characters. # Ordnet Platzhalternotationen akzentuierten Zeichen zu.
+    "a´": "á", "e´": "é", "i´": "í", "o´": "ó", "u´": "ú", "n~": "ñ",
+    "A´": "Á", "E´": "É", "I´": "Í", "O´": "Ó", "U´": "Ú", "N~": "Ñ",
+}
+ACCENT_PATTERN = re.compile("|".join(ACCENT_PLACEHOLDERS)) # One alternation matches every placeholder in a single scan. # Eine Alternation erkennt jeden Platzhalter in einem einzigen Durchlauf.
+
+
+def _replace_placeholder(match) -> str: # Looks up the accented character of a match. # Sucht das akzentuierte Zeichen eines Treffers.
+    return ACCENT_PLACEHOLDERS[match.group(0)]
+
+
+def restore_accents(text: str) -> str: # Restores typed accent placeholders. # Stellt getippte Akzent-Platzhalter wieder her.
+    """Replace placeholders such as a´ and n~ with á and ñ"""
+    if "´" not in text and "~" not in text: # No placeholder marker, nothing to scan. # Keine Platzhaltermarkierung, nichts zu durchsuchen.
+        return text
+    return ACCENT_PATTERN.sub(_replace_placeholder, text) # Replaces all placeholders in one pass. # Ersetzt alle Platzhalter in einem Durchlauf.
+
+
+def normalize_text(text: Union[str, bytes]) -> str: # Runs the full normalization stage. # Führt die vollständige Normalisierungsstufe aus.
+    """Decode, restore accent placeholders and NFKC-normalize text in one pass"""
+    if isinstance(text, bytes): # Accepts raw UTF-8 input. # Akzeptiert rohe UTF-8-Eingaben.
+        text = text.decode("utf-8") # Decodes once. # Dekodiert einmal.
+    if text.isascii(): # ASCII is already NFKC; only n~ placeholders can occur. # ASCII ist bereits NFKC; nur n~-Platzhalter können vorkommen.
+        return restore_accents(text) if "~" in text else text
+    text = restore_accents(text) # Placeholders first, since NFKC would split ´ into a space and a combining accent. # Platzhalter zuerst, da NFKC ´ in ein Leerzeichen und einen kombinierenden Akzent aufteilen würde.
+    if unicodedata.is_normalized("NFKC", text): # Quick check avoids building a new string. # Schnelle Prüfung vermeidet das Erstellen einer neuen Zeichenkette.
+        return text
+    return unicodedata.normalize("NFKC", text) # Composes characters. # Setzt Zeichen zusammen.
+
+
+def to_ascii(text: str) -> str: # Strips accents and other non-ASCII characters. # Entfernt Akzente und andere Nicht-ASCII-Zeichen.
+    """Return an ASCII approximation of text"""
+    if text.isascii(): # Nothing to strip. # Nichts zu entfernen.
+        return text
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii") # Decomposes and drops the combining marks. # Zerlegt und entfernt die kombinierenden Zeichen.
@@ -0,0 +1,102 @@
+# TranslationCache
+#
+# A persistent cache of Gemini responses in a SQLite file, shared by every worker process on the host. # Ein persistenter Cache von Gemini-Antworten in einer SQLite-Datei, gemeinsam genutzt von allen Worker-Prozessen des Hosts.
+# A repeated prompt skips the Gemini call; parsing and audio assembly (mostly from the clip library) still run. # Eine wiederholte Eingabe überspringt den Gemini-Aufruf; Parsen und Audiozusammenstellung (meist aus der Clip-Bibliothek) laufen weiterhin.
+#
+# Usage:
+# cache = TranslationCache() # Opens the cache next to the generated audio files. # Öffnet den Cache neben den erzeugten Audiodateien.
+# key = cache.key("I am looking for a job", prompt_fingerprint) # Builds the key of a prompt. # Erstellt den Schlüssel einer Eingabe.
+# cache.get(key) # Returns the cached response or None. # Gibt die zwischengespeicherte Antwort oder None zurück.
+# cache.put(key, generated_text) # Stores a response for all workers. # Speichert eine Antwort für alle Worker.
+#
+# EN: SQLite in WAL mode lets many processes read while one writes, so adding workers doesn't split the hit rate between per-process caches.
+# DE: SQLite im WAL-Modus lässt viele Prozesse lesen, während einer schreibt, sodass zusätzliche Worker die Trefferquote nicht auf prozesseigene Caches aufteilen.
+
+import hashlib # For building stable keys. # Zum Erstellen stabiler Schlüssel.
+import logging # For reporting cache errors. # Zum Melden von Cache-Fehlern.
+import os # For configuration and the process id. # Für die Konfiguration und die Prozess-ID.
+import re # For collapsing whitespace in prompts. # Zum Zusammenfassen von Leerzeichen in Eingaben.
+import sqlite3 # For the shared cache file. # Für die gemeinsame Cache-Datei.
+import threading # For one connection per thread. # Für eine Verbindung pro Thread.
+import time # For expiry. # Für den Ablauf.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS translations (key TEXT PRIMARY KEY, response TEXT NOT NULL, created REAL NOT NULL)" # One row per prompt. # Eine Zeile pro Eingabe.
+
+
+class TranslationCache: # Defines the TranslationCache class. # Definiert die TranslationCache-Klasse.
+    def __init__( # Initializes the cache. # Initialisiert den Cache.
+        self,
+        path: Optional[str] = None, # Optional path of the SQLite file. # Optionaler Pfad der SQLite-Datei.
+        max_entries: Optional[int] = None, # Optional entry limit. # Optionales Eintragslimit.
+        ttl_seconds: Optional[float] = None, # Optional lifetime of an entry. # Optionale Lebensdauer eines Eintrags.
+    ):
+        self.path = path or os.getenv("TRANSLATION_CACHE_PATH") or os.path.join(self._get_temp_directory(), "translation_cache.sqlite3") # Stored next to the audio clips. # Neben den Audioclips gespeichert.
+        self.max_entries = max_entries or int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000")) # Oldest entries beyond this are evicted. # Älteste Einträge darüber hinaus werden entfernt.
+        self.ttl_seconds = ttl_seconds or float(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # Entries older than this are ignored. # Ältere Einträge werden ignoriert.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True) # Creates the directory if it doesn't exist. # Erstellt das Verzeichnis, falls es nicht existiert.
+        self._local = threading.local() # Connection of the current thread. # Verbindung des aktuellen Threads.
+        self._puts = 0 # Writes since the last eviction. # Schreibvorgänge seit der letzten Entfernung.
+
+    def _get_temp_directory(self) -> str: # Defines method to get the audio directory. # Definiert Methode zum Abrufen des Audioverzeichnisses.
+        """Return the shared TTS audio directory"""
+        if os.name == "nt": # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            return os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Uses the Windows temp directory. # Verwendet das Windows-Temp-Verzeichnis.
+        return "/tmp/tts_audio" # Uses the Unix audio directory. # Verwendet das Unix-Audioverzeichnis.
+
+    def _connection(self) -> sqlite3.Connection: # Returns the connection of this thread and process. # Gibt die Verbindung dieses Threads und Prozesses zurück.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid(): # SQLite connections must not cross threads or a fork. # SQLite-Verbindungen dürfen weder Threads noch einen Fork überqueren.
+            connection = sqlite3.connect(self.path, timeout=5.0) # Waits up to 5 s for another worker's write. # Wartet bis zu 5 s auf den Schreibvorgang eines anderen Workers.
+            connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer and vice versa. # Leser blockieren den Schreiber nicht und umgekehrt.
+            connection.execute("PRAGMA synchronous=NORMAL") # A lost entry after a power cut is acceptable for a cache. # Ein verlorener Eintrag nach einem Stromausfall ist für einen Cache akzeptabel.
+            connection.execute(SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    @staticmethod
+    def key(text: str, fingerprint: str = "") -> str: # Builds the key for a prompt. # Erstellt den Schlüssel für eine Eingabe.
+        """Return a stable key for the prompt text and whatever else shapes the response (model, instructions)"""
+        normalized = re.sub(r"\s+", " ", text.strip()) # Collapses whitespace so spacing variants share an entry. # Fasst Leerzeichen zusammen, damit Abstandsvarianten einen Eintrag teilen.
+        return hashlib.sha1(f"{fingerprint}\x1f{normalized}".encode("utf-8")).hexdigest() # Hashes into a compact key. # Hasht in einen kompakten Schlüssel.
+
+    def get(self, key: str) -> Optional[str]: # Looks up a response. # Sucht eine Antwort.
+        """Return the cached response or None when missing, expired or unreadable"""
+        try: # A broken cache must never fail a request. # Ein defekter Cache darf nie eine Anfrage scheitern lassen.
+            row = self._connection().execute(
+                "SELECT response FROM translations WHERE key = ? AND created > ?", (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        except sqlite3.Error as e: # Locked too long or corrupted. # Zu lange gesperrt oder beschädigt.
+            logger.warning("Translation cache read failed: %s", e)
+            return None
+        return row[0] if row else None # Returns the response if found. # Gibt die Antwort zurück, falls gefunden.
+
+    def put(self, key: str, response: str) -> None: # Stores a response. # Speichert eine Antwort.
+        """Store a response for every worker and evict the oldest entries now and then"""
+        if not response: # Ignores empty responses. # Ignoriert leere Antworten.
+            return
+        try:
+            connection = self._connection()
+            with connection: # Commits the write. # Bestätigt den Schreibvorgang.
+                connection.execute("INSERT OR REPLACE INTO translations VALUES (?, ?, ?)", (key, response, time.time()))
+            self._puts += 1
+            if self._puts >= 256: # Evicts in batches, not on every write. # Entfernt in Stapeln, nicht bei jedem Schreibvorgang.
+                self._puts = 0
+                self.evict()
+        except sqlite3.Error as e: # Another worker held the lock too long. # Ein anderer Worker hielt die Sperre zu lange.
+            logger.warning("Translation cache write failed: %s", e)
+
+    def evict(self) -> None: # Removes expired and surplus entries. # Entfernt abgelaufene und überzählige Einträge.
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM translations WHERE created <= ?", (time.time() - self.ttl_seconds,)) # Drops expired entries. # Verwirft abgelaufene Einträge.
+            connection.execute( # Keeps the newest max_entries. # Behält die neuesten max_entries.
+                "DELETE FROM translations WHERE key IN (SELECT key FROM translations ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict: # Returns usage statistics. # Gibt Nutzungsstatistiken zurück.
+        """Return the number of stored entries for monitoring"""
+        return {"entries": self._connection().execute("SELECT COUNT(*) FROM translations").fetchone()[0]}
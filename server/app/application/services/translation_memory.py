@@ -0,0 +1,215 @@
+# TranslationMemory
+#
+# An index of past prompts that finds the cached response of a near-duplicate: different casing, punctuation, spacing or a typo. # Ein Index früherer Eingaben, der die zwischengespeicherte Antwort eines Beinahe-Duplikats findet: andere Schreibweise, Satzzeichen, Abstände oder ein Tippfehler.
+# Prompts are shared by every worker through a SQLite file; each worker indexes them in memory with MinHash signatures of character trigrams in LSH bands. # Eingaben werden über eine SQLite-Datei von allen Workern geteilt; jeder Worker indiziert sie im Speicher mit MinHash-Signaturen von Zeichen-Trigrammen in LSH-Bändern.
+#
+# Usage:
+# memory = TranslationMemory() # Opens the memory next to the generated audio files. # Öffnet den Speicher neben den erzeugten Audiodateien.
+# memory.add("I am looking for a job", cache_key) # Remembers the cache key of a prompt. # Merkt sich den Cache-Schlüssel einer Eingabe.
+# memory.match("i am lookin for a job") # Returns the cache key of "I am looking for a job", or None. # Gibt den Cache-Schlüssel von "I am looking for a job" zurück, oder None.
+#
+# EN: A voice prompt rarely repeats character for character; its close match still finds the response Gemini already wrote.
+# DE: Eine Spracheingabe wiederholt sich selten Zeichen für Zeichen; ihr naher Treffer findet trotzdem die Antwort, die Gemini bereits geschrieben hat.
+
+import logging # For reporting memory errors. # Zum Melden von Speicherfehlern.
+import os # For configuration and the process id. # Für die Konfiguration und die Prozess-ID.
+import random # For the MinHash masks. # Für die MinHash-Masken.
+import re # For normalizing prompts. # Zum Normalisieren von Eingaben.
+import sqlite3 # For the shared prompt file. # Für die gemeinsame Eingabedatei.
+import threading # For one connection per thread and the index lock. # Für eine Verbindung pro Thread und die Indexsperre.
+import time # For refresh timestamps. # Für Aktualisierungszeitstempel.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+
+from .spell_index import SUPPORTED_LANGUAGES, SpellIndex, _edit_distance # For telling typos from different words. # Zum Unterscheiden von Tippfehlern und anderen Wörtern.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+TRANSLATION_MEMORY_THRESHOLD = float(os.getenv("TRANSLATION_MEMORY_THRESHOLD", "0.7")) # Smallest trigram Jaccard similarity of a match. # Kleinste Trigramm-Jaccard-Ähnlichkeit eines Treffers.
+TRANSLATION_MEMORY_MAX_ENTRIES = int(os.getenv("TRANSLATION_MEMORY_MAX_ENTRIES", "20000")) # Newest prompts kept per worker. # Pro Worker behaltene neueste Eingaben.
+TRANSLATION_MEMORY_REFRESH_SECONDS = float(os.getenv("TRANSLATION_MEMORY_REFRESH_SECONDS", "30")) # How often a worker picks up other workers' prompts. # Wie oft ein Worker die Eingaben anderer Worker übernimmt.
+BANDS, ROWS = 8, 4 # 32 hashes; prompts above ~0.6 similarity share a band with high probability. # 32 Hashes; Eingaben über ~0,6 Ähnlichkeit teilen mit hoher Wahrscheinlichkeit ein Band.
+MASKS = [random.Random(index).getrandbits(64) for index in range(BANDS * ROWS)] # One XOR mask per MinHash permutation. # Eine XOR-Maske pro MinHash-Permutation.
+HASH_MASK = (1 << 64) - 1 # Makes hash() values unsigned. # Macht hash()-Werte vorzeichenlos.
+FALLBACK_MIN_WORD_CHARS = 5 # Shortest word judged by edit distance while the spelling indexes open; short real words often differ by one letter. # Kürzestes Wort, das per Editierdistanz beurteilt wird, während die Rechtschreibindizes öffnen; kurze echte Wörter unterscheiden sich oft um einen Buchstaben.
+REFRESH_OVERLAP_SECONDS = 5.0 # Re-reads recent rows, in case a slower writer committed an older timestamp. # Liest neuere Zeilen erneut, falls ein langsamerer Schreiber einen älteren Zeitstempel festgeschrieben hat.
+
+SCHEMA = "CREATE TABLE IF NOT EXISTS prompts (key TEXT PRIMARY KEY, prompt TEXT NOT NULL, created REAL NOT NULL)" # One row per cached prompt. # Eine Zeile pro zwischengespeicherter Eingabe.
+INDEX = "CREATE INDEX IF NOT EXISTS prompts_created ON prompts (created)" # For incremental refreshes and eviction. # Für inkrementelle Aktualisierungen und Entfernung.
+
+
+def normalize(text: str) -> str: # Builds the compared form of a prompt. # Erstellt die verglichene Form einer Eingabe.
+    return " ".join(re.sub(r"[^\w\s'-]", " ", text.lower()).split())
+
+
+def shingles(normalized: str) -> set: # Character trigrams of a normalized prompt. # Zeichen-Trigramme einer normalisierten Eingabe.
+    padded = f" {normalized} " # Word edges count as characters. # Wortränder zählen als Zeichen.
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def signature(trigrams: set) -> tuple: # MinHash signature of a trigram set. # MinHash-Signatur einer Trigrammmenge.
+    hashes = [hash(trigram) & HASH_MASK for trigram in trigrams] # Per-process hashes are fine; signatures are never shared. # Prozesseigene Hashes genügen; Signaturen werden nie geteilt.
+    return tuple(min([value ^ mask for value in hashes]) for mask in MASKS)
+
+
+def bands(values: tuple) -> list: # LSH band keys of a signature. # LSH-Bandschlüssel einer Signatur.
+    return [(band, values[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+_opening = threading.Event() # Set once the spelling indexes are being opened in the background. # Gesetzt, sobald die Rechtschreibindizes im Hintergrund geöffnet werden.
+
+
+def _open_indexes() -> None: # Opens (or builds) every spelling index; runs in a background thread. # Öffnet (oder erstellt) jeden Rechtschreibindex; läuft in einem Hintergrund-Thread.
+    for lang in SUPPORTED_LANGUAGES:
+        try:
+            SpellIndex.open(lang)
+        except Exception as e: # A missing dictionary leaves the fallback in place. # Ein fehlendes Wörterbuch belässt den Ersatz.
+            logger.warning("Opening the %s spelling index failed: %s", lang, e)
+
+
+def is_typo(word: str, other: str) -> bool: # Whether two different words are one word spelled wrong. # Ob zwei verschiedene Wörter ein falsch geschriebenes Wort sind.
+    """True when the spelling index of a supported language corrects one word into the other; a different real word never is.
+    Until every index is open, which the first call starts in the background, long words one edit apart count as a typo."""
+    indexes = [SpellIndex.opened(lang) for lang in SUPPORTED_LANGUAGES]
+    if None in indexes: # Warm-up is off or not finished; a match never builds or waits for an index. # Das Aufwärmen ist aus oder nicht fertig; ein Treffer erstellt nie einen Index und wartet nie darauf.
+        if not _opening.is_set():
+            _opening.set()
+            threading.Thread(target=_open_indexes, name="spell-index-open", daemon=True).start()
+        return min(len(word), len(other)) >= FALLBACK_MIN_WORD_CHARS and _edit_distance(word, other, 1) <= 1
+    return any(index.lookup(word) == other or index.lookup(other) == word for index in indexes)
+
+
+class TranslationMemory: # Defines the TranslationMemory class. # Definiert die TranslationMemory-Klasse.
+    def __init__(self, path: Optional[str] = None): # Initializes the memory. # Initialisiert den Speicher.
+        self.path = path or os.getenv("TRANSLATION_MEMORY_PATH") or os.path.join(self._get_temp_directory(), "translation_memory.sqlite3") # Stored next to the audio clips. # Neben den Audioclips gespeichert.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True) # Creates the directory if it doesn't exist. # Erstellt das Verzeichnis, falls es nicht existiert.
+        self._local = threading.local() # Connection of the current thread. # Verbindung des aktuellen Threads.
+        self._lock = threading.Lock() # Guards the index against a refresh in the thread pool. # Schützt den Index vor einer Aktualisierung im Thread-Pool.
+        self._entries = {} # Normalized prompt -> (cache key, band keys), oldest first. # Normalisierte Eingabe -> (Cache-Schlüssel, Bandschlüssel), älteste zuerst.
+        self._bands = {} # Band key -> normalized prompts. # Bandschlüssel -> normalisierte Eingaben.
+        self._seen = 0.0 # Newest prompt applied to the index. # Neueste in den Index übernommene Eingabe.
+        self._refreshed = None # Monotonic time of the last refresh. # Monotone Zeit der letzten Aktualisierung.
+        self._puts = 0 # Writes since the last eviction. # Schreibvorgänge seit der letzten Entfernung.
+
+    def _get_temp_directory(self) -> str: # Defines method to get the audio directory. # Definiert Methode zum Abrufen des Audioverzeichnisses.
+        """Return the shared TTS audio directory"""
+        if os.name == "nt": # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            return os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Uses the Windows temp directory. # Verwendet das Windows-Temp-Verzeichnis.
+        return "/tmp/tts_audio" # Uses the Unix audio directory. # Verwendet das Unix-Audioverzeichnis.
+
+    def _connection(self) -> sqlite3.Connection: # Returns the connection of this thread and process. # Gibt die Verbindung dieses Threads und Prozesses zurück.
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid(): # SQLite connections must not cross threads or a fork. # SQLite-Verbindungen dürfen weder Threads noch einen Fork überqueren.
+            connection = sqlite3.connect(self.path, timeout=5.0) # Waits up to 5 s for another worker's write. # Wartet bis zu 5 s auf den Schreibvorgang eines anderen Workers.
+            connection.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer and vice versa. # Leser blockieren den Schreiber nicht und umgekehrt.
+            connection.execute("PRAGMA synchronous=NORMAL") # A lost prompt after a power cut is acceptable. # Eine verlorene Eingabe nach einem Stromausfall ist akzeptabel.
+            connection.execute(SCHEMA)
+            connection.execute(INDEX)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _index(self, normalized: str, cache_key: str, band_keys: list) -> None: # Adds a prompt to the in-memory index; the lock is held. # Fügt eine Eingabe dem In-Memory-Index hinzu; die Sperre wird gehalten.
+        if normalized in self._entries: # Moves a repeated prompt to the newest position. # Verschiebt eine wiederholte Eingabe an die neueste Position.
+            self._drop(normalized)
+        self._entries[normalized] = (cache_key, band_keys)
+        for band_key in band_keys:
+            self._bands.setdefault(band_key, set()).add(normalized)
+        while len(self._entries) > TRANSLATION_MEMORY_MAX_ENTRIES: # Forgets the oldest prompts. # Vergisst die ältesten Eingaben.
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, normalized: str) -> None: # Removes a prompt from the in-memory index; the lock is held. # Entfernt eine Eingabe aus dem In-Memory-Index; die Sperre wird gehalten.
+        _, band_keys = self._entries.pop(normalized)
+        for band_key in band_keys:
+            members = self._bands[band_key]
+            members.discard(normalized)
+            if not members: # Keeps the band table small. # Hält die Bandtabelle klein.
+                del self._bands[band_key]
+
+    def add(self, prompt: str, cache_key: str) -> None: # Remembers a cached prompt. # Merkt sich eine zwischengespeicherte Eingabe.
+        """Store the prompt for every worker and index it here; runs in the thread pool"""
+        normalized = normalize(prompt)
+        if not normalized: # Nothing to compare. # Nichts zu vergleichen.
+            return
+        try:
+            connection = self._connection()
+            with connection: # Commits the write. # Bestätigt den Schreibvorgang.
+                connection.execute("INSERT OR REPLACE INTO prompts VALUES (?, ?, ?)", (cache_key, prompt, time.time()))
+            self._puts += 1
+            if self._puts >= 256: # Evicts in batches, not on every write. # Entfernt in Stapeln, nicht bei jedem Schreibvorgang.
+                self._puts = 0
+                self.evict()
+        except sqlite3.Error as e: # Another worker held the lock too long. # Ein anderer Worker hielt die Sperre zu lange.
+            logger.warning("Translation memory write failed: %s", e)
+        band_keys = bands(signature(shingles(normalized))) # Computed outside the lock. # Außerhalb der Sperre berechnet.
+        with self._lock:
+            self._index(normalized, cache_key, band_keys)
+
+    def evict(self) -> None: # Removes surplus prompts. # Entfernt überzählige Eingaben.
+        connection = self._connection()
+        with connection: # Keeps the newest prompts. # Behält die neuesten Eingaben.
+            connection.execute(
+                "DELETE FROM prompts WHERE key IN (SELECT key FROM prompts ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (TRANSLATION_MEMORY_MAX_ENTRIES,),
+            )
+
+    def stale(self) -> bool: # Whether other workers' prompts may be missing. # Ob Eingaben anderer Worker fehlen könnten.
+        return self._refreshed is None or time.monotonic() - self._refreshed > TRANSLATION_MEMORY_REFRESH_SECONDS
+
+    def refresh(self) -> None: # Loads prompts stored since the last refresh. # Lädt seit der letzten Aktualisierung gespeicherte Eingaben.
+        """Index prompts other workers stored since the last refresh, oldest first; runs in the thread pool"""
+        try:
+            rows = self._connection().execute(
+                "SELECT key, prompt, created FROM prompts WHERE created >= ? ORDER BY created DESC LIMIT ?",
+                (self._seen - REFRESH_OVERLAP_SECONDS, TRANSLATION_MEMORY_MAX_ENTRIES),
+            ).fetchall()
+        except sqlite3.Error as e: # Locked too long or corrupted. # Zu lange gesperrt oder beschädigt.
+            logger.warning("Translation memory refresh failed: %s", e)
+            return
+        indexed = [] # New prompts, oldest first, with signatures computed outside the lock. # Neue Eingaben, älteste zuerst, mit außerhalb der Sperre berechneten Signaturen.
+        for cache_key, prompt, created in reversed(rows):
+            normalized = normalize(prompt)
+            if normalized and self._entries.get(normalized, (None,))[0] != cache_key: # Skips prompts already indexed. # Überspringt bereits indizierte Eingaben.
+                indexed.append((normalized, cache_key, bands(signature(shingles(normalized)))))
+        with self._lock:
+            for normalized, cache_key, band_keys in indexed:
+                self._index(normalized, cache_key, band_keys)
+            if rows: # Rows arrive newest first. # Zeilen kommen neueste zuerst.
+                self._seen = max(self._seen, rows[0][2])
+        self._refreshed = time.monotonic()
+
+    def match(self, prompt: str) -> Optional[str]: # Finds a near-duplicate. # Findet ein Beinahe-Duplikat.
+        """Return the cache key of the most similar past prompt that differs only in casing, punctuation, spacing or typos, or None; runs in the thread pool"""
+        normalized = normalize(prompt)
+        if not normalized:
+            return None
+        with self._lock:
+            entry = self._entries.get(normalized)
+            if entry: # Same words, different casing, punctuation or spacing. # Dieselben Wörter, andere Schreibweise, Satzzeichen oder Abstände.
+                return entry[0]
+            trigrams = shingles(normalized)
+            candidates = set()
+            for band_key in bands(signature(trigrams)): # Prompts sharing a band are likely similar. # Eingaben, die ein Band teilen, sind wahrscheinlich ähnlich.
+                candidates |= self._bands.get(band_key, set())
+            candidates = [(candidate, self._entries[candidate][0]) for candidate in candidates]
+
+        words = normalized.split()
+        best, best_similarity = None, TRANSLATION_MEMORY_THRESHOLD
+        for candidate, cache_key in candidates:
+            other = shingles(candidate)
+            similarity = len(trigrams & other) / len(trigrams | other) # Exact Jaccard similarity. # Exakte Jaccard-Ähnlichkeit.
+            if similarity >= best_similarity and self._typos_only(words, candidate.split()):
+                best, best_similarity = cache_key, similarity
+        return best
+
+    @staticmethod
+    def _typos_only(words: list, other: list) -> bool: # Whether two prompts differ only by misspelled words. # Ob sich zwei Eingaben nur durch falsch geschriebene Wörter unterscheiden.
+        if len(words) != len(other): # An added or dropped word may change the meaning. # Ein hinzugefügtes oder weggelassenes Wort kann die Bedeutung ändern.
+            return False
+        different = [(word, candidate) for word, candidate in zip(words, other) if word != candidate]
+        if len(different) > max(1, len(words) // 4): # At most one typo per four words. # Höchstens ein Tippfehler pro vier Wörter.
+            return False
+        return all(is_typo(word, candidate) for word, candidate in different)
+
+    def stats(self) -> dict: # Returns usage statistics. # Gibt Nutzungsstatistiken zurück.
+        """Return the number of indexed prompts for monitoring"""
+        with self._lock:
+            return {"entries": len(self._entries)}
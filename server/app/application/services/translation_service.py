@@ -6,25 +6,101 @@
 # Usage:
 # service = TranslationService() # Creates a new translation service instance. # Erstellt eine neue Übersetzungsdienst-Instanz.
 # translation = await service.process_prompt("Hello world", "en", "de") # Translates text from English to German with full details. # Übersetzt Text von Englisch nach Deutsch mit vollständigen Details.
+# translation = await service.process_prompt(paragraph, "en", "de") # Inputs over LONG_INPUT_CHARS are translated per sentence, in parallel. # Eingaben über LONG_INPUT_CHARS werden pro Satz parallel übersetzt.
+# translation = await service.process_prompt("Hello world", "en", "de", audio_delivery="job") # Returns at once; translation.audio_job_id tracks the audio. # Kehrt sofort zurück; translation.audio_job_id verfolgt das Audio.
 #
 # EN: Leverages Google's Gemini AI model to provide multi-level translations with educational word mappings.
 # DE: Nutzt Googles Gemini-KI-Modell, um mehrstufige Übersetzungen mit lehrreichen Wortzuordnungen bereitzustellen.
 
 from google.generativeai import GenerativeModel # Imports Google's Generative AI model class. # Importiert Googles Generative-KI-Modellklasse.
 import google.generativeai as genai # Imports the Google Generative AI library. # Importiert die Google Generative-KI-Bibliothek.
+import asyncio # Imports asyncio for running cache lookups off the event loop. # Importiert asyncio, um Cache-Abfragen außerhalb der Ereignisschleife auszuführen.
+import hashlib # Imports hashlib for the prompt fingerprint. # Importiert hashlib für den Prompt-Fingerabdruck.
 import os # Imports operating system functionality for environment variables. # Importiert Betriebssystemfunktionalität für Umgebungsvariablen.
+import logging # Imports logging for service logging. # Importiert logging für die Dienstprotokollierung.
+import threading # Imports threading to serialize the stateful chat session. # Importiert threading, um die zustandsbehaftete Chat-Sitzung zu serialisieren.
 from dotenv import load_dotenv # Imports load_dotenv to read environment variables from .env file. # Importiert load_dotenv zum Lesen von Umgebungsvariablen aus der .env-Datei.
 from ...domain.entities.translation import Translation # Imports the Translation entity from domain layer. # Importiert die Translation-Entität aus der Domain-Schicht.
-from spellchecker import SpellChecker # Imports SpellChecker for fixing spelling errors. # Importiert SpellChecker zum Beheben von Rechtschreibfehlern.
-import unicodedata # Imports unicodedata for handling text normalization. # Importiert unicodedata zur Textbereinigung.
+from .spell_index import SUPPORTED_LANGUAGES, SpellIndex # Imports the memory-mapped spelling index for fixing spelling errors. # Importiert den Memory-gemappten Rechtschreibindex zum Beheben von Rechtschreibfehlern.
+from .text_normalizer import normalize_text, restore_accents, to_ascii # Imports the single-pass text normalization stage. # Importiert die Textnormalisierungsstufe in einem Durchlauf.
 import regex as re # Imports regex for advanced pattern matching. # Importiert regex für erweiterte Mustererkennung.
-from .tts_service import EnhancedTTSService # Imports the text-to-speech service. # Importiert den Text-zu-Sprache-Dienst.
+from ...infrastructure.admission import UpstreamOverloaded, admit # Imports the per-upstream admission control. # Importiert die Zulassungssteuerung pro Upstream.
+from ...infrastructure.deadline import DeadlineExceeded # Imports the request deadline error. # Importiert den Fristfehler der Anfrage.
+from ...infrastructure.resilience import UpstreamTimeout, resilient_call # Imports timeouts, retries and hedging for Gemini. # Importiert Timeouts, Wiederholungen und Absicherung für Gemini.
+from ...infrastructure.observability.logging_setup import log_payload # Imports sampled payload logging. # Importiert stichprobenartiges Nutzdaten-Logging.
+from ...infrastructure.observability.metrics import record_cache, stage_timer, timed, upstream_call # Imports stage latency metrics. # Importiert Stufenlatenz-Metriken.
+from .audio_jobs import AudioJobQueue # Imports the background audio job queue. # Importiert die Warteschlange für Hintergrund-Audio-Jobs.
+from .bilingual_lexicon import BilingualLexicon # Imports the lexicon learned from past word pairs. # Importiert das aus früheren Wortpaaren gelernte Lexikon.
+from .translation_cache import TranslationCache # Imports the cross-worker cache of Gemini responses. # Importiert den workerübergreifenden Cache von Gemini-Antworten.
+from .translation_memory import TranslationMemory # Imports the near-duplicate index of cached prompts. # Importiert den Beinahe-Duplikat-Index zwischengespeicherter Eingaben.
+from .tts_service import EnhancedTTSService, SynthesisPipeline # Imports the text-to-speech service and its streaming pipeline. # Importiert den Text-zu-Sprache-Dienst und seine Streaming-Pipeline.
 import tempfile # Imports tempfile for creating temporary files. # Importiert tempfile zum Erstellen temporärer Dateien.
 from typing import Optional # Imports Optional for type hinting. # Importiert Optional für Typenhinweise.
 
+logger = logging.getLogger(__name__) # Creates a logger instance for this module. # Erstellt eine Logger-Instanz für dieses Modul.
+
+AUDIO_DELIVERY = os.getenv("AUDIO_DELIVERY", "inline") # "inline" waits for the audio, "job" synthesizes it in the background. # "inline" wartet auf das Audio, "job" synthetisiert es im Hintergrund.
+LONG_INPUT_CHARS = int(os.getenv("LONG_INPUT_CHARS", "400")) # Longer inputs are split into sentence chunks; 0 disables splitting. # Längere Eingaben werden in Satz-Chunks geteilt; 0 deaktiviert das Teilen.
+TRANSLATION_CHUNK_CHARS = int(os.getenv("TRANSLATION_CHUNK_CHARS", "240")) # Longer sentences are split further at clause boundaries. # Längere Sätze werden an Teilsatzgrenzen weiter geteilt.
+TRANSLATION_CHUNK_CONCURRENCY = int(os.getenv("TRANSLATION_CHUNK_CONCURRENCY", "4")) # Chunks of one input translated at once. # Gleichzeitig übersetzte Chunks einer Eingabe.
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?…]["»”)\]]*)\s+') # Whitespace after a sentence end and its closing quotes. # Leerraum nach einem Satzende und seinen schließenden Anführungszeichen.
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:—])\s+') # Whitespace after a clause end. # Leerraum nach einem Teilsatzende.
+
+# Patterns for German translations
+GERMAN_PATTERNS = [ # Defines patterns to extract German translations of different styles. # Definiert Muster zur Extraktion deutscher Übersetzungen verschiedener Stile.
+    {
+        "text_pattern": r'German Translation:.*?\* Conversational-native:\s*"([^"]+)"', # Pattern for native German. # Muster für muttersprachliches Deutsch.
+        "pairs_pattern": r'\* word by word Conversational-native German-Spanish:\s*"([^"]+)"', # Pattern for native German word pairs. # Muster für muttersprachliche deutsche Wortpaare.
+        "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
+    },
+    {
+        "text_pattern": r'\* Conversational-colloquial:\s*"([^"]+)"', # Pattern for colloquial German. # Muster für umgangssprachliches Deutsch.
+        "pairs_pattern": r'\* word by word Conversational-colloquial German-Spanish:\s*"([^"]+)"', # Pattern for colloquial German word pairs. # Muster für umgangssprachliche deutsche Wortpaare.
+        "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
+    },
+    {
+        "text_pattern": r'\* Conversational-informal:\s*"([^"]+)"', # Pattern for informal German. # Muster für informelles Deutsch.
+        "pairs_pattern": r'\* word by word Conversational-informal German-Spanish:\s*"([^"]+)"', # Pattern for informal German word pairs. # Muster für informelle deutsche Wortpaare.
+        "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
+    },
+    {
+        "text_pattern": r'\* Conversational-formal:\s*"([^"]+)"', # Pattern for formal German. # Muster für formelles Deutsch.
+        "pairs_pattern": r'\* word by word Conversational-formal German-Spanish:\s*"([^"]+)"', # Pattern for formal German word pairs. # Muster für formelle deutsche Wortpaare.
+        "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
+    },
+]
+
+# Patterns for English translations
+ENGLISH_PATTERNS = [ # Defines patterns to extract English translations of different styles. # Definiert Muster zur Extraktion englischer Übersetzungen verschiedener Stile.
+    {
+        "text_pattern": r'English Translation:.*?\* Conversational-native:\s*"([^"]+)"', # Pattern for native English. # Muster für muttersprachliches Englisch.
+        "pairs_pattern": r'\* word by word Conversational-native English-Spanish:\s*"([^"]+)"', # Pattern for native English word pairs. # Muster für muttersprachliche englische Wortpaare.
+        "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
+    },
+    {
+        "text_pattern": r'English Translation:.*?\* Conversational-colloquial:\s*"([^"]+)"', # Pattern for colloquial English. # Muster für umgangssprachliches Englisch.
+        "pairs_pattern": r'\* word by word Conversational-colloquial English-Spanish:\s*"([^"]+)"', # Pattern for colloquial English word pairs. # Muster für umgangssprachliche englische Wortpaare.
+        "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
+    },
+    {
+        "text_pattern": r'English Translation:.*?\* Conversational-informal:\s*"([^"]+)"', # Pattern for informal English. # Muster für informelles Englisch.
+        "pairs_pattern": r'\* word by word Conversational-informal English-Spanish:\s*"([^"]+)"', # Pattern for informal English word pairs. # Muster für informelle englische Wortpaare.
+        "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
+    },
+    {
+        "text_pattern": r'English Translation:.*?\* Conversational-formal:\s*"([^"]+)"', # Pattern for formal English. # Muster für formelles Englisch.
+        "pairs_pattern": r'\* word by word Conversational-formal English-Spanish:\s*"([^"]+)"', # Pattern for formal English word pairs. # Muster für formelle englische Wortpaare.
+        "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
+    },
+]
+
+# Combine patterns
+SECTION_PATTERNS = GERMAN_PATTERNS + ENGLISH_PATTERNS # Combines German and English patterns, in the order the model writes the sections. # Kombiniert deutsche und englische Muster in der Reihenfolge, in der das Modell die Abschnitte schreibt.
+SECTION_STYLES = ("native", "colloquial", "informal", "formal") # Style of each section within its language. # Stil jedes Abschnitts innerhalb seiner Sprache.
+
 
 class TranslationService: # Defines the TranslationService class. # Definiert die TranslationService-Klasse.
-    def __init__(self): # Initializes the TranslationService. # Initialisiert den TranslationService.
+    def __init__(self, tts_service: Optional[EnhancedTTSService] = None, audio_jobs: Optional[AudioJobQueue] = None): # Initializes the TranslationService, optionally on shared TTS and audio job services. # Initialisiert den TranslationService, optional auf gemeinsamen TTS- und Audio-Job-Diensten.
         load_dotenv() # Loads environment variables from .env file. # Lädt Umgebungsvariablen aus der .env-Datei.
         api_key = os.getenv("GEMINI_API_KEY") # Gets the Gemini API key from environment variables. # Holt den Gemini-API-Schlüssel aus den Umgebungsvariablen.
         if not api_key: # Checks if the API key is missing. # Prüft, ob der API-Schlüssel fehlt.
@@ -32,8 +108,6 @@ class TranslationService: # Defines the TranslationService class. # Definiert di
 
         genai.configure(api_key=api_key) # Configures the Generative AI library with the API key. # Konfiguriert die Generative-KI-Bibliothek mit dem API-Schlüssel.
 
-        self.spell = SpellChecker() # Creates a spell checker instance. # Erstellt eine Rechtschreibprüfungs-Instanz.
-
         self.generation_config = { # Configures parameters for the AI model generation. # Konfiguriert Parameter für die KI-Modellerzeugung.
             "temperature": 1, # Sets creativity level (higher = more creative). # Setzt die Kreativitätsstufe (höher = kreativer).
             "top_p": 0.95, # Sets probability threshold for token selection. # Setzt die Wahrscheinlichkeitsschwelle für die Token-Auswahl.
@@ -46,7 +120,8 @@ class TranslationService: # Defines the TranslationService class. # Definiert di
             model_name="gemini-2.0-flash-exp", generation_config=self.generation_config # Uses Gemini 2.0 Flash experimental model with custom config. # Verwendet Gemini 2.0 Flash-Experimentalmodell mit benutzerdefinierter Konfiguration.
         )
 
-        self.tts_service = EnhancedTTSService() # Creates an enhanced text-to-speech service instance. # Erstellt eine erweiterte Text-zu-Sprache-Dienstinstanz.
+        self.tts_service = tts_service or EnhancedTTSService() # Uses the shared text-to-speech service or creates one. # Verwendet den gemeinsamen Text-zu-Sprache-Dienst oder erstellt einen.
+        self.audio_jobs = audio_jobs or AudioJobQueue() # Background syntheses of audio_delivery="job". # Hintergrundsynthesen von audio_delivery="job".
 
         self.chat_session = self.model.start_chat( # Initializes a chat session with the AI model. # Initialisiert eine Chat-Sitzung mit dem KI-Modell.
             history=[ # Sets initial chat history with prompting instructions. # Setzt die anfängliche Chat-Historie mit Anweisungen.
@@ -109,47 +184,241 @@ English Translation:
                 }
             ]
         )
+        self._history_base = len(self.chat_session.history) # Length of the few-shot instructions kept in every request. # Länge der Few-Shot-Anweisungen, die in jeder Anfrage erhalten bleiben.
+        self.history_turns = int(os.getenv("GEMINI_HISTORY_TURNS", "0")) # Earlier exchanges kept after the instructions. # Nach den Anweisungen behaltene frühere Wortwechsel.
+        self._chat_lock = threading.Lock() # One message at a time while the chat keeps history. # Eine Nachricht nach der anderen, solange der Chat eine Historie behält.
+
+        self.translation_cache = None # Response cache, disabled unless configured. # Antwort-Cache, deaktiviert, sofern nicht konfiguriert.
+        if os.getenv("TRANSLATION_CACHE", "true").lower() == "true" and not self.history_turns: # With kept history a response depends on earlier requests. # Mit behaltener Historie hängt eine Antwort von früheren Anfragen ab.
+            self.translation_cache = TranslationCache() # Opens the cache shared by all workers. # Öffnet den von allen Workern geteilten Cache.
+        self.translation_memory = None # Near-duplicate lookups, only on top of the cache. # Beinahe-Duplikat-Suchen, nur zusätzlich zum Cache.
+        if self.translation_cache and os.getenv("TRANSLATION_MEMORY", "true").lower() == "true":
+            self.translation_memory = TranslationMemory() # Opens the prompts shared by all workers. # Öffnet die von allen Workern geteilten Eingaben.
+        self.lexicon = None # Local answers to one-word prompts, disabled unless configured. # Lokale Antworten auf Ein-Wort-Eingaben, deaktiviert, sofern nicht konfiguriert.
+        if os.getenv("LEXICON", "true").lower() == "true" and not self.history_turns: # A lexicon answer would skip the kept history. # Eine Lexikonantwort würde die behaltene Historie überspringen.
+            self.lexicon = BilingualLexicon() # Opens the lexicon shared by all workers. # Öffnet das von allen Workern geteilte Lexikon.
+        self._prompt_fingerprint = hashlib.sha1(repr(( # Changes whenever the model, its settings or the instructions change. # Ändert sich, wenn sich Modell, Einstellungen oder Anweisungen ändern.
+            getattr(self.model, "model_name", ""), self.generation_config, self.chat_session.history[:self._history_base],
+        )).encode("utf-8")).hexdigest()
+
+    def _trim_chat_history(self) -> None: # Defines method to bound the chat history. # Definiert Methode zur Begrenzung der Chat-Historie.
+        """Drop old exchanges so the history doesn't grow with every request"""
+        history = self.chat_session.history # Instructions followed by one user/model pair per request. # Anweisungen gefolgt von einem Benutzer/Modell-Paar pro Anfrage.
+        keep = 2 * self.history_turns # Messages kept after the instructions. # Nach den Anweisungen behaltene Nachrichten.
+        if len(history) > self._history_base + keep: # Only rewrites when over the limit. # Schreibt nur bei Überschreitung des Limits neu.
+            self.chat_session.history = history[:self._history_base] + (history[len(history) - keep:] if keep else []) # Keeps the instructions and the newest exchanges. # Behält die Anweisungen und die neuesten Wortwechsel.
+
+    def _send_chat_message(self, text: str) -> str: # Defines method to send one message through the shared chat. # Definiert Methode zum Senden einer Nachricht über den gemeinsamen Chat.
+        """Send a message that continues the chat history; runs in the thread pool"""
+        with self._chat_lock: # The history of one exchange must not interleave with another. # Die Historie eines Wortwechsels darf sich nicht mit einem anderen vermischen.
+            try: # Trims the history even when the call fails. # Kürzt die Historie auch, wenn der Aufruf fehlschlägt.
+                return self.chat_session.send_message(text).text # Sends text to AI model for translation. # Sendet Text zur Übersetzung an das KI-Modell.
+            finally: # Every request would otherwise add to the history for the life of the process. # Sonst würde jede Anfrage die Historie für die Lebensdauer des Prozesses verlängern.
+                self._trim_chat_history() # Bounds the history. # Begrenzt die Historie.
+
+    async def _ask_gemini(self, text: str, pipeline: Optional[SynthesisPipeline] = None) -> str: # Defines method for one Gemini attempt. # Definiert Methode für einen Gemini-Versuch.
+        """Run one Gemini request in the thread pool and return the generated text"""
+        loop = asyncio.get_running_loop()
+        with upstream_call("gemini"): # Records Gemini latency and errors. # Erfasst Gemini-Latenz und -Fehler.
+            if self.history_turns: # Stateful chat, not safe to repeat. # Zustandsbehafteter Chat, nicht sicher wiederholbar.
+                return await loop.run_in_executor(None, self._send_chat_message, text)
+            contents = self.chat_session.history[:self._history_base] + [{"role": "user", "parts": [text]}] # The instructions plus the prompt, the same request the chat would send. # Die Anweisungen plus die Eingabe, dieselbe Anfrage, die der Chat senden würde.
+            if pipeline: # Streams, so synthesis starts with the first complete section. # Streamt, damit die Synthese mit dem ersten vollständigen Abschnitt beginnt.
+                return await self._stream_gemini(contents, pipeline)
+            response = await loop.run_in_executor(None, self.model.generate_content, contents) # Stateless, so a retry or hedge can repeat it. # Zustandslos, daher kann eine Wiederholung oder Absicherung sie wiederholen.
+            return response.text # Gets the generated translation text. # Holt den generierten Übersetzungstext.
+
+    async def _stream_gemini(self, contents: list, pipeline: SynthesisPipeline) -> str: # Defines method for one streamed Gemini attempt. # Definiert Methode für einen gestreamten Gemini-Versuch.
+        """Stream a Gemini response and feed each section to the pipeline once its text and word pairs are complete"""
+        loop = asyncio.get_running_loop()
+        chunks = asyncio.Queue() # Chunk texts, then None at the end or the exception. # Chunk-Texte, dann None am Ende oder die Ausnahme.
+        stop = threading.Event() # Set when the attempt is abandoned. # Gesetzt, wenn der Versuch aufgegeben wird.
+
+        def put(item) -> None: # Hands an item to the event loop. # Übergibt ein Element an die Ereignisschleife.
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError: # The loop is gone. # Die Schleife existiert nicht mehr.
+                stop.set()
+
+        def produce() -> None: # Iterates the blocking stream in the thread pool. # Durchläuft den blockierenden Stream im Thread-Pool.
+            try:
+                for chunk in self.model.generate_content(contents, stream=True):
+                    if stop.is_set(): # A cancelled attempt stops reading. # Ein abgebrochener Versuch hört auf zu lesen.
+                        return
+                    put(chunk.text)
+                put(None)
+            except Exception as e: # Re-raised on the event loop. # Wird in der Ereignisschleife erneut ausgelöst.
+                put(e)
+
+        loop.run_in_executor(None, produce)
+        generated_text, fed = "", (0, 0) # Text so far and the section and pair counts last fed. # Bisheriger Text und die zuletzt gefütterten Abschnitts- und Paarzahlen.
+        try:
+            while True:
+                item = await chunks.get()
+                if item is None:
+                    return generated_text
+                if isinstance(item, Exception):
+                    raise item
+                generated_text += item
+                if '"' not in item: # Sections and word pairs only complete with a closing quote. # Abschnitte und Wortpaare werden nur mit einem schließenden Anführungszeichen vollständig.
+                    continue
+                translations, word_pairs = self._extract_text_and_pairs(generated_text)
+                if (len(translations), len(word_pairs)) != fed: # A section or its word pairs completed. # Ein Abschnitt oder seine Wortpaare wurden vollständig.
+                    fed = (len(translations), len(word_pairs))
+                    pipeline.feed(translations, word_pairs)
+        finally:
+            stop.set()
+
+    async def _cached_response(self, text: str) -> tuple[Optional[str], Optional[str]]: # Defines method to look up a stored response. # Definiert Methode zum Nachschlagen einer gespeicherten Antwort.
+        """Return (response, None) on a cache hit and (None, key to store the fresh response under) on a miss"""
+        if not self.translation_cache: # Caching is off. # Caching ist aus.
+            return None, None
+        cache_key = self.translation_cache.key(text, self._prompt_fingerprint) # Only the text is sent to Gemini, so the languages aren't part of the key. # Nur der Text wird an Gemini gesendet, daher gehören die Sprachen nicht zum Schlüssel.
+        generated_text = await asyncio.get_running_loop().run_in_executor(None, self.translation_cache.get, cache_key) # May wait on another worker's write. # Kann auf den Schreibvorgang eines anderen Workers warten.
+        record_cache("translations", hits=int(generated_text is not None), misses=int(generated_text is None)) # Counts the lookup. # Zählt die Abfrage.
+        if generated_text is None and self.translation_memory: # Looks for the same prompt with other casing, punctuation or a typo. # Sucht dieselbe Eingabe mit anderer Schreibweise, Satzzeichen oder einem Tippfehler.
+            if self.translation_memory.stale(): # Picks up prompts other workers cached. # Übernimmt Eingaben, die andere Worker zwischengespeichert haben.
+                await asyncio.get_running_loop().run_in_executor(None, self.translation_memory.refresh)
+            match_key = await asyncio.get_running_loop().run_in_executor(None, self.translation_memory.match, text) # Edit distances of the candidates stay off the event loop. # Die Editierdistanzen der Kandidaten bleiben außerhalb der Ereignisschleife.
+            if match_key: # Reads the near-duplicate's response. # Liest die Antwort des Beinahe-Duplikats.
+                generated_text = await asyncio.get_running_loop().run_in_executor(None, self.translation_cache.get, match_key)
+            record_cache("translation_memory", hits=int(generated_text is not None), misses=int(generated_text is None)) # Counts the lookup. # Zählt die Abfrage.
+        return (generated_text, None) if generated_text is not None else (None, cache_key)
+
+    def _store_response(self, text: str, cache_key: str, generated_text: str) -> None: # Defines method to share a fresh response. # Definiert Methode zum Teilen einer frischen Antwort.
+        """Cache the response for every worker and remember its prompt for near-duplicates; runs in the thread pool"""
+        self.translation_cache.put(cache_key, generated_text)
+        if self.translation_memory:
+            self.translation_memory.add(text, cache_key)
+
+    async def _call_gemini(self, text: str, pipeline: Optional[SynthesisPipeline] = None) -> str: # Defines method to query Gemini under load control. # Definiert Methode zur Gemini-Abfrage unter Laststeuerung.
+        async with admit("gemini"): # Waits for a Gemini slot or fails fast with 429. # Wartet auf einen Gemini-Platz oder scheitert schnell mit 429.
+            return await resilient_call( # Times out, retries and hedges the request. # Begrenzt, wiederholt und sichert die Anfrage ab.
+                "gemini", lambda: self._ask_gemini(text, pipeline), idempotent=not self.history_turns,
+            )
+
+    def _split_long_input(self, text: str) -> list[str]: # Defines method to split a long input into chunks. # Definiert Methode zum Teilen einer langen Eingabe in Chunks.
+        """Split inputs over LONG_INPUT_CHARS into sentences, and over-long sentences into packed clauses"""
+        if not LONG_INPUT_CHARS or len(text) <= LONG_INPUT_CHARS or self.history_turns: # Short inputs and the stateful chat stay whole. # Kurze Eingaben und der zustandsbehaftete Chat bleiben ganz.
+            return [text]
+        chunks = [] # Initializes the chunk list. # Initialisiert die Chunk-Liste.
+        for sentence in SENTENCE_BOUNDARY.split(text.strip()): # One chunk per sentence, so the same sentence hits the cache in any paragraph. # Ein Chunk pro Satz, damit derselbe Satz in jedem Absatz den Cache trifft.
+            if len(sentence) <= TRANSLATION_CHUNK_CHARS: # Short enough to translate whole. # Kurz genug, um ganz übersetzt zu werden.
+                chunks.append(sentence)
+                continue
+            packed = "" # Clauses packed up to the chunk size. # Bis zur Chunk-Größe gepackte Teilsätze.
+            for clause in CLAUSE_BOUNDARY.split(sentence): # Splits only this sentence, so other chunks keep their cache keys. # Teilt nur diesen Satz, damit andere Chunks ihre Cache-Schlüssel behalten.
+                if packed and len(packed) + 1 + len(clause) > TRANSLATION_CHUNK_CHARS:
+                    chunks.append(packed)
+                    packed = clause
+                else:
+                    packed = f"{packed} {clause}" if packed else clause
+            chunks.append(packed)
+        return [chunk for chunk in chunks if chunk.strip()] # Drops empty pieces. # Verwirft leere Teile.
+
+    async def _translate_chunks(self, chunks: list[str]) -> str: # Defines method to translate chunks concurrently. # Definiert Methode zum gleichzeitigen Übersetzen von Chunks.
+        """Translate the chunks with bounded fan-out and merge their responses in order"""
+        semaphore = asyncio.Semaphore(TRANSLATION_CHUNK_CONCURRENCY) # Bounds the fan-out of one request. # Begrenzt die Auffächerung einer Anfrage.
+
+        async def translate(chunk: str) -> str: # Translates one chunk. # Übersetzt einen Chunk.
+            async with semaphore:
+                generated_text, cache_key = await self._cached_response(chunk) # Reuses chunks of earlier requests. # Verwendet Chunks früherer Anfragen wieder.
+                if generated_text is None:
+                    generated_text = await self._call_gemini(chunk)
+                    await self._learn(self._extract_text_and_pairs(generated_text)[1]) # Long inputs teach the lexicon too. # Lange Eingaben lehren das Lexikon ebenfalls.
+                    if cache_key and any(section_text for section_text, _ in self._extract_sections(generated_text)): # Stores only responses that parsed. # Speichert nur Antworten, die geparst werden konnten.
+                        await asyncio.get_running_loop().run_in_executor(None, self._store_response, chunk, cache_key, generated_text)
+                return generated_text
+
+        tasks = [asyncio.ensure_future(translate(chunk)) for chunk in chunks] # Latency follows the slowest chunk, not the total length. # Die Latenz folgt dem langsamsten Chunk, nicht der Gesamtlänge.
+        try:
+            responses = await asyncio.gather(*tasks)
+        except BaseException: # A failed chunk, the deadline or a disconnect. # Ein fehlgeschlagener Chunk, die Frist oder ein Verbindungsabbruch.
+            for task in tasks: # Stops the other chunks. # Stoppt die anderen Chunks.
+                task.cancel()
+            raise
+        with stage_timer("translation", "merge"): # Records merge time. # Erfasst die Zusammenführungszeit.
+            return self._merge_responses(responses)
+
+    def _extract_sections(self, generated_text: str) -> list[tuple[Optional[str], Optional[str]]]: # Defines method to read each section raw. # Definiert Methode zum Rohlesen jedes Abschnitts.
+        """Return (translation, word-by-word line) of every section in SECTION_PATTERNS order, None where missing"""
+        sections = [] # Initializes the section list. # Initialisiert die Abschnittsliste.
+        for pattern_set in SECTION_PATTERNS: # Uses the same patterns as the parser. # Verwendet dieselben Muster wie der Parser.
+            text_match = re.search(pattern_set["text_pattern"], generated_text, re.DOTALL | re.IGNORECASE)
+            pairs_match = re.search(pattern_set["pairs_pattern"], generated_text, re.IGNORECASE)
+            sections.append((
+                text_match.group(1).strip() if text_match else None,
+                pairs_match.group(1).strip() if pairs_match else None,
+            ))
+        return sections # Returns the sections. # Gibt die Abschnitte zurück.
+
+    def _merge_responses(self, responses: list[str]) -> str: # Defines method to join chunk responses. # Definiert Methode zum Verbinden von Chunk-Antworten.
+        """Join each section across the chunk responses and write the result in the model's format, so it parses like one response"""
+        parsed = [self._extract_sections(response) for response in responses] # Sections of every chunk. # Abschnitte jedes Chunks.
+        return self._render_sections([ # Chunk translations and word pairs in input order. # Chunk-Übersetzungen und Wortpaare in Eingabereihenfolge.
+            (
+                " ".join(sections[index][0] for sections in parsed if sections[index][0]) or None,
+                " ".join(sections[index][1] for sections in parsed if sections[index][1]) or None,
+            )
+            for index in range(len(SECTION_PATTERNS))
+        ])
+
+    def _render_sections(self, sections: list[tuple[Optional[str], Optional[str]]]) -> str: # Defines method to write sections in the model's format. # Definiert Methode zum Schreiben von Abschnitten im Format des Modells.
+        """Write (translation, word-by-word line) per SECTION_PATTERNS entry as the model would, skipping sections without a translation"""
+        lines, language = [], None # Output lines and the language heading written last. # Ausgabezeilen und die zuletzt geschriebene Sprachüberschrift.
+        for index, pattern_set in enumerate(SECTION_PATTERNS): # Walks the sections in the model's order. # Durchläuft die Abschnitte in der Reihenfolge des Modells.
+            text, pairs = sections[index]
+            if not text: # No translation for this section. # Keine Übersetzung für diesen Abschnitt.
+                continue
+            section_language = "German" if pattern_set["is_german"] else "English" # Language of the section. # Sprache des Abschnitts.
+            style = SECTION_STYLES[index % len(SECTION_STYLES)] # Style of the section. # Stil des Abschnitts.
+            if section_language != language: # Starts a language block. # Beginnt einen Sprachblock.
+                language = section_language
+                lines.append(f"{language} Translation:")
+            lines.append(f"* Conversational-{style}:")
+            lines.append(f'"{text}"')
+            if pairs: # Keeps the word-by-word line. # Behält die Wort-für-Wort-Zeile.
+                lines.append(f"* word by word Conversational-{style} {language}-Spanish:")
+                lines.append(f'"{pairs}"')
+            lines.append("")
+        return "\n".join(lines) # Returns the rendered response. # Gibt die gerenderte Antwort zurück.
+
+    async def _lexicon_response(self, text: str, source_lang: str) -> Optional[str]: # Defines method to answer a one-word prompt locally. # Definiert Methode zur lokalen Beantwortung einer Ein-Wort-Eingabe.
+        """Return the native German and English sections built from the lexicon, or None when it isn't sure"""
+        if not self.lexicon: # The lexicon is off. # Das Lexikon ist aus.
+            return None
+        if self.lexicon.stale(): # Picks up words other workers learned. # Übernimmt Wörter, die andere Worker gelernt haben.
+            await asyncio.get_running_loop().run_in_executor(None, self.lexicon.refresh)
+        words = self.lexicon.lookup(text, source_lang) # (German, English, Spanish) per word. # (Deutsch, Englisch, Spanisch) pro Wort.
+        record_cache("lexicon", hits=int(words is not None), misses=int(words is None)) # Counts the lookup. # Zählt die Abfrage.
+        if words is None:
+            return None
+        sections = [(None, None)] * len(SECTION_PATTERNS) # Only the native sections; the lexicon knows no styles. # Nur die muttersprachlichen Abschnitte; das Lexikon kennt keine Stile.
+        sections[0] = (" ".join(german for german, _, _ in words), " ".join(f"{german} ({spanish})" for german, _, spanish in words))
+        sections[len(GERMAN_PATTERNS)] = (" ".join(english for _, english, _ in words), " ".join(f"{english} ({spanish})" for _, english, spanish in words))
+        return self._render_sections(sections)
+
+    async def _learn(self, word_pairs: list[tuple[str, str, bool]]) -> None: # Defines method to teach the lexicon. # Definiert Methode zum Lehren des Lexikons.
+        if self.lexicon and word_pairs: # Learns only from fresh Gemini responses, so a cached one isn't counted twice. # Lernt nur aus frischen Gemini-Antworten, damit eine zwischengespeicherte nicht doppelt zählt.
+            await asyncio.get_running_loop().run_in_executor(None, self.lexicon.learn, word_pairs)
+
+    def warm_up(self) -> None: # Defines method to load deferred resources. # Definiert Methode zum Laden verzögerter Ressourcen.
+        """Open the spelling indexes of all supported languages ahead of the first request"""
+        for lang in SUPPORTED_LANGUAGES: # Maps (or builds) each index once. # Mappt (oder erstellt) jeden Index einmal.
+            SpellIndex.open(lang)
+        if self.lexicon: # Loads the learned words. # Lädt die gelernten Wörter.
+            self.lexicon.refresh()
+        if self.translation_memory: # Indexes the cached prompts. # Indiziert die zwischengespeicherten Eingaben.
+            self.translation_memory.refresh()
 
     def _normalize_text(self, text: str) -> str: # Defines method to normalize Unicode text to ASCII. # Definiert eine Methode zur Normalisierung von Unicode-Text in ASCII.
-        normalized = unicodedata.normalize("NFKD", text) # Normalizes text by decomposing characters. # Normalisiert Text durch Zerlegung von Zeichen.
-        ascii_text = normalized.encode("ascii", "ignore").decode("ascii") # Converts to ASCII by removing non-ASCII characters. # Konvertiert zu ASCII durch Entfernen von Nicht-ASCII-Zeichen.
-        return ascii_text # Returns the normalized ASCII text. # Gibt den normalisierten ASCII-Text zurück.
+        return to_ascii(text) # Returns the normalized ASCII text. # Gibt den normalisierten ASCII-Text zurück.
 
     def _restore_accents(self, text: str) -> str: # Defines method to restore accents in text. # Definiert eine Methode zur Wiederherstellung von Akzenten im Text.
-        accent_map = { # Maps basic characters to their accented versions. # Ordnet grundlegende Zeichen ihren akzentuierten Versionen zu.
-            "a": "á",
-            "e": "é",
-            "i": "í",
-            "o": "ó",
-            "u": "ú",
-            "n": "ñ",
-            "A": "Á",
-            "E": "É",
-            "I": "Í",
-            "O": "Ó",
-            "U": "Ú",
-            "N": "Ñ",
-        }
-
-        patterns = { # Defines patterns to match accent placeholder notations. # Definiert Muster, um Akzent-Platzhalternotationen zu erkennen.
-            r"([aeiou])´": lambda m: accent_map[m.group(1)], # Pattern for vowel followed by acute accent. # Muster für Vokal gefolgt von Akut-Akzent.
-            r"([AEIOU])´": lambda m: accent_map[m.group(1)], # Pattern for uppercase vowel followed by acute accent. # Muster für Großbuchstaben-Vokal gefolgt von Akut-Akzent.
-            r"n~": "ñ", # Pattern for Spanish eñe placeholder. # Muster für spanischen Eñe-Platzhalter.
-            r"N~": "Ñ", # Pattern for uppercase Spanish eñe placeholder. # Muster für großgeschriebenen spanischen Eñe-Platzhalter.
-        }
-
-        for pattern, replacement in patterns.items(): # Iterates through each pattern-replacement pair. # Iteriert durch jedes Muster-Ersetzungs-Paar.
-            if callable(replacement): # Checks if replacement is a function. # Prüft, ob die Ersetzung eine Funktion ist.
-                text = re.sub(pattern, replacement, text) # Applies functional replacement. # Wendet funktionale Ersetzung an.
-            else:
-                text = re.sub(pattern, replacement, text) # Applies string replacement. # Wendet Zeichenkettenersetzung an.
-
-        return text # Returns text with restored accents. # Gibt Text mit wiederhergestellten Akzenten zurück.
+        return restore_accents(text) # Returns text with restored accents. # Gibt Text mit wiederhergestellten Akzenten zurück.
 
     def _ensure_unicode(self, text: str) -> str: # Defines method to ensure text is in Unicode format. # Definiert eine Methode, um sicherzustellen, dass Text im Unicode-Format ist.
-        if isinstance(text, bytes): # Checks if text is in bytes format. # Prüft, ob Text im Bytes-Format ist.
-            text = text.decode("utf-8") # Decodes bytes to UTF-8 string. # Dekodiert Bytes in UTF-8-Zeichenkette.
-        return unicodedata.normalize("NFKC", text) # Normalizes to composed form (combines characters). # Normalisiert zur zusammengesetzten Form (kombiniert Zeichen).
+        return normalize_text(text) # Decodes, restores accents and composes characters in one pass. # Dekodiert, stellt Akzente wieder her und setzt Zeichen in einem Durchlauf zusammen.
 
     def _extract_word_pairs(self, text: str) -> list[tuple[str, str]]: # Defines method to extract word pairs from translation text. # Definiert eine Methode zum Extrahieren von Wortpaaren aus Übersetzungstext.
         word_pairs = [] # Initializes empty list for word pairs. # Initialisiert leere Liste für Wortpaare.
@@ -197,43 +466,66 @@ English Translation:
         return ssml # Returns the complete SSML document. # Gibt das vollständige SSML-Dokument zurück.
 
     async def process_prompt(
-        self, text: str, source_lang: str, target_lang: str
+        self, text: str, source_lang: str, target_lang: str, audio_mode: Optional[str] = None,
+        audio_format: Optional[str] = None, audio_delivery: Optional[str] = None, audio_priority: Optional[str] = None,
     ) -> Translation: # Defines the main method to process a translation request. # Definiert die Hauptmethode zur Verarbeitung einer Übersetzungsanfrage.
 
         try: # Begins error handling block. # Beginnt einen Fehlerbehandlungsblock.
-
-            response = self.chat_session.send_message(text) # Sends text to AI model for translation. # Sendet Text zur Übersetzung an das KI-Modell.
-            generated_text = response.text # Gets the generated translation text. # Holt den generierten Übersetzungstext.
-
-            print(f"Generated text from Gemini: {generated_text[:100]}...") # Logs the first 100 characters of the generated text. # Protokolliert die ersten 100 Zeichen des generierten Textes.
+            with stage_timer("translation", "normalize"): # Records normalization time. # Erfasst die Normalisierungszeit.
+                prompt = self._ensure_unicode(text) # Normalized copy for the caches and the model; the response keeps what the user typed. # Normalisierte Kopie für die Caches und das Modell; die Antwort behält, was der Benutzer eingegeben hat.
+
+            audio_delivery = audio_delivery or AUDIO_DELIVERY # Inline or background audio. # Direktes oder Hintergrund-Audio.
+            generated_text, cache_key, pipeline = None, None, None # Response, its cache key and the synthesis started while Gemini streams. # Antwort, ihr Cache-Schlüssel und die während des Gemini-Streams gestartete Synthese.
+            chunks = self._split_long_input(prompt) # Long inputs are translated sentence by sentence. # Lange Eingaben werden Satz für Satz übersetzt.
+            if len(chunks) > 1: # Many short generations in parallel instead of one huge one. # Viele kurze Generierungen parallel statt einer riesigen.
+                generated_text = await self._translate_chunks(chunks)
+            else: # Looks for a response any worker already received. # Sucht eine Antwort, die bereits ein Worker erhalten hat.
+                generated_text, cache_key = await self._cached_response(prompt)
+                if generated_text is None: # Answers one word or a short phrase without Gemini when the lexicon is sure. # Beantwortet ein Wort oder eine kurze Phrase ohne Gemini, wenn das Lexikon sicher ist.
+                    generated_text = await self._lexicon_response(prompt, source_lang)
+                    if generated_text is not None: # Cached as the full response only when it came from Gemini. # Als vollständige Antwort nur zwischengespeichert, wenn sie von Gemini kam.
+                        cache_key = None
+
+            fresh = generated_text is None # Whether Gemini answers this request. # Ob Gemini diese Anfrage beantwortet.
+            if fresh: # Not cached. # Nicht zwischengespeichert.
+                if audio_delivery != "job" and not self.history_turns: # Streams only the stateless request. # Streamt nur die zustandslose Anfrage.
+                    pipeline = self.tts_service.start_pipeline(audio_format, audio_mode)
+                try:
+                    generated_text = await self._call_gemini(prompt, pipeline)
+                except BaseException: # Stops syntheses of a response that never completed. # Stoppt Synthesen einer Antwort, die nie fertig wurde.
+                    if pipeline:
+                        pipeline.cancel()
+                    raise
+
+            log_payload(logger, "Generated text from Gemini", generated_text) # Logs a sampled, truncated copy of the generated text. # Protokolliert eine stichprobenartige, gekürzte Kopie des generierten Textes.
 
             translations, word_pairs = self._extract_text_and_pairs(generated_text) # Extracts translations and word pairs from AI response. # Extrahiert Übersetzungen und Wortpaare aus der KI-Antwort.
+            if cache_key and translations: # Shares only responses that parsed, with every worker. # Teilt nur Antworten, die geparst werden konnten, mit jedem Worker.
+                await asyncio.get_running_loop().run_in_executor(None, self._store_response, prompt, cache_key, generated_text)
+            if fresh: # Every fresh response teaches the lexicon. # Jede frische Antwort lehrt das Lexikon.
+                await self._learn(word_pairs)
 
-            audio_filename = None # Initializes audio filename to None. # Initialisiert den Audio-Dateinamen auf None.
-
-            if translations and word_pairs: # If both translations and word pairs are available. # Wenn sowohl Übersetzungen als auch Wortpaare verfügbar sind.
+            audio_filename, audio_job_id = None, None # Initializes audio filename and job to None. # Initialisiert Audio-Dateinamen und Job auf None.
 
-                audio_filename = await self.tts_service.text_to_speech_word_pairs( # Generates audio from word pairs. # Erzeugt Audio aus Wortpaaren.
-                    word_pairs=word_pairs,
-                    source_lang=source_lang,
-                    target_lang=target_lang,
-                    complete_text="\n".join(translations),
+            if translations and audio_delivery == "job": # Returns the text now and synthesizes in the background. # Gibt den Text jetzt zurück und synthetisiert im Hintergrund.
+                audio_job_id = await self.audio_jobs.submit(
+                    lambda: self._synthesize_audio(translations, word_pairs, source_lang, target_lang, audio_mode, audio_format),
+                    priority=audio_priority or "normal",
                 )
-            elif translations: # If only translations are available (no word pairs). # Wenn nur Übersetzungen verfügbar sind (keine Wortpaare).
+            elif translations: # Waits for the audio. # Wartet auf das Audio.
+                audio_filename = await self._synthesize_audio(translations, word_pairs, source_lang, target_lang, audio_mode, audio_format, pipeline)
+            elif pipeline: # Nothing parsed, nothing to speak. # Nichts geparst, nichts zu sprechen.
+                pipeline.cancel()
 
-                formatted_ssml = self.tts_service.generate_enhanced_ssml( # Generates enhanced SSML for translations. # Erzeugt erweitertes SSML für Übersetzungen.
-                    text="\n".join(translations),
-                    source_lang=source_lang,
-                    target_lang=target_lang,
-                )
-                audio_filename = await self.tts_service.text_to_speech(formatted_ssml) # Converts SSML to speech. # Konvertiert SSML zu Sprache.
+            if audio_job_id: # Audio follows via the job. # Audio folgt über den Job.
 
-            if audio_filename: # If audio was successfully generated. # Wenn Audio erfolgreich erzeugt wurde.
+                logger.debug("Queued audio job: %s", audio_job_id) # Logs the queued job. # Protokolliert den eingereihten Job.
+            elif audio_filename: # If audio was successfully generated. # Wenn Audio erfolgreich erzeugt wurde.
 
-                print(f"Successfully generated audio: {audio_filename}") # Logs successful audio generation. # Protokolliert erfolgreiche Audioerzeugung.
+                logger.debug("Successfully generated audio: %s", audio_filename) # Logs successful audio generation. # Protokolliert erfolgreiche Audioerzeugung.
             else: # If audio generation failed. # Wenn die Audioerzeugung fehlgeschlagen ist.
 
-                print("Audio generation failed") # Logs audio generation failure. # Protokolliert Fehler bei der Audioerzeugung.
+                logger.warning("Audio generation failed") # Logs audio generation failure. # Protokolliert Fehler bei der Audioerzeugung.
 
             return Translation( # Creates and returns a Translation object with all results. # Erstellt und gibt ein Übersetzungsobjekt mit allen Ergebnissen zurück.
                 original_text=text,
@@ -241,6 +533,7 @@ English Translation:
                 source_language=source_lang,
                 target_language=target_lang,
                 audio_path=audio_filename if audio_filename else None,
+                audio_job_id=audio_job_id,
                 translations={
                     "main": translations[0] if translations else generated_text
                 },
@@ -250,11 +543,41 @@ English Translation:
                 ),
             )
 
+        except (UpstreamOverloaded, UpstreamTimeout, DeadlineExceeded): # Reaches the client as 429 or 504; a retry finds the response in the cache. # Erreicht den Client als 429 oder 504; ein erneuter Versuch findet die Antwort im Cache.
+            raise
         except Exception as e: # Catches any exceptions during processing. # Fängt alle Ausnahmen während der Verarbeitung ab.
 
-            print(f"Error in process_prompt: {str(e)}") # Logs the error message. # Protokolliert die Fehlermeldung.
+            logger.error("Error in process_prompt: %s", e) # Logs the error message. # Protokolliert die Fehlermeldung.
             raise Exception(f"Translation processing failed: {str(e)}") # Re-raises exception with context. # Wirft Ausnahme mit Kontext erneut.
 
+    async def _synthesize_audio(
+        self, translations: list, word_pairs: list, source_lang: str, target_lang: str,
+        audio_mode: Optional[str], audio_format: Optional[str], pipeline: Optional[SynthesisPipeline] = None,
+    ) -> Optional[str]: # Synthesizes the audio of a parsed response, inline or as a job. # Synthetisiert das Audio einer geparsten Antwort, direkt oder als Job.
+        if word_pairs: # If both translations and word pairs are available. # Wenn sowohl Übersetzungen als auch Wortpaare verfügbar sind.
+
+            return await self.tts_service.text_to_speech_word_pairs( # Generates audio from word pairs. # Erzeugt Audio aus Wortpaaren.
+                word_pairs=word_pairs,
+                source_lang=source_lang,
+                target_lang=target_lang,
+                complete_text="\n".join(translations),
+                audio_mode=audio_mode,
+                audio_format=audio_format,
+                pipeline=pipeline, # Joins the segments synthesized while streaming. # Verbindet die während des Streamens synthetisierten Segmente.
+            )
+
+        if pipeline: # Without word pairs no segments were started. # Ohne Wortpaare wurden keine Segmente gestartet.
+            pipeline.cancel()
+
+        formatted_ssml = self.tts_service.generate_enhanced_ssml( # Generates enhanced SSML for translations. # Erzeugt erweitertes SSML für Übersetzungen.
+            text="\n".join(translations),
+            source_lang=source_lang,
+            target_lang=target_lang,
+            audio_mode=audio_mode,
+        )
+        return await self.tts_service.text_to_speech(formatted_ssml, audio_format=audio_format) # Converts SSML to speech. # Konvertiert SSML zu Sprache.
+
+    @timed("translation", "parse") # Records response parsing time. # Erfasst die Zeit für das Parsen der Antwort.
     def _extract_text_and_pairs(
         self, generated_text: str
     ) -> tuple[list[str], list[tuple[str, str, bool]]]: # Defines method to extract translations and word pairs with language flag. # Definiert eine Methode zum Extrahieren von Übersetzungen und Wortpaaren mit Sprachflagge.
@@ -265,59 +588,8 @@ English Translation:
         translations = [] # Initializes empty list for translations. # Initialisiert leere Liste für Übersetzungen.
         word_pairs = [] # Initializes empty list for word pairs. # Initialisiert leere Liste für Wortpaare.
 
-        # Patterns for German translations
-        german_patterns = [ # Defines patterns to extract German translations of different styles. # Definiert Muster zur Extraktion deutscher Übersetzungen verschiedener Stile.
-            {
-                "text_pattern": r'German Translation:.*?\* Conversational-native:\s*"([^"]+)"', # Pattern for native German. # Muster für muttersprachliches Deutsch.
-                "pairs_pattern": r'\* word by word Conversational-native German-Spanish:\s*"([^"]+)"', # Pattern for native German word pairs. # Muster für muttersprachliche deutsche Wortpaare.
-                "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
-            },
-            {
-                "text_pattern": r'\* Conversational-colloquial:\s*"([^"]+)"', # Pattern for colloquial German. # Muster für umgangssprachliches Deutsch.
-                "pairs_pattern": r'\* word by word Conversational-colloquial German-Spanish:\s*"([^"]+)"', # Pattern for colloquial German word pairs. # Muster für umgangssprachliche deutsche Wortpaare.
-                "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
-            },
-            {
-                "text_pattern": r'\* Conversational-informal:\s*"([^"]+)"', # Pattern for informal German. # Muster für informelles Deutsch.
-                "pairs_pattern": r'\* word by word Conversational-informal German-Spanish:\s*"([^"]+)"', # Pattern for informal German word pairs. # Muster für informelle deutsche Wortpaare.
-                "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
-            },
-            {
-                "text_pattern": r'\* Conversational-formal:\s*"([^"]+)"', # Pattern for formal German. # Muster für formelles Deutsch.
-                "pairs_pattern": r'\* word by word Conversational-formal German-Spanish:\s*"([^"]+)"', # Pattern for formal German word pairs. # Muster für formelle deutsche Wortpaare.
-                "is_german": True, # Flags as German translation. # Kennzeichnet als deutsche Übersetzung.
-            },
-        ]
-
-        # Patterns for English translations
-        english_patterns = [ # Defines patterns to extract English translations of different styles. # Definiert Muster zur Extraktion englischer Übersetzungen verschiedener Stile.
-            {
-                "text_pattern": r'English Translation:.*?\* Conversational-native:\s*"([^"]+)"', # Pattern for native English. # Muster für muttersprachliches Englisch.
-                "pairs_pattern": r'\* word by word Conversational-native English-Spanish:\s*"([^"]+)"', # Pattern for native English word pairs. # Muster für muttersprachliche englische Wortpaare.
-                "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
-            },
-            {
-                "text_pattern": r'English Translation:.*?\* Conversational-colloquial:\s*"([^"]+)"', # Pattern for colloquial English. # Muster für umgangssprachliches Englisch.
-                "pairs_pattern": r'\* word by word Conversational-colloquial English-Spanish:\s*"([^"]+)"', # Pattern for colloquial English word pairs. # Muster für umgangssprachliche englische Wortpaare.
-                "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
-            },
-            {
-                "text_pattern": r'English Translation:.*?\* Conversational-informal:\s*"([^"]+)"', # Pattern for informal English. # Muster für informelles Englisch.
-                "pairs_pattern": r'\* word by word Conversational-informal English-Spanish:\s*"([^"]+)"', # Pattern for informal English word pairs. # Muster für informelle englische Wortpaare.
-                "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
-            },
-            {
-                "text_pattern": r'English Translation:.*?\* Conversational-formal:\s*"([^"]+)"', # Pattern for formal English. # Muster für formelles Englisch.
-                "pairs_pattern": r'\* word by word Conversational-formal English-Spanish:\s*"([^"]+)"', # Pattern for formal English word pairs. # Muster für formelle englische Wortpaare.
-                "is_german": False, # Flags as English translation. # Kennzeichnet als englische Übersetzung.
-            },
-        ]
-
-        # Combine patterns
-        all_patterns = german_patterns + english_patterns # Combines German and English patterns. # Kombiniert deutsche und englische Muster.
-
         # Extract translations and word pairs
-        for pattern_set in all_patterns: # Iterates through each pattern set. # Iteriert durch jedes Mustersatz.
+        for pattern_set in SECTION_PATTERNS: # Iterates through each pattern set. # Iteriert durch jedes Mustersatz.
             # Extract text
             text_match = re.search(
                 pattern_set["text_pattern"], generated_text, re.DOTALL | re.IGNORECASE
@@ -419,25 +691,9 @@ English Translation:
             "tense": "Tense usage explanation", # Placeholder for tense explanation. # Platzhalter für Zeitformenerklärung.
         }
 
-    def _auto_fix_spelling(self, text: str) -> str: # Defines method to automatically fix spelling errors. # Definiert eine Methode zur automatischen Behebung von Rechtschreibfehlern.
+    def _auto_fix_spelling(self, text: str, lang: str = "en") -> str: # Defines method to automatically fix spelling errors. # Definiert eine Methode zur automatischen Behebung von Rechtschreibfehlern.
         """Fix spelling in the given text."""
-        words = re.findall(r"\b\w+\b|[^\w\s]", text) # Splits text into words and punctuation. # Teilt Text in Wörter und Interpunktion auf.
-        corrected_words = [] # Initializes list for corrected words. # Initialisiert Liste für korrigierte Wörter.
-
-        for word in words: # Iterates through each word. # Iteriert durch jedes Wort.
-            if not re.match(r"\w+", word): # If not a word (punctuation). # Wenn kein Wort (Interpunktion).
-                corrected_words.append(word) # Adds unchanged to result. # Fügt unverändert zum Ergebnis hinzu.
-                continue # Skips to next word. # Springt zum nächsten Wort.
-
-            if self.spell.unknown([word]): # If word is not in dictionary. # Wenn Wort nicht im Wörterbuch ist.
-                correction = self.spell.correction(word) # Gets spelling correction. # Holt Rechtschreibkorrektur.
-                if correction: # If correction is available. # Wenn Korrektur verfügbar ist.
-                    if word.isupper(): # If word is all uppercase. # Wenn Wort in Großbuchstaben ist.
-                        correction = correction.upper() # Makes correction uppercase. # Macht Korrektur in Großbuchstaben.
-                    elif word[0].isupper(): # If word is capitalized. # Wenn Wort großgeschrieben ist.
-                        correction = correction.capitalize() # Capitalizes correction. # Schreibt Korrektur groß.
-                    word = correction # Replaces word with correction. # Ersetzt Wort durch Korrektur.
-
-            corrected_words.append(word) # Adds word to result list. # Fügt Wort zur Ergebnisliste hinzu.
-
-        return " ".join(corrected_words) # Joins corrected words into text. # Verbindet korrigierte Wörter zu Text.
+        lang = (lang or "en")[:2].lower() # Accepts codes like "de-DE". # Akzeptiert Codes wie "de-DE".
+        if lang not in SUPPORTED_LANGUAGES: # No dictionary for this language. # Kein Wörterbuch für diese Sprache.
+            return text # Returns the text unchanged. # Gibt den Text unverändert zurück.
+        return SpellIndex.open(lang).correct_text(text) # Corrects all words in one batched, memoized call. # Korrigiert alle Wörter in einem gebündelten, zwischengespeicherten Aufruf.
@@ -1,559 +1,815 @@
-# EnhancedTTSService
-#
-# A service for converting text to speech using Azure Cognitive Services. # Ein Dienst zur Umwandlung von Text in Sprache mit Azure Cognitive Services.
-# Specialized in handling multilingual word-by-word translations with phonetic accuracy. # Spezialisiert auf die Behandlung mehrsprachiger Wort-für-Wort-Übersetzungen mit phonetischer Genauigkeit.
-#
-# Usage:
-# tts_service = EnhancedTTSService() # Creates a new TTS service instance. # Erstellt eine neue TTS-Dienst-Instanz.
-# ssml = tts_service.generate_enhanced_ssml(text="Hello world", source_lang="en", target_lang="es") # Generates SSML markup with language tags. # Generiert SSML-Markup mit Sprachtags.
-# audio_file = await tts_service.text_to_speech(ssml) # Converts the SSML to an audio file. # Konvertiert das SSML in eine Audiodatei.
-#
-# EN: Creates high-quality multilingual text-to-speech with precise language transitions and pronunciation.
-# DE: Erstellt hochwertige mehrsprachige Text-zu-Sprache mit präzisen Sprachübergängen und Aussprache.
-
-from azure.cognitiveservices.speech import ( # Imports Azure Speech SDK components. # Importiert Azure Speech SDK-Komponenten.
-    SpeechConfig, # For configuring speech service connection. # Zur Konfiguration der Sprachdienstverbindung.
-    SpeechSynthesizer, # For performing text-to-speech conversion. # Zur Durchführung der Text-zu-Sprache-Umwandlung.
-    SpeechSynthesisOutputFormat, # For defining audio output format. # Zur Definition des Audio-Ausgabeformats.
-    ResultReason, # For checking speech synthesis results. # Zur Prüfung der Sprachsyntheseresultate.
-    CancellationReason, # For handling synthesis cancellations. # Zur Behandlung von Syntheseabbrüchen.
-)
-from azure.cognitiveservices.speech.audio import AudioOutputConfig # For configuring audio output settings. # Zur Konfiguration der Audio-Ausgabeeinstellungen.
-import os # For accessing operating system functionality. # Für den Zugriff auf Betriebssystemfunktionalität.
-from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
-from datetime import datetime # For generating timestamps. # Zur Erzeugung von Zeitstempeln.
-import asyncio # For asynchronous programming. # Für asynchrone Programmierung.
-import re # For regular expression pattern matching. # Für reguläre Ausdruckmusterabgleiche.
-
-from asyncio import Semaphore # For limiting concurrent operations. # Zur Begrenzung gleichzeitiger Operationen.
-import time # For time-related functions. # Für zeitbezogene Funktionen.
-
-
-class EnhancedTTSService: # Defines the EnhancedTTSService class. # Definiert die EnhancedTTSService-Klasse.
-    def __init__(self): # Initializes the service. # Initialisiert den Dienst.
-        self.subscription_key = os.getenv("AZURE_SPEECH_KEY") # Gets Azure API key from environment variables. # Holt den Azure-API-Schlüssel aus Umgebungsvariablen.
-        self.region = os.getenv("AZURE_SPEECH_REGION") # Gets Azure region from environment variables. # Holt die Azure-Region aus Umgebungsvariablen.
-
-        if not self.subscription_key or not self.region: # Checks if credentials are missing. # Prüft, ob Anmeldedaten fehlen.
-            raise ValueError( # Raises an error if credentials are missing. # Löst einen Fehler aus, wenn Anmeldedaten fehlen.
-                "Azure Speech credentials not found in environment variables" # Error message for missing credentials. # Fehlermeldung für fehlende Anmeldedaten.
-            )
-
-        os.environ["SPEECH_CONTAINER_OPTION"] = "1" # Sets container mode for Azure Speech SDK. # Setzt den Container-Modus für das Azure Speech SDK.
-        os.environ["SPEECH_SYNTHESIS_PLATFORM_CONFIG"] = "container" # Configures synthesis platform for containers. # Konfiguriert die Syntheseplattform für Container.
-        
-    
-        self.speech_host = f"wss://{self.region}.tts.speech.microsoft.com/cognitiveservices/websocket/v1" # Constructs WebSocket endpoint URL. # Konstruiert die WebSocket-Endpunkt-URL.
-        self.speech_config = SpeechConfig( # Creates speech configuration. # Erstellt die Sprachkonfiguration.
-            subscription=self.subscription_key, # Sets the API key. # Setzt den API-Schlüssel.
-            endpoint=self.speech_host # Sets the endpoint URL. # Setzt die Endpunkt-URL.
-        )
-        
-        self.speech_config.set_speech_synthesis_output_format( # Sets output audio format. # Setzt das Ausgabe-Audioformat.
-            SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3 # Uses 16kHz 32kbps mono MP3 format. # Verwendet 16kHz 32kbps Mono-MP3-Format.
-        )
-
-        tts_device = os.getenv("TTS_DEVICE", "cpu").lower() # Gets device setting (CPU/GPU) from environment or defaults to CPU. # Holt Geräteeinstellung (CPU/GPU) aus der Umgebung oder setzt Standard auf CPU.
-        if os.getenv("CONTAINER_ENV", "false").lower() == "true": # Checks if running in container environment. # Prüft, ob in Container-Umgebung ausgeführt wird.
-            tts_device = "cpu" # Forces CPU mode in container environment. # Erzwingt CPU-Modus in Container-Umgebung.
-            
-        print(f"Using TTS device: {tts_device}") # Logs the device being used. # Protokolliert das verwendete Gerät.
-
-        self.voice_mapping = { # Maps language codes to voice names. # Ordnet Sprachcodes den Stimmnamen zu.
-            "en": "en-US-JennyMultilingualNeural", # English voice. # Englische Stimme.
-            "es": "es-ES-ArabellaMultilingualNeural", # Spanish voice. # Spanische Stimme.
-            "de": "de-DE-SeraphinaMultilingualNeural", # German voice. # Deutsche Stimme.
-        }
-
-    async def _execute_speech_synthesis( # Defines private method for executing speech synthesis. # Definiert private Methode zur Ausführung der Sprachsynthese.
-        self, ssml: str, output_path: Optional[str] = None # Takes SSML and optional output path. # Nimmt SSML und optionalen Ausgabepfad.
-    ) -> Optional[str]: # Returns filename or None if failed. # Gibt Dateinamen zurück oder None bei Fehlschlag.
-        """Execute the speech synthesis with proper resource cleanup"""
-        synthesizer = None # Initializes synthesizer to None for cleanup in finally block. # Initialisiert Synthesizer mit None für Bereinigung im Finally-Block.
-        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
-            if not output_path: # Checks if output path is not provided. # Prüft, ob kein Ausgabepfad angegeben ist.
-                temp_dir = self._get_temp_directory() # Gets temporary directory. # Holt temporäres Verzeichnis.
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # Creates timestamp for unique filename. # Erstellt Zeitstempel für eindeutigen Dateinamen.
-                output_path = os.path.join(temp_dir, f"speech_{timestamp}.mp3") # Creates full output path. # Erstellt vollständigen Ausgabepfad.
-
-            audio_config = AudioOutputConfig(filename=output_path) # Configures audio output to file. # Konfiguriert Audio-Ausgabe in Datei.
-            synthesizer = SpeechSynthesizer( # Creates speech synthesizer. # Erstellt Sprachsynthesizer.
-                speech_config=self.speech_config, audio_config=audio_config # Configures with speech and audio settings. # Konfiguriert mit Sprach- und Audioeinstellungen.
-            )
-
-            result = await asyncio.get_event_loop().run_in_executor( # Runs CPU-intensive task in thread pool. # Führt CPU-intensive Aufgabe im Thread-Pool aus.
-                None, lambda: synthesizer.speak_ssml_async(ssml).get() # Executes SSML synthesis and gets result. # Führt SSML-Synthese aus und holt Ergebnis.
-            )
-
-            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
-                return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
-
-            if result.reason == ResultReason.Canceled: # Checks if synthesis was canceled. # Prüft, ob Synthese abgebrochen wurde.
-                cancellation_details = result.cancellation_details # Gets cancellation details. # Holt Abbruchdetails.
-                error_message = ( # Creates error message with cancellation reason. # Erstellt Fehlermeldung mit Abbruchgrund.
-                    f"Speech synthesis canceled: {cancellation_details.reason}" # Basic cancellation message. # Grundlegende Abbruchmeldung.
-                )
-                if cancellation_details.reason == CancellationReason.Error: # Checks if cancellation was due to error. # Prüft, ob Abbruch aufgrund eines Fehlers erfolgte.
-                    error_message += ( # Adds error details to message. # Fügt Fehlerdetails zur Nachricht hinzu.
-                        f"\nError details: {cancellation_details.error_details}" # Detailed error information. # Detaillierte Fehlerinformationen.
-                    )
-                raise Exception(error_message) # Raises exception with error details. # Löst Ausnahme mit Fehlerdetails aus.
-
-            return None # Returns None if synthesis didn't complete successfully. # Gibt None zurück, wenn Synthese nicht erfolgreich abgeschlossen wurde.
-
-        finally: # Finally block for cleanup regardless of success/failure. # Finally-Block für Bereinigung unabhängig von Erfolg/Fehlschlag.
-            if synthesizer: # Checks if synthesizer was created. # Prüft, ob Synthesizer erstellt wurde.
-                try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
-                    synthesizer.stop_speaking_async() # Stops any ongoing synthesis. # Stoppt laufende Synthese.
-                except: # Ignores errors during cleanup. # Ignoriert Fehler während der Bereinigung.
-                    pass # Does nothing if cleanup fails. # Tut nichts, wenn Bereinigung fehlschlägt.
-
-    def _get_temp_directory(self) -> str: # Defines method to get temporary directory. # Definiert Methode zum Abrufen des temporären Verzeichnisses.
-        """Create and return the temporary directory path"""
-        if os.name == "nt":  # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
-            temp_dir = os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Creates path in Windows temp. # Erstellt Pfad im Windows-Temp.
-        else: # For non-Windows systems (Linux/Mac). # Für Nicht-Windows-Systeme (Linux/Mac).
-            temp_dir = "/tmp/tts_audio" # Uses Unix standard temp directory. # Verwendet Unix-Standard-Temp-Verzeichnis.
-        os.makedirs(temp_dir, exist_ok=True) # Creates directory if it doesn't exist. # Erstellt Verzeichnis, falls es nicht existiert.
-        return temp_dir # Returns the directory path. # Gibt den Verzeichnispfad zurück.
-
-    def _detect_language(self, text: str) -> str: # Defines method to detect language from text. # Definiert Methode zur Spracherkennung aus Text.
-        """Detect the primary language of the text"""
-        if re.search(r"[äöüßÄÖÜ]", text): # Checks for German-specific characters. # Prüft auf deutschspezifische Zeichen.
-            return "de" # Returns German language code. # Gibt deutschen Sprachcode zurück.
-        elif re.search(r"[áéíóúñ¿¡]", text): # Checks for Spanish-specific characters. # Prüft auf spanischspezifische Zeichen.
-            return "es" # Returns Spanish language code. # Gibt spanischen Sprachcode zurück.
-        return "en" # Default to English if no specific characters found. # Standardmäßig Englisch, wenn keine spezifischen Zeichen gefunden.
-
-    def _is_german_word(self, word: str) -> bool: # Defines method to check if word is German. # Definiert Methode zur Prüfung, ob Wort deutsch ist.
-        german_words = { # Set of common German words. # Menge häufiger deutscher Wörter.
-            "dir", # you (dative) # dir
-            "ich", # I # ich
-            "du", # you (informal) # du
-            "sie", # she/they/you (formal) # sie
-            "er", # he # er
-            "es", # it # es
-            "wir", # we # wir
-            "ihr", # you (plural) # ihr
-            "ist", # is # ist
-            "sind", # are # sind
-            "haben", # have # haben
-            "sein", # to be # sein
-            "werden", # to become # werden
-            "kann", # can # kann
-            "könnte", # could # könnte
-            "möchte", # would like # möchte
-            "muss", # must # muss
-            "darf", # may # darf
-            "soll", # should # soll
-        }
-        return word.lower() in german_words # Checks if lowercased word is in German word set. # Prüft, ob Wort in Kleinbuchstaben in deutscher Wörtermenge ist.
-
-    def _is_english_word(self, word: str) -> bool: # Defines method to check if word is English. # Definiert Methode zur Prüfung, ob Wort englisch ist.
-        english_words = {"the", "a", "an", "in", "on", "at", "to", "for", "with", "by"} # Set of common English words. # Menge häufiger englischer Wörter.
-        return word.lower() in english_words # Checks if lowercased word is in English word set. # Prüft, ob Wort in Kleinbuchstaben in englischer Wörtermenge ist.
-
-    def generate_german_spanish_wordforword_ssml( # Defines method for German-Spanish word pairs SSML. # Definiert Methode für Deutsch-Spanisch-Wortpaar-SSML.
-        self,
-        word_pairs: list[tuple[str, str]], # List of source-target word pairs. # Liste von Quell-Ziel-Wortpaaren.
-    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
-        """Generate SSML specifically for German-Spanish word-by-word translations"""
-        ssml = """
-        <voice name="en-US-JennyMultilingualNeural">
-            <prosody rate="0.8">""" # Creates SSML header with voice and slower speech rate. # Erstellt SSML-Header mit Stimme und langsamerer Sprechrate.
-
-        for source_word, target_word in word_pairs: # Iterates through each word pair. # Iteriert durch jedes Wortpaar.
-            source_word = source_word.strip().replace("&", "&amp;") # Cleans up source word and escapes ampersands. # Bereinigt Quellwort und escapet Kaufmannsund.
-            target_word = target_word.strip().replace("&", "&amp;") # Cleans up target word and escapes ampersands. # Bereinigt Zielwort und escapet Kaufmannsund.
-
-            ssml += f"""
-                <lang xml:lang="de-DE">{source_word}</lang>
-                <break time="300ms"/>
-                <lang xml:lang="es-ES">{target_word}</lang>
-                <break time="500ms"/>""" # Adds each word pair with language tags and pauses. # Fügt jedes Wortpaar mit Sprachtags und Pausen hinzu.
-
-        ssml += """
-                <break time="1000ms"/>
-            </prosody>
-        </voice>""" # Closes the SSML tags. # Schließt die SSML-Tags.
-
-        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
-
-    def generate_english_spanish_wordforword_ssml( # Defines method for English-Spanish word pairs SSML. # Definiert Methode für Englisch-Spanisch-Wortpaar-SSML.
-        self,
-        word_pairs: list[tuple[str, str]], # List of source-target word pairs. # Liste von Quell-Ziel-Wortpaaren.
-    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
-        """Generate SSML specifically for English-Spanish word-by-word translations"""
-        ssml = """
-        <voice name="en-US-JennyMultilingualNeural">
-            <prosody rate="0.8">""" # Creates SSML header with voice and slower speech rate. # Erstellt SSML-Header mit Stimme und langsamerer Sprechrate.
-
-        for source_word, target_word in word_pairs: # Iterates through each word pair. # Iteriert durch jedes Wortpaar.
-            source_word = source_word.strip().replace("&", "&amp;") # Cleans up source word and escapes ampersands. # Bereinigt Quellwort und escapet Kaufmannsund.
-            target_word = target_word.strip().replace("&", "&amp;") # Cleans up target word and escapes ampersands. # Bereinigt Zielwort und escapet Kaufmannsund.
-
-            ssml += f"""
-                <lang xml:lang="en-US">{source_word}</lang>
-                <break time="300ms"/>
-                <lang xml:lang="es-ES">{target_word}</lang>
-                <break time="500ms"/>""" # Adds each word pair with language tags and pauses. # Fügt jedes Wortpaar mit Sprachtags und Pausen hinzu.
-
-        ssml += """
-                <break time="1000ms"/>
-            </prosody>
-        </voice>""" # Closes the SSML tags. # Schließt die SSML-Tags.
-
-        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
-
-    def generate_enhanced_ssml( # Defines method to generate enhanced SSML with multiple languages. # Definiert Methode zur Generierung von erweitertem SSML mit mehreren Sprachen.
-        self,
-        text: Optional[str] = None, # Optional text to translate. # Optionaler zu übersetzender Text.
-        word_pairs: Optional[list[tuple[str, str, bool]]] = None, # Optional word pairs with language flag. # Optionale Wortpaare mit Sprachflagge.
-        source_lang: str = "de", # Source language, defaults to German. # Quellsprache, standardmäßig Deutsch.
-        target_lang: str = "es", # Target language, defaults to Spanish. # Zielsprache, standardmäßig Spanisch.
-    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
-        """Generate SSML with proper phrase handling for both German and English"""
-        ssml = """<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">""" # Starts SSML document. # Startet SSML-Dokument.
-
-        if text: # Checks if text is provided. # Prüft, ob Text bereitgestellt wird.
-            sentences = (text.split("\n") + [""] * 8)[:8] # Splits text by lines and pads to 8 sentences. # Teilt Text nach Zeilen und füllt auf 8 Sätze auf.
-            sentences = [ # Processes each sentence. # Verarbeitet jeden Satz.
-                t.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;") # Escapes XML special characters. # Escapet XML-Sonderzeichen.
-                for t in sentences # For each sentence in the list. # Für jeden Satz in der Liste.
-            ]
-
-            ( # Unpacks sentences to named variables. # Entpackt Sätze in benannte Variablen.
-                german_native, # Native German translation. # Muttersprachliche deutsche Übersetzung.
-                german_colloquial, # Colloquial German translation. # Umgangssprachliche deutsche Übersetzung.
-                german_informal, # Informal German translation. # Informelle deutsche Übersetzung.
-                german_formal, # Formal German translation. # Formelle deutsche Übersetzung.
-                english_native, # Native English translation. # Muttersprachliche englische Übersetzung.
-                english_colloquial, # Colloquial English translation. # Umgangssprachliche englische Übersetzung.
-                english_informal, # Informal English translation. # Informelle englische Übersetzung.
-                english_formal, # Formal English translation. # Formelle englische Übersetzung.
-            ) = sentences # Assigns sentence list to these variables. # Weist Satzliste diesen Variablen zu.
-
-            if word_pairs: # Checks if word pairs are provided. # Prüft, ob Wortpaare bereitgestellt werden.
-                german_pairs = [ # Filters for German word pairs. # Filtert nach deutschen Wortpaaren.
-                    (src, tgt) for src, tgt, is_german in word_pairs if is_german # Keeps only German source pairs. # Behält nur deutsche Quellpaare.
-                ]
-                english_pairs = [ # Filters for English word pairs. # Filtert nach englischen Wortpaaren.
-                    (src, tgt) for src, tgt, is_german in word_pairs if not is_german # Keeps only English source pairs. # Behält nur englische Quellpaare.
-                ]
-
-                if german_native: # Checks if native German translation exists. # Prüft, ob muttersprachliche deutsche Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds native German section to SSML. # Fügt muttersprachlichen deutschen Abschnitt zum SSML hinzu.
-                        german_native, # The sentence text. # Der Satztext.
-                        german_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="de-DE-SeraphinaMultilingualNeural", # German voice to use. # Zu verwendende deutsche Stimme.
-                        lang="de-DE", # German language code. # Deutscher Sprachcode.
-                    )
-
-                if german_colloquial: # Checks if colloquial German translation exists. # Prüft, ob umgangssprachliche deutsche Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds colloquial German section to SSML. # Fügt umgangssprachlichen deutschen Abschnitt zum SSML hinzu.
-                        german_colloquial, # The sentence text. # Der Satztext.
-                        german_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="de-DE-SeraphinaMultilingualNeural", # German voice to use. # Zu verwendende deutsche Stimme.
-                        lang="de-DE", # German language code. # Deutscher Sprachcode.
-                    )
-
-                if german_informal: # Checks if informal German translation exists. # Prüft, ob informelle deutsche Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds informal German section to SSML. # Fügt informellen deutschen Abschnitt zum SSML hinzu.
-                        german_informal, # The sentence text. # Der Satztext.
-                        german_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="de-DE-KatjaNeural", # Alternative German voice for variety. # Alternative deutsche Stimme für Abwechslung.
-                        lang="de-DE", # German language code. # Deutscher Sprachcode.
-                    )
-
-                if german_formal: # Checks if formal German translation exists. # Prüft, ob formelle deutsche Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds formal German section to SSML. # Fügt formellen deutschen Abschnitt zum SSML hinzu.
-                        german_formal, # The sentence text. # Der Satztext.
-                        german_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="de-DE-SeraphinaMultilingualNeural", # German voice to use. # Zu verwendende deutsche Stimme.
-                        lang="de-DE", # German language code. # Deutscher Sprachcode.
-                    )
-
-                if english_native: # Checks if native English translation exists. # Prüft, ob muttersprachliche englische Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds native English section to SSML. # Fügt muttersprachlichen englischen Abschnitt zum SSML hinzu.
-                        english_native, # The sentence text. # Der Satztext.
-                        english_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="en-US-JennyMultilingualNeural", # English voice to use. # Zu verwendende englische Stimme.
-                        lang="en-US", # English language code. # Englischer Sprachcode.
-                    )
-
-                if english_colloquial: # Checks if colloquial English translation exists. # Prüft, ob umgangssprachliche englische Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds colloquial English section to SSML. # Fügt umgangssprachlichen englischen Abschnitt zum SSML hinzu.
-                        english_colloquial, # The sentence text. # Der Satztext.
-                        english_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="en-US-JennyMultilingualNeural", # English voice to use. # Zu verwendende englische Stimme.
-                        lang="en-US", # English language code. # Englischer Sprachcode.
-                    )
-
-                if english_informal: # Checks if informal English translation exists. # Prüft, ob informelle englische Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds informal English section to SSML. # Fügt informellen englischen Abschnitt zum SSML hinzu.
-                        english_informal, # The sentence text. # Der Satztext.
-                        english_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="en-US-JennyNeural", # Alternative English voice for variety. # Alternative englische Stimme für Abwechslung.
-                        lang="en-US", # English language code. # Englischer Sprachcode.
-                    )
-
-                if english_formal: # Checks if formal English translation exists. # Prüft, ob formelle englische Übersetzung existiert.
-                    ssml += self._generate_language_section( # Adds formal English section to SSML. # Fügt formellen englischen Abschnitt zum SSML hinzu.
-                        english_formal, # The sentence text. # Der Satztext.
-                        english_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
-                        voice="en-US-JennyMultilingualNeural", # English voice to use. # Zu verwendende englische Stimme.
-                        lang="en-US", # English language code. # Englischer Sprachcode.
-                    )
-
-        ssml = re.sub(r'(<break time="500ms"\s*/>\s*)+', '<break time="500ms"/>', ssml) # Removes duplicate breaks. # Entfernt doppelte Pausen.
-        ssml += "</speak>" # Closes the SSML root element. # Schließt das SSML-Root-Element.
-        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
-
-    def _generate_language_section( # Defines method to generate a language-specific section. # Definiert Methode zur Generierung eines sprachspezifischen Abschnitts.
-        self, sentence: str, word_pairs: list[tuple[str, str]], voice: str, lang: str # Parameters for sentence, word pairs, voice and language. # Parameter für Satz, Wortpaare, Stimme und Sprache.
-    ) -> str: # Returns SSML string section. # Gibt SSML-Zeichenkettenabschnitt zurück.
-        """Generate complete language section with phrase handling"""
-        section = f"""
-        <voice name="{voice}">
-            <prosody rate="1.0">
-                <lang xml:lang="{lang}">{sentence}</lang>
-                <break time="1000ms"/>
-            </prosody>
-        </voice>""" # Creates section for full sentence with specified voice and language. # Erstellt Abschnitt für vollständigen Satz mit angegebener Stimme und Sprache.
-
-        if word_pairs: # Checks if word pairs are provided. # Prüft, ob Wortpaare bereitgestellt werden.
-            section += """
-        <voice name="en-US-JennyMultilingualNeural">
-            <prosody rate="0.8">""" # Starts word-by-word breakdown section with slower speech rate. # Startet Wort-für-Wort-Aufschlüsselungsabschnitt mit langsamerer Sprechrate.
-
-            # Create phrase map and sort by phrase length
-            phrase_map = {src.lower(): (src, tgt) for src, tgt in word_pairs} # Creates mapping of lowercase source to original pairs. # Erstellt Zuordnung von Kleinbuchstaben-Quelle zu Original-Paaren.
-            phrases = sorted( # Sorts phrases by length (longest first). # Sortiert Phrasen nach Länge (längste zuerst).
-                phrase_map.keys(), key=lambda x: len(x.split()), reverse=True # Sort key is word count in descending order. # Sortierschlüssel ist Wortzahl in absteigender Reihenfolge.
-            )
-            words = sentence.split() # Splits sentence into words. # Teilt Satz in Wörter.
-            index = 0 # Initializes word index. # Initialisiert Wortindex.
-
-            while index < len(words): # Loops through all words in sentence. # Schleife durch alle Wörter im Satz.
-                matched = False # Tracks if current position matched a phrase. # Verfolgt, ob aktuelle Position einer Phrase entspricht.
-
-                # Try to match multi-word phrases first
-                for phrase_key in phrases: # Checks each potential phrase. # Prüft jede potenzielle Phrase.
-                    phrase_words = phrase_key.split() # Splits phrase into words. # Teilt Phrase in Wörter.
-                    if index + len(phrase_words) > len(words): # Checks if phrase would extend beyond sentence end. # Prüft, ob Phrase über Satzende hinausgehen würde.
-                        continue # Skips to next phrase. # Springt zur nächsten Phrase.
-
-                    candidate = " ".join( # Constructs candidate phrase from sentence words. # Konstruiert Kandidatenphrase aus Satzwörtern.
-                        words[index : index + len(phrase_words)] # Takes slice of words. # Nimmt Ausschnitt von Wörtern.
-                    ).lower() # Converts to lowercase for comparison. # Konvertiert für Vergleich in Kleinbuchstaben.
-                    if candidate == phrase_key: # Checks if candidate matches known phrase. # Prüft, ob Kandidat mit bekannter Phrase übereinstimmt.
-                        original_phrase, translation = phrase_map[phrase_key] # Gets original phrase and translation. # Holt Originalphrase und Übersetzung.
-                        section += f"""
-            <lang xml:lang="{lang}">{original_phrase}</lang>
-            <break time="300ms"/>
-            <lang xml:lang="es-ES">{translation}</lang>
-            <break time="500ms"/>""" # Adds phrase with its translation to SSML. # Fügt Phrase mit ihrer Übersetzung zum SSML hinzu.
-                        index += len(phrase_words) # Advances index past this phrase. # Verschiebt Index über diese Phrase hinaus.
-                        matched = True # Marks as matched. # Markiert als übereinstimmend.
-                        break # Exits phrase search loop. # Beendet Phrasen-Suchschleife.
-
-                # Single word fallback
-                if not matched: # If no phrase matched at current position. # Wenn keine Phrase an aktueller Position übereinstimmt.
-                    word = words[index].strip(".,!?") # Gets current word without punctuation. # Holt aktuelles Wort ohne Interpunktion.
-                    translation = next( # Finds matching translation for this word. # Findet passende Übersetzung für dieses Wort.
-                        (tgt for src, tgt in word_pairs if src.lower() == word.lower()), # Searches case-insensitively. # Sucht unabhängig von Groß-/Kleinschreibung.
-                        None, # Default to None if no match found. # Standardmäßig None, wenn keine Übereinstimmung gefunden.
-                    )
-                    section += f"""
-            <lang xml:lang="{lang}">{word}</lang>
-            <break time="300ms"/>""" # Adds word to SSML. # Fügt Wort zum SSML hinzu.
-                    if translation: # If translation was found. # Wenn Übersetzung gefunden wurde.
-                        section += f"""
-            <lang xml:lang="es-ES">{translation}</lang>
-            <break time="500ms"/>""" # Adds translation to SSML. # Fügt Übersetzung zum SSML hinzu.
-                    else: # If no translation was found. # Wenn keine Übersetzung gefunden wurde.
-                        section += """<break time="500ms"/>""" # Adds pause only. # Fügt nur Pause hinzu.
-                    index += 1 # Advances to next word. # Verschiebt zu nächstem Wort.
-
-            section += """
-            <break time="1000ms"/>
-            </prosody>
-        </voice>""" # Closes word-by-word section. # Schließt Wort-für-Wort-Abschnitt.
-
-        return section # Returns the complete section. # Gibt den vollständigen Abschnitt zurück.
-
-    def _generate_sentence_section( # Defines method to generate a sentence section. # Definiert Methode zur Generierung eines Satzabschnitts.
-        self,
-        sentence: str, # The sentence text. # Der Satztext.
-        word_pairs: list[tuple[str, str]], # Word pairs for translation. # Wortpaare für Übersetzung.
-        voice: str, # Voice to use. # Zu verwendende Stimme.
-        lang: str, # Language code. # Sprachcode.
-    ) -> str: # Returns SSML string section. # Gibt SSML-Zeichenkettenabschnitt zurück.
-        if not sentence: # Checks if sentence is empty. # Prüft, ob Satz leer ist.
-            return "" # Returns empty string for empty input. # Gibt leere Zeichenkette für leere Eingabe zurück.
-
-        # Generate the main sentence SSML
-        ssml = f"""
-            <voice name="{voice}">
-                <prosody rate="1.0">
-                    <lang xml:lang="{lang}">{sentence}</lang>
-                    <break time="1000ms"/>
-                </prosody>
-            </voice>""" # Creates section for full sentence. # Erstellt Abschnitt für vollständigen Satz.
-
-        if word_pairs: # Checks if word pairs are provided. # Prüft, ob Wortpaare bereitgestellt werden.
-            ssml += """
-                <voice name="en-US-JennyMultilingualNeural">
-                    <prosody rate="0.8">""" # Starts word-by-word breakdown with slower speech. # Startet Wort-für-Wort-Aufschlüsselung mit langsamerer Sprache.
-
-            # Create phrase map and sort by phrase length (longest first)
-            phrase_map = {src.lower(): (src, tgt) for src, tgt in word_pairs} # Creates mapping of lowercase source to original pairs. # Erstellt Zuordnung von Kleinbuchstaben-Quelle zu Original-Paaren.
-            phrases = sorted( # Sorts phrases by word count (longest first). # Sortiert Phrasen nach Wortzahl (längste zuerst).
-                phrase_map.keys(), key=lambda x: len(x.split()), reverse=True # Sort key is word count in descending order. # Sortierschlüssel ist Wortzahl in absteigender Reihenfolge.
-            )
-            words = sentence.split() # Splits sentence into words. # Teilt Satz in Wörter.
-            index = 0 # Initializes word index. # Initialisiert Wortindex.
-
-            while index < len(words): # Loops through all words in sentence. # Schleife durch alle Wörter im Satz.
-                matched = False # Tracks if current position matched a phrase. # Verfolgt, ob aktuelle Position einer Phrase entspricht.
-
-                # Try to match multi-word phrases first
-                for phrase_key in phrases: # Checks each potential phrase. # Prüft jede potenzielle Phrase.
-                    phrase_words = phrase_key.split() # Splits phrase into words. # Teilt Phrase in Wörter.
-                    phrase_len = len(phrase_words) # Gets phrase length in words. # Holt Phrasenlänge in Wörtern.
-
-                    if index + phrase_len <= len(words): # Checks if phrase would fit in remaining words. # Prüft, ob Phrase in verbleibende Wörter passen würde.
-                        current_phrase = " ".join( # Constructs candidate phrase from sentence words. # Konstruiert Kandidatenphrase aus Satzwörtern.
-                            words[index : index + phrase_len] # Takes slice of words of phrase length. # Nimmt Ausschnitt von Wörtern der Phrasenlänge.
-                        ).lower() # Converts to lowercase for comparison. # Konvertiert für Vergleich in Kleinbuchstaben.
-                        if current_phrase == phrase_key: # Checks if candidate matches known phrase. # Prüft, ob Kandidat mit bekannter Phrase übereinstimmt.
-                            original_phrase, translation = phrase_map[phrase_key] # Gets original phrase and translation. # Holt Originalphrase und Übersetzung.
-                            ssml += f"""
-                                <lang xml:lang="{lang}">{original_phrase}</lang>
-                                <break time="300ms"/>
-                                <lang xml:lang="es-ES">{translation}</lang>
-                                <break time="500ms"/>""" # Adds phrase with translation to SSML. # Fügt Phrase mit Übersetzung zum SSML hinzu.
-                            index += phrase_len # Advances index past phrase. # Verschiebt Index über Phrase hinaus.
-                            matched = True # Marks as matched. # Markiert als übereinstimmend.
-                            break # Exits phrase search loop. # Beendet Phrasen-Suchschleife.
-
-                # Fallback to single-word matching
-                if not matched: # If no phrase matched at current position. # Wenn keine Phrase an aktueller Position übereinstimmt.
-                    current_word = words[index].strip(".,!?").lower() # Gets current word without punctuation, lowercase. # Holt aktuelles Wort ohne Interpunktion, in Kleinbuchstaben.
-                    original_word = words[index] # Keeps original word with punctuation. # Behält Originalwort mit Interpunktion.
-                    translation = next( # Finds matching translation for this word. # Findet passende Übersetzung für dieses Wort.
-                        (tgt for src, tgt in word_pairs if src.lower() == current_word), # Searches case-insensitively. # Sucht unabhängig von Groß-/Kleinschreibung.
-                        None, # Default to None if no match found. # Standardmäßig None, wenn keine Übereinstimmung gefunden.
-                    )
-
-                    ssml += f"""
-                        <lang xml:lang="{lang}">{original_word}</lang>
-                        <break time="300ms"/>""" # Adds word to SSML. # Fügt Wort zum SSML hinzu.
-                    if translation: # If translation was found. # Wenn Übersetzung gefunden wurde.
-                        ssml += f"""
-                            <lang xml:lang="es-ES">{translation}</lang>
-                            <break time="500ms"/>""" # Adds translation to SSML. # Fügt Übersetzung zum SSML hinzu.
-                    else: # If no translation was found. # Wenn keine Übersetzung gefunden wurde.
-                        ssml += """<break time="500ms"/>""" # Adds pause only. # Fügt nur Pause hinzu.
-
-                    index += 1 # Advances to next word. # Verschiebt zu nächstem Wort.
-
-            ssml += """
-                        <break time="1000ms"/>
-                    </prosody>
-                </voice>""" # Closes word-by-word section. # Schließt Wort-für-Wort-Abschnitt.
-
-        return ssml # Returns the complete section. # Gibt den vollständigen Abschnitt zurück.
-
-    async def text_to_speech_word_pairs( # Defines method to convert word pairs to speech. # Definiert Methode zur Umwandlung von Wortpaaren in Sprache.
-        self,
-        word_pairs: list[tuple[str, str]], # Source-target word pairs. # Quell-Ziel-Wortpaare.
-        source_lang: str, # Source language code. # Quellsprachcode.
-        target_lang: str, # Target language code. # Zielsprachcode.
-        output_path: Optional[str] = None, # Optional custom output path. # Optionaler benutzerdefinierter Ausgabepfad.
-        complete_text: Optional[str] = None,  # New parameter for full text. # Neuer Parameter für vollständigen Text.
-    ) -> Optional[str]: # Returns filename or None if failed. # Gibt Dateinamen zurück oder None bei Fehlschlag.
-        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
-            if not output_path: # Checks if output path is not provided. # Prüft, ob kein Ausgabepfad angegeben ist.
-                temp_dir = self._get_temp_directory() # Gets temporary directory. # Holt temporäres Verzeichnis.
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # Creates timestamp for filename. # Erstellt Zeitstempel für Dateinamen.
-                output_path = os.path.join(temp_dir, f"speech_{timestamp}.mp3") # Creates full output path. # Erstellt vollständigen Ausgabepfad.
-                print(f"Output path: {output_path}") # Logs the output path. # Protokolliert den Ausgabepfad.
-
-            audio_config = AudioOutputConfig(filename=output_path) # Configures audio output to file. # Konfiguriert Audio-Ausgabe in Datei.
-            speech_config = SpeechConfig( # Creates speech configuration. # Erstellt Sprachkonfiguration.
-                subscription=self.subscription_key, region=self.region # Sets API key and region. # Setzt API-Schlüssel und Region.
-            )
-            speech_config.set_speech_synthesis_output_format( # Sets audio format. # Setzt Audioformat.
-                SpeechSynthesisOutputFormat.Audio16Khz32KBitRateMonoMp3 # Uses 16kHz 32kbps mono MP3. # Verwendet 16kHz 32kbps Mono-MP3.
-            )
-
-            synthesizer = SpeechSynthesizer( # Creates speech synthesizer. # Erstellt Sprachsynthesizer.
-                speech_config=speech_config, audio_config=audio_config # Configures with speech and audio settings. # Konfiguriert mit Sprach- und Audioeinstellungen.
-            )
-
-            # Use the new combined SSML generator
-            ssml = self.generate_enhanced_ssml( # Generates enhanced SSML. # Generiert erweitertes SSML.
-                text=complete_text, # Full text content. # Vollständiger Textinhalt.
-                word_pairs=word_pairs, # Word pairs for pronunciation. # Wortpaare für Aussprache.
-                source_lang=source_lang, # Source language. # Quellsprache.
-                target_lang=target_lang, # Target language. # Zielsprache.
-            )
-            print(f"Generated SSML:\n{ssml}")  # Debug output. # Debug-Ausgabe.
-
-            result = await asyncio.get_event_loop().run_in_executor( # Runs CPU-intensive task in thread pool. # Führt CPU-intensive Aufgabe im Thread-Pool aus.
-                None, lambda: synthesizer.speak_ssml_async(ssml).get() # Executes SSML synthesis and gets result. # Führt SSML-Synthese aus und holt Ergebnis.
-            )
-
-            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
-                return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
-
-            if result.reason == ResultReason.Canceled: # Checks if synthesis was canceled. # Prüft, ob Synthese abgebrochen wurde.
-                cancellation_details = result.cancellation_details # Gets cancellation details. # Holt Abbruchdetails.
-                print(f"Speech synthesis canceled: {cancellation_details.reason}") # Logs cancellation reason. # Protokolliert Abbruchgrund.
-                if cancellation_details.reason == CancellationReason.Error: # Checks if cancellation was due to error. # Prüft, ob Abbruch aufgrund eines Fehlers erfolgte.
-                    print(f"Error details: {cancellation_details.error_details}") # Logs error details. # Protokolliert Fehlerdetails.
-
-            return None # Returns None if synthesis didn't complete successfully. # Gibt None zurück, wenn Synthese nicht erfolgreich abgeschlossen wurde.
-        except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
-            print(f"Error in text_to_speech_word_pairs: {str(e)}") # Logs the error. # Protokolliert den Fehler.
-            return None # Returns None on error. # Gibt None bei Fehler zurück.
-
-    # async def text_to_speech(
-    #     self, ssml: str, output_path: Optional[str] = None
-    # ) -> Optional[str]:
-    async def text_to_speech( # Defines method to convert SSML to speech. # Definiert Methode zur Umwandlung von SSML in Sprache.
-        self, ssml: str, output_path: Optional[str] = None # SSML text and optional output path. # SSML-Text und optionaler Ausgabepfad.
-    ) -> Optional[str]: # Returns filename or None if failed. # Gibt Dateinamen zurück oder None bei Fehlschlag.
-        """Convert SSML to speech with proper language handling"""
-        synthesizer = None # Initializes synthesizer to None for cleanup in finally block. # Initialisiert Synthesizer mit None für Bereinigung im Finally-Block.
-        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
-            if not output_path: # Checks if output path is not provided. # Prüft, ob kein Ausgabepfad angegeben ist.
-                temp_dir = self._get_temp_directory() # Gets temporary directory. # Holt temporäres Verzeichnis.
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # Creates timestamp for filename. # Erstellt Zeitstempel für Dateinamen.
-                output_path = os.path.join(temp_dir, f"speech_{timestamp}.mp3") # Creates full output path. # Erstellt vollständigen Ausgabepfad.
-                print(f"Output path: {output_path}") # Logs the output path. # Protokolliert den Ausgabepfad.
-
-            audio_config = AudioOutputConfig(filename=output_path) # Configures audio output to file. # Konfiguriert Audio-Ausgabe in Datei.
-            synthesizer = SpeechSynthesizer( # Creates speech synthesizer. # Erstellt Sprachsynthesizer.
-                speech_config=self.speech_config, audio_config=audio_config # Configures with speech and audio settings. # Konfiguriert mit Sprach- und Audioeinstellungen.
-            )
-
-            result = await asyncio.get_event_loop().run_in_executor( # Runs CPU-intensive task in thread pool. # Führt CPU-intensive Aufgabe im Thread-Pool aus.
-                None, lambda: synthesizer.speak_ssml_async(ssml).get() # Executes SSML synthesis and gets result. # Führt SSML-Synthese aus und holt Ergebnis.
-            )
-
-            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
-                return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
-
-            return None # Returns None if synthesis didn't complete successfully. # Gibt None zurück, wenn Synthese nicht erfolgreich abgeschlossen wurde.
-
-        except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
-            print(f"Exception in text_to_speech: {str(e)}") # Logs the error. # Protokolliert den Fehler.
-            return None # Returns None on error. # Gibt None bei Fehler zurück.
-        finally: # Finally block for cleanup regardless of success/failure. # Finally-Block für Bereinigung unabhängig von Erfolg/Fehlschlag.
-            if synthesizer: # Checks if synthesizer was created. # Prüft, ob Synthesizer erstellt wurde.
-                try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
-                    synthesizer.stop_speaking_async() # Stops any ongoing synthesis. # Stoppt laufende Synthese.
-                except: # Ignores errors during cleanup. # Ignoriert Fehler während der Bereinigung.
-                    pass # Does nothing if cleanup fails. # Tut nichts, wenn Bereinigung fehlschlägt.
+# EnhancedTTSService
+#
+# A service for converting text to speech using Azure Cognitive Services. # Ein Dienst zur Umwandlung von Text in Sprache mit Azure Cognitive Services.
+# Specialized in handling multilingual word-by-word translations with phonetic accuracy. # Spezialisiert auf die Behandlung mehrsprachiger Wort-für-Wort-Übersetzungen mit phonetischer Genauigkeit.
+#
+# Usage:
+# tts_service = EnhancedTTSService() # Creates a new TTS service instance. # Erstellt eine neue TTS-Dienst-Instanz.
+# ssml = tts_service.generate_enhanced_ssml(text="Hello world", source_lang="en", target_lang="es") # Generates SSML markup with language tags. # Generiert SSML-Markup mit Sprachtags.
+# audio_file = await tts_service.text_to_speech(ssml) # Converts the SSML to an audio file. # Konvertiert das SSML in eine Audiodatei.
+# pipeline = tts_service.start_pipeline(); pipeline.feed(translations, word_pairs) # Synthesizes sections while the model is still generating. # Synthetisiert Abschnitte, während das Modell noch generiert.
+#
+# EN: Creates high-quality multilingual text-to-speech with precise language transitions and pronunciation.
+# DE: Erstellt hochwertige mehrsprachige Text-zu-Sprache mit präzisen Sprachübergängen und Aussprache.
+
+from azure.cognitiveservices.speech import ( # Imports Azure Speech SDK components. # Importiert Azure Speech SDK-Komponenten.
+    SpeechConfig, # For configuring speech service connection. # Zur Konfiguration der Sprachdienstverbindung.
+    SpeechSynthesizer, # For performing text-to-speech conversion. # Zur Durchführung der Text-zu-Sprache-Umwandlung.
+    SpeechSynthesisOutputFormat, # For defining audio output format. # Zur Definition des Audio-Ausgabeformats.
+    ResultReason, # For checking speech synthesis results. # Zur Prüfung der Sprachsyntheseresultate.
+    CancellationReason, # For handling synthesis cancellations. # Zur Behandlung von Syntheseabbrüchen.
+)
+from azure.cognitiveservices.speech.audio import AudioOutputConfig # For configuring audio output settings. # Zur Konfiguration der Audio-Ausgabeeinstellungen.
+import os # For accessing operating system functionality. # Für den Zugriff auf Betriebssystemfunktionalität.
+from typing import Optional # For type hinting with optional values. # Für Typhinweise mit optionalen Werten.
+from datetime import datetime # For generating timestamps. # Zur Erzeugung von Zeitstempeln.
+import asyncio # For asynchronous programming. # Für asynchrone Programmierung.
+import logging # For service logging. # Für die Dienstprotokollierung.
+import re # For regular expression pattern matching. # Für reguläre Ausdruckmusterabgleiche.
+
+import time # For time-related functions. # Für zeitbezogene Funktionen.
+import uuid # For collision-free output file names. # Für kollisionsfreie Ausgabedateinamen.
+from xml.sax.saxutils import escape # For escaping clip texts inside SSML. # Zum Escapen von Cliptexten innerhalb von SSML.
+
+from .audio_clip_library import AudioClipLibrary, strip_id3 # For reusing synthesized word clips. # Zur Wiederverwendung synthetisierter Wortclips.
+from .audio_formats import DEFAULT_AUDIO_FORMAT, get_audio_format # For selecting the audio output format. # Zur Auswahl des Audio-Ausgabeformats.
+from ...infrastructure.admission import UpstreamOverloaded, admit # For the Azure TTS concurrency limit. # Für das Nebenläufigkeitslimit von Azure TTS.
+from ...infrastructure.deadline import DeadlineExceeded, check_deadline # For the request's time budget. # Für das Zeitbudget der Anfrage.
+from ...infrastructure.resilience import resilient_call # For Azure TTS timeouts, retries and hedging. # Für Azure-TTS-Timeouts, -Wiederholungen und -Absicherung.
+from ...infrastructure.observability.logging_setup import log_payload # For sampled SSML logging. # Für stichprobenartiges SSML-Logging.
+from ...infrastructure.observability.metrics import ( # For stage latency, upstream and audio metrics. # Für Stufenlatenz-, Upstream- und Audiometriken.
+    record_audio_bytes, record_cache, record_upstream_error, stage_timer, timed, upstream_call,
+)
+from ...infrastructure.observability.request_timing import run_in_executor # Keeps executor stages in the request's Server-Timing. # Behält Executor-Stufen im Server-Timing der Anfrage.
+
+logger = logging.getLogger(__name__) # Creates a logger instance for this module. # Erstellt eine Logger-Instanz für dieses Modul.
+
+
+class EnhancedTTSService: # Defines the EnhancedTTSService class. # Definiert die EnhancedTTSService-Klasse.
+    def __init__(self): # Initializes the service. # Initialisiert den Dienst.
+        self.subscription_key = os.getenv("AZURE_SPEECH_KEY") # Gets Azure API key from environment variables. # Holt den Azure-API-Schlüssel aus Umgebungsvariablen.
+        self.region = os.getenv("AZURE_SPEECH_REGION") # Gets Azure region from environment variables. # Holt die Azure-Region aus Umgebungsvariablen.
+
+        if not self.subscription_key or not self.region: # Checks if credentials are missing. # Prüft, ob Anmeldedaten fehlen.
+            raise ValueError( # Raises an error if credentials are missing. # Löst einen Fehler aus, wenn Anmeldedaten fehlen.
+                "Azure Speech credentials not found in environment variables" # Error message for missing credentials. # Fehlermeldung für fehlende Anmeldedaten.
+            )
+
+        os.environ["SPEECH_CONTAINER_OPTION"] = "1" # Sets container mode for Azure Speech SDK. # Setzt den Container-Modus für das Azure Speech SDK.
+        os.environ["SPEECH_SYNTHESIS_PLATFORM_CONFIG"] = "container" # Configures synthesis platform for containers. # Konfiguriert die Syntheseplattform für Container.
+        
+    
+        self.speech_host = f"wss://{self.region}.tts.speech.microsoft.com/cognitiveservices/websocket/v1" # Constructs WebSocket endpoint URL. # Konstruiert die WebSocket-Endpunkt-URL.
+        self.speech_config = SpeechConfig( # Creates speech configuration. # Erstellt die Sprachkonfiguration.
+            subscription=self.subscription_key, # Sets the API key. # Setzt den API-Schlüssel.
+            endpoint=self.speech_host # Sets the endpoint URL. # Setzt die Endpunkt-URL.
+        )
+        
+        self.speech_config.set_speech_synthesis_output_format( # Sets output audio format. # Setzt das Ausgabe-Audioformat.
+            self._sdk_output_format(DEFAULT_AUDIO_FORMAT) # Uses the configured default format (16kHz 32kbps mono MP3 unless TTS_AUDIO_FORMAT is set). # Verwendet das konfigurierte Standardformat (16kHz 32kbps Mono-MP3, sofern TTS_AUDIO_FORMAT nicht gesetzt ist).
+        )
+        self._speech_configs = {DEFAULT_AUDIO_FORMAT: self.speech_config} # Speech configurations by output format. # Sprachkonfigurationen nach Ausgabeformat.
+
+        tts_device = os.getenv("TTS_DEVICE", "cpu").lower() # Gets device setting (CPU/GPU) from environment or defaults to CPU. # Holt Geräteeinstellung (CPU/GPU) aus der Umgebung oder setzt Standard auf CPU.
+        if os.getenv("CONTAINER_ENV", "false").lower() == "true": # Checks if running in container environment. # Prüft, ob in Container-Umgebung ausgeführt wird.
+            tts_device = "cpu" # Forces CPU mode in container environment. # Erzwingt CPU-Modus in Container-Umgebung.
+            
+        logger.info("Using TTS device: %s", tts_device) # Logs the device being used. # Protokolliert das verwendete Gerät.
+
+        self.voice_mapping = { # Maps language codes to voice names. # Ordnet Sprachcodes den Stimmnamen zu.
+            "en": "en-US-JennyMultilingualNeural", # English voice. # Englische Stimme.
+            "es": "es-ES-ArabellaMultilingualNeural", # Spanish voice. # Spanische Stimme.
+            "de": "de-DE-SeraphinaMultilingualNeural", # German voice. # Deutsche Stimme.
+        }
+
+        self.section_layout = [ # Voice and language for each of the eight translation sentences, in order. # Stimme und Sprache für jeden der acht Übersetzungssätze, in Reihenfolge.
+            (True, "de-DE-SeraphinaMultilingualNeural", "de-DE"), # Native German. # Muttersprachliches Deutsch.
+            (True, "de-DE-SeraphinaMultilingualNeural", "de-DE"), # Colloquial German. # Umgangssprachliches Deutsch.
+            (True, "de-DE-KatjaNeural", "de-DE"), # Informal German with an alternative voice for variety. # Informelles Deutsch mit alternativer Stimme für Abwechslung.
+            (True, "de-DE-SeraphinaMultilingualNeural", "de-DE"), # Formal German. # Formelles Deutsch.
+            (False, "en-US-JennyMultilingualNeural", "en-US"), # Native English. # Muttersprachliches Englisch.
+            (False, "en-US-JennyMultilingualNeural", "en-US"), # Colloquial English. # Umgangssprachliches Englisch.
+            (False, "en-US-JennyNeural", "en-US"), # Informal English with an alternative voice for variety. # Informelles Englisch mit alternativer Stimme für Abwechslung.
+            (False, "en-US-JennyMultilingualNeural", "en-US"), # Formal English. # Formelles Englisch.
+        ]
+
+        self.default_audio_mode = os.getenv("TTS_AUDIO_MODE", "full").lower() # Audio mode used when a request doesn't choose one. # Audiomodus, wenn eine Anfrage keinen wählt.
+
+        self.clip_library = None # Word clip library, disabled unless configured. # Wortclip-Bibliothek, deaktiviert, sofern nicht konfiguriert.
+        if os.getenv("TTS_CLIP_LIBRARY", "true").lower() == "true": # Checks if word clips should be reused. # Prüft, ob Wortclips wiederverwendet werden sollen.
+            self.clip_library = AudioClipLibrary() # Creates the shared clip library. # Erstellt die gemeinsame Clip-Bibliothek.
+        self.clip_concurrency = int(os.getenv("TTS_CLIP_CONCURRENCY", "4")) # Maximum parallel clip syntheses per response; the azure_tts admission limit caps all responses together. # Maximale Anzahl paralleler Clip-Synthesen pro Antwort; das azure_tts-Zulassungslimit begrenzt alle Antworten zusammen.
+        self.pipeline_enabled = os.getenv("TTS_PIPELINE", "true").lower() == "true" # Starts synthesis while Gemini is still streaming. # Startet die Synthese, während Gemini noch streamt.
+        self._synthesizer_pools = {} # Idle reusable in-memory synthesizers by format; never waited on. # Freie wiederverwendbare In-Memory-Synthesizer nach Format; es wird nie auf sie gewartet.
+
+    def start_pipeline( # Defines method to start synthesis ahead of the complete response. # Definiert Methode, um die Synthese vor der vollständigen Antwort zu starten.
+        self, audio_format: Optional[str] = None, audio_mode: Optional[str] = None,
+    ) -> Optional["SynthesisPipeline"]: # Returns None when the audio isn't assembled from clips. # Gibt None zurück, wenn das Audio nicht aus Clips zusammengesetzt wird.
+        """Return a pipeline that synthesizes each section as soon as it is complete in the streamed response"""
+        if not (self.pipeline_enabled and self.clip_library and get_audio_format(audio_format)["concatenable"]): # Only segment audio can be made ahead and joined. # Nur Segment-Audio kann vorab erzeugt und verbunden werden.
+            return None
+        return SynthesisPipeline(self, audio_format or DEFAULT_AUDIO_FORMAT, audio_mode)
+
+    def _sdk_output_format(self, audio_format: Optional[str]): # Defines method to resolve the SDK output format. # Definiert Methode zur Auflösung des SDK-Ausgabeformats.
+        """Return the SpeechSynthesisOutputFormat member for a registered format name"""
+        return getattr(SpeechSynthesisOutputFormat, get_audio_format(audio_format)["sdk_format"]) # Looks up the SDK enum member. # Sucht das SDK-Enum-Mitglied.
+
+    def _get_speech_config(self, audio_format: Optional[str] = None) -> SpeechConfig: # Defines method to get a speech configuration per format. # Definiert Methode zum Abrufen einer Sprachkonfiguration pro Format.
+        """Return a cached speech configuration that produces the given output format"""
+        audio_format = audio_format or DEFAULT_AUDIO_FORMAT # Falls back to the default format. # Fällt auf das Standardformat zurück.
+        speech_config = self._speech_configs.get(audio_format) # Looks up an existing configuration. # Sucht eine vorhandene Konfiguration.
+        if speech_config is None: # If this format hasn't been used yet. # Wenn dieses Format noch nicht verwendet wurde.
+            speech_config = SpeechConfig( # Creates speech configuration. # Erstellt die Sprachkonfiguration.
+                subscription=self.subscription_key, # Sets the API key. # Setzt den API-Schlüssel.
+                endpoint=self.speech_host # Sets the endpoint URL. # Setzt die Endpunkt-URL.
+            )
+            speech_config.set_speech_synthesis_output_format(self._sdk_output_format(audio_format)) # Sets output audio format. # Setzt das Ausgabe-Audioformat.
+            self._speech_configs[audio_format] = speech_config # Caches the configuration. # Speichert die Konfiguration zwischen.
+        return speech_config # Returns the configuration. # Gibt die Konfiguration zurück.
+
+    def _new_output_path(self, audio_format: Optional[str] = None) -> str: # Defines method to build an output file path. # Definiert Methode zum Erstellen eines Ausgabedateipfads.
+        """Return a unique file path in the audio directory with the extension of the format"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S") # Creates timestamp for filename. # Erstellt Zeitstempel für Dateinamen.
+        extension = get_audio_format(audio_format)["extension"] # Gets the file extension of the format. # Holt die Dateierweiterung des Formats.
+        return os.path.join( # Creates full output path. # Erstellt vollständigen Ausgabepfad.
+            self._get_temp_directory(), f"speech_{timestamp}_{uuid.uuid4().hex[:8]}{extension}" # Random suffix avoids collisions within a second. # Zufälliges Suffix vermeidet Kollisionen innerhalb einer Sekunde.
+        )
+
+    def _get_temp_directory(self) -> str: # Defines method to get temporary directory. # Definiert Methode zum Abrufen des temporären Verzeichnisses.
+        """Create and return the temporary directory path"""
+        if os.name == "nt":  # Checks if running on Windows. # Prüft, ob auf Windows ausgeführt.
+            temp_dir = os.path.join(os.environ.get("TEMP", ""), "tts_audio") # Creates path in Windows temp. # Erstellt Pfad im Windows-Temp.
+        else: # For non-Windows systems (Linux/Mac). # Für Nicht-Windows-Systeme (Linux/Mac).
+            temp_dir = "/tmp/tts_audio" # Uses Unix standard temp directory. # Verwendet Unix-Standard-Temp-Verzeichnis.
+        os.makedirs(temp_dir, exist_ok=True) # Creates directory if it doesn't exist. # Erstellt Verzeichnis, falls es nicht existiert.
+        return temp_dir # Returns the directory path. # Gibt den Verzeichnispfad zurück.
+
+    def _detect_language(self, text: str) -> str: # Defines method to detect language from text. # Definiert Methode zur Spracherkennung aus Text.
+        """Detect the primary language of the text"""
+        if re.search(r"[äöüßÄÖÜ]", text): # Checks for German-specific characters. # Prüft auf deutschspezifische Zeichen.
+            return "de" # Returns German language code. # Gibt deutschen Sprachcode zurück.
+        elif re.search(r"[áéíóúñ¿¡]", text): # Checks for Spanish-specific characters. # Prüft auf spanischspezifische Zeichen.
+            return "es" # Returns Spanish language code. # Gibt spanischen Sprachcode zurück.
+        return "en" # Default to English if no specific characters found. # Standardmäßig Englisch, wenn keine spezifischen Zeichen gefunden.
+
+    def _is_german_word(self, word: str) -> bool: # Defines method to check if word is German. # Definiert Methode zur Prüfung, ob Wort deutsch ist.
+        german_words = { # Set of common German words. # Menge häufiger deutscher Wörter.
+            "dir", # you (dative) # dir
+            "ich", # I # ich
+            "du", # you (informal) # du
+            "sie", # she/they/you (formal) # sie
+            "er", # he # er
+            "es", # it # es
+            "wir", # we # wir
+            "ihr", # you (plural) # ihr
+            "ist", # is # ist
+            "sind", # are # sind
+            "haben", # have # haben
+            "sein", # to be # sein
+            "werden", # to become # werden
+            "kann", # can # kann
+            "könnte", # could # könnte
+            "möchte", # would like # möchte
+            "muss", # must # muss
+            "darf", # may # darf
+            "soll", # should # soll
+        }
+        return word.lower() in german_words # Checks if lowercased word is in German word set. # Prüft, ob Wort in Kleinbuchstaben in deutscher Wörtermenge ist.
+
+    def _is_english_word(self, word: str) -> bool: # Defines method to check if word is English. # Definiert Methode zur Prüfung, ob Wort englisch ist.
+        english_words = {"the", "a", "an", "in", "on", "at", "to", "for", "with", "by"} # Set of common English words. # Menge häufiger englischer Wörter.
+        return word.lower() in english_words # Checks if lowercased word is in English word set. # Prüft, ob Wort in Kleinbuchstaben in englischer Wörtermenge ist.
+
+    def generate_german_spanish_wordforword_ssml( # Defines method for German-Spanish word pairs SSML. # Definiert Methode für Deutsch-Spanisch-Wortpaar-SSML.
+        self,
+        word_pairs: list[tuple[str, str]], # List of source-target word pairs. # Liste von Quell-Ziel-Wortpaaren.
+    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
+        """Generate SSML specifically for German-Spanish word-by-word translations"""
+        ssml = """
+        <voice name="en-US-JennyMultilingualNeural">
+            <prosody rate="0.8">""" # Creates SSML header with voice and slower speech rate. # Erstellt SSML-Header mit Stimme und langsamerer Sprechrate.
+
+        for source_word, target_word in word_pairs: # Iterates through each word pair. # Iteriert durch jedes Wortpaar.
+            source_word = source_word.strip().replace("&", "&amp;") # Cleans up source word and escapes ampersands. # Bereinigt Quellwort und escapet Kaufmannsund.
+            target_word = target_word.strip().replace("&", "&amp;") # Cleans up target word and escapes ampersands. # Bereinigt Zielwort und escapet Kaufmannsund.
+
+            ssml += f"""
+                <lang xml:lang="de-DE">{source_word}</lang>
+                <break time="300ms"/>
+                <lang xml:lang="es-ES">{target_word}</lang>
+                <break time="500ms"/>""" # Adds each word pair with language tags and pauses. # Fügt jedes Wortpaar mit Sprachtags und Pausen hinzu.
+
+        ssml += """
+                <break time="1000ms"/>
+            </prosody>
+        </voice>""" # Closes the SSML tags. # Schließt die SSML-Tags.
+
+        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
+
+    def generate_english_spanish_wordforword_ssml( # Defines method for English-Spanish word pairs SSML. # Definiert Methode für Englisch-Spanisch-Wortpaar-SSML.
+        self,
+        word_pairs: list[tuple[str, str]], # List of source-target word pairs. # Liste von Quell-Ziel-Wortpaaren.
+    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
+        """Generate SSML specifically for English-Spanish word-by-word translations"""
+        ssml = """
+        <voice name="en-US-JennyMultilingualNeural">
+            <prosody rate="0.8">""" # Creates SSML header with voice and slower speech rate. # Erstellt SSML-Header mit Stimme und langsamerer Sprechrate.
+
+        for source_word, target_word in word_pairs: # Iterates through each word pair. # Iteriert durch jedes Wortpaar.
+            source_word = source_word.strip().replace("&", "&amp;") # Cleans up source word and escapes ampersands. # Bereinigt Quellwort und escapet Kaufmannsund.
+            target_word = target_word.strip().replace("&", "&amp;") # Cleans up target word and escapes ampersands. # Bereinigt Zielwort und escapet Kaufmannsund.
+
+            ssml += f"""
+                <lang xml:lang="en-US">{source_word}</lang>
+                <break time="300ms"/>
+                <lang xml:lang="es-ES">{target_word}</lang>
+                <break time="500ms"/>""" # Adds each word pair with language tags and pauses. # Fügt jedes Wortpaar mit Sprachtags und Pausen hinzu.
+
+        ssml += """
+                <break time="1000ms"/>
+            </prosody>
+        </voice>""" # Closes the SSML tags. # Schließt die SSML-Tags.
+
+        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
+
+    def _iter_sections( # Defines method to split the complete text into speakable sections. # Definiert Methode zur Aufteilung des vollständigen Texts in sprechbare Abschnitte.
+        self,
+        text: Optional[str], # Newline-separated translations in layout order. # Zeilengetrennte Übersetzungen in Layout-Reihenfolge.
+        word_pairs: Optional[list[tuple[str, str, bool]]], # Word pairs with language flag. # Wortpaare mit Sprachflagge.
+        escape_xml: bool = True, # Whether to escape XML special characters in sentences. # Ob XML-Sonderzeichen in Sätzen escapet werden sollen.
+    ) -> list[tuple[str, list[tuple[str, str]], str, str]]: # Returns (sentence, pairs, voice, lang) tuples. # Gibt (Satz, Paare, Stimme, Sprache)-Tupel zurück.
+        """Pair each non-empty translation sentence with its word pairs, voice and language"""
+        if not text or not word_pairs: # Sections are only spoken when both text and word pairs exist. # Abschnitte werden nur gesprochen, wenn Text und Wortpaare existieren.
+            return [] # Returns no sections. # Gibt keine Abschnitte zurück.
+
+        sentences = (text.split("\n") + [""] * 8)[:8] # Splits text by lines and pads to 8 sentences. # Teilt Text nach Zeilen und füllt auf 8 Sätze auf.
+        if escape_xml: # Checks if sentences go into SSML. # Prüft, ob Sätze in SSML eingefügt werden.
+            sentences = [ # Processes each sentence. # Verarbeitet jeden Satz.
+                t.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;") # Escapes XML special characters. # Escapet XML-Sonderzeichen.
+                for t in sentences # For each sentence in the list. # Für jeden Satz in der Liste.
+            ]
+
+        german_pairs = [ # Filters for German word pairs. # Filtert nach deutschen Wortpaaren.
+            (src, tgt) for src, tgt, is_german in word_pairs if is_german # Keeps only German source pairs. # Behält nur deutsche Quellpaare.
+        ]
+        english_pairs = [ # Filters for English word pairs. # Filtert nach englischen Wortpaaren.
+            (src, tgt) for src, tgt, is_german in word_pairs if not is_german # Keeps only English source pairs. # Behält nur englische Quellpaare.
+        ]
+
+        sections = [] # Initializes the section list. # Initialisiert die Abschnittsliste.
+        for sentence, (is_german, voice, lang) in zip(sentences, self.section_layout): # Walks sentences alongside their layout. # Durchläuft Sätze zusammen mit ihrem Layout.
+            if sentence: # Skips missing translations. # Überspringt fehlende Übersetzungen.
+                sections.append( # Adds the section. # Fügt den Abschnitt hinzu.
+                    (sentence, german_pairs if is_german else english_pairs, voice, lang) # Uses the pairs of the sentence language. # Verwendet die Paare der Satzsprache.
+                )
+        return sections # Returns the sections in speaking order. # Gibt die Abschnitte in Sprechreihenfolge zurück.
+
+    @timed("tts", "ssml_build") # Records SSML build time. # Erfasst die SSML-Erstellungszeit.
+    def generate_enhanced_ssml( # Defines method to generate enhanced SSML with multiple languages. # Definiert Methode zur Generierung von erweitertem SSML mit mehreren Sprachen.
+        self,
+        text: Optional[str] = None, # Optional text to translate. # Optionaler zu übersetzender Text.
+        word_pairs: Optional[list[tuple[str, str, bool]]] = None, # Optional word pairs with language flag. # Optionale Wortpaare mit Sprachflagge.
+        source_lang: str = "de", # Source language, defaults to German. # Quellsprache, standardmäßig Deutsch.
+        target_lang: str = "es", # Target language, defaults to Spanish. # Zielsprache, standardmäßig Spanisch.
+        audio_mode: Optional[str] = None, # "full" or "compact", defaults to TTS_AUDIO_MODE. # "full" oder "compact", standardmäßig TTS_AUDIO_MODE.
+    ) -> str: # Returns SSML string. # Gibt SSML-Zeichenkette zurück.
+        """Generate SSML with proper phrase handling for both German and English"""
+        ssml = """<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">""" # Starts SSML document. # Startet SSML-Dokument.
+        spoken = set() if self._is_compact(audio_mode) else None # Tracks spoken pairs across sections in compact mode. # Verfolgt im Kompaktmodus gesprochene Paare über Abschnitte hinweg.
+
+        for sentence, section_pairs, voice, lang in self._iter_sections(text, word_pairs): # Iterates over the sentences that have word pairs. # Iteriert über die Sätze mit Wortpaaren.
+            ssml += self._generate_language_section( # Adds the sentence section to SSML. # Fügt den Satzabschnitt zum SSML hinzu.
+                sentence, # The sentence text. # Der Satztext.
+                section_pairs, # Word pairs for this section. # Wortpaare für diesen Abschnitt.
+                voice=voice, # Voice to use for the sentence. # Zu verwendende Stimme für den Satz.
+                lang=lang, # Language code of the sentence. # Sprachcode des Satzes.
+                spoken=spoken, # Pairs already spoken in earlier sections. # Bereits in früheren Abschnitten gesprochene Paare.
+            )
+
+        ssml = re.sub(r'(<break time="500ms"\s*/>\s*)+', '<break time="500ms"/>', ssml) # Removes duplicate breaks. # Entfernt doppelte Pausen.
+        ssml += "</speak>" # Closes the SSML root element. # Schließt das SSML-Root-Element.
+        return ssml # Returns the complete SSML. # Gibt das vollständige SSML zurück.
+
+    def _is_compact(self, audio_mode: Optional[str]) -> bool: # Defines method to resolve the audio mode. # Definiert Methode zur Auflösung des Audiomodus.
+        """Return True when each unique word pair should be spoken only once"""
+        return (audio_mode or self.default_audio_mode).lower() == "compact" # Falls back to the configured default mode. # Fällt auf den konfigurierten Standardmodus zurück.
+
+    def _generate_language_section( # Defines method to generate a language-specific section. # Definiert Methode zur Generierung eines sprachspezifischen Abschnitts.
+        self, sentence: str, word_pairs: list[tuple[str, str]], voice: str, lang: str, # Parameters for sentence, word pairs, voice and language. # Parameter für Satz, Wortpaare, Stimme und Sprache.
+        spoken: Optional[set] = None, # Pairs already spoken, only set in compact mode. # Bereits gesprochene Paare, nur im Kompaktmodus gesetzt.
+    ) -> str: # Returns SSML string section. # Gibt SSML-Zeichenkettenabschnitt zurück.
+        """Generate complete language section with phrase handling"""
+        section = f"""
+        <voice name="{voice}">
+            <prosody rate="1.0">
+                <lang xml:lang="{lang}">{sentence}</lang>
+                <break time="1000ms"/>
+            </prosody>
+        </voice>""" # Creates section for full sentence with specified voice and language. # Erstellt Abschnitt für vollständigen Satz mit angegebener Stimme und Sprache.
+
+        steps = self._match_word_pairs(sentence, word_pairs, spoken) if word_pairs else [] # Aligns the sentence with its word pairs. # Richtet den Satz an seinen Wortpaaren aus.
+        if steps: # Checks if there is anything to break down. # Prüft, ob es etwas aufzuschlüsseln gibt.
+            section += """
+        <voice name="en-US-JennyMultilingualNeural">
+            <prosody rate="0.8">""" # Starts word-by-word breakdown section with slower speech rate. # Startet Wort-für-Wort-Aufschlüsselungsabschnitt mit langsamerer Sprechrate.
+
+            for source_phrase, translation in steps: # Walks the sentence phrase by phrase. # Durchläuft den Satz Phrase für Phrase.
+                section += f"""
+            <lang xml:lang="{lang}">{source_phrase}</lang>
+            <break time="300ms"/>""" # Adds the source phrase to SSML. # Fügt die Quellphrase zum SSML hinzu.
+                if translation: # If translation was found. # Wenn Übersetzung gefunden wurde.
+                    section += f"""
+            <lang xml:lang="es-ES">{translation}</lang>
+            <break time="500ms"/>""" # Adds translation to SSML. # Fügt Übersetzung zum SSML hinzu.
+                else: # If no translation was found. # Wenn keine Übersetzung gefunden wurde.
+                    section += """<break time="500ms"/>""" # Adds pause only. # Fügt nur Pause hinzu.
+
+            section += """
+            <break time="1000ms"/>
+            </prosody>
+        </voice>""" # Closes word-by-word section. # Schließt Wort-für-Wort-Abschnitt.
+
+        return section # Returns the complete section. # Gibt den vollständigen Abschnitt zurück.
+
+    def _match_word_pairs( # Defines method to align a sentence with its word pairs. # Definiert Methode zur Ausrichtung eines Satzes an seinen Wortpaaren.
+        self, sentence: str, word_pairs: list[tuple[str, str]], # The sentence and its word pairs. # Der Satz und seine Wortpaare.
+        spoken: Optional[set] = None, # Pairs spoken earlier in the response, skipped when given. # Früher in der Antwort gesprochene Paare, werden übersprungen, wenn angegeben.
+    ) -> list[tuple[str, Optional[str]]]: # Returns (source phrase, translation) steps. # Gibt (Quellphrase, Übersetzung)-Schritte zurück.
+        """Walk a sentence and pair each phrase or word with its translation, longest phrase first"""
+        steps = [] # Initializes the list of steps. # Initialisiert die Liste der Schritte.
+
+        # Create phrase map and sort by phrase length
+        phrase_map = {src.lower(): (src, tgt) for src, tgt in word_pairs} # Creates mapping of lowercase source to original pairs. # Erstellt Zuordnung von Kleinbuchstaben-Quelle zu Original-Paaren.
+        phrases = sorted( # Sorts phrases by length (longest first). # Sortiert Phrasen nach Länge (längste zuerst).
+            phrase_map.keys(), key=lambda x: len(x.split()), reverse=True # Sort key is word count in descending order. # Sortierschlüssel ist Wortzahl in absteigender Reihenfolge.
+        )
+        words = sentence.split() # Splits sentence into words. # Teilt Satz in Wörter.
+        index = 0 # Initializes word index. # Initialisiert Wortindex.
+
+        while index < len(words): # Loops through all words in sentence. # Schleife durch alle Wörter im Satz.
+            matched = False # Tracks if current position matched a phrase. # Verfolgt, ob aktuelle Position einer Phrase entspricht.
+
+            # Try to match multi-word phrases first
+            for phrase_key in phrases: # Checks each potential phrase. # Prüft jede potenzielle Phrase.
+                phrase_words = phrase_key.split() # Splits phrase into words. # Teilt Phrase in Wörter.
+                if index + len(phrase_words) > len(words): # Checks if phrase would extend beyond sentence end. # Prüft, ob Phrase über Satzende hinausgehen würde.
+                    continue # Skips to next phrase. # Springt zur nächsten Phrase.
+
+                candidate = " ".join( # Constructs candidate phrase from sentence words. # Konstruiert Kandidatenphrase aus Satzwörtern.
+                    words[index : index + len(phrase_words)] # Takes slice of words. # Nimmt Ausschnitt von Wörtern.
+                ).lower() # Converts to lowercase for comparison. # Konvertiert für Vergleich in Kleinbuchstaben.
+                if candidate == phrase_key: # Checks if candidate matches known phrase. # Prüft, ob Kandidat mit bekannter Phrase übereinstimmt.
+                    steps.append(phrase_map[phrase_key]) # Adds original phrase and translation. # Fügt Originalphrase und Übersetzung hinzu.
+                    index += len(phrase_words) # Advances index past this phrase. # Verschiebt Index über diese Phrase hinaus.
+                    matched = True # Marks as matched. # Markiert als übereinstimmend.
+                    break # Exits phrase search loop. # Beendet Phrasen-Suchschleife.
+
+            # Single word fallback
+            if not matched: # If no phrase matched at current position. # Wenn keine Phrase an aktueller Position übereinstimmt.
+                word = words[index].strip(".,!?") # Gets current word without punctuation. # Holt aktuelles Wort ohne Interpunktion.
+                translation = next( # Finds matching translation for this word. # Findet passende Übersetzung für dieses Wort.
+                    (tgt for src, tgt in word_pairs if src.lower() == word.lower()), # Searches case-insensitively. # Sucht unabhängig von Groß-/Kleinschreibung.
+                    None, # Default to None if no match found. # Standardmäßig None, wenn keine Übereinstimmung gefunden.
+                )
+                steps.append((word, translation)) # Adds the word with its translation, if any. # Fügt das Wort mit seiner Übersetzung hinzu, falls vorhanden.
+                index += 1 # Advances to next word. # Verschiebt zu nächstem Wort.
+
+        if spoken is not None: # Compact mode keeps only pairs not spoken yet. # Der Kompaktmodus behält nur noch nicht gesprochene Paare.
+            unique_steps = [] # Initializes the list of new steps. # Initialisiert die Liste neuer Schritte.
+            for source_phrase, translation in steps: # Checks each step. # Prüft jeden Schritt.
+                key = (source_phrase.lower(), translation) # Pairs are compared case-insensitively. # Paare werden ohne Berücksichtigung der Groß-/Kleinschreibung verglichen.
+                if key not in spoken: # If the pair is new in this response. # Wenn das Paar in dieser Antwort neu ist.
+                    spoken.add(key) # Remembers the pair. # Merkt sich das Paar.
+                    unique_steps.append((source_phrase, translation)) # Keeps the step. # Behält den Schritt.
+            steps = unique_steps # Uses only the new steps. # Verwendet nur die neuen Schritte.
+
+        return steps # Returns the aligned steps. # Gibt die ausgerichteten Schritte zurück.
+
+    def _generate_sentence_section( # Defines method to generate a sentence section. # Definiert Methode zur Generierung eines Satzabschnitts.
+        self,
+        sentence: str, # The sentence text. # Der Satztext.
+        word_pairs: list[tuple[str, str]], # Word pairs for translation. # Wortpaare für Übersetzung.
+        voice: str, # Voice to use. # Zu verwendende Stimme.
+        lang: str, # Language code. # Sprachcode.
+    ) -> str: # Returns SSML string section. # Gibt SSML-Zeichenkettenabschnitt zurück.
+        if not sentence: # Checks if sentence is empty. # Prüft, ob Satz leer ist.
+            return "" # Returns empty string for empty input. # Gibt leere Zeichenkette für leere Eingabe zurück.
+
+        # Generate the main sentence SSML
+        ssml = f"""
+            <voice name="{voice}">
+                <prosody rate="1.0">
+                    <lang xml:lang="{lang}">{sentence}</lang>
+                    <break time="1000ms"/>
+                </prosody>
+            </voice>""" # Creates section for full sentence. # Erstellt Abschnitt für vollständigen Satz.
+
+        if word_pairs: # Checks if word pairs are provided. # Prüft, ob Wortpaare bereitgestellt werden.
+            ssml += """
+                <voice name="en-US-JennyMultilingualNeural">
+                    <prosody rate="0.8">""" # Starts word-by-word breakdown with slower speech. # Startet Wort-für-Wort-Aufschlüsselung mit langsamerer Sprache.
+
+            # Create phrase map and sort by phrase length (longest first)
+            phrase_map = {src.lower(): (src, tgt) for src, tgt in word_pairs} # Creates mapping of lowercase source to original pairs. # Erstellt Zuordnung von Kleinbuchstaben-Quelle zu Original-Paaren.
+            phrases = sorted( # Sorts phrases by word count (longest first). # Sortiert Phrasen nach Wortzahl (längste zuerst).
+                phrase_map.keys(), key=lambda x: len(x.split()), reverse=True # Sort key is word count in descending order. # Sortierschlüssel ist Wortzahl in absteigender Reihenfolge.
+            )
+            words = sentence.split() # Splits sentence into words. # Teilt Satz in Wörter.
+            index = 0 # Initializes word index. # Initialisiert Wortindex.
+
+            while index < len(words): # Loops through all words in sentence. # Schleife durch alle Wörter im Satz.
+                matched = False # Tracks if current position matched a phrase. # Verfolgt, ob aktuelle Position einer Phrase entspricht.
+
+                # Try to match multi-word phrases first
+                for phrase_key in phrases: # Checks each potential phrase. # Prüft jede potenzielle Phrase.
+                    phrase_words = phrase_key.split() # Splits phrase into words. # Teilt Phrase in Wörter.
+                    phrase_len = len(phrase_words) # Gets phrase length in words. # Holt Phrasenlänge in Wörtern.
+
+                    if index + phrase_len <= len(words): # Checks if phrase would fit in remaining words. # Prüft, ob Phrase in verbleibende Wörter passen würde.
+                        current_phrase = " ".join( # Constructs candidate phrase from sentence words. # Konstruiert Kandidatenphrase aus Satzwörtern.
+                            words[index : index + phrase_len] # Takes slice of words of phrase length. # Nimmt Ausschnitt von Wörtern der Phrasenlänge.
+                        ).lower() # Converts to lowercase for comparison. # Konvertiert für Vergleich in Kleinbuchstaben.
+                        if current_phrase == phrase_key: # Checks if candidate matches known phrase. # Prüft, ob Kandidat mit bekannter Phrase übereinstimmt.
+                            original_phrase, translation = phrase_map[phrase_key] # Gets original phrase and translation. # Holt Originalphrase und Übersetzung.
+                            ssml += f"""
+                                <lang xml:lang="{lang}">{original_phrase}</lang>
+                                <break time="300ms"/>
+                                <lang xml:lang="es-ES">{translation}</lang>
+                                <break time="500ms"/>""" # Adds phrase with translation to SSML. # Fügt Phrase mit Übersetzung zum SSML hinzu.
+                            index += phrase_len # Advances index past phrase. # Verschiebt Index über Phrase hinaus.
+                            matched = True # Marks as matched. # Markiert als übereinstimmend.
+                            break # Exits phrase search loop. # Beendet Phrasen-Suchschleife.
+
+                # Fallback to single-word matching
+                if not matched: # If no phrase matched at current position. # Wenn keine Phrase an aktueller Position übereinstimmt.
+                    current_word = words[index].strip(".,!?").lower() # Gets current word without punctuation, lowercase. # Holt aktuelles Wort ohne Interpunktion, in Kleinbuchstaben.
+                    original_word = words[index] # Keeps original word with punctuation. # Behält Originalwort mit Interpunktion.
+                    translation = next( # Finds matching translation for this word. # Findet passende Übersetzung für dieses Wort.
+                        (tgt for src, tgt in word_pairs if src.lower() == current_word), # Searches case-insensitively. # Sucht unabhängig von Groß-/Kleinschreibung.
+                        None, # Default to None if no match found. # Standardmäßig None, wenn keine Übereinstimmung gefunden.
+                    )
+
+                    ssml += f"""
+                        <lang xml:lang="{lang}">{original_word}</lang>
+                        <break time="300ms"/>""" # Adds word to SSML. # Fügt Wort zum SSML hinzu.
+                    if translation: # If translation was found. # Wenn Übersetzung gefunden wurde.
+                        ssml += f"""
+                            <lang xml:lang="es-ES">{translation}</lang>
+                            <break time="500ms"/>""" # Adds translation to SSML. # Fügt Übersetzung zum SSML hinzu.
+                    else: # If no translation was found. # Wenn keine Übersetzung gefunden wurde.
+                        ssml += """<break time="500ms"/>""" # Adds pause only. # Fügt nur Pause hinzu.
+
+                    index += 1 # Advances to next word. # Verschiebt zu nächstem Wort.
+
+            ssml += """
+                        <break time="1000ms"/>
+                    </prosody>
+                </voice>""" # Closes word-by-word section. # Schließt Wort-für-Wort-Abschnitt.
+
+        return ssml # Returns the complete section. # Gibt den vollständigen Abschnitt zurück.
+
+    def _build_audio_plan( # Defines method to lay out the audio as clips, sentences and pauses. # Definiert Methode zur Gliederung des Audios in Clips, Sätze und Pausen.
+        self,
+        text: Optional[str], # Newline-separated translations. # Zeilengetrennte Übersetzungen.
+        word_pairs: Optional[list[tuple[str, str, bool]]], # Word pairs with language flag. # Wortpaare mit Sprachflagge.
+        audio_mode: Optional[str] = None, # "full" or "compact". # "full" oder "compact".
+    ) -> list[tuple]: # Returns the ordered audio segments. # Gibt die geordneten Audiosegmente zurück.
+        """Mirror generate_enhanced_ssml as ("speech", text, lang, voice, rate, reusable) and ("break", ms) segments"""
+        plan = [] # Initializes the segment list. # Initialisiert die Segmentliste.
+        spoken = set() if self._is_compact(audio_mode) else None # Tracks spoken pairs across sections in compact mode. # Verfolgt im Kompaktmodus gesprochene Paare über Abschnitte hinweg.
+        for sentence, section_pairs, voice, lang in self._iter_sections(text, word_pairs, escape_xml=False): # Walks the same sections as the SSML generator. # Durchläuft dieselben Abschnitte wie der SSML-Generator.
+            plan.append(("speech", sentence, lang, voice, "1.0", False)) # Full sentences are always synthesized fresh. # Vollständige Sätze werden immer frisch synthetisiert.
+            plan.append(("break", 1000)) # Pause after the sentence. # Pause nach dem Satz.
+            steps = self._match_word_pairs(sentence, section_pairs, spoken) if section_pairs else [] # Aligns the sentence with its word pairs. # Richtet den Satz an seinen Wortpaaren aus.
+            if not steps: # Skips the word-by-word part without new pairs. # Überspringt den Wort-für-Wort-Teil ohne neue Paare.
+                continue
+
+            for source_phrase, translation in steps: # Walks the sentence phrase by phrase. # Durchläuft den Satz Phrase für Phrase.
+                plan.append(("speech", source_phrase, lang, "en-US-JennyMultilingualNeural", "0.8", True)) # Reusable source word clip. # Wiederverwendbarer Quellwort-Clip.
+                plan.append(("break", 300)) # Pause between word and translation. # Pause zwischen Wort und Übersetzung.
+                if translation: # If translation was found. # Wenn Übersetzung gefunden wurde.
+                    plan.append(("speech", translation, "es-ES", "en-US-JennyMultilingualNeural", "0.8", True)) # Reusable translation clip. # Wiederverwendbarer Übersetzungsclip.
+                plan.append(("break", 500)) # Pause after the pair. # Pause nach dem Paar.
+            plan.append(("break", 1000)) # Pause after the word-by-word part. # Pause nach dem Wort-für-Wort-Teil.
+        return plan # Returns the audio plan. # Gibt den Audioplan zurück.
+
+    def _clip_ssml(self, text: str, lang: str, voice: str, rate: str) -> str: # Defines method to wrap one segment in SSML. # Definiert Methode zum Einbetten eines Segments in SSML.
+        """Build a standalone SSML document for a single sentence or clip"""
+        return ( # Returns the SSML document. # Gibt das SSML-Dokument zurück.
+            '<speak version="1.0" xmlns="http://www.w3.org/2001/10/synthesis" xml:lang="en-US">'
+            f'<voice name="{voice}"><prosody rate="{rate}">'
+            f'<lang xml:lang="{lang}">{escape(text.strip())}</lang>'
+            "</prosody></voice></speak>"
+        )
+
+    def _acquire_synthesizer(self, audio_format: str): # Defines method to borrow an in-memory synthesizer. # Definiert Methode zum Ausleihen eines In-Memory-Synthesizers.
+        """Borrow an idle synthesizer for the format, or create one; callers hold an azure_tts slot, which is the only queue"""
+        idle = self._synthesizer_pools.setdefault(audio_format, []) # Looks up the idle synthesizers of the format. # Sucht die freien Synthesizer des Formats.
+        if idle: # Reuses a warm synthesizer. # Verwendet einen warmen Synthesizer wieder.
+            return idle.pop()
+        return SpeechSynthesizer( # Creates a synthesizer that returns audio in memory. # Erstellt einen Synthesizer, der Audio im Speicher zurückgibt.
+            speech_config=self._get_speech_config(audio_format), audio_config=None # No audio output device or file. # Kein Audioausgabegerät und keine Datei.
+        )
+
+    def _release_synthesizer(self, audio_format: str, synthesizer, healthy: bool = True) -> None: # Defines method to return a synthesizer. # Definiert Methode zur Rückgabe eines Synthesizers.
+        """Keep a synthesizer for reuse, dropping it after a failure"""
+        if healthy: # A synthesizer still busy in the thread pool is dropped, not reused. # Ein im Thread-Pool noch beschäftigter Synthesizer wird verworfen, nicht wiederverwendet.
+            self._synthesizer_pools[audio_format].append(synthesizer) # At most one idle synthesizer per admission slot and hedge ever builds up. # Es sammelt sich höchstens ein freier Synthesizer pro Zulassungsplatz und Absicherung an.
+
+    async def _speak_ssml(self, synthesizer, ssml: str): # Defines method to run one synthesis. # Definiert Methode zur Ausführung einer Synthese.
+        """Run a blocking SSML synthesis in the thread pool, recorded as an Azure TTS upstream call"""
+        with upstream_call("azure_tts"): # Records duration, in-flight calls and exceptions. # Erfasst Dauer, laufende Aufrufe und Ausnahmen.
+            result = await asyncio.get_event_loop().run_in_executor( # Runs CPU-intensive task in thread pool. # Führt CPU-intensive Aufgabe im Thread-Pool aus.
+                None, lambda: synthesizer.speak_ssml_async(ssml).get() # Executes SSML synthesis and gets result. # Führt SSML-Synthese aus und holt Ergebnis.
+            )
+        if result.reason == ResultReason.Canceled: # Canceled results are failures without an exception. # Abgebrochene Ergebnisse sind Fehler ohne Ausnahme.
+            record_upstream_error("azure_tts", "Canceled") # Counts the failure. # Zählt den Fehler.
+        return result # Returns the SDK result. # Gibt das SDK-Ergebnis zurück.
+
+    async def _synthesize_segment( # Defines method to synthesize one segment into memory. # Definiert Methode zur Synthese eines Segments in den Speicher.
+        self, text: str, lang: str, voice: str, rate: str, audio_format: str, # Segment attributes and output format. # Segment-Attribute und Ausgabeformat.
+        fan_out: asyncio.Semaphore, # Bounds the segments of one response in flight. # Begrenzt die laufenden Segmente einer Antwort.
+    ) -> bytes: # Returns MP3 bytes. # Gibt MP3-Bytes zurück.
+        """Synthesize a single sentence or clip and return its audio bytes"""
+        ssml = self._clip_ssml(text, lang, voice, rate) # Builds the segment SSML. # Erstellt das Segment-SSML.
+        async with fan_out: # A response with many segments queues on itself, not on the shared admission queue. # Eine Antwort mit vielen Segmenten wartet bei sich selbst, nicht in der gemeinsamen Zulassungswarteschlange.
+            async with admit("azure_tts"): # The only queue: bounded, shed with 429 and measured; the synthesizer pool never waits. # Die einzige Warteschlange: begrenzt, mit 429 abgewiesen und gemessen; der Synthesizer-Pool wartet nie.
+                handed = [self._acquire_synthesizer(audio_format)] # Borrowed before the timed attempt, so creating a synthesizer doesn't count toward its timeout. # Vor dem zeitbegrenzten Versuch ausgeliehen, damit das Erstellen eines Synthesizers nicht auf dessen Timeout zählt.
+
+                async def attempt(): # The first attempt uses the borrowed synthesizer; retries and hedges borrow their own. # Der erste Versuch nutzt den ausgeliehenen Synthesizer; Wiederholungen und Absicherungen leihen eigene.
+                    return await self._speak_segment(ssml, audio_format, handed.pop() if handed else None)
+
+                try:
+                    return await resilient_call("azure_tts", attempt) # Times out, retries and hedges the segment. # Begrenzt, wiederholt und sichert das Segment ab.
+                finally:
+                    if handed: # No attempt started, e.g. past the deadline. # Kein Versuch gestartet, z. B. nach der Frist.
+                        self._release_synthesizer(audio_format, handed.pop())
+
+    async def _speak_segment(self, ssml: str, audio_format: str, synthesizer=None) -> bytes: # Defines method for one segment attempt. # Definiert Methode für einen Segmentversuch.
+        """Synthesize segment SSML on a pooled synthesizer; a cancelled attempt stops and drops its synthesizer"""
+        if synthesizer is None: # Borrows a synthesizer unless one was handed over. # Leiht einen Synthesizer aus, sofern keiner übergeben wurde.
+            synthesizer = self._acquire_synthesizer(audio_format)
+        healthy = False # Assumes failure until synthesis completes. # Nimmt einen Fehler an, bis die Synthese abgeschlossen ist.
+        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
+            result = await self._speak_ssml(synthesizer, ssml) # Runs the blocking SDK call in the thread pool. # Führt den blockierenden SDK-Aufruf im Thread-Pool aus.
+            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
+                healthy = True # Keeps the synthesizer for reuse. # Behält den Synthesizer zur Wiederverwendung.
+                return strip_id3(result.audio_data) # Returns the raw MP3 frames. # Gibt die rohen MP3-Frames zurück.
+
+            error_message = f"Clip synthesis did not complete: {result.reason}" # Builds an error message. # Erstellt eine Fehlermeldung.
+            if result.reason == ResultReason.Canceled: # Checks if synthesis was canceled. # Prüft, ob Synthese abgebrochen wurde.
+                error_message += f" ({result.cancellation_details.error_details})" # Adds cancellation details. # Fügt Abbruchdetails hinzu.
+            raise Exception(error_message) # Raises so the call is retried or falls back to full synthesis. # Löst aus, damit der Aufruf wiederholt wird oder auf die vollständige Synthese zurückfällt.
+        except asyncio.CancelledError: # Lost a hedge race or timed out while the SDK call still runs. # Hat ein Absicherungsrennen verloren oder ist abgelaufen, während der SDK-Aufruf noch läuft.
+            try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
+                synthesizer.stop_speaking_async() # Aborts the running synthesis. # Bricht die laufende Synthese ab.
+            except Exception: # Ignores errors during cleanup. # Ignoriert Fehler während der Bereinigung.
+                pass
+            raise
+        finally: # Returns the synthesizer to the pool. # Gibt den Synthesizer an den Pool zurück.
+            self._release_synthesizer(audio_format, synthesizer, healthy) # A synthesizer still busy in the thread pool is replaced, not reused. # Ein im Thread-Pool noch beschäftigter Synthesizer wird ersetzt, nicht wiederverwendet.
+
+    def _lookup_clips(self, plan: list[tuple], audio_format: str) -> dict: # Defines method to load cached clips for a plan. # Definiert Methode zum Laden zwischengespeicherter Clips für einen Plan.
+        """Return {segment index: audio} for every reusable segment already in the library"""
+        found = {} # Initializes the result mapping. # Initialisiert die Ergebniszuordnung.
+        lookups = 0 # Counts reusable segments. # Zählt wiederverwendbare Segmente.
+        with stage_timer("tts", "clip_lookup"): # Records lookup time. # Erfasst die Suchzeit.
+            for index, segment in enumerate(plan): # Walks the plan. # Durchläuft den Plan.
+                if segment[0] == "speech" and segment[5]: # Only reusable clips are looked up. # Nur wiederverwendbare Clips werden gesucht.
+                    lookups += 1 # Counts the lookup. # Zählt die Suche.
+                    audio = self.clip_library.get(*segment[1:5], output_format=audio_format) # Reads the clip from the library. # Liest den Clip aus der Bibliothek.
+                    if audio is not None: # If the clip exists. # Wenn der Clip existiert.
+                        found[index] = audio # Records the clip. # Speichert den Clip.
+        record_cache("audio_clips", hits=len(found), misses=lookups - len(found)) # Counts hits and misses. # Zählt Treffer und Fehlschläge.
+        return found # Returns the cached clips. # Gibt die zwischengespeicherten Clips zurück.
+
+    @timed("tts", "file_write") # Records file write time. # Erfasst die Dateischreibzeit.
+    def _write_audio_file(self, output_path: str, audio: bytes) -> None: # Defines method to write assembled audio. # Definiert Methode zum Schreiben des zusammengesetzten Audios.
+        with open(output_path, "wb") as f: # Opens the output file. # Öffnet die Ausgabedatei.
+            f.write(audio) # Writes the audio bytes. # Schreibt die Audio-Bytes.
+
+    async def _text_to_speech_from_clips( # Defines method to assemble word-by-word audio from clips. # Definiert Methode zum Zusammensetzen von Wort-für-Wort-Audio aus Clips.
+        self,
+        word_pairs: list[tuple[str, str, bool]], # Word pairs with language flag. # Wortpaare mit Sprachflagge.
+        complete_text: str, # Newline-separated translations. # Zeilengetrennte Übersetzungen.
+        output_path: str, # Destination audio file. # Zielaudiodatei.
+        audio_mode: Optional[str] = None, # "full" or "compact". # "full" oder "compact".
+        audio_format: Optional[str] = None, # Concatenable output format name. # Name eines verkettbaren Ausgabeformats.
+        pipeline: Optional["SynthesisPipeline"] = None, # Segments already synthesizing since the response streamed in. # Segmente, die seit dem Eintreffen der gestreamten Antwort bereits synthetisiert werden.
+    ) -> Optional[str]: # Returns filename or None. # Gibt Dateinamen oder None zurück.
+        """Assemble audio from cached word clips, fresh sentence audio and generated silence"""
+        plan = self._build_audio_plan(complete_text, word_pairs, audio_mode) # Lays out the audio segments. # Gliedert die Audiosegmente.
+        if not plan: # Nothing to speak. # Nichts zu sprechen.
+            return None
+
+        audio_format = audio_format or DEFAULT_AUDIO_FORMAT # Falls back to the default format. # Fällt auf das Standardformat zurück.
+        format_details = get_audio_format(audio_format) # Gets sample rate and bitrate for silence frames. # Holt Abtastrate und Bitrate für Stille-Frames.
+        audio_by_index = await run_in_executor(self._lookup_clips, plan, audio_format) # Loads cached clips off the event loop. # Lädt zwischengespeicherte Clips außerhalb der Ereignisschleife.
+
+        pending = {} # Groups missing segments so each unique one is synthesized once. # Gruppiert fehlende Segmente, damit jedes eindeutige nur einmal synthetisiert wird.
+        for index, segment in enumerate(plan): # Walks the plan. # Durchläuft den Plan.
+            if segment[0] == "speech" and index not in audio_by_index: # Needs synthesis. # Benötigt Synthese.
+                pending.setdefault(segment[1:], []).append(index) # Groups by (text, lang, voice, rate, reusable). # Gruppiert nach (Text, Sprache, Stimme, Rate, wiederverwendbar).
+
+        segments = list(pending) # Fixes the order of the pending segments. # Legt die Reihenfolge der ausstehenden Segmente fest.
+        fan_out = pipeline.fan_out if pipeline else asyncio.Semaphore(self.clip_concurrency) # Shared with the segments the pipeline started. # Geteilt mit den Segmenten, die die Pipeline gestartet hat.
+        prefetched = [pipeline.take(segment) if pipeline else None for segment in segments] # Syntheses the pipeline started; it stores their clips itself. # Von der Pipeline gestartete Synthesen; sie speichert deren Clips selbst.
+        tasks = [ # One synthesis per unique segment, reusing those the pipeline started. # Eine Synthese pro eindeutigem Segment, wobei die von der Pipeline gestarteten wiederverwendet werden.
+            task or asyncio.ensure_future(self._synthesize_segment(*segment[:4], audio_format, fan_out))
+            for segment, task in zip(segments, prefetched)
+        ]
+        try: # Synthesizes missing segments concurrently through the pool. # Synthetisiert fehlende Segmente gleichzeitig über den Pool.
+            results = await asyncio.gather(*tasks)
+        except BaseException: # A failed segment, the deadline or a disconnect. # Ein fehlgeschlagenes Segment, die Frist oder ein Verbindungsabbruch.
+            for task in tasks: # Stops the other syntheses instead of finishing them for nobody. # Stoppt die anderen Synthesen, statt sie für niemanden zu beenden.
+                task.cancel()
+            raise
+        for segment, audio, task in zip(segments, results, prefetched): # Distributes the synthesized audio. # Verteilt das synthetisierte Audio.
+            if segment[4] and task is None: # Stores reusable clips for later requests; the pipeline stored its own. # Speichert wiederverwendbare Clips für spätere Anfragen; die Pipeline hat ihre eigenen gespeichert.
+                await run_in_executor( # Writes the clip off the event loop. # Schreibt den Clip außerhalb der Ereignisschleife.
+                    lambda seg=segment, data=audio: self.clip_library.put(*seg[:4], data, output_format=audio_format)
+                )
+            for index in pending[segment]: # Every occurrence shares the same audio. # Jedes Vorkommen teilt dasselbe Audio.
+                audio_by_index[index] = audio # Records the audio. # Speichert das Audio.
+
+        chunks = [] # Initializes the output chunks. # Initialisiert die Ausgabeteile.
+        for index, segment in enumerate(plan): # Assembles the plan in order. # Setzt den Plan in Reihenfolge zusammen.
+            if segment[0] == "break": # Pauses become silent frames. # Pausen werden zu stillen Frames.
+                chunks.append(self.clip_library.silence( # Adds the silence. # Fügt die Stille hinzu.
+                    segment[1], format_details["sample_rate"], format_details["bitrate_kbps"] # Matches the frame format of the clips. # Entspricht dem Frame-Format der Clips.
+                ))
+            else: # Speech segments use their synthesized or cached audio. # Sprachsegmente verwenden ihr synthetisiertes oder zwischengespeichertes Audio.
+                chunks.append(audio_by_index[index]) # Adds the audio. # Fügt das Audio hinzu.
+
+        with stage_timer("tts", "assemble"): # Records assembly time. # Erfasst die Zusammensetzungszeit.
+            audio = b"".join(chunks) # Joins the frames. # Verbindet die Frames.
+        await run_in_executor(self._write_audio_file, output_path, audio) # Writes the assembled file off the event loop. # Schreibt die zusammengesetzte Datei außerhalb der Ereignisschleife.
+        record_audio_bytes(audio_format, len(audio)) # Counts the produced audio. # Zählt das erzeugte Audio.
+        return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
+
+    @timed("tts", "word_pairs_audio") # Records total word-by-word audio time. # Erfasst die gesamte Wort-für-Wort-Audiozeit.
+    async def text_to_speech_word_pairs( # Defines method to convert word pairs to speech. # Definiert Methode zur Umwandlung von Wortpaaren in Sprache.
+        self,
+        word_pairs: list[tuple[str, str]], # Source-target word pairs. # Quell-Ziel-Wortpaare.
+        source_lang: str, # Source language code. # Quellsprachcode.
+        target_lang: str, # Target language code. # Zielsprachcode.
+        output_path: Optional[str] = None, # Optional custom output path. # Optionaler benutzerdefinierter Ausgabepfad.
+        complete_text: Optional[str] = None,  # New parameter for full text. # Neuer Parameter für vollständigen Text.
+        audio_mode: Optional[str] = None, # "full" or "compact", defaults to TTS_AUDIO_MODE. # "full" oder "compact", standardmäßig TTS_AUDIO_MODE.
+        audio_format: Optional[str] = None, # Output format name, defaults to TTS_AUDIO_FORMAT. # Name des Ausgabeformats, standardmäßig TTS_AUDIO_FORMAT.
+        pipeline: Optional["SynthesisPipeline"] = None, # Pipeline fed while the response streamed in. # Während des Streamens der Antwort gefütterte Pipeline.
+    ) -> Optional[str]: # Returns filename or None if failed. # Gibt Dateinamen zurück oder None bei Fehlschlag.
+        synthesizer = None # Initializes synthesizer to None for cleanup in finally block. # Initialisiert Synthesizer mit None für Bereinigung im Finally-Block.
+        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
+            if not output_path: # Checks if output path is not provided. # Prüft, ob kein Ausgabepfad angegeben ist.
+                output_path = self._new_output_path(audio_format) # Creates full output path. # Erstellt vollständigen Ausgabepfad.
+                logger.debug("Output path: %s", output_path) # Logs the output path. # Protokolliert den Ausgabepfad.
+
+            can_concatenate = get_audio_format(audio_format)["concatenable"] # Clip assembly needs a frame-joinable format. # Die Clip-Zusammensetzung benötigt ein Format mit verbindbaren Frames.
+            if self.clip_library and can_concatenate and word_pairs and complete_text: # Uses the clip library when it is enabled. # Verwendet die Clip-Bibliothek, wenn sie aktiviert ist.
+                try: # Tries clip assembly first. # Versucht zuerst die Clip-Zusammensetzung.
+                    return await self._text_to_speech_from_clips( # Assembles audio from clips. # Setzt Audio aus Clips zusammen.
+                        word_pairs, complete_text, output_path, audio_mode, audio_format, pipeline # Passes the request options. # Übergibt die Anfrageoptionen.
+                    )
+                except (UpstreamOverloaded, DeadlineExceeded): # Full synthesis would need the same overloaded upstream, or come too late. # Die vollständige Synthese bräuchte denselben überlasteten Upstream oder käme zu spät.
+                    raise
+                except Exception as e: # Falls back to single-document synthesis. # Fällt auf die Synthese eines einzelnen Dokuments zurück.
+                    logger.warning("Clip assembly failed, using full synthesis: %s", e) # Logs the fallback. # Protokolliert den Rückfall.
+
+            audio_config = AudioOutputConfig(filename=output_path) # Configures audio output to file. # Konfiguriert Audio-Ausgabe in Datei.
+            speech_config = SpeechConfig( # Creates speech configuration. # Erstellt Sprachkonfiguration.
+                subscription=self.subscription_key, region=self.region # Sets API key and region. # Setzt API-Schlüssel und Region.
+            )
+            speech_config.set_speech_synthesis_output_format( # Sets audio format. # Setzt Audioformat.
+                self._sdk_output_format(audio_format) # Uses the negotiated format. # Verwendet das ausgehandelte Format.
+            )
+
+            synthesizer = SpeechSynthesizer( # Creates speech synthesizer. # Erstellt Sprachsynthesizer.
+                speech_config=speech_config, audio_config=audio_config # Configures with speech and audio settings. # Konfiguriert mit Sprach- und Audioeinstellungen.
+            )
+
+            # Use the new combined SSML generator
+            ssml = self.generate_enhanced_ssml( # Generates enhanced SSML. # Generiert erweitertes SSML.
+                text=complete_text, # Full text content. # Vollständiger Textinhalt.
+                word_pairs=word_pairs, # Word pairs for pronunciation. # Wortpaare für Aussprache.
+                source_lang=source_lang, # Source language. # Quellsprache.
+                target_lang=target_lang, # Target language. # Zielsprache.
+                audio_mode=audio_mode, # Full or compact word-by-word sections. # Vollständige oder kompakte Wort-für-Wort-Abschnitte.
+            )
+            log_payload(logger, "Generated SSML", ssml) # Sampled and truncated debug output. # Stichprobenartige und gekürzte Debug-Ausgabe.
+
+            check_deadline("synthesis") # Skips synthesis for a request that is already too late. # Überspringt die Synthese für eine bereits zu späte Anfrage.
+            async with admit("azure_tts"): # Waits for an Azure TTS slot or fails fast with 429. # Wartet auf einen Azure-TTS-Platz oder scheitert schnell mit 429.
+                result = await resilient_call( # Runs the blocking synthesis in the thread pool with a timeout; a file synthesis is never repeated. # Führt die blockierende Synthese mit Timeout im Thread-Pool aus; eine Dateisynthese wird nie wiederholt.
+                    "azure_tts", lambda: self._speak_ssml(synthesizer, ssml), idempotent=False,
+                )
+
+            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
+                record_audio_bytes(audio_format, os.path.getsize(output_path)) # Counts the produced audio. # Zählt das erzeugte Audio.
+                return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
+
+            if result.reason == ResultReason.Canceled: # Checks if synthesis was canceled. # Prüft, ob Synthese abgebrochen wurde.
+                cancellation_details = result.cancellation_details # Gets cancellation details. # Holt Abbruchdetails.
+                logger.warning("Speech synthesis canceled: %s", cancellation_details.reason) # Logs cancellation reason. # Protokolliert Abbruchgrund.
+                if cancellation_details.reason == CancellationReason.Error: # Checks if cancellation was due to error. # Prüft, ob Abbruch aufgrund eines Fehlers erfolgte.
+                    logger.warning("Error details: %s", cancellation_details.error_details) # Logs error details. # Protokolliert Fehlerdetails.
+
+            return None # Returns None if synthesis didn't complete successfully. # Gibt None zurück, wenn Synthese nicht erfolgreich abgeschlossen wurde.
+        except (UpstreamOverloaded, DeadlineExceeded): # Reaches the client as 429 or 504 instead of a silent answer. # Erreicht den Client als 429 oder 504 statt einer stummen Antwort.
+            raise
+        except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
+            logger.error("Error in text_to_speech_word_pairs: %s", e) # Logs the error. # Protokolliert den Fehler.
+            return None # Returns None on error. # Gibt None bei Fehler zurück.
+        finally: # Releases the synthesizer and its output file handle. # Gibt den Synthesizer und sein Ausgabedatei-Handle frei.
+            if pipeline: # Drops segments the final audio didn't need. # Verwirft Segmente, die das endgültige Audio nicht brauchte.
+                pipeline.cancel()
+            if synthesizer: # Checks if synthesizer was created. # Prüft, ob Synthesizer erstellt wurde.
+                try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
+                    synthesizer.stop_speaking_async() # Stops any ongoing synthesis. # Stoppt laufende Synthese.
+                except: # Ignores errors during cleanup. # Ignoriert Fehler während der Bereinigung.
+                    pass # Does nothing if cleanup fails. # Tut nichts, wenn Bereinigung fehlschlägt.
+                del synthesizer # Drops the last reference so the SDK closes the file now, not at the next garbage collection. # Entfernt die letzte Referenz, damit das SDK die Datei jetzt schließt und nicht erst bei der nächsten Speicherbereinigung.
+
+    # async def text_to_speech(
+    #     self, ssml: str, output_path: Optional[str] = None
+    # ) -> Optional[str]:
+    @timed("tts", "ssml_audio") # Records total SSML audio time. # Erfasst die gesamte SSML-Audiozeit.
+    async def text_to_speech( # Defines method to convert SSML to speech. # Definiert Methode zur Umwandlung von SSML in Sprache.
+        self, ssml: str, output_path: Optional[str] = None, # SSML text and optional output path. # SSML-Text und optionaler Ausgabepfad.
+        audio_format: Optional[str] = None, # Output format name, defaults to TTS_AUDIO_FORMAT. # Name des Ausgabeformats, standardmäßig TTS_AUDIO_FORMAT.
+    ) -> Optional[str]: # Returns filename or None if failed. # Gibt Dateinamen zurück oder None bei Fehlschlag.
+        """Convert SSML to speech with proper language handling"""
+        synthesizer = None # Initializes synthesizer to None for cleanup in finally block. # Initialisiert Synthesizer mit None für Bereinigung im Finally-Block.
+        try: # Starts try block for error handling. # Beginnt Try-Block für Fehlerbehandlung.
+            if not output_path: # Checks if output path is not provided. # Prüft, ob kein Ausgabepfad angegeben ist.
+                output_path = self._new_output_path(audio_format) # Creates full output path. # Erstellt vollständigen Ausgabepfad.
+                logger.debug("Output path: %s", output_path) # Logs the output path. # Protokolliert den Ausgabepfad.
+
+            audio_config = AudioOutputConfig(filename=output_path) # Configures audio output to file. # Konfiguriert Audio-Ausgabe in Datei.
+            synthesizer = SpeechSynthesizer( # Creates speech synthesizer. # Erstellt Sprachsynthesizer.
+                speech_config=self._get_speech_config(audio_format), audio_config=audio_config # Configures with speech and audio settings. # Konfiguriert mit Sprach- und Audioeinstellungen.
+            )
+
+            check_deadline("synthesis") # Skips synthesis for a request that is already too late. # Überspringt die Synthese für eine bereits zu späte Anfrage.
+            async with admit("azure_tts"): # Waits for an Azure TTS slot or fails fast with 429. # Wartet auf einen Azure-TTS-Platz oder scheitert schnell mit 429.
+                result = await resilient_call( # Runs the blocking synthesis in the thread pool with a timeout; a file synthesis is never repeated. # Führt die blockierende Synthese mit Timeout im Thread-Pool aus; eine Dateisynthese wird nie wiederholt.
+                    "azure_tts", lambda: self._speak_ssml(synthesizer, ssml), idempotent=False,
+                )
+
+            if result.reason == ResultReason.SynthesizingAudioCompleted: # Checks if synthesis completed successfully. # Prüft, ob Synthese erfolgreich abgeschlossen wurde.
+                record_audio_bytes(audio_format, os.path.getsize(output_path)) # Counts the produced audio. # Zählt das erzeugte Audio.
+                return os.path.basename(output_path) # Returns only filename without path. # Gibt nur Dateinamen ohne Pfad zurück.
+
+            return None # Returns None if synthesis didn't complete successfully. # Gibt None zurück, wenn Synthese nicht erfolgreich abgeschlossen wurde.
+
+        except (UpstreamOverloaded, DeadlineExceeded): # Reaches the client as 429 or 504 instead of a silent answer. # Erreicht den Client als 429 oder 504 statt einer stummen Antwort.
+            raise
+        except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
+            logger.error("Exception in text_to_speech: %s", e) # Logs the error. # Protokolliert den Fehler.
+            return None # Returns None on error. # Gibt None bei Fehler zurück.
+        finally: # Finally block for cleanup regardless of success/failure. # Finally-Block für Bereinigung unabhängig von Erfolg/Fehlschlag.
+            if synthesizer: # Checks if synthesizer was created. # Prüft, ob Synthesizer erstellt wurde.
+                try: # Nested try for cleanup. # Verschachtelter Try für Bereinigung.
+                    synthesizer.stop_speaking_async() # Stops any ongoing synthesis. # Stoppt laufende Synthese.
+                except: # Ignores errors during cleanup. # Ignoriert Fehler während der Bereinigung.
+                    pass # Does nothing if cleanup fails. # Tut nichts, wenn Bereinigung fehlschlägt.
+
+
+class SynthesisPipeline: # Synthesizes sections of a response that is still streaming. # Synthetisiert Abschnitte einer Antwort, die noch gestreamt wird.
+    """Start the segment syntheses of every completed section, for the final clip assembly to pick up in order"""
+
+    def __init__(self, tts: EnhancedTTSService, audio_format: str, audio_mode: Optional[str]): # Initializes the pipeline. # Initialisiert die Pipeline.
+        self.tts = tts # Service doing the syntheses. # Dienst, der die Synthesen ausführt.
+        self.audio_format = audio_format # Output format of the segments. # Ausgabeformat der Segmente.
+        self.audio_mode = audio_mode # "full" or "compact". # "full" oder "compact".
+        self.tasks = {} # (text, lang, voice, rate, reusable) -> synthesis task. # (Text, Sprache, Stimme, Rate, wiederverwendbar) -> Synthese-Task.
+        self.fan_out = asyncio.Semaphore(tts.clip_concurrency) # Segments of this response in flight. # Laufende Segmente dieser Antwort.
+
+    def feed(self, translations: list, word_pairs: list) -> None: # Starts the segments of the sections seen so far. # Startet die Segmente der bisher gesehenen Abschnitte.
+        """Plan the audio of the sections parsed so far and start syntheses for segments not yet started"""
+        for segment in self.tts._build_audio_plan("\n".join(translations), word_pairs, self.audio_mode): # Same plan the final assembly builds. # Derselbe Plan, den die endgültige Zusammensetzung erstellt.
+            if segment[0] == "speech" and segment[1:] not in self.tasks: # Each unique segment starts once. # Jedes eindeutige Segment startet einmal.
+                self.tasks[segment[1:]] = asyncio.ensure_future(self._prefetch(segment[1:]))
+
+    async def _prefetch(self, segment: tuple) -> bytes: # Produces the audio of one segment. # Erzeugt das Audio eines Segments.
+        if segment[4]: # Reusable clips may already be in the library. # Wiederverwendbare Clips sind eventuell schon in der Bibliothek.
+            audio = await run_in_executor(
+                lambda: self.tts.clip_library.get(*segment[:4], output_format=self.audio_format)
+            )
+            if audio is not None: # Already stored. # Bereits gespeichert.
+                return audio
+        audio = await self.tts._synthesize_segment(*segment[:4], self.audio_format, self.fan_out) # Waits for admission like any segment. # Wartet wie jedes Segment auf Zulassung.
+        if segment[4]: # Stores the fresh clip once, so the assembly doesn't write it again. # Speichert den frischen Clip einmal, damit die Zusammensetzung ihn nicht erneut schreibt.
+            await run_in_executor(lambda: self.tts.clip_library.put(*segment[:4], audio, output_format=self.audio_format))
+        return audio
+
+    def take(self, segment: tuple) -> Optional[asyncio.Future]: # Hands a started synthesis to the assembly. # Übergibt eine gestartete Synthese an die Zusammensetzung.
+        return self.tasks.pop(segment, None)
+
+    def cancel(self) -> None: # Stops syntheses nobody will use. # Stoppt Synthesen, die niemand verwenden wird.
+        for task in self.tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled(): # Retrieves a failure so it isn't reported as unhandled. # Holt einen Fehler ab, damit er nicht als unbehandelt gemeldet wird.
+                task.exception()
+        self.tasks.clear()
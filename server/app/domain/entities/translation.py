@@ -24,6 +24,7 @@ class Translation(BaseModel): # Defines a Translation class that inherits from P
     source_language: str # The language code of the original text (required). # Der Sprachcode des Originaltextes (erforderlich).
     target_language: str # The language code of the translated text (required). # Der Sprachcode des übersetzten Textes (erforderlich).
     audio_path: Optional[str] = None # Optional path to an audio file of the pronunciation. # Optionaler Pfad zu einer Audiodatei der Aussprache.
+    audio_job_id: Optional[str] = None # Optional id of the background job synthesizing the audio. # Optionale ID des Hintergrund-Jobs, der das Audio synthetisiert.
     translations: Optional[Dict[str, str]] = None # Optional dictionary of alternative translations with different formality levels. # Optionales Wörterbuch alternativer Übersetzungen mit verschiedenen Formalitätsstufen.
     word_by_word: Optional[Dict[str, Dict[str, str]]] = None # Optional dictionary mapping each word to its translation and part of speech. # Optionales Wörterbuch, das jedes Wort seiner Übersetzung und Wortart zuordnet.
     grammar_explanations: Optional[Dict[str, str]] = None # Optional dictionary of grammar explanations for the translation. # Optionales Wörterbuch mit Grammatikerklärungen für die Übersetzung.
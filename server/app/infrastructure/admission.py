@@ -0,0 +1,171 @@
+# Admission Control
+#
+# Limits the concurrent calls to each upstream (Gemini, Azure TTS, Azure and Google speech recognition) and queues the rest in a bounded FIFO. # Begrenzt die gleichzeitigen Aufrufe an jeden Upstream (Gemini, Azure TTS, Azure- und Google-Spracherkennung) und reiht den Rest in eine begrenzte FIFO-Warteschlange ein.
+# A call that finds the queue full, or waits longer than ADMISSION_MAX_WAIT_SECONDS, fails at once with 429 and a Retry-After estimate. # Ein Aufruf, der die Warteschlange voll vorfindet oder länger als ADMISSION_MAX_WAIT_SECONDS wartet, scheitert sofort mit 429 und einer Retry-After-Schätzung.
+#
+# Usage:
+# async with admit("gemini"): ... # Waits for a Gemini slot or raises UpstreamOverloaded. # Wartet auf einen Gemini-Platz oder löst UpstreamOverloaded aus.
+# ADMISSION_GEMINI_LIMIT=8 ADMISSION_GEMINI_QUEUE=32 # Concurrent calls and waiting calls per worker process. # Gleichzeitige und wartende Aufrufe pro Worker-Prozess.
+# release = try_admit("gemini") # Takes an idle slot for optional work such as a hedged call, or returns None. # Nimmt einen freien Platz für optionale Arbeit wie einen abgesicherten Aufruf oder gibt None zurück.
+# admission_status() # Active and queued calls per upstream, shown by /health. # Laufende und wartende Aufrufe pro Upstream, angezeigt von /health.
+#
+# EN: Under a burst, excess requests are turned away in milliseconds instead of piling onto a throttled upstream and timing out for everyone.
+# DE: Bei einem Ansturm werden überzählige Anfragen in Millisekunden abgewiesen, statt sich auf einem gedrosselten Upstream zu stauen und für alle in Timeouts zu laufen.
+
+import asyncio # For the waiting calls. # Für die wartenden Aufrufe.
+import math # For rounding Retry-After up. # Zum Aufrunden von Retry-After.
+import os # For configuration. # Für die Konfiguration.
+import time # For wait and hold times. # Für Warte- und Haltezeiten.
+from collections import deque # For the FIFO of waiting calls. # Für die FIFO wartender Aufrufe.
+from typing import Callable, Optional # For type hinting. # Für Typhinweise.
+
+from fastapi import HTTPException # The overload error is also the HTTP response. # Der Überlastfehler ist zugleich die HTTP-Antwort.
+from prometheus_client import Counter, Gauge, Histogram # For queue metrics. # Für Warteschlangenmetriken.
+
+from .deadline import DeadlineExceeded, bounded, expired # Never waits past the request's deadline. # Wartet nie über die Frist der Anfrage hinaus.
+
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true" # Disables all limits when false. # Deaktiviert alle Limits, wenn false.
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10")) # Longest a call waits in the queue. # Längste Wartezeit eines Aufrufs in der Warteschlange.
+DEFAULT_LIMITS = { # Upstream -> (concurrent calls, queued calls) per worker process. # Upstream -> (gleichzeitige Aufrufe, wartende Aufrufe) pro Worker-Prozess.
+    "gemini": (8, 32), "azure_tts": (16, 64), "azure_stt": (8, 32), "google_stt": (4, 16),
+    "azure_dictation": (8, 8), # Live dictation sessions hold their slot for minutes, so they get their own. # Live-Diktatsitzungen halten ihren Platz minutenlang und erhalten daher einen eigenen.
+}
+
+QUEUE_DEPTH = Gauge( # Calls waiting for a slot. # Auf einen Platz wartende Aufrufe.
+    "speak_admission_queue_depth", "Calls waiting for an upstream slot", ["upstream"], multiprocess_mode="livesum"
+)
+WAIT_SECONDS = Histogram( # Time spent in the queue by admitted calls. # Von zugelassenen Aufrufen in der Warteschlange verbrachte Zeit.
+    "speak_admission_wait_seconds", "Time a call waited for an upstream slot", ["upstream"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0),
+)
+REJECTED = Counter( # Calls turned away. # Abgewiesene Aufrufe.
+    "speak_admission_rejected_total", "Calls rejected by admission control", ["upstream", "reason"]
+)
+
+
+class UpstreamOverloaded(HTTPException): # 429 raised when an upstream has no room. # 429, ausgelöst, wenn ein Upstream keinen Platz hat.
+    def __init__(self, upstream: str, reason: str, retry_after: int): # Builds the response. # Erstellt die Antwort.
+        super().__init__(
+            status_code=429, detail=f"{upstream} is overloaded, retry in {retry_after} s",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.upstream = upstream # Upstream that rejected the call. # Upstream, der den Aufruf abgewiesen hat.
+        self.reason = reason # "queue_full" or "timeout". # "queue_full" oder "timeout".
+        self.retry_after = retry_after # Seconds until a retry is likely to be admitted. # Sekunden, bis ein erneuter Versuch wahrscheinlich zugelassen wird.
+
+
+class UpstreamLimiter: # Concurrency limit with a bounded FIFO queue. # Nebenläufigkeitslimit mit begrenzter FIFO-Warteschlange.
+    """Admit up to limit concurrent calls and queue up to max_queue more; everything beyond is rejected"""
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float): # Stores the settings. # Speichert die Einstellungen.
+        self.name = name # Upstream name. # Upstream-Name.
+        self.limit = limit # Concurrent calls. # Gleichzeitige Aufrufe.
+        self.max_queue = max_queue # Waiting calls. # Wartende Aufrufe.
+        self.max_wait = max_wait # Longest wait in seconds. # Längste Wartezeit in Sekunden.
+        self.active = 0 # Calls holding a slot. # Aufrufe, die einen Platz halten.
+        self._waiters = deque() # Futures of waiting calls, oldest first. # Futures wartender Aufrufe, älteste zuerst.
+        self._hold_seconds = 1.0 # Moving average of how long a call holds its slot. # Gleitender Durchschnitt, wie lange ein Aufruf seinen Platz hält.
+
+    def retry_after(self) -> int: # Estimates when a new call would get a slot. # Schätzt, wann ein neuer Aufruf einen Platz bekäme.
+        """Seconds until the current queue has drained, from the average hold time"""
+        return max(1, min(60, math.ceil((len(self._waiters) + 1) * self._hold_seconds / self.limit)))
+
+    def _reject(self, reason: str): # Turns the call away. # Weist den Aufruf ab.
+        REJECTED.labels(self.name, reason).inc()
+        raise UpstreamOverloaded(self.name, reason, self.retry_after())
+
+    async def acquire(self) -> None: # Takes a slot, waiting in line if needed. # Nimmt einen Platz und wartet bei Bedarf in der Schlange.
+        if self.active < self.limit and not self._waiters: # Free slot and nobody ahead. # Freier Platz und niemand davor.
+            self.active += 1
+            WAIT_SECONDS.labels(self.name).observe(0.0)
+            return
+        if len(self._waiters) >= self.max_queue: # Sheds load before doing any waiting. # Wirft Last ab, bevor gewartet wird.
+            self._reject("queue_full")
+
+        future = asyncio.get_running_loop().create_future() # Completed by release() when the slot is handed over. # Von release() erfüllt, wenn der Platz übergeben wird.
+        self._waiters.append(future)
+        QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(future, bounded(self.max_wait)) # Shortened by the request's deadline. # Durch die Frist der Anfrage verkürzt.
+        except asyncio.TimeoutError: # Waited too long. # Zu lange gewartet.
+            if not _granted(future): # The slot may have been handed over just as the wait expired. # Der Platz wurde eventuell genau beim Ablauf übergeben.
+                if expired(): # The request ran out of time, not the queue. # Der Anfrage ist die Zeit ausgegangen, nicht der Warteschlange.
+                    raise DeadlineExceeded(f"{self.name} admission")
+                self._reject("timeout")
+        except asyncio.CancelledError: # The request went away while waiting. # Die Anfrage ist während des Wartens verschwunden.
+            if _granted(future): # Passes on a slot that was already handed over. # Gibt einen bereits übergebenen Platz weiter.
+                self.release()
+            raise
+        finally:
+            if future in self._waiters: # Still queued after a timeout or cancellation. # Nach Timeout oder Abbruch noch eingereiht.
+                self._waiters.remove(future)
+            QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+        WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+
+    def try_acquire(self) -> bool: # Takes a slot only if one is idle. # Nimmt einen Platz nur, wenn einer frei ist.
+        """Take a free slot without waiting, for optional work such as hedged calls"""
+        if self.active < self.limit and not self._waiters: # Never jumps the queue. # Drängelt nie vor.
+            self.active += 1
+            return True
+        return False
+
+    def release(self, held: Optional[float] = None) -> None: # Frees a slot. # Gibt einen Platz frei.
+        """Hand the slot to the oldest waiting call, or return it to the pool"""
+        if held is not None: # Tracks the hold time for Retry-After. # Verfolgt die Haltezeit für Retry-After.
+            self._hold_seconds = 0.9 * self._hold_seconds + 0.1 * held
+        while self._waiters: # Skips calls that timed out or were cancelled. # Überspringt Aufrufe, die abgelaufen sind oder abgebrochen wurden.
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None) # The slot moves on without being released. # Der Platz wird weitergegeben, ohne freigegeben zu werden.
+                QUEUE_DEPTH.labels(self.name).set(len(self._waiters))
+                return
+        self.active -= 1
+
+    def status(self) -> dict: # Current load. # Aktuelle Last.
+        return {"active": self.active, "limit": self.limit, "queued": len(self._waiters), "max_queue": self.max_queue}
+
+
+def _granted(future: asyncio.Future) -> bool: # Whether release() handed a slot to this waiter. # Ob release() diesem Wartenden einen Platz übergeben hat.
+    return future.done() and not future.cancelled()
+
+
+def _limiter_from_env(name: str, limit: int, max_queue: int) -> UpstreamLimiter: # Reads ADMISSION_<NAME>_* overrides. # Liest ADMISSION_<NAME>_*-Überschreibungen.
+    prefix = f"ADMISSION_{name.upper()}"
+    return UpstreamLimiter(
+        name, int(os.getenv(f"{prefix}_LIMIT", str(limit))), int(os.getenv(f"{prefix}_QUEUE", str(max_queue))), ADMISSION_MAX_WAIT_SECONDS,
+    )
+
+
+limiters = {name: _limiter_from_env(name, *limits) for name, limits in DEFAULT_LIMITS.items()} # Limiters of this process. # Limiter dieses Prozesses.
+
+
+class admit: # Async context manager holding an upstream slot. # Asynchroner Kontextmanager, der einen Upstream-Platz hält.
+    """Hold a slot of the upstream for the duration of the block, or raise UpstreamOverloaded"""
+    __slots__ = ("limiter", "_start")
+
+    def __init__(self, upstream: str): # Looks up the limiter. # Sucht den Limiter.
+        self.limiter = limiters.get(upstream) if ADMISSION_CONTROL else None # Unknown upstreams aren't limited. # Unbekannte Upstreams werden nicht begrenzt.
+
+    async def __aenter__(self): # Waits for a slot. # Wartet auf einen Platz.
+        if self.limiter is not None:
+            await self.limiter.acquire()
+            self._start = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb): # Frees the slot. # Gibt den Platz frei.
+        if self.limiter is not None:
+            self.limiter.release(time.perf_counter() - self._start)
+        return False # Never swallows exceptions. # Unterdrückt nie Ausnahmen.
+
+
+def try_admit(upstream: str) -> Optional[Callable[[], None]]: # Takes an idle slot for optional work. # Nimmt einen freien Platz für optionale Arbeit.
+    """Return the release function of a newly taken slot, or None when the upstream has no idle slot"""
+    limiter = limiters.get(upstream) if ADMISSION_CONTROL else None
+    if limiter is None: # Not limited. # Nicht begrenzt.
+        return lambda: None
+    return limiter.release if limiter.try_acquire() else None
+
+
+def admission_status() -> dict: # Load of every upstream. # Last jedes Upstreams.
+    return {name: limiter.status() for name, limiter in limiters.items()}
@@ -9,61 +9,92 @@
 # EN: Implements a RESTful API for text translation, speech-to-text, and text-to-speech functionalities.
 # DE: Implementiert eine RESTful-API für Textübersetzung, Sprache-zu-Text und Text-zu-Sprache-Funktionalitäten.
 
+import asyncio # Imports asyncio for the background service warm-up. # Importiert asyncio für das Aufwärmen der Dienste im Hintergrund.
 import logging # Imports Python's logging module for application logging. # Importiert Pythons Logging-Modul für Anwendungsprotokollierung.
 import tempfile # Imports tempfile for creating temporary files. # Importiert tempfile zum Erstellen temporärer Dateien.
 import os # Imports operating system interfaces. # Importiert Betriebssystemschnittstellen.
+import hmac # Imports constant-time comparison for the admin token. # Importiert konstante Zeitvergleiche für das Admin-Token.
+import json # Imports json for streamed batch results. # Importiert json für gestreamte Stapelergebnisse.
+import time # Imports time for batch timings. # Importiert time für Stapel-Zeitmessungen.
+import re # Imports re for validating audio job ids. # Importiert re zum Prüfen von Audio-Job-IDs.
 from datetime import datetime # Imports datetime for timestamp handling. # Importiert datetime für die Verarbeitung von Zeitstempeln.
 from contextlib import asynccontextmanager # Imports async context manager for managing application lifecycle. # Importiert async-Kontextmanager für die Verwaltung des Anwendungslebenszyklus.
-from fastapi import FastAPI, HTTPException, UploadFile, File # Imports FastAPI framework and components. # Importiert FastAPI-Framework und Komponenten.
-from fastapi.responses import FileResponse, JSONResponse # Imports FastAPI response types. # Importiert FastAPI-Antworttypen.
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, WebSocket, WebSocketDisconnect # Imports FastAPI framework and components. # Importiert FastAPI-Framework und Komponenten.
+from starlette.websockets import WebSocketState # Imports the connection state for closing live dictation cleanly. # Importiert den Verbindungszustand zum sauberen Schließen des Live-Diktats.
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse # Imports FastAPI response types. # Importiert FastAPI-Antworttypen.
 from fastapi.middleware.cors import CORSMiddleware # Imports CORS middleware for cross-origin requests. # Importiert CORS-Middleware für ursprungsübergreifende Anfragen.
 from pydantic import BaseModel # Imports Pydantic for data validation. # Importiert Pydantic für Datenvalidierung.
-from typing import Optional # Imports Optional type for optional fields. # Importiert Optional-Typ für optionale Felder.
-from ...application.services.speech_service import SpeechService # Imports SpeechService from application layer. # Importiert SpeechService aus der Anwendungsschicht.
-from ...application.services.translation_service import TranslationService # Imports TranslationService from application layer. # Importiert TranslationService aus der Anwendungsschicht.
+from typing import Literal, Optional # Imports Optional and Literal types for optional and enumerated fields. # Importiert Optional- und Literal-Typen für optionale und aufgezählte Felder.
+from ...application.services.audio_formats import media_type_for_filename, negotiate_audio_format # Imports audio format negotiation helpers. # Importiert Hilfsfunktionen zur Aushandlung des Audioformats.
+from ..observability.metrics import MetricsMiddleware, metrics_payload # Imports Prometheus metrics support. # Importiert Prometheus-Metrikunterstützung.
+from ..admission import admission_status # Imports the per-upstream load. # Importiert die Last pro Upstream.
+from ..resilience import resilience_status # Imports the upstream timeout, retry and hedge counters. # Importiert die Upstream-Zähler für Timeouts, Wiederholungen und Absicherungen.
+from ..deadline import DeadlineMiddleware # Imports request deadlines and cancellation on disconnect. # Importiert Anfragefristen und Abbruch bei Verbindungsverlust.
+from ..uploads import UploadLimitMiddleware, read_upload, spool_upload # Imports capped, chunked upload ingestion. # Importiert gedeckelte, stückweise Upload-Aufnahme.
+from ..container import SERVICE_WARMUP, services # Imports the lazily built, shared services. # Importiert die verzögert erstellten, gemeinsam genutzten Dienste.
+from ..observability.logging_setup import configure_logging # Imports the non-blocking logging pipeline. # Importiert die nicht blockierende Logging-Pipeline.
+from ..observability.loop_watchdog import LOOP_WATCHDOG_ENABLED, watchdog # Imports the event loop blocking detector. # Importiert den Blockadedetektor der Ereignisschleife.
+from ..observability.profiling import list_profiles, profile_path # Imports the profile store. # Importiert den Profilspeicher.
+from ..observability.request_timing import ServerTimingMiddleware # Imports Server-Timing support. # Importiert Server-Timing-Unterstützung.
 from ...domain.entities.translation import Translation # Imports Translation entity from domain layer. # Importiert Translation-Entität aus der Domänenschicht.
 
-logging.basicConfig( # Configures the basic logging system. # Konfiguriert das grundlegende Logging-System.
-    level=logging.DEBUG, # Sets the logging level to DEBUG. # Setzt die Protokollierungsstufe auf DEBUG.
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', # Sets log message format with timestamp, logger name, level and message. # Setzt das Protokollnachrichtenformat mit Zeitstempel, Logger-Name, Stufe und Nachricht.
-    handlers=[ # Configures where logs will be sent. # Konfiguriert, wohin Logs gesendet werden.
-        logging.StreamHandler(), # Sends logs to the console. # Sendet Logs an die Konsole.
-        logging.FileHandler("api.log") # Sends logs to the api.log file. # Sendet Logs an die Datei api.log.
-    ]
-)
+configure_logging() # Configures JSON logging through a background writer thread (LOG_LEVEL, LOG_LEVELS, LOG_FILE). # Konfiguriert JSON-Logging über einen Hintergrund-Schreibthread (LOG_LEVEL, LOG_LEVELS, LOG_FILE).
 logger = logging.getLogger(__name__) # Creates a logger instance for this module. # Erstellt eine Logger-Instanz für dieses Modul.
 
+def _log_warm_up_failure(future) -> None: # Reports a failed background warm-up. # Meldet ein fehlgeschlagenes Aufwärmen im Hintergrund.
+    if future.exception() is not None: # The first request retries the construction. # Die erste Anfrage versucht die Erstellung erneut.
+        logger.error("Service warm-up failed: %s", future.exception())
+
 @asynccontextmanager # Decorator that creates an async context manager. # Dekorator, der einen asynchronen Kontextmanager erstellt.
 async def lifespan(app: FastAPI): # Function that manages the application lifecycle. # Funktion, die den Anwendungslebenszyklus verwaltet.
     logger.info("Starting API server") # Logs server startup. # Protokolliert Serverstart.
     logger.info(f"Temp directory: {tempfile.gettempdir()}") # Logs the temporary directory location. # Protokolliert den Speicherort des temporären Verzeichnisses.
     logger.info(f"Current working directory: {os.getcwd()}") # Logs the current working directory. # Protokolliert das aktuelle Arbeitsverzeichnis.
+    if LOOP_WATCHDOG_ENABLED: # Starts the event loop blocking detector. # Startet den Blockadedetektor der Ereignisschleife.
+        watchdog.start()
+        logger.info(f"Event loop watchdog started (threshold {watchdog.threshold * 1000:.0f} ms)") # Logs the threshold. # Protokolliert den Schwellenwert.
+    if SERVICE_WARMUP: # Builds the services while the server already accepts requests. # Erstellt die Dienste, während der Server bereits Anfragen annimmt.
+        warm_up = asyncio.get_running_loop().run_in_executor(None, services.warm_up) # Requests arriving earlier wait for the same construction. # Früher eintreffende Anfragen warten auf dieselbe Erstellung.
+        warm_up.add_done_callback(_log_warm_up_failure) # Missing credentials show up here. # Fehlende Zugangsdaten zeigen sich hier.
     
     yield # Yields control back to FastAPI until shutdown. # Gibt die Kontrolle zurück an FastAPI bis zum Herunterfahren.
     
+    if LOOP_WATCHDOG_ENABLED: # Stops the watchdog. # Stoppt den Watchdog.
+        await watchdog.stop()
     logger.info("Shutting down API server") # Logs server shutdown. # Protokolliert Server-Herunterfahren.
 
 app = FastAPI( # Creates a FastAPI application instance. # Erstellt eine FastAPI-Anwendungsinstanz.
     title="Speak and Translate API", # Sets the API title. # Setzt den API-Titel.
     root_path="", # Sets the root path (empty for direct access). # Setzt den Root-Pfad (leer für direkten Zugriff).
-    openapi_url="/openapi.json" # Sets the OpenAPI documentation URL. # Setzt die OpenAPI-Dokumentations-URL.
+    openapi_url="/openapi.json", # Sets the OpenAPI documentation URL. # Setzt die OpenAPI-Dokumentations-URL.
+    lifespan=lifespan # Runs the startup and shutdown hooks. # Führt die Start- und Herunterfahr-Hooks aus.
 )
 
+app.add_middleware(DeadlineMiddleware) # Cancels work at the request's deadline or when the client disconnects; inside CORS so its 504 gets CORS headers. # Bricht Arbeit bei der Frist der Anfrage oder bei Verbindungsabbruch ab; innerhalb von CORS, damit sein 504 CORS-Header erhält.
+app.add_middleware(UploadLimitMiddleware) # Answers 413 to oversized upload bodies before they are read; also inside CORS. # Antwortet mit 413 auf zu große Upload-Rümpfe, bevor sie gelesen werden; ebenfalls innerhalb von CORS.
 app.add_middleware( # Adds middleware to the application. # Fügt Middleware zur Anwendung hinzu.
     CORSMiddleware, # Uses Cross-Origin Resource Sharing middleware. # Verwendet Cross-Origin Resource Sharing Middleware.
     allow_origins=["*"], # Allows all origins to access the API. # Erlaubt allen Ursprüngen den Zugriff auf die API.
     allow_credentials=True, # Allows cookies to be included in cross-origin requests. # Erlaubt, dass Cookies in ursprungsübergreifenden Anfragen enthalten sind.
     allow_methods=["*"], # Allows all HTTP methods (GET, POST, etc.). # Erlaubt alle HTTP-Methoden (GET, POST, usw.).
     allow_headers=["*"], # Allows all headers in requests. # Erlaubt alle Header in Anfragen.
+    expose_headers=["Server-Timing", "X-Profile-Id"], # Lets browser clients read the timing and profile headers. # Lässt Browser-Clients die Timing- und Profil-Header lesen.
 )
+app.add_middleware(ServerTimingMiddleware) # Adds per-stage Server-Timing headers and optional profiles. # Fügt Server-Timing-Header pro Stufe und optionale Profile hinzu.
+app.add_middleware(MetricsMiddleware) # Records request latency and in-flight requests per endpoint. # Erfasst Anfragelatenz und laufende Anfragen pro Endpunkt.
 
-translation_service = TranslationService() # Creates a translation service instance. # Erstellt eine Instanz des Übersetzungsdienstes.
-speech_service = SpeechService() # Creates a speech service instance. # Erstellt eine Instanz des Sprachdienstes.
 
 class PromptRequest(BaseModel): # Defines the request model for translation requests. # Definiert das Anforderungsmodell für Übersetzungsanfragen.
     text: str # The text to translate (required). # Der zu übersetzende Text (erforderlich).
     source_lang: Optional[str] = "en" # Source language, defaults to English. # Quellsprache, standardmäßig Englisch.
     target_lang: Optional[str] = "en" # Target language, defaults to English. # Zielsprache, standardmäßig Englisch.
+    audio_format: Optional[str] = None # Audio format name such as "opus-16k" or "mp3-48k-192", overrides the Accept header. # Audioformatname wie "opus-16k" oder "mp3-48k-192", überschreibt den Accept-Header.
+    audio_mode: Optional[Literal["full", "compact"]] = None # Speaks every word pair per sentence ("full") or each unique pair once ("compact"), defaults to TTS_AUDIO_MODE. # Spricht jedes Wortpaar pro Satz ("full") oder jedes eindeutige Paar einmal ("compact"), standardmäßig TTS_AUDIO_MODE.
+    audio_delivery: Optional[Literal["inline", "job"]] = None # Waits for the audio ("inline") or returns an audio_job_id to poll ("job"), defaults to AUDIO_DELIVERY. # Wartet auf das Audio ("inline") oder gibt eine abzufragende audio_job_id zurück ("job"), standardmäßig AUDIO_DELIVERY.
+    audio_priority: Optional[Literal["high", "normal", "low"]] = None # Queue priority of the audio job, e.g. "low" for prefetching. # Warteschlangenpriorität des Audio-Jobs, z. B. "low" für Vorabruf.
+
+AUDIO_JOB_ID = re.compile(r"[0-9a-f]{32}") # Job ids are uuid4 hex strings, which also rules out path traversal. # Job-IDs sind uuid4-Hex-Zeichenketten, was auch Pfad-Traversal ausschließt.
+AUDIO_JOB_MAX_WAIT_SECONDS = float(os.getenv("AUDIO_JOB_MAX_WAIT_SECONDS", "30")) # Longest long-poll. # Längster Long-Poll.
 
 
 @app.get("/health") # Defines a GET endpoint at /health. # Definiert einen GET-Endpunkt unter /health.
@@ -93,49 +124,84 @@ async def health_check(): # Defines the health check function. # Definiert die F
         "timestamp": datetime.utcnow().isoformat(), # Includes current UTC time. # Enthält aktuelle UTC-Zeit.
         "temp_dir": tempfile.gettempdir(), # Includes temporary directory path. # Enthält temporären Verzeichnispfad.
         "audio_dir": audio_dir, # Includes audio directory path. # Enthält Audio-Verzeichnispfad.
-        "environment_vars": env_vars # Includes environment variable status. # Enthält Umgebungsvariablenstatus.
+        "environment_vars": env_vars, # Includes environment variable status. # Enthält Umgebungsvariablenstatus.
+        "services": services.status(), # Includes which services are built. # Enthält, welche Dienste erstellt sind.
+        "admission": admission_status(), # Includes active and queued upstream calls. # Enthält laufende und wartende Upstream-Aufrufe.
+        "upstreams": resilience_status(), # Includes timeouts, retries and hedge wins. # Enthält Timeouts, Wiederholungen und Absicherungsgewinne.
+        "audio_jobs": services.resolve("audio_jobs").status(), # Includes queued audio jobs; the queue is cheap to build. # Enthält wartende Audio-Jobs.
     }
 
 @app.get("/") # Defines a GET endpoint at the root path. # Definiert einen GET-Endpunkt am Root-Pfad.
 async def root(): # Defines the root endpoint function. # Definiert die Root-Endpunkt-Funktion.
     return {"status": "ok from server/app/infrastructure/api/routes.py test 4"} # Returns simple status message. # Gibt einfache Statusmeldung zurück.
 
+@app.get("/metrics") # Defines a GET endpoint for Prometheus scrapes. # Definiert einen GET-Endpunkt für Prometheus-Abfragen.
+async def metrics(): # Returns the current metrics. # Gibt die aktuellen Metriken zurück.
+    body, content_type = metrics_payload() # Renders the metrics in the Prometheus text format. # Rendert die Metriken im Prometheus-Textformat.
+    return Response(content=body, media_type=content_type) # Returns the metrics. # Gibt die Metriken zurück.
+
+def require_admin(request: Request): # Checks the admin token of a request. # Prüft das Admin-Token einer Anfrage.
+    """Reject the request unless X-Admin-Token matches ADMIN_TOKEN"""
+    expected = os.getenv("ADMIN_TOKEN", "") # Admin endpoints are disabled without a token. # Admin-Endpunkte sind ohne Token deaktiviert.
+    supplied = request.headers.get("x-admin-token", "") # Token sent by the client. # Vom Client gesendetes Token.
+    if not expected or not hmac.compare_digest(supplied.encode(), expected.encode()): # Compares in constant time. # Vergleicht in konstanter Zeit.
+        raise HTTPException(status_code=403, detail="Forbidden") # Raises HTTP 403 for missing or wrong tokens. # Wirft HTTP 403 für fehlende oder falsche Tokens.
+
+@app.get("/admin/profiles") # Defines a GET endpoint listing stored profiles. # Definiert einen GET-Endpunkt, der gespeicherte Profile auflistet.
+async def get_profiles(request: Request): # Returns the profile store contents. # Gibt den Inhalt des Profilspeichers zurück.
+    require_admin(request) # Admin only. # Nur für Administratoren.
+    return {"profiles": list_profiles()} # Newest profiles first. # Neueste Profile zuerst.
+
+@app.get("/admin/profiles/{profile_id}") # Defines a GET endpoint downloading one profile. # Definiert einen GET-Endpunkt, der ein Profil herunterlädt.
+async def get_profile(profile_id: str, request: Request): # Returns one folded-stack profile. # Gibt ein Folded-Stack-Profil zurück.
+    require_admin(request) # Admin only. # Nur für Administratoren.
+    path = profile_path(profile_id) # Resolves and validates the id. # Löst die ID auf und validiert sie.
+    if path is None: # Unknown or invalid id. # Unbekannte oder ungültige ID.
+        raise HTTPException(status_code=404, detail="Profile not found") # Raises HTTP 404. # Wirft HTTP 404.
+    return FileResponse(path=path, media_type="text/plain", filename=f"{profile_id}.folded") # Loads in speedscope or flamegraph.pl. # Lädt in speedscope oder flamegraph.pl.
+
+@app.get("/admin/loop-blocks") # Defines a GET endpoint reporting event loop blocks. # Definiert einen GET-Endpunkt, der Blockaden der Ereignisschleife meldet.
+async def get_loop_blocks(request: Request, reset: bool = False): # Returns the blocking call sites. # Gibt die blockierenden Aufrufstellen zurück.
+    require_admin(request) # Admin only. # Nur für Administratoren.
+    report = watchdog.report() # Call sites sorted by total blocking time. # Aufrufstellen sortiert nach gesamter Blockadezeit.
+    if reset: # Starts a fresh measurement window. # Startet ein neues Messfenster.
+        watchdog.reset()
+    return report # Returns the report. # Gibt den Bericht zurück.
+
 @app.post("/api/conversation", response_model=Translation) # Defines a POST endpoint for translations with Translation response model. # Definiert einen POST-Endpunkt für Übersetzungen mit Translation-Antwortmodell.
-async def start_conversation(prompt: PromptRequest): # Handles translation requests. # Verarbeitet Übersetzungsanfragen.
+async def start_conversation(prompt: PromptRequest, request: Request): # Handles translation requests. # Verarbeitet Übersetzungsanfragen.
+    try: # Resolves the audio format before any work is done. # Ermittelt das Audioformat, bevor Arbeit erledigt wird.
+        audio_format = negotiate_audio_format(prompt.audio_format, request.headers.get("accept")) # Uses the body field, then the Accept header. # Verwendet das Body-Feld, dann den Accept-Header.
+    except ValueError as e: # Unknown format name. # Unbekannter Formatname.
+        raise HTTPException(status_code=400, detail=str(e)) # Raises HTTP 400 for unsupported formats. # Wirft HTTP 400 für nicht unterstützte Formate.
+
     try: # Begins try block for translation processing. # Beginnt Try-Block für Übersetzungsverarbeitung.
+        translation_service = await services.get("translation") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
         response = await translation_service.process_prompt( # Calls translation service to process the prompt. # Ruft Übersetzungsdienst auf, um die Anfrage zu verarbeiten.
-            prompt.text, prompt.source_lang, prompt.target_lang # Passes text and language parameters. # Übergibt Text- und Sprachparameter.
+            prompt.text, prompt.source_lang, prompt.target_lang, # Passes text and language parameters. # Übergibt Text- und Sprachparameter.
+            audio_mode=prompt.audio_mode, # Passes the requested audio mode. # Übergibt den angeforderten Audiomodus.
+            audio_format=audio_format, # Passes the negotiated audio format. # Übergibt das ausgehandelte Audioformat.
+            audio_delivery=prompt.audio_delivery, # Passes inline or background audio. # Übergibt direktes oder Hintergrund-Audio.
+            audio_priority=prompt.audio_priority, # Passes the audio job priority. # Übergibt die Priorität des Audio-Jobs.
         )
         return response # Returns the translation response. # Gibt die Übersetzungsantwort zurück.
+    except HTTPException: # Keeps 429 with its Retry-After header. # Behält 429 mit seinem Retry-After-Header.
+        raise
     except Exception as e: # Catches any exceptions during translation. # Fängt alle Ausnahmen während der Übersetzung ab.
         logger.error(f"Conversation error: {str(e)}", exc_info=True) # Logs error with full traceback. # Protokolliert Fehler mit vollständigem Traceback.
         raise HTTPException(status_code=500, detail=str(e)) # Raises HTTP 500 error with exception details. # Wirft HTTP 500-Fehler mit Ausnahmedetails.
 
+STT_BATCH_MAX_FILES = int(os.getenv("STT_BATCH_MAX_FILES", "20")) # Most clips in one batch request. # Höchstzahl an Clips in einer Stapelanfrage.
+STT_BATCH_CONCURRENCY = int(os.getenv("STT_BATCH_CONCURRENCY", "4")) # Clips of one batch in flight at once, so a batch doesn't fill the google_stt queue alone. # Gleichzeitig laufende Clips eines Stapels, damit ein Stapel die google_stt-Warteschlange nicht allein füllt.
+
 @app.post("/api/speech-to-text") # Defines a POST endpoint for speech-to-text conversion. # Definiert einen POST-Endpunkt für Sprache-zu-Text-Umwandlung.
 async def speech_to_text(file: UploadFile = File(...)): # Handles file uploads for speech recognition. # Verarbeitet Datei-Uploads für Spracherkennung.
     tmp_path = None # Initializes temporary path variable. # Initialisiert temporäre Pfadvariable.
     try: # Begins try block for file processing. # Beginnt Try-Block für Dateiverarbeitung.
-        content_type = file.content_type or "audio/wav" # Gets file content type or defaults to WAV. # Holt Datei-Inhaltstyp oder setzt Standard auf WAV.
-        ext = ".wav" # Default file extension. # Standard-Dateierweiterung.
-        mime_map = { # Maps MIME types to file extensions. # Ordnet MIME-Typen Dateierweiterungen zu.
-            "audio/wav": ".wav", # WAV audio file extension. # WAV-Audiodateierweiterung.
-            "audio/aac": ".aac", # AAC audio file extension. # AAC-Audiodateierweiterung.
-            "audio/mpeg": ".mp3", # MP3 audio file extension. # MP3-Audiodateierweiterung.
-            "audio/ogg": ".ogg" # OGG audio file extension. # OGG-Audiodateierweiterung.
-        }
-        
-        if content_type in mime_map: # Checks if content type is in the MIME map. # Prüft, ob Inhaltstyp in der MIME-Zuordnung ist.
-            ext = mime_map[content_type] # Sets extension based on MIME type. # Setzt Erweiterung basierend auf MIME-Typ.
-        else: # If MIME type is not recognized. # Wenn MIME-Typ nicht erkannt wird.
-            filename_ext = os.path.splitext(file.filename or "")[1].lower() # Gets extension from filename. # Holt Erweiterung aus Dateinamen.
-            ext = filename_ext if filename_ext in [".wav", ".aac", ".mp3", ".ogg"] else ".wav" # Uses filename extension if valid, otherwise defaults to WAV. # Verwendet Dateinamen-Erweiterung wenn gültig, sonst Standard WAV.
-
-        with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp: # Creates a temporary file with the correct extension. # Erstellt temporäre Datei mit der richtigen Erweiterung.
-            content = await file.read() # Reads uploaded file content. # Liest hochgeladenen Dateiinhalt.
-            tmp.write(content) # Writes content to temporary file. # Schreibt Inhalt in temporäre Datei.
-            tmp_path = tmp.name # Stores the temporary file path. # Speichert den temporären Dateipfad.
-            logger.debug(f"Created temp file: {tmp_path}") # Logs temporary file creation. # Protokolliert Erstellung der temporären Datei.
+        tmp_path, _ = await spool_upload(file) # Checks the content's first bytes, then copies it in chunks under the size and duration caps; the extension follows the content, not the declared type. # Prüft die ersten Bytes des Inhalts und kopiert ihn dann stückweise unter den Größen- und Dauergrenzen; die Erweiterung folgt dem Inhalt, nicht dem angegebenen Typ.
+        logger.debug("Created temp file: %s", tmp_path) # Logs temporary file creation. # Protokolliert Erstellung der temporären Datei.
 
+        speech_service = await services.get("speech") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
         recognized_text = await speech_service.process_audio(tmp_path) # Processes audio for speech-to-text. # Verarbeitet Audio für Sprache-zu-Text.
         return {"text": recognized_text} # Returns recognized text. # Gibt erkannten Text zurück.
 
@@ -151,23 +217,116 @@ async def speech_to_text(file: UploadFile = File(...)): # Handles file uploads f
         if tmp_path and os.path.exists(tmp_path): # Checks if temporary file exists. # Prüft, ob temporäre Datei existiert.
             try: # Tries to delete temporary file. # Versucht, temporäre Datei zu löschen.
                 os.unlink(tmp_path) # Deletes the temporary file. # Löscht die temporäre Datei.
-                logger.debug(f"Cleaned up temp file: {tmp_path}") # Logs successful cleanup. # Protokolliert erfolgreiche Bereinigung.
+                logger.debug("Cleaned up temp file: %s", tmp_path) # Logs successful cleanup. # Protokolliert erfolgreiche Bereinigung.
             except Exception as e: # Catches cleanup exceptions. # Fängt Bereinigungsausnahmen ab.
                 logger.error(f"Final cleanup failed: {str(e)}") # Logs cleanup failure. # Protokolliert Bereinigungsfehler.
 
+@app.post("/api/speech-to-text/batch") # Defines a POST endpoint recognizing many clips at once. # Definiert einen POST-Endpunkt, der viele Clips auf einmal erkennt.
+async def speech_to_text_batch(files: list[UploadFile] = File(...)): # Streams one NDJSON line per clip as it finishes. # Streamt eine NDJSON-Zeile pro Clip, sobald er fertig ist.
+    if len(files) > STT_BATCH_MAX_FILES: # Keeps one request from taking over the recognizers. # Verhindert, dass eine Anfrage die Erkenner übernimmt.
+        raise HTTPException(status_code=400, detail=f"At most {STT_BATCH_MAX_FILES} files per batch")
+    started = time.perf_counter()
+    speech_service = await services.get("speech") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
+    clips = [] # (filename, format, content, rejection) per file, read before the response starts. # (Dateiname, Format, Inhalt, Abweisung) pro Datei, vor Antwortbeginn gelesen.
+    for file in files:
+        try:
+            clips.append((file.filename, *await read_upload(file), None)) # Checked and capped like single uploads. # Wie einzelne Uploads geprüft und gedeckelt.
+        except HTTPException as e: # 400, 413 or 415 for this clip only. # 400, 413 oder 415 nur für diesen Clip.
+            clips.append((file.filename, None, None, e))
+    semaphore = asyncio.Semaphore(STT_BATCH_CONCURRENCY) # Bounds the clips in flight. # Begrenzt die laufenden Clips.
+
+    async def transcribe(index: int, filename: Optional[str], ext: Optional[str], data: Optional[bytes], rejection: Optional[HTTPException]) -> dict: # Recognizes one clip; errors stay in its line. # Erkennt einen Clip; Fehler bleiben in seiner Zeile.
+        result = {"index": index, "filename": filename}
+        async with semaphore:
+            try:
+                if rejection: # Rejected while reading. # Beim Lesen abgewiesen.
+                    raise rejection
+                result.update(await speech_service.transcribe_clip(ext, data), status=200)
+            except HTTPException as e: # 400, 422, 429, 502 or 504 for this clip only. # 400, 422, 429, 502 oder 504 nur für diesen Clip.
+                result.update(status=e.status_code, error=e.detail)
+            except Exception as e: # Unexpected failure of this clip. # Unerwarteter Fehler dieses Clips.
+                logger.error(f"Batch speech-to-text error: {str(e)}", exc_info=True) # Logs error with full traceback. # Protokolliert Fehler mit vollständigem Traceback.
+                result.update(status=500, error="Audio processing failed. See server logs for details.")
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1) # Time since the request arrived. # Zeit seit Eingang der Anfrage.
+        return result
+
+    async def results(): # Yields the clips in completion order. # Liefert die Clips in Fertigstellungsreihenfolge.
+        tasks = [asyncio.ensure_future(transcribe(index, *clip)) for index, clip in enumerate(clips)]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield json.dumps(await next_result) + "\n"
+        finally: # A client that leaves cancels the remaining clips. # Ein Client, der geht, bricht die restlichen Clips ab.
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+DICTATION_LANGUAGE = re.compile(r"[a-z]{2,3}-[A-Z]{2}") # Locale such as es-ES or de-DE. # Gebietsschema wie es-ES oder de-DE.
+
+async def _pump_dictation_audio(websocket: WebSocket, session) -> None: # Feeds received frames into the recognizer. # Speist empfangene Frames in den Erkenner.
+    """Push binary messages into the session until the client sends "end", the session is full, idle or too old, or the client goes away"""
+    while True:
+        try:
+            message = await asyncio.wait_for(websocket.receive(), session.receive_timeout())
+        except asyncio.TimeoutError: # A silent or trickling client would hold a dictation slot and a recognizer forever. # Ein stiller oder tröpfelnder Client hielte einen Diktatplatz und einen Erkenner für immer.
+            session.expire()
+            return
+        if message["type"] == "websocket.disconnect": # Nobody is left to read the results. # Niemand ist mehr da, um die Ergebnisse zu lesen.
+            session.abort()
+            return
+        if message.get("bytes"): # One captured frame of PCM. # Ein aufgenommener PCM-Frame.
+            if not session.write(message["bytes"]):
+                return
+        elif message.get("text") == "end": # The speaker stopped; the last final result follows. # Der Sprecher hat aufgehört; das letzte Endergebnis folgt.
+            session.finish()
+            return
+
+@app.websocket("/api/live-dictation") # Defines a WebSocket endpoint for live dictation. # Definiert einen WebSocket-Endpunkt für Live-Diktat.
+async def live_dictation(websocket: WebSocket, language: str = "es-ES", sample_rate: int = 16000): # Streams hypotheses while audio arrives. # Streamt Hypothesen, während Audio ankommt.
+    """Receive 16-bit mono PCM frames as binary messages and send {"type": "partial" | "final" | "error", ...} messages as recognition proceeds"""
+    await websocket.accept()
+    if not DICTATION_LANGUAGE.fullmatch(language): # 1003: data the server can't accept. # 1003: Daten, die der Server nicht annehmen kann.
+        await websocket.close(code=1003, reason="Expected a locale such as es-ES")
+        return
+    reader = None
+    try:
+        speech_service = await services.get("speech") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
+        async with speech_service.dictation(language, sample_rate) as session: # Waits for a dictation slot. # Wartet auf einen Diktatplatz.
+            reader = asyncio.ensure_future(_pump_dictation_audio(websocket, session))
+            async for event in session.events(): # Sent as soon as the recognizer reports them. # Gesendet, sobald der Erkenner sie meldet.
+                await websocket.send_json(event)
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.send_json({"type": "end"}) # No more results follow. # Es folgen keine weiteren Ergebnisse.
+            await websocket.close()
+    except WebSocketDisconnect: # The client left while results were sent. # Der Client ging, während Ergebnisse gesendet wurden.
+        pass
+    except ValueError as e: # Unsupported sample rate. # Nicht unterstützte Abtastrate.
+        await websocket.close(code=1003, reason=str(e))
+    except HTTPException as e: # 429 when every dictation slot is taken. # 429, wenn alle Diktatplätze belegt sind.
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1013 if e.status_code == 429 else 1011, reason=str(e.detail)) # 1013: try again later. # 1013: später erneut versuchen.
+    except Exception as e: # Catches recognizer failures. # Fängt Erkennerfehler ab.
+        logger.error(f"Live dictation error: {str(e)}", exc_info=True) # Logs error with full traceback. # Protokolliert Fehler mit vollständigem Traceback.
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close(code=1011, reason="Live dictation failed")
+    finally:
+        if reader is not None: # Stops reading once the results are over. # Beendet das Lesen, sobald die Ergebnisse vorbei sind.
+            reader.cancel()
+
 
 @app.post("/api/voice-command") # Defines a POST endpoint for voice command processing. # Definiert einen POST-Endpunkt für Sprachbefehlsverarbeitung.
 async def process_voice_command(file: UploadFile = File(...)): # Handles file uploads for voice commands. # Verarbeitet Datei-Uploads für Sprachbefehle.
     tmp_path = None # Initializes temporary path variable. # Initialisiert temporäre Pfadvariable.
     try: # Begins try block for command processing. # Beginnt Try-Block für Befehlsverarbeitung.
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp: # Creates temporary WAV file. # Erstellt temporäre WAV-Datei.
-            content = await file.read() # Reads uploaded file content. # Liest hochgeladenen Dateiinhalt.
-            tmp.write(content) # Writes content to temporary file. # Schreibt Inhalt in temporäre Datei.
-            tmp_path = tmp.name # Stores temporary file path. # Speichert temporären Dateipfad.
+        tmp_path, _ = await spool_upload(file) # Checked and copied in chunks like speech-to-text uploads. # Wie Sprache-zu-Text-Uploads geprüft und stückweise kopiert.
             
+        speech_service = await services.get("speech") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
         command_text = await speech_service.process_command(tmp_path) # Processes audio for command detection. # Verarbeitet Audio für Befehlserkennung.
         return {"command": command_text} # Returns detected command. # Gibt erkannten Befehl zurück.
         
+    except HTTPException: # Keeps 408 and 429. # Behält 408 und 429.
+        raise
     except Exception as e: # Catches any exceptions. # Fängt alle Ausnahmen ab.
         logger.error(f"Voice command error: {str(e)}", exc_info=True) # Logs error with full traceback. # Protokolliert Fehler mit vollständigem Traceback.
         raise HTTPException( # Raises HTTP 500 error. # Wirft HTTP 500-Fehler.
@@ -179,6 +338,17 @@ async def process_voice_command(file: UploadFile = File(...)): # Handles file up
             os.unlink(tmp_path) # Deletes the temporary file. # Löscht die temporäre Datei.
 
 
+@app.get("/api/audio-jobs/{job_id}") # Defines a GET endpoint reporting a background audio job. # Definiert einen GET-Endpunkt, der einen Hintergrund-Audio-Job meldet.
+async def get_audio_job(job_id: str, wait: float = 0.0): # Returns the job's status, optionally long-polling. # Gibt den Status des Jobs zurück, optional per Long-Polling.
+    """Report a job as queued, running, done (with audio_path for /api/audio) or failed; wait=<seconds> holds the request until it finishes"""
+    if not AUDIO_JOB_ID.fullmatch(job_id): # Rejects malformed ids. # Weist fehlerhafte IDs zurück.
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    translation_service = await services.get("translation") # Shared service, built on first use. # Gemeinsamer Dienst, bei der ersten Verwendung erstellt.
+    job = await translation_service.audio_jobs.wait(job_id, timeout=max(0.0, min(wait, AUDIO_JOB_MAX_WAIT_SECONDS)))
+    if job is None: # Unknown or expired job. # Unbekannter oder abgelaufener Job.
+        raise HTTPException(status_code=404, detail="Audio job not found")
+    return {key: job[key] for key in ("job_id", "status", "audio_path", "error")} # Returns the public fields. # Gibt die öffentlichen Felder zurück.
+
 @app.get("/api/audio/{filename}") # Defines a GET endpoint for retrieving audio files. # Definiert einen GET-Endpunkt zum Abrufen von Audiodateien.
 async def get_audio(filename: str): # Handles audio file retrieval by filename. # Verarbeitet Audiodateiabruf nach Dateinamen.
     try: # Begins try block for file retrieval. # Beginnt Try-Block für Dateiabruf.
@@ -198,7 +368,7 @@ async def get_audio(filename: str): # Handles audio file retrieval by filename.
 
         return FileResponse( # Returns file as HTTP response. # Gibt Datei als HTTP-Antwort zurück.
             path=file_path, # Path to the file. # Pfad zur Datei.
-            media_type="audio/mp3", # Sets media type to MP3 audio. # Setzt Medientyp auf MP3-Audio.
+            media_type=media_type_for_filename(filename), # Sets media type from the file extension. # Setzt Medientyp anhand der Dateierweiterung.
             filename=filename, # Sets filename in the response. # Setzt Dateiname in der Antwort.
             headers={"Cache-Control": "no-cache"} # Prevents caching of audio files. # Verhindert Caching von Audiodateien.
         )
@@ -0,0 +1,90 @@
+# Service Container
+#
+# Creates each application service once, on first use, and shares it between all endpoints. # Erstellt jeden Anwendungsdienst einmalig bei der ersten Verwendung und teilt ihn zwischen allen Endpunkten.
+# The service modules, and with them the Azure SDK, Gemini client and pydub, are only imported when a service is first needed or warmed up. # Die Dienstmodule und mit ihnen das Azure SDK, der Gemini-Client und pydub werden erst importiert, wenn ein Dienst zum ersten Mal benötigt oder aufgewärmt wird.
+#
+# Usage:
+# translation_service = await services.get("translation") # Resolves a service without blocking the event loop. # Löst einen Dienst auf, ohne die Ereignisschleife zu blockieren.
+# services.warm_up() # Builds every service and opens the spelling indexes ahead of the first request. # Erstellt jeden Dienst und öffnet die Rechtschreibindizes vor der ersten Anfrage.
+# services.override("speech", fake_speech_service) # Replaces a service, e.g. in tests or benchmarks. # Ersetzt einen Dienst, z. B. in Tests oder Benchmarks.
+#
+# EN: Importing the API no longer constructs two TranslationService instances, two TTS services and an unused chat session.
+# DE: Der Import der API erstellt nicht mehr zwei TranslationService-Instanzen, zwei TTS-Dienste und eine ungenutzte Chat-Sitzung.
+
+import asyncio # For resolving services off the event loop. # Zum Auflösen von Diensten außerhalb der Ereignisschleife.
+import logging # For warm-up logging. # Für das Aufwärm-Logging.
+import os # For configuration. # Für die Konfiguration.
+import threading # For creating each service exactly once. # Zum genau einmaligen Erstellen jedes Dienstes.
+import time # For timing the warm-up. # Zur Zeitmessung des Aufwärmens.
+
+SERVICE_WARMUP = os.getenv("SERVICE_WARMUP", "true").lower() == "true" # Warms the services up in the background at startup. # Wärmt die Dienste beim Start im Hintergrund auf.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+
+def _create_tts(container: "ServiceContainer"): # Builds the text-to-speech service. # Erstellt den Text-zu-Sprache-Dienst.
+    from ..application.services.tts_service import EnhancedTTSService # Imports the Azure SDK. # Importiert das Azure SDK.
+    return EnhancedTTSService()
+
+
+def _create_audio_jobs(container: "ServiceContainer"): # Builds the background audio job queue. # Erstellt die Warteschlange für Hintergrund-Audio-Jobs.
+    from ..application.services.audio_jobs import AudioJobQueue
+    return AudioJobQueue()
+
+
+def _create_translation(container: "ServiceContainer"): # Builds the translation service on the shared TTS service and job queue. # Erstellt den Übersetzungsdienst auf dem gemeinsamen TTS-Dienst und der Job-Warteschlange.
+    from ..application.services.translation_service import TranslationService # Imports the Gemini client. # Importiert den Gemini-Client.
+    return TranslationService(tts_service=container.resolve("tts"), audio_jobs=container.resolve("audio_jobs"))
+
+
+def _create_speech(container: "ServiceContainer"): # Builds the speech recognition service. # Erstellt den Spracherkennungsdienst.
+    from ..application.services.speech_service import SpeechService # Imports the Azure SDK and SpeechRecognition. # Importiert das Azure SDK und SpeechRecognition.
+    return SpeechService()
+
+
+FACTORIES = {"tts": _create_tts, "audio_jobs": _create_audio_jobs, "translation": _create_translation, "speech": _create_speech} # Service name -> factory. # Dienstname -> Fabrik.
+
+
+class ServiceContainer: # Lazily created, shared services. # Verzögert erstellte, gemeinsam genutzte Dienste.
+    def __init__(self, factories: dict = FACTORIES): # Stores the factories. # Speichert die Fabriken.
+        self._factories = dict(factories)
+        self._services = {} # Service name -> instance. # Dienstname -> Instanz.
+        self._lock = threading.RLock() # Reentrant, because factories resolve their dependencies. # Reentrant, weil Fabriken ihre Abhängigkeiten auflösen.
+
+    def resolve(self, name: str): # Returns a service, creating it on first use. # Gibt einen Dienst zurück und erstellt ihn bei der ersten Verwendung.
+        """Return the shared instance of a service; blocks while it is being created"""
+        service = self._services.get(name) # Lock-free fast path once created. # Sperrfreier schneller Pfad nach der Erstellung.
+        if service is None:
+            with self._lock: # Only one thread builds a service. # Nur ein Thread erstellt einen Dienst.
+                service = self._services.get(name) # Re-checks after acquiring the lock. # Prüft erneut nach Erhalt der Sperre.
+                if service is None:
+                    started = time.perf_counter()
+                    service = self._services[name] = self._factories[name](self) # Creates and shares it. # Erstellt und teilt ihn.
+                    logger.info("Created %s service in %.0f ms", name, (time.perf_counter() - started) * 1000)
+        return service
+
+    async def get(self, name: str): # Resolves a service from a coroutine. # Löst einen Dienst aus einer Coroutine auf.
+        """Return a service, building it in the thread pool on first use so the event loop keeps running"""
+        service = self._services.get(name)
+        if service is None: # First use pays the import and construction in a worker thread. # Die erste Verwendung zahlt Import und Erstellung in einem Worker-Thread.
+            service = await asyncio.get_event_loop().run_in_executor(None, self.resolve, name)
+        return service
+
+    def override(self, name: str, service) -> None: # Replaces a service instance. # Ersetzt eine Dienstinstanz.
+        with self._lock:
+            self._services[name] = service
+
+    def status(self) -> dict: # Which services exist. # Welche Dienste existieren.
+        return {name: name in self._services for name in self._factories}
+
+    def warm_up(self) -> None: # Creates everything the first request would. # Erstellt alles, was die erste Anfrage erstellen würde.
+        """Build all services and run their warm_up hooks, so the first request doesn't pay for them"""
+        started = time.perf_counter()
+        for name in self._factories: # Builds every service. # Erstellt jeden Dienst.
+            warm_up = getattr(self.resolve(name), "warm_up", None) # Optional hook for deferred resources. # Optionaler Hook für verzögerte Ressourcen.
+            if warm_up is not None:
+                warm_up()
+        logger.info("Services warmed up in %.0f ms", (time.perf_counter() - started) * 1000)
+
+
+services = ServiceContainer() # The application's container. # Der Container der Anwendung.
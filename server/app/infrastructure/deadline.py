@@ -0,0 +1,177 @@
+# Request Deadlines
+#
+# Gives each API request a time budget that every stage can read, and cancels the request's work when the budget runs out or the client disconnects. # Gibt jeder API-Anfrage ein Zeitbudget, das jede Stufe lesen kann, und bricht die Arbeit der Anfrage ab, wenn das Budget aufgebraucht ist oder der Client die Verbindung trennt.
+# Cancellation reaches the upstream calls: admission queues are left, hedges and segment syntheses are cancelled and synthesizers and recognizers are stopped. # Der Abbruch erreicht die Upstream-Aufrufe: Zulassungswarteschlangen werden verlassen, Absicherungen und Segmentsynthesen abgebrochen und Synthesizer und Erkenner gestoppt.
+#
+# Usage:
+# app.add_middleware(DeadlineMiddleware) # Adds a deadline to /api/conversation, /api/speech-to-text and /api/voice-command. # Fügt /api/conversation, /api/speech-to-text und /api/voice-command eine Frist hinzu.
+# check_deadline("tts") # Raises DeadlineExceeded (504) once the budget is spent. # Löst DeadlineExceeded (504) aus, sobald das Budget aufgebraucht ist.
+# timeout = bounded(5.0) # A stage timeout that never outlives the request. # Ein Stufen-Timeout, das die Anfrage nie überdauert.
+# with deadline_scope(120): ... # Budget of background work such as an audio job. # Budget von Hintergrundarbeit wie einem Audio-Job.
+# X-Request-Timeout: 20 # Request header lowering the budget below REQUEST_DEADLINE_SECONDS. # Anfrage-Header, der das Budget unter REQUEST_DEADLINE_SECONDS senkt.
+#
+# EN: A mobile client that gives up no longer leaves a Gemini retry and a full synthesis running for nobody.
+# DE: Ein mobiler Client, der aufgibt, hinterlässt keine Gemini-Wiederholung und keine vollständige Synthese mehr, die für niemanden laufen.
+
+import asyncio # For the request task and the disconnect watcher. # Für die Anfrage-Task und den Verbindungswächter.
+import contextlib # For deadline scopes of background work. # Für Fristbereiche von Hintergrundarbeit.
+import contextvars # For the request-scoped deadline. # Für die anfragebezogene Frist.
+import json # For the 504 body. # Für den 504-Rumpf.
+import logging # For cancellation logging. # Für das Protokollieren von Abbrüchen.
+import os # For configuration. # Für die Konfiguration.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+from fastapi import HTTPException # The deadline error is also the HTTP response. # Der Fristfehler ist zugleich die HTTP-Antwort.
+from prometheus_client import Counter # For cancellation metrics. # Für Abbruchmetriken.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "60")) # Largest budget of a request. # Größtes Budget einer Anfrage.
+DEADLINE_PATHS = tuple( # Path prefixes that get a deadline. # Pfadpräfixe, die eine Frist erhalten.
+    path.strip() for path in os.getenv(
+        "DEADLINE_PATHS", "/api/conversation,/api/speech-to-text,/api/voice-command"
+    ).split(",") if path.strip()
+)
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None) # Event loop time at which the current request expires. # Zeitpunkt der Ereignisschleife, zu dem die aktuelle Anfrage abläuft.
+
+CANCELLED = Counter( # Requests whose work was cancelled. # Anfragen, deren Arbeit abgebrochen wurde.
+    "speak_requests_cancelled_total", "Requests cancelled before completion", ["reason"]
+)
+
+
+class DeadlineExceeded(HTTPException): # 504 raised when the request's budget is spent. # 504, ausgelöst, wenn das Budget der Anfrage aufgebraucht ist.
+    def __init__(self, stage: str): # Builds the response. # Erstellt die Antwort.
+        super().__init__(status_code=504, detail=f"Request deadline exceeded before {stage}")
+        self.stage = stage # Stage that found the budget spent. # Stufe, die das Budget aufgebraucht vorfand.
+
+
+def remaining() -> Optional[float]: # Seconds left for the current request. # Verbleibende Sekunden der aktuellen Anfrage.
+    """Return the seconds until the current request's deadline, or None outside a request with a deadline"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - asyncio.get_running_loop().time()
+
+
+def bounded(timeout: float) -> float: # Caps a stage timeout. # Begrenzt ein Stufen-Timeout.
+    """Return the timeout, shortened to what is left of the request's budget"""
+    left = remaining()
+    return timeout if left is None else max(0.0, min(timeout, left))
+
+
+def expired() -> bool: # Whether the budget is spent. # Ob das Budget aufgebraucht ist.
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline(stage: str) -> None: # Stops a stage that would start too late. # Stoppt eine Stufe, die zu spät beginnen würde.
+    if expired():
+        raise DeadlineExceeded(stage)
+
+
+@contextlib.contextmanager
+def deadline_scope(seconds: float): # Gives work outside a request its own budget. # Gibt Arbeit außerhalb einer Anfrage ein eigenes Budget.
+    """Set a deadline for the enclosed block, e.g. a background job, that its upstream calls respect"""
+    token = _deadline.set(asyncio.get_running_loop().time() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _request_budget(scope) -> float: # Reads the client's budget. # Liest das Budget des Clients.
+    for name, value in scope.get("headers", []):
+        if name == b"x-request-timeout": # Seconds the client is willing to wait. # Sekunden, die der Client zu warten bereit ist.
+            try:
+                return max(0.0, min(REQUEST_DEADLINE_SECONDS, float(value)))
+            except ValueError: # Ignores malformed values. # Ignoriert fehlerhafte Werte.
+                break
+    return REQUEST_DEADLINE_SECONDS
+
+
+class DeadlineMiddleware: # Pure ASGI middleware enforcing deadlines and client disconnects. # Reine ASGI-Middleware, die Fristen und Verbindungsabbrüche durchsetzt.
+    """Run selected requests in a task that is cancelled at the deadline or when the client goes away"""
+
+    def __init__(self, app, paths: Optional[tuple] = None): # Wraps the next ASGI application. # Umschließt die nächste ASGI-Anwendung.
+        self.app = app # Next application. # Nächste Anwendung.
+        self.paths = paths or DEADLINE_PATHS # Path prefixes with a deadline. # Pfadpräfixe mit Frist.
+
+    async def __call__(self, scope, receive, send): # Handles one ASGI connection. # Bearbeitet eine ASGI-Verbindung.
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths): # Other requests pass through untouched. # Andere Anfragen werden unverändert durchgereicht.
+            await self.app(scope, receive, send)
+            return
+
+        loop = asyncio.get_running_loop()
+        budget = _request_budget(scope)
+        deadline = loop.time() + budget
+        token = _deadline.set(deadline) # Copied into every task the request starts. # In jede Task kopiert, die die Anfrage startet.
+        state = {"started": False, "complete": False} # Response progress. # Antwortfortschritt.
+        body_read, disconnected = asyncio.Event(), asyncio.Event()
+
+        async def receive_wrapper(): # Notes when the body is read and when the client leaves. # Merkt sich, wann der Rumpf gelesen ist und wann der Client geht.
+            if disconnected.is_set(): # The watcher already received the disconnect. # Der Wächter hat den Abbruch bereits empfangen.
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+            elif not message.get("more_body", False): # Last body chunk. # Letzter Rumpfteil.
+                body_read.set()
+            return message
+
+        async def send_wrapper(message): # Tracks the response. # Verfolgt die Antwort.
+            if message["type"] == "http.response.start":
+                state["started"] = True
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                state["complete"] = True
+            await send(message)
+
+        async def watch_disconnect(): # Waits for the client to leave once the body is read. # Wartet nach dem Lesen des Rumpfs darauf, dass der Client geht.
+            await body_read.wait() # Before that, the application itself receives. # Vorher empfängt die Anwendung selbst.
+            while not disconnected.is_set():
+                if (await receive())["type"] == "http.disconnect":
+                    disconnected.set()
+
+        task = asyncio.ensure_future(self.app(scope, receive_wrapper, send_wrapper))
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            reason = None
+            while not task.done():
+                timeout = None if state["started"] else max(0.0, deadline - loop.time()) # A started response runs to its end. # Eine begonnene Antwort läuft bis zu ihrem Ende.
+                done, _ = await asyncio.wait({task, watcher}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if task in done:
+                    break
+                if watcher in done or disconnected.is_set(): # The client left, or the server closed the connection. # Der Client ist gegangen oder der Server hat die Verbindung geschlossen.
+                    if state["complete"]: # Normal end of a finished response. # Normales Ende einer fertigen Antwort.
+                        await task
+                        break
+                    reason = "disconnect"
+                elif not done and not state["started"]: # Budget spent before the response began. # Budget vor Antwortbeginn aufgebraucht.
+                    reason = "deadline"
+                if reason:
+                    break
+
+            if reason is None: # Finished in time; surfaces the application's own errors. # Rechtzeitig fertig; gibt die eigenen Fehler der Anwendung weiter.
+                task.result()
+                return
+
+            CANCELLED.labels(reason).inc()
+            logger.info("Cancelling %s %s: %s after %.1f s", scope["method"], scope["path"], reason, budget - (deadline - loop.time()))
+            task.cancel() # Cancels upstream calls down the pipeline. # Bricht Upstream-Aufrufe entlang der Pipeline ab.
+            try:
+                await task # Lets cleanup blocks stop synthesizers and delete files. # Lässt Bereinigungsblöcke Synthesizer stoppen und Dateien löschen.
+            except asyncio.CancelledError:
+                pass
+            except Exception as e: # Errors while unwinding are only logged. # Fehler beim Abwickeln werden nur protokolliert.
+                logger.warning("Error while cancelling %s: %s", scope["path"], e)
+            if reason == "deadline" and not state["started"]: # Tells a still connected client why. # Teilt einem noch verbundenen Client den Grund mit.
+                body = json.dumps({"detail": "Request deadline exceeded"}).encode("utf-8")
+                await send({"type": "http.response.start", "status": 504, "headers": [
+                    (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1")),
+                ]})
+                await send({"type": "http.response.body", "body": body})
+        finally:
+            if watcher.done() and not watcher.cancelled(): # Retrieves a receive error so it isn't reported as unhandled. # Holt einen Empfangsfehler ab, damit er nicht als unbehandelt gemeldet wird.
+                watcher.exception()
+            watcher.cancel()
+            if not task.done(): # The server cancelled this handler. # Der Server hat diesen Handler abgebrochen.
+                task.cancel()
+            _deadline.reset(token)
@@ -0,0 +1,149 @@
+# Logging Setup
+#
+# The single logging configuration of the server: records are handed through a bounded queue to a background writer thread that emits compact JSON lines. # Die einzige Logging-Konfiguration des Servers: Einträge werden über eine begrenzte Warteschlange an einen Hintergrund-Schreibthread übergeben, der kompakte JSON-Zeilen ausgibt.
+# Levels are configurable per module, long messages are truncated and large payloads (SSML, Gemini output) are sampled. # Stufen sind pro Modul konfigurierbar, lange Nachrichten werden gekürzt und große Nutzdaten (SSML, Gemini-Ausgabe) werden stichprobenartig protokolliert.
+#
+# Usage:
+# configure_logging() # Installs the queue handler on the root logger once. # Installiert den Warteschlangen-Handler einmalig am Root-Logger.
+# LOG_LEVEL=INFO LOG_LEVELS="app.application.services.tts_service=DEBUG,uvicorn=WARNING" # Root level and per-module overrides. # Root-Stufe und Überschreibungen pro Modul.
+# log_payload(logger, "Generated SSML", ssml) # Logs a truncated, sampled payload at DEBUG. # Protokolliert gekürzte, stichprobenartige Nutzdaten auf DEBUG.
+#
+# EN: Logging calls on the event loop only copy the record into a queue; formatting and disk or console writes happen on the writer thread, and a full queue drops records instead of blocking. Forked workers start their own writer.
+# DE: Logging-Aufrufe auf der Ereignisschleife kopieren den Eintrag nur in eine Warteschlange; Formatierung und Schreiben auf Datenträger oder Konsole erfolgen im Schreibthread, und eine volle Warteschlange verwirft Einträge, statt zu blockieren. Geforkte Worker starten ihren eigenen Schreiber.
+
+import atexit # For flushing the queue at exit. # Zum Leeren der Warteschlange beim Beenden.
+import copy # For copying records before they cross threads. # Zum Kopieren von Einträgen, bevor sie Threads wechseln.
+import json # For the JSON lines. # Für die JSON-Zeilen.
+import logging # For the standard logging machinery. # Für die Standard-Logging-Mechanik.
+import logging.handlers # For QueueHandler and QueueListener. # Für QueueHandler und QueueListener.
+import os # For configuration. # Für die Konfiguration.
+import queue # For the bounded record queue. # Für die begrenzte Eintragswarteschlange.
+import random # For payload sampling. # Für die Stichproben von Nutzdaten.
+import sys # For the console stream. # Für den Konsolenstrom.
+import time # For timestamps. # Für Zeitstempel.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+from prometheus_client import Counter # For counting dropped records. # Zum Zählen verworfener Einträge.
+
+LOG_LEVEL = os.getenv("LOG_LEVEL") or ("DEBUG" if os.getenv("DEBUG_MODE") else "INFO") # Root level. # Root-Stufe.
+LOG_LEVELS = os.getenv("LOG_LEVELS", "") # Comma-separated logger=LEVEL overrides. # Kommagetrennte Überschreibungen logger=STUFE.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower() # "json" or "text". # "json" oder "text".
+LOG_FILE = os.getenv("LOG_FILE", "api.log") # Log file written next to the console; empty disables it. # Neben der Konsole geschriebene Logdatei; leer deaktiviert sie.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000")) # Records waiting for the writer before new ones are dropped. # Auf den Schreiber wartende Einträge, bevor neue verworfen werden.
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000")) # Longer messages are truncated. # Längere Nachrichten werden gekürzt.
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "300")) # Characters kept of a logged payload. # Behaltene Zeichen einer protokollierten Nutzlast.
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1")) # Share of payloads logged at DEBUG. # Anteil der auf DEBUG protokollierten Nutzdaten.
+
+DEFAULT_LEVELS = { # Chatty libraries that log on every request at DEBUG. # Gesprächige Bibliotheken, die bei jeder Anfrage auf DEBUG protokollieren.
+    "multipart": "WARNING", "python_multipart": "WARNING", "httpx": "WARNING", "httpcore": "WARNING",
+    "urllib3": "WARNING", "asyncio": "WARNING", "uvicorn.access": "WARNING",
+}
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"} # Standard attributes; anything else came from extra=. # Standardattribute; alles andere kam aus extra=.
+
+LOG_RECORDS_DROPPED = Counter( # Records lost because the writer fell behind. # Einträge, die verloren gingen, weil der Schreiber zurückfiel.
+    "speak_log_records_dropped_total", "Log records dropped because the log queue was full"
+)
+
+_listener: Optional[logging.handlers.QueueListener] = None # Writer thread, set once configured. # Schreibthread, gesetzt nach der Konfiguration.
+
+
+def truncate(text: str, limit: int) -> str: # Shortens text and notes the original length. # Kürzt Text und vermerkt die ursprüngliche Länge.
+    return text if len(text) <= limit else f"{text[:limit]}... [{len(text)} chars]"
+
+
+class JsonFormatter(logging.Formatter): # One compact JSON object per line. # Ein kompaktes JSON-Objekt pro Zeile.
+    def format(self, record: logging.LogRecord) -> str: # Formats a record. # Formatiert einen Eintrag.
+        entry = { # Fixed fields first. # Feste Felder zuerst.
+            "ts": f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))}.{int(record.msecs):03d}Z",
+            "level": record.levelname, "logger": record.name, "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items(): # Fields passed with extra=. # Mit extra= übergebene Felder.
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value if isinstance(value, (bool, int, float, type(None))) else truncate(str(value), LOG_MAX_MESSAGE_CHARS)
+        if record.exc_text: # Traceback rendered by the queue handler. # Vom Warteschlangen-Handler gerenderter Traceback.
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler): # Hands records to the writer thread. # Übergibt Einträge an den Schreibthread.
+    """Queue handler that never blocks the caller and leaves formatting to the writer thread"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord: # Makes the record safe to cross threads. # Macht den Eintrag sicher für den Threadwechsel.
+        message = truncate(record.getMessage(), LOG_MAX_MESSAGE_CHARS) # Merges the arguments now, as they may change later. # Führt die Argumente jetzt zusammen, da sie sich später ändern können.
+        record = copy.copy(record) # Other handlers may still see the original. # Andere Handler sehen eventuell noch das Original.
+        record.msg, record.args, record.message = message, None, message
+        if record.exc_info: # Renders the traceback while its frames are alive; only on error paths. # Rendert den Traceback, solange seine Frames leben; nur auf Fehlerpfaden.
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None: # Adds a record without waiting. # Fügt einen Eintrag ohne Warten hinzu.
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full: # Dropping beats stalling the event loop. # Verwerfen ist besser als die Ereignisschleife anzuhalten.
+            LOG_RECORDS_DROPPED.inc()
+
+
+def parse_levels(spec: str) -> dict: # Parses "logger=LEVEL,..." into a mapping. # Zerlegt "logger=STUFE,..." in eine Zuordnung.
+    levels = {}
+    for item in spec.split(","): # One override per item. # Eine Überschreibung pro Eintrag.
+        name, _, level = item.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None: # Installs the logging pipeline. # Installiert die Logging-Pipeline.
+    """Route all loggers through one non-blocking queue to a JSON writer thread; safe to call more than once"""
+    global _listener
+    if _listener is not None: # Already configured by another entry point. # Bereits von einem anderen Einstiegspunkt konfiguriert.
+        return
+    if LOG_FORMAT == "json": # Structured lines for log collectors. # Strukturierte Zeilen für Log-Sammler.
+        formatter = JsonFormatter()
+    else: # Readable lines for local development. # Lesbare Zeilen für die lokale Entwicklung.
+        formatter = logging.Formatter("%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s", "%Y-%m-%d %H:%M:%S")
+    handlers = [logging.StreamHandler(sys.stderr)] # Console output. # Konsolenausgabe.
+    if LOG_FILE: # File output, written only by the writer thread. # Dateiausgabe, nur vom Schreibthread geschrieben.
+        handlers.append(logging.FileHandler(LOG_FILE, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    records = queue.Queue(maxsize=LOG_QUEUE_SIZE) # Bounded, so a stuck writer can't grow memory. # Begrenzt, damit ein hängender Schreiber den Speicher nicht wachsen lässt.
+    root = logging.getLogger()
+    for handler in list(root.handlers): # Replaces basicConfig or earlier handlers. # Ersetzt basicConfig oder frühere Handler.
+        root.removeHandler(handler)
+    root.addHandler(NonBlockingQueueHandler(records))
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in {**DEFAULT_LEVELS, **parse_levels(LOG_LEVELS)}.items(): # Per-module levels. # Stufen pro Modul.
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True) # Writer thread. # Schreibthread.
+    _listener.start()
+    atexit.register(_listener.stop) # Writes the remaining records at exit. # Schreibt die verbleibenden Einträge beim Beenden.
+
+
+def _restart_after_fork() -> None: # Gives a forked worker its own writer thread. # Gibt einem geforkten Worker seinen eigenen Schreibthread.
+    """Replace the inherited queue and writer, whose thread only runs in the parent process"""
+    global _listener
+    if _listener is None: # Logging was never configured. # Logging wurde nie konfiguriert.
+        return
+    atexit.unregister(_listener.stop) # The parent's writer isn't running here. # Der Schreiber des Elternprozesses läuft hier nicht.
+    for handler in _listener.handlers: # Closes this process's copies of the file handles. # Schließt die Kopien der Dateihandles dieses Prozesses.
+        handler.close()
+    _listener = None
+    configure_logging()
+
+
+if hasattr(os, "register_at_fork"): # Preforking servers such as gunicorn load the app before forking. # Vorforkende Server wie gunicorn laden die App vor dem Forken.
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def log_payload(logger: logging.Logger, label: str, payload: str) -> None: # Logs a large payload cheaply. # Protokolliert große Nutzdaten kostengünstig.
+    """Log a truncated payload at DEBUG for a sample of calls; costs one level check when DEBUG is off"""
+    if not logger.isEnabledFor(logging.DEBUG): # The common production case. # Der übliche Produktionsfall.
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE: # Skips most payloads. # Überspringt die meisten Nutzdaten.
+        return
+    logger.debug("%s: %s", label, truncate(payload, LOG_PAYLOAD_MAX_CHARS), extra={"payload_chars": len(payload)})
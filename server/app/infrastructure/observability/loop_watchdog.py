@@ -0,0 +1,152 @@
+# LoopWatchdog
+#
+# Detects callbacks that block the asyncio event loop and reports them aggregated by call site. # Erkennt Callbacks, die die asyncio-Ereignisschleife blockieren, und meldet sie nach Aufrufstelle zusammengefasst.
+# A heartbeat task measures event-loop lag; a watchdog thread captures the loop thread's stack while a beat is overdue. # Eine Heartbeat-Task misst die Verzögerung der Ereignisschleife; ein Watchdog-Thread erfasst den Stack des Schleifen-Threads, während ein Takt überfällig ist.
+#
+# Usage:
+# LOOP_WATCHDOG_ENABLED=true # Starts the watchdog with the application. # Startet den Watchdog mit der Anwendung.
+# LOOP_BLOCK_THRESHOLD_MS=100 # Blocks shorter than this are only counted as lag. # Blockaden unter diesem Wert werden nur als Verzögerung gezählt.
+# GET /admin/loop-blocks # Returns the blocking call sites, worst first. # Gibt die blockierenden Aufrufstellen zurück, die schlimmsten zuerst.
+#
+# EN: Finds synchronous calls (Gemini, Google STT, pydub, file writes) hiding in async handlers that cause tail latency.
+# DE: Findet synchrone Aufrufe (Gemini, Google STT, pydub, Dateischreibvorgänge) in asynchronen Handlern, die Tail-Latenz verursachen.
+
+import asyncio # For the heartbeat task. # Für die Heartbeat-Task.
+import os # For configuration and path handling. # Für Konfiguration und Pfadbehandlung.
+import sys # For capturing the loop thread's stack. # Zum Erfassen des Stacks des Schleifen-Threads.
+import threading # For the watchdog thread. # Für den Watchdog-Thread.
+import time # For monotonic timing. # Für monotone Zeitmessung.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+from prometheus_client import Counter, Histogram # For lag and block metrics. # Für Verzögerungs- und Blockademetriken.
+
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "false").lower() == "true" # Starts the watchdog with the application. # Startet den Watchdog mit der Anwendung.
+LOOP_BLOCK_THRESHOLD = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100")) / 1000 # Blocking time that triggers a stack capture. # Blockadezeit, die eine Stack-Erfassung auslöst.
+LOOP_WATCHDOG_INTERVAL = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "20")) / 1000 # Heartbeat interval. # Heartbeat-Intervall.
+MAX_CALL_SITES = int(os.getenv("LOOP_WATCHDOG_MAX_SITES", "200")) # Bounds the report size. # Begrenzt die Berichtsgröße.
+MAX_STACK_DEPTH = 30 # Frames kept per captured stack. # Pro erfasstem Stack behaltene Frames.
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # The app package, whose frames identify the call site. # Das app-Paket, dessen Frames die Aufrufstelle identifizieren.
+
+LOOP_LAG_SECONDS = Histogram( # How late heartbeats ran. # Wie verspätet Heartbeats liefen.
+    "speak_event_loop_lag_seconds", "Delay of the event loop heartbeat beyond its interval",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+LOOP_BLOCKS = Counter( # Blocks above the threshold. # Blockaden über dem Schwellenwert.
+    "speak_event_loop_blocks_total", "Event loop blocks longer than the threshold"
+)
+
+
+def _frame_label(frame) -> str: # Formats a frame as file:line function. # Formatiert einen Frame als Datei:Zeile Funktion.
+    path = frame.f_code.co_filename # Source file. # Quelldatei.
+    if path.startswith(APP_ROOT): # App frames are shown relative to the server directory. # App-Frames werden relativ zum Server-Verzeichnis angezeigt.
+        path = os.path.relpath(path, os.path.dirname(APP_ROOT))
+    else: # Library frames only need the file name. # Bibliotheks-Frames benötigen nur den Dateinamen.
+        path = os.path.basename(path)
+    return f"{path}:{frame.f_lineno} {frame.f_code.co_name}"
+
+
+class LoopWatchdog: # Measures event-loop lag and aggregates blocking call sites. # Misst die Verzögerung der Ereignisschleife und fasst blockierende Aufrufstellen zusammen.
+    """Heartbeat task plus watchdog thread that samples the loop thread while it is blocked"""
+
+    def __init__(self, threshold: float = LOOP_BLOCK_THRESHOLD, interval: float = LOOP_WATCHDOG_INTERVAL): # Stores the settings. # Speichert die Einstellungen.
+        self.threshold = threshold # Blocking time that triggers a capture. # Blockadezeit, die eine Erfassung auslöst.
+        self.interval = interval # Heartbeat interval. # Heartbeat-Intervall.
+        self.sites = {} # (call site, blocking frame) -> aggregated block statistics. # (Aufrufstelle, blockierender Frame) -> zusammengefasste Blockadestatistik.
+        self.blocks = 0 # Blocks above the threshold. # Blockaden über dem Schwellenwert.
+        self.max_lag = 0.0 # Worst observed lag. # Schlimmste beobachtete Verzögerung.
+        self._lock = threading.Lock() # Guards the statistics between loop and watchdog threads. # Schützt die Statistik zwischen Schleifen- und Watchdog-Threads.
+        self._last_beat = time.monotonic() # Time of the last heartbeat. # Zeit des letzten Heartbeats.
+        self._captured = None # Site key captured for the current stall. # Für die aktuelle Blockade erfasster Stellenschlüssel.
+        self._loop_thread_id = None # Thread running the event loop. # Thread, der die Ereignisschleife ausführt.
+        self._task = None # Heartbeat task. # Heartbeat-Task.
+        self._thread = None # Watchdog thread. # Watchdog-Thread.
+        self._stop = threading.Event() # Signals the watchdog thread to stop. # Signalisiert dem Watchdog-Thread, anzuhalten.
+
+    def start(self) -> None: # Starts both halves inside the running loop. # Startet beide Hälften innerhalb der laufenden Schleife.
+        """Start the heartbeat on the running event loop and the watchdog thread"""
+        self._loop_thread_id = threading.get_ident() # Called from the loop thread. # Wird aus dem Schleifen-Thread aufgerufen.
+        self._last_beat = time.monotonic() # Resets the heartbeat. # Setzt den Heartbeat zurück.
+        self._stop.clear()
+        self._task = asyncio.get_event_loop().create_task(self._heartbeat()) # Starts the heartbeat. # Startet den Heartbeat.
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True) # Watchdog thread. # Watchdog-Thread.
+        self._thread.start()
+
+    async def stop(self) -> None: # Stops both halves. # Stoppt beide Hälften.
+        self._stop.set() # Stops the watchdog thread. # Stoppt den Watchdog-Thread.
+        if self._task is not None: # Cancels the heartbeat. # Bricht den Heartbeat ab.
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._thread is not None: # Waits for the watchdog thread. # Wartet auf den Watchdog-Thread.
+            self._thread.join()
+
+    async def _heartbeat(self): # Beats on the event loop and measures how late each beat ran. # Schlägt auf der Ereignisschleife und misst, wie verspätet jeder Takt lief.
+        while True:
+            expected = time.monotonic() + self.interval # When the beat should run. # Wann der Takt laufen sollte.
+            await asyncio.sleep(self.interval) # Yields to other callbacks. # Gibt an andere Callbacks ab.
+            now = time.monotonic() # When it actually ran. # Wann er tatsächlich lief.
+            lag = max(0.0, now - expected) # Time the loop was busy beyond the interval. # Zeit, die die Schleife über das Intervall hinaus beschäftigt war.
+            LOOP_LAG_SECONDS.observe(lag) # Records the lag. # Erfasst die Verzögerung.
+            with self._lock: # Closes the stall under the lock so the watchdog sees a consistent state. # Schließt die Blockade unter der Sperre, damit der Watchdog einen konsistenten Zustand sieht.
+                self._last_beat = now # Marks the loop as responsive. # Markiert die Schleife als reaktionsfähig.
+                self.max_lag = max(self.max_lag, lag) # Tracks the worst lag. # Verfolgt die schlimmste Verzögerung.
+                if lag >= self.threshold: # The loop was blocked. # Die Schleife war blockiert.
+                    self.blocks += 1 # Counts the block. # Zählt die Blockade.
+                    LOOP_BLOCKS.inc()
+                    site = self.sites.get(self._captured) if self._captured else None # Statistics of the captured call site. # Statistik der erfassten Aufrufstelle.
+                    if site is not None: # Adds the full blocking time to the site. # Fügt der Stelle die gesamte Blockadezeit hinzu.
+                        site["total_ms"] += lag * 1000
+                        site["max_ms"] = max(site["max_ms"], lag * 1000)
+                self._captured = None # Ready for the next stall. # Bereit für die nächste Blockade.
+
+    def _watch(self): # Watchdog thread loop. # Schleife des Watchdog-Threads.
+        while not self._stop.wait(self.interval): # Checks once per interval. # Prüft einmal pro Intervall.
+            with self._lock: # Reads the heartbeat state. # Liest den Heartbeat-Zustand.
+                overdue = time.monotonic() - self._last_beat - self.interval # How long the current beat is late. # Wie lange der aktuelle Takt verspätet ist.
+                if overdue < self.threshold or self._captured is not None: # Loop is responsive, or this stall was captured already. # Schleife ist reaktionsfähig, oder diese Blockade wurde bereits erfasst.
+                    continue
+                frame = sys._current_frames().get(self._loop_thread_id) # Stack of the blocked loop thread. # Stack des blockierten Schleifen-Threads.
+                if frame is not None: # Records the blocking call site. # Erfasst die blockierende Aufrufstelle.
+                    self._captured = self._record(frame)
+
+    def _record(self, frame) -> Optional[tuple]: # Adds a captured stack to the report. # Fügt dem Bericht einen erfassten Stack hinzu.
+        stack = [] # Leaf first. # Blatt zuerst.
+        while frame is not None and len(stack) < MAX_STACK_DEPTH: # Walks to the root. # Geht bis zur Wurzel.
+            stack.append(frame)
+            frame = frame.f_back
+        app_frame = next((f for f in stack if f.f_code.co_filename.startswith(APP_ROOT)), None) # Innermost frame of our own code. # Innerster Frame unseres eigenen Codes.
+        key = (_frame_label(app_frame) if app_frame else "outside app", _frame_label(stack[0])) # Call site and the frame that was running. # Aufrufstelle und der laufende Frame.
+        site = self.sites.get(key) # Existing statistics. # Bestehende Statistik.
+        if site is None: # First block at this site. # Erste Blockade an dieser Stelle.
+            if len(self.sites) >= MAX_CALL_SITES: # Keeps memory bounded. # Hält den Speicher begrenzt.
+                return None
+            site = self.sites[key] = {
+                "call_site": key[0], "blocking_frame": key[1], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "stack": [_frame_label(f) for f in reversed(stack)], # Root first, as in tracebacks. # Wurzel zuerst, wie in Tracebacks.
+            }
+        site["count"] += 1 # Counts the block. # Zählt die Blockade.
+        return key
+
+    def report(self) -> dict: # Summarizes the blocking call sites. # Fasst die blockierenden Aufrufstellen zusammen.
+        """Return the lag summary and the call sites sorted by total blocking time"""
+        with self._lock: # Copies a consistent snapshot. # Kopiert eine konsistente Momentaufnahme.
+            sites = sorted((dict(site) for site in self.sites.values()), key=lambda site: site["total_ms"], reverse=True)
+            return {
+                "enabled": self._task is not None and not self._task.done(),
+                "threshold_ms": self.threshold * 1000,
+                "blocks": self.blocks,
+                "max_lag_ms": round(self.max_lag * 1000, 1),
+                "call_sites": [{**site, "total_ms": round(site["total_ms"], 1), "max_ms": round(site["max_ms"], 1)} for site in sites],
+            }
+
+    def reset(self) -> None: # Clears the statistics. # Löscht die Statistik.
+        with self._lock:
+            self.sites.clear()
+            self.blocks = 0
+            self.max_lag = 0.0
+
+
+watchdog = LoopWatchdog() # Process-wide watchdog. # Prozessweiter Watchdog.
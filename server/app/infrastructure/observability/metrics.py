@@ -0,0 +1,176 @@
+# Metrics
+#
+# Prometheus metrics for the translation and speech API. # Prometheus-Metriken für die Übersetzungs- und Sprach-API.
+# Provides per-stage latency histograms, in-flight gauges, upstream error counters, audio byte counters and cache lookups. # Bietet Latenzhistogramme pro Stufe, In-Flight-Messwerte, Upstream-Fehlerzähler, Audio-Bytezähler und Cache-Abfragen.
+#
+# Usage:
+# with stage_timer("translation", "parse"): ... # Records the duration of a pipeline stage. # Erfasst die Dauer einer Pipeline-Stufe.
+# with upstream_call("gemini"): ... # Records duration, in-flight calls and errors of an upstream call. # Erfasst Dauer, laufende Aufrufe und Fehler eines Upstream-Aufrufs.
+# record_cache("audio_clips", hits=3, misses=1) # Counts cache lookups. # Zählt Cache-Abfragen.
+# app.add_middleware(MetricsMiddleware) # Records request latency and in-flight requests per endpoint. # Erfasst Anfragelatenz und laufende Anfragen pro Endpunkt.
+#
+# EN: Shows which stage of a slow request (Gemini, parsing, SSML, Azure synthesis, file I/O) took the time, scraped from GET /metrics.
+# DE: Zeigt, welche Stufe einer langsamen Anfrage (Gemini, Parsing, SSML, Azure-Synthese, Datei-E/A) die Zeit benötigt hat, abgefragt über GET /metrics.
+
+import asyncio # For detecting coroutine functions in the decorator. # Zum Erkennen von Coroutine-Funktionen im Dekorator.
+import functools # For preserving wrapped function metadata. # Zum Erhalten der Metadaten umschlossener Funktionen.
+import os # For detecting the multi-process mode. # Zum Erkennen des Mehrprozessmodus.
+import time # For monotonic timing. # Für monotone Zeitmessung.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest # Prometheus client primitives. # Prometheus-Client-Grundbausteine.
+from prometheus_client import multiprocess # For aggregating the metrics of all workers. # Zum Zusammenführen der Metriken aller Worker.
+from starlette.routing import Match # For resolving the route template of a request. # Zum Auflösen der Routenvorlage einer Anfrage.
+
+from .request_timing import record_timing # For the Server-Timing header of the current request. # Für den Server-Timing-Header der aktuellen Anfrage.
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0) # Covers regex parsing (ms) to long syntheses (tens of seconds). # Deckt Regex-Parsing (ms) bis lange Synthesen (zehn Sekunden) ab.
+
+STAGE_SECONDS = Histogram( # Duration of each pipeline stage. # Dauer jeder Pipeline-Stufe.
+    "speak_stage_duration_seconds", "Duration of a processing stage", ["service", "stage"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram( # Duration of each HTTP request. # Dauer jeder HTTP-Anfrage.
+    "speak_http_request_duration_seconds", "Duration of an HTTP request", ["endpoint", "method", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge( # Requests currently being handled. # Aktuell bearbeitete Anfragen.
+    "speak_http_requests_in_flight", "HTTP requests currently being handled", ["endpoint"], multiprocess_mode="livesum"
+)
+UPSTREAM_IN_FLIGHT = Gauge( # Calls currently waiting on an upstream service. # Aufrufe, die aktuell auf einen Upstream-Dienst warten.
+    "speak_upstream_calls_in_flight", "Calls currently waiting on an upstream service", ["upstream"], multiprocess_mode="livesum"
+)
+UPSTREAM_ERRORS = Counter( # Failed upstream calls by error type. # Fehlgeschlagene Upstream-Aufrufe nach Fehlertyp.
+    "speak_upstream_errors_total", "Failed upstream calls", ["upstream", "error"]
+)
+AUDIO_BYTES = Counter( # Audio bytes written for clients. # Für Clients geschriebene Audio-Bytes.
+    "speak_audio_bytes_total", "Audio bytes produced", ["format"]
+)
+CACHE_LOOKUPS = Counter( # Cache lookups; hit ratio = hit / (hit + miss). # Cache-Abfragen; Trefferquote = hit / (hit + miss).
+    "speak_cache_lookups_total", "Cache lookups by result", ["cache", "result"]
+)
+
+_stage_children = {} # Labeled histogram children by (service, stage), avoids label resolution on the hot path. # Gelabelte Histogramm-Kinder nach (Dienst, Stufe), vermeidet Label-Auflösung im Hot Path.
+
+
+def _stage_histogram(service: str, stage: str): # Returns the cached histogram child of a stage. # Gibt das zwischengespeicherte Histogramm-Kind einer Stufe zurück.
+    key = (service, stage) # Cache key. # Cache-Schlüssel.
+    child = _stage_children.get(key) # Looks up the child. # Sucht das Kind.
+    if child is None: # First use of this stage. # Erste Verwendung dieser Stufe.
+        child = _stage_children[key] = STAGE_SECONDS.labels(service, stage) # Resolves the labels once. # Löst die Labels einmal auf.
+    return child # Returns the child. # Gibt das Kind zurück.
+
+
+class stage_timer: # Context manager that times a pipeline stage. # Kontextmanager, der eine Pipeline-Stufe misst.
+    """Observe the duration of a block in speak_stage_duration_seconds"""
+    __slots__ = ("service", "stage", "_start") # Keeps the timer small. # Hält den Timer klein.
+
+    def __init__(self, service: str, stage: str): # Stores the labels. # Speichert die Labels.
+        self.service = service # Service name, e.g. "tts". # Dienstname, z. B. "tts".
+        self.stage = stage # Stage name, e.g. "synthesis". # Stufenname, z. B. "synthesis".
+
+    def __enter__(self): # Starts timing. # Startet die Messung.
+        self._start = time.perf_counter() # Monotonic start time. # Monotone Startzeit.
+        return self
+
+    def __exit__(self, exc_type, exc, tb): # Stops timing. # Stoppt die Messung.
+        duration = time.perf_counter() - self._start # Elapsed time. # Verstrichene Zeit.
+        _stage_histogram(self.service, self.stage).observe(duration) # Records the duration. # Erfasst die Dauer.
+        record_timing(self.service, self.stage, duration) # Adds the stage to Server-Timing of a timed request. # Fügt die Stufe dem Server-Timing einer gemessenen Anfrage hinzu.
+        return False # Never swallows exceptions. # Unterdrückt nie Ausnahmen.
+
+
+class upstream_call(stage_timer): # Context manager for calls to Gemini, Azure or Google. # Kontextmanager für Aufrufe an Gemini, Azure oder Google.
+    """Time an upstream call as a stage and track in-flight calls and errors"""
+    __slots__ = () # No extra attributes. # Keine zusätzlichen Attribute.
+
+    def __init__(self, upstream: str): # Uses the upstream name as service and stage. # Verwendet den Upstream-Namen als Dienst und Stufe.
+        super().__init__("upstream", upstream)
+
+    def __enter__(self): # Counts the call as in flight. # Zählt den Aufruf als laufend.
+        UPSTREAM_IN_FLIGHT.labels(self.stage).inc() # Increments the gauge. # Erhöht den Messwert.
+        return super().__enter__()
+
+    def __exit__(self, exc_type, exc, tb): # Ends the call. # Beendet den Aufruf.
+        UPSTREAM_IN_FLIGHT.labels(self.stage).dec() # Decrements the gauge. # Verringert den Messwert.
+        if exc_type is not None: # The call failed. # Der Aufruf ist fehlgeschlagen.
+            record_upstream_error(self.stage, exc_type.__name__) # Counts the error by type. # Zählt den Fehler nach Typ.
+        return super().__exit__(exc_type, exc, tb)
+
+
+def timed(service: str, stage: str): # Decorator that times every call of a function as a stage. # Dekorator, der jeden Aufruf einer Funktion als Stufe misst.
+    """Record each call of a sync or async function in speak_stage_duration_seconds"""
+    def decorator(func): # Wraps the function. # Umschließt die Funktion.
+        if asyncio.iscoroutinefunction(func): # Async functions are timed until the coroutine finishes. # Asynchrone Funktionen werden bis zum Ende der Coroutine gemessen.
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs): # Times an awaited call. # Misst einen erwarteten Aufruf.
+                with stage_timer(service, stage): # A fresh timer per call keeps concurrent calls apart. # Ein neuer Timer pro Aufruf hält gleichzeitige Aufrufe getrennt.
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs): # Times a plain call. # Misst einen normalen Aufruf.
+            with stage_timer(service, stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_upstream_error(upstream: str, error: str) -> None: # Counts a failed upstream call. # Zählt einen fehlgeschlagenen Upstream-Aufruf.
+    UPSTREAM_ERRORS.labels(upstream, error).inc() # Increments the counter. # Erhöht den Zähler.
+
+
+def record_audio_bytes(audio_format: Optional[str], size: int) -> None: # Counts produced audio bytes. # Zählt erzeugte Audio-Bytes.
+    AUDIO_BYTES.labels(audio_format or "default").inc(size) # Increments the counter. # Erhöht den Zähler.
+
+
+def record_cache(cache: str, hits: int = 0, misses: int = 0) -> None: # Counts cache lookups. # Zählt Cache-Abfragen.
+    if hits: # Counts hits. # Zählt Treffer.
+        CACHE_LOOKUPS.labels(cache, "hit").inc(hits)
+    if misses: # Counts misses. # Zählt Fehlschläge.
+        CACHE_LOOKUPS.labels(cache, "miss").inc(misses)
+
+
+def metrics_payload() -> tuple: # Renders the metrics for a scrape. # Rendert die Metriken für eine Abfrage.
+    """Return (body, content type) in the Prometheus text format, summed over all workers in multi-process mode"""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"): # Set by gunicorn.conf.py; every worker writes its values to files there. # Von gunicorn.conf.py gesetzt; jeder Worker schreibt seine Werte dort in Dateien.
+        registry = CollectorRegistry() # Fresh registry per scrape, as the client library requires. # Neue Registry pro Abfrage, wie es die Client-Bibliothek verlangt.
+        multiprocess.MultiProcessCollector(registry) # Reads the files of all workers. # Liest die Dateien aller Worker.
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST # Serializes the default registry. # Serialisiert die Standard-Registry.
+
+
+def _endpoint_label(scope: dict) -> str: # Resolves the route template of a request. # Löst die Routenvorlage einer Anfrage auf.
+    app = scope.get("app") # The Starlette application set by the outer app. # Die von der äußeren App gesetzte Starlette-Anwendung.
+    for route in getattr(getattr(app, "router", None), "routes", ()): # Walks the registered routes. # Durchläuft die registrierten Routen.
+        match, _ = route.matches(scope) # Checks the route. # Prüft die Route.
+        if match == Match.FULL: # The route handles the request. # Die Route bearbeitet die Anfrage.
+            return getattr(route, "path", "other") # Uses the template, e.g. /api/audio/{filename}, to bound label cardinality. # Verwendet die Vorlage, z. B. /api/audio/{filename}, um die Label-Kardinalität zu begrenzen.
+    return "unmatched" # Unknown paths share one label. # Unbekannte Pfade teilen sich ein Label.
+
+
+class MetricsMiddleware: # Pure ASGI middleware recording request metrics. # Reine ASGI-Middleware zur Erfassung von Anfragemetriken.
+    """Record request latency and in-flight requests per route template"""
+
+    def __init__(self, app): # Wraps the next ASGI application. # Umschließt die nächste ASGI-Anwendung.
+        self.app = app # Next application. # Nächste Anwendung.
+
+    async def __call__(self, scope, receive, send): # Handles one ASGI connection. # Bearbeitet eine ASGI-Verbindung.
+        if scope["type"] != "http": # Only HTTP requests are measured. # Nur HTTP-Anfragen werden gemessen.
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = _endpoint_label(scope) # Resolves the route template. # Löst die Routenvorlage auf.
+        status = {"code": 500} # Response status, 500 if the app raises before responding. # Antwortstatus, 500, wenn die App vor dem Antworten eine Ausnahme auslöst.
+
+        async def send_wrapper(message): # Captures the response status. # Erfasst den Antwortstatus.
+            if message["type"] == "http.response.start": # First response message. # Erste Antwortnachricht.
+                status["code"] = message["status"] # Stores the status code. # Speichert den Statuscode.
+            await send(message) # Forwards the message. # Leitet die Nachricht weiter.
+
+        in_flight = REQUESTS_IN_FLIGHT.labels(endpoint) # Gauge of the endpoint. # Messwert des Endpunkts.
+        in_flight.inc() # Counts the request. # Zählt die Anfrage.
+        start = time.perf_counter() # Starts timing. # Startet die Messung.
+        try: # Runs the application. # Führt die Anwendung aus.
+            await self.app(scope, receive, send_wrapper)
+        finally: # Records even failed requests. # Erfasst auch fehlgeschlagene Anfragen.
+            in_flight.dec() # Releases the request. # Gibt die Anfrage frei.
+            REQUEST_SECONDS.labels(endpoint, scope["method"], str(status["code"])).observe(time.perf_counter() - start) # Records the duration. # Erfasst die Dauer.
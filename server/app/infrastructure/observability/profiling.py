@@ -0,0 +1,142 @@
+# Profiling
+#
+# An opt-in sampling profiler that records flame-graph profiles of single requests into a bounded local store. # Ein optionaler Sampling-Profiler, der Flame-Graph-Profile einzelner Anfragen in einem begrenzten lokalen Speicher aufzeichnet.
+# Profiles use the folded stack format read by flamegraph.pl, speedscope and inferno. # Profile verwenden das Folded-Stack-Format, das von flamegraph.pl, speedscope und inferno gelesen wird.
+#
+# Usage:
+# PROFILING_ENABLED=true # Allows clients to request a profile with the X-Profile header. # Erlaubt Clients, mit dem X-Profile-Header ein Profil anzufordern.
+# PROFILE_SAMPLE_RATE=0.01 # Profiles 1% of the timed requests automatically. # Profiliert automatisch 1 % der gemessenen Anfragen.
+# curl -H "X-Profile: 1" ... # Profiles one request; the X-Profile-Id response header names the profile. # Profiliert eine Anfrage; der Antwort-Header X-Profile-Id nennt das Profil.
+#
+# EN: Shows where the time of one slow production request went without redeploying or attaching a debugger.
+# DE: Zeigt, wohin die Zeit einer langsamen Produktionsanfrage geflossen ist, ohne Neubereitstellung oder Debugger.
+
+import asyncio # For the request task. # Für die Anfrage-Task.
+import os # For file system operations and configuration. # Für Dateisystemoperationen und Konfiguration.
+import random # For request sampling. # Für die Anfrageauswahl.
+import re # For safe file names. # Für sichere Dateinamen.
+import sys # For sampling thread stacks. # Für das Sampling von Thread-Stacks.
+import threading # For the sampler thread. # Für den Sampler-Thread.
+from collections import Counter # For counting identical stacks. # Zum Zählen identischer Stacks.
+from datetime import datetime # For profile names. # Für Profilnamen.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true" # Allows header-triggered profiles. # Erlaubt per Header ausgelöste Profile.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "") # Optional secret the X-Profile header must carry. # Optionales Geheimnis, das der X-Profile-Header enthalten muss.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0")) # Share of timed requests profiled automatically. # Anteil der gemessenen Anfragen, die automatisch profiliert werden.
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000 # Sampling interval in seconds. # Sampling-Intervall in Sekunden.
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join( # Directory of the profile store. # Verzeichnis des Profilspeichers.
+    os.environ.get("TEMP", "") if os.name == "nt" else "/tmp", "profiles"
+)
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50")) # Oldest profiles are deleted beyond this count. # Älteste Profile werden über dieser Anzahl gelöscht.
+MAX_STACK_DEPTH = 64 # Deeper stacks are truncated at the root. # Tiefere Stacks werden an der Wurzel abgeschnitten.
+
+_active = threading.Semaphore(int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))) # Bounds concurrent profiles and their overhead. # Begrenzt gleichzeitige Profile und deren Overhead.
+
+
+def _frame_name(code) -> str: # Formats a stack entry. # Formatiert einen Stack-Eintrag.
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}" # File and function, without line numbers so samples merge. # Datei und Funktion, ohne Zeilennummern, damit Samples zusammengeführt werden.
+
+
+def _collapse_frame(frame) -> str: # Folds a thread stack into one line. # Faltet einen Thread-Stack in eine Zeile.
+    names = [] # Leaf first. # Blatt zuerst.
+    while frame is not None and len(names) < MAX_STACK_DEPTH: # Walks to the root. # Geht bis zur Wurzel.
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(names)) # Root first, as the folded format expects. # Wurzel zuerst, wie es das Folded-Format erwartet.
+
+
+def _collapse_task(task) -> str: # Folds the await chain of a task into one line. # Faltet die Await-Kette einer Task in eine Zeile.
+    names = [] # Root first. # Wurzel zuerst.
+    coro = task.get_coro() # Outermost coroutine of the request. # Äußerste Coroutine der Anfrage.
+    while coro is not None and len(names) < MAX_STACK_DEPTH: # Follows what each coroutine awaits. # Folgt dem, worauf jede Coroutine wartet.
+        code = getattr(coro, "cr_code", None) or getattr(coro, "gi_code", None) # Coroutine or generator code. # Coroutine- oder Generator-Code.
+        if code is None: # Reached a future or a foreign awaitable. # Ein Future oder ein fremdes Awaitable erreicht.
+            names.append(type(coro).__name__)
+            break
+        names.append(_frame_name(code))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) # Next link of the chain. # Nächstes Glied der Kette.
+    return ";".join(names)
+
+
+class RequestProfiler: # Samples all thread stacks and the request's await chain while a request runs. # Sampelt alle Thread-Stacks und die Await-Kette der Anfrage, während eine Anfrage läuft.
+    def __init__(self, scope: dict, task: Optional[asyncio.Task]): # Starts sampling. # Startet das Sampling.
+        path = re.sub(r"[^A-Za-z0-9]+", "_", scope.get("path", "")).strip("_") or "root" # Path as a safe file name part. # Pfad als sicherer Dateinamensteil.
+        self.profile_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{scope.get('method', 'GET')}_{path}" # Unique profile name. # Eindeutiger Profilname.
+        self.samples = Counter() # Folded stack -> sample count. # Gefalteter Stack -> Anzahl Samples.
+        self._task = task # Request task for the await chain. # Anfrage-Task für die Await-Kette.
+        self._stop = threading.Event() # Signals the sampler to stop. # Signalisiert dem Sampler, anzuhalten.
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True) # Sampler thread. # Sampler-Thread.
+        self._thread.start() # Starts sampling. # Startet das Sampling.
+
+    def _run(self): # Sampling loop. # Sampling-Schleife.
+        own_id = threading.get_ident() # The sampler doesn't sample itself. # Der Sampler sampelt sich nicht selbst.
+        while not self._stop.wait(PROFILE_INTERVAL): # One sample per interval. # Ein Sample pro Intervall.
+            names = {thread.ident: thread.name for thread in threading.enumerate()} # Thread names for the stack roots. # Thread-Namen für die Stack-Wurzeln.
+            for thread_id, frame in sys._current_frames().items(): # Snapshot of every thread. # Momentaufnahme jedes Threads.
+                if thread_id != own_id: # Skips the sampler. # Überspringt den Sampler.
+                    self.samples[f"thread {names.get(thread_id, thread_id)};{_collapse_frame(frame)}"] += 1 # Counts the stack. # Zählt den Stack.
+            if self._task is not None and not self._task.done(): # Records what the request is waiting on. # Erfasst, worauf die Anfrage wartet.
+                self.samples[f"request await;{_collapse_task(self._task)}"] += 1
+
+    def stop(self): # Stops sampling. # Stoppt das Sampling.
+        self._stop.set() # Signals the sampler. # Signalisiert dem Sampler.
+        self._thread.join() # Waits for the last sample. # Wartet auf das letzte Sample.
+        _active.release() # Frees the profiling slot. # Gibt den Profiling-Platz frei.
+
+    def save(self, duration: float) -> str: # Writes the profile to the store. # Schreibt das Profil in den Speicher.
+        """Write the folded stacks to PROFILE_DIR and prune the oldest profiles"""
+        os.makedirs(PROFILE_DIR, exist_ok=True) # Creates the store. # Erstellt den Speicher.
+        path = os.path.join(PROFILE_DIR, f"{self.profile_id}.folded") # Profile file. # Profildatei.
+        with open(path, "w", encoding="utf-8") as f: # Writes one stack per line. # Schreibt einen Stack pro Zeile.
+            f.write(f"# duration_ms={duration * 1000:.1f} interval_ms={PROFILE_INTERVAL * 1000:g}\n") # Header comment. # Header-Kommentar.
+            for stack, count in self.samples.most_common(): # Most frequent stacks first. # Häufigste Stacks zuerst.
+                f.write(f"{stack} {count}\n")
+        prune_profiles() # Keeps the store bounded. # Hält den Speicher begrenzt.
+        return path # Returns the file path. # Gibt den Dateipfad zurück.
+
+
+def _wants_profile(scope: dict) -> bool: # Decides whether to profile a request. # Entscheidet, ob eine Anfrage profiliert wird.
+    if PROFILING_ENABLED: # Header-triggered profiles are allowed. # Per Header ausgelöste Profile sind erlaubt.
+        for name, value in scope.get("headers", ()): # Looks for the X-Profile header. # Sucht nach dem X-Profile-Header.
+            if name == b"x-profile": # Header names are lowercase in ASGI. # Header-Namen sind in ASGI kleingeschrieben.
+                return value.decode("latin-1") == PROFILE_TOKEN if PROFILE_TOKEN else value not in (b"", b"0", b"false") # Checks the token if one is configured. # Prüft das Token, falls eines konfiguriert ist.
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE # Random sampling. # Zufällige Auswahl.
+
+
+def profiler_for_request(scope: dict) -> Optional[RequestProfiler]: # Starts a profiler for a request when wanted. # Startet einen Profiler für eine Anfrage, falls gewünscht.
+    """Return a running profiler if the request should be profiled and a slot is free, otherwise None"""
+    if not _wants_profile(scope) or not _active.acquire(blocking=False): # Skips when not requested or when busy. # Überspringt, wenn nicht angefordert oder ausgelastet.
+        return None
+    try: # Creates the profiler. # Erstellt den Profiler.
+        return RequestProfiler(scope, asyncio.current_task())
+    except Exception: # Frees the slot if the sampler can't start. # Gibt den Platz frei, wenn der Sampler nicht starten kann.
+        _active.release()
+        raise
+
+
+def list_profiles() -> list: # Lists the stored profiles. # Listet die gespeicherten Profile auf.
+    """Return the stored profiles, newest first"""
+    if not os.path.isdir(PROFILE_DIR): # No profiles yet. # Noch keine Profile.
+        return []
+    entries = [] # Profile metadata. # Profil-Metadaten.
+    for name in os.listdir(PROFILE_DIR): # Walks the store. # Durchläuft den Speicher.
+        if name.endswith(".folded"): # Only profile files. # Nur Profildateien.
+            stat = os.stat(os.path.join(PROFILE_DIR, name)) # File metadata. # Dateimetadaten.
+            entries.append({"id": name[:-len(".folded")], "bytes": stat.st_size, "created": stat.st_mtime})
+    return sorted(entries, key=lambda entry: entry["created"], reverse=True) # Newest first. # Neueste zuerst.
+
+
+def profile_path(profile_id: str) -> Optional[str]: # Resolves a profile id to its file. # Löst eine Profil-ID in ihre Datei auf.
+    if not re.fullmatch(r"[A-Za-z0-9_]+", profile_id): # Rejects path traversal. # Lehnt Pfad-Traversal ab.
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.folded") # Profile file. # Profildatei.
+    return path if os.path.exists(path) else None # Returns the path if it exists. # Gibt den Pfad zurück, falls er existiert.
+
+
+def prune_profiles() -> None: # Deletes the oldest profiles beyond the limit. # Löscht die ältesten Profile über dem Limit.
+    for entry in list_profiles()[PROFILE_MAX_FILES:]: # Everything after the newest PROFILE_MAX_FILES. # Alles nach den neuesten PROFILE_MAX_FILES.
+        try: # Another worker may have deleted it already. # Ein anderer Worker könnte es bereits gelöscht haben.
+            os.remove(os.path.join(PROFILE_DIR, f"{entry['id']}.folded"))
+        except OSError:
+            pass
@@ -0,0 +1,93 @@
+# RequestTiming
+#
+# Per-request stage timings reported to the client in a Server-Timing header. # Stufenzeiten pro Anfrage, die dem Client in einem Server-Timing-Header gemeldet werden.
+# Stage timers record into a context variable that is set for the duration of each timed request. # Stufen-Timer zeichnen in eine Kontextvariable auf, die für die Dauer jeder gemessenen Anfrage gesetzt ist.
+#
+# Usage:
+# app.add_middleware(ServerTimingMiddleware) # Adds Server-Timing to /api/conversation, /api/speech-to-text and /api/voice-command. # Fügt Server-Timing zu /api/conversation, /api/speech-to-text und /api/voice-command hinzu.
+# await run_in_executor(func, *args) # Runs blocking work in the thread pool while keeping the request's timings. # Führt blockierende Arbeit im Thread-Pool aus und behält die Zeiten der Anfrage bei.
+#
+# EN: Lets engineers read the stage breakdown of a single slow response straight from its headers.
+# DE: Ermöglicht Entwicklern, die Stufenaufteilung einer einzelnen langsamen Antwort direkt aus ihren Headern abzulesen.
+
+import asyncio # For the running event loop. # Für die laufende Ereignisschleife.
+import contextvars # For request-scoped timing lists. # Für anfragebezogene Zeitlisten.
+import functools # For binding executor calls to a context. # Zum Binden von Executor-Aufrufen an einen Kontext.
+import os # For configuration. # Für die Konfiguration.
+import time # For monotonic timing. # Für monotone Zeitmessung.
+from typing import Optional # For type hinting. # Für Typhinweise.
+
+from .profiling import profiler_for_request # For the opt-in sampling profiler. # Für den optionalen Sampling-Profiler.
+
+_timings: contextvars.ContextVar = contextvars.ContextVar("request_timings", default=None) # List of (name, seconds) of the current request. # Liste von (Name, Sekunden) der aktuellen Anfrage.
+
+TIMED_PATHS = tuple( # Path prefixes that get a Server-Timing header. # Pfadpräfixe, die einen Server-Timing-Header erhalten.
+    path.strip() for path in os.getenv(
+        "SERVER_TIMING_PATHS", "/api/conversation,/api/speech-to-text,/api/voice-command"
+    ).split(",") if path.strip()
+)
+
+
+def record_timing(service: str, stage: str, seconds: float) -> None: # Adds a stage duration to the current request. # Fügt der aktuellen Anfrage eine Stufendauer hinzu.
+    timings = _timings.get() # Timing list of the request, None outside timed requests. # Zeitliste der Anfrage, None außerhalb gemessener Anfragen.
+    if timings is not None: # Only timed requests collect stages. # Nur gemessene Anfragen sammeln Stufen.
+        timings.append((f"{service}.{stage}", seconds)) # list.append is atomic, so executor threads may record too. # list.append ist atomar, daher dürfen auch Executor-Threads aufzeichnen.
+
+
+async def run_in_executor(func, *args): # Runs a blocking call in the default thread pool. # Führt einen blockierenden Aufruf im Standard-Thread-Pool aus.
+    """Like loop.run_in_executor, but stage timers inside func still reach the request's Server-Timing"""
+    context = contextvars.copy_context() # Executor threads don't inherit context variables on Python 3.9. # Executor-Threads erben unter Python 3.9 keine Kontextvariablen.
+    return await asyncio.get_event_loop().run_in_executor(None, functools.partial(context.run, func, *args)) # Runs func inside the copied context. # Führt func im kopierten Kontext aus.
+
+
+def format_server_timing(timings: list, total: float) -> str: # Builds the header value. # Erstellt den Header-Wert.
+    """Sum the durations per stage and render them as Server-Timing metrics in milliseconds"""
+    totals, counts, order = {}, {}, [] # Aggregates repeated stages (e.g. one synthesis per clip). # Fasst wiederholte Stufen zusammen (z. B. eine Synthese pro Clip).
+    for name, seconds in timings: # Walks the recorded stages. # Durchläuft die erfassten Stufen.
+        if name not in totals: # First occurrence keeps the stage order. # Erstes Vorkommen behält die Stufenreihenfolge bei.
+            order.append(name)
+            totals[name], counts[name] = 0.0, 0
+        totals[name] += seconds # Sums the durations. # Summiert die Dauern.
+        counts[name] += 1 # Counts the calls. # Zählt die Aufrufe.
+    parts = [ # One metric per stage; concurrent calls can sum to more than the wall time. # Eine Metrik pro Stufe; gleichzeitige Aufrufe können mehr als die Gesamtzeit ergeben.
+        f'{name};dur={totals[name] * 1000:.1f}' + (f';desc="x{counts[name]}"' if counts[name] > 1 else "")
+        for name in order
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}") # Wall time until the response started. # Gesamtzeit bis zum Antwortbeginn.
+    return ", ".join(parts) # Returns the header value. # Gibt den Header-Wert zurück.
+
+
+class ServerTimingMiddleware: # Pure ASGI middleware adding Server-Timing and optional profiles. # Reine ASGI-Middleware, die Server-Timing und optionale Profile hinzufügt.
+    """Collect stage timings of selected requests and attach them as a Server-Timing header"""
+
+    def __init__(self, app, paths: Optional[tuple] = None): # Wraps the next ASGI application. # Umschließt die nächste ASGI-Anwendung.
+        self.app = app # Next application. # Nächste Anwendung.
+        self.paths = paths or TIMED_PATHS # Timed path prefixes. # Gemessene Pfadpräfixe.
+
+    async def __call__(self, scope, receive, send): # Handles one ASGI connection. # Bearbeitet eine ASGI-Verbindung.
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths): # Other requests pass through untouched. # Andere Anfragen werden unverändert durchgereicht.
+            await self.app(scope, receive, send)
+            return
+
+        timings = [] # Stage timings of this request. # Stufenzeiten dieser Anfrage.
+        token = _timings.set(timings) # Makes the list visible to stage timers. # Macht die Liste für Stufen-Timer sichtbar.
+        profiler = profiler_for_request(scope) # Starts a sampling profiler if requested or sampled. # Startet einen Sampling-Profiler, falls angefordert oder ausgewählt.
+        start = time.perf_counter() # Starts timing. # Startet die Messung.
+
+        async def send_wrapper(message): # Adds headers to the response start. # Fügt dem Antwortbeginn Header hinzu.
+            if message["type"] == "http.response.start": # Headers are sent with the first message. # Header werden mit der ersten Nachricht gesendet.
+                headers = list(message.get("headers", [])) # Copies the headers. # Kopiert die Header.
+                value = format_server_timing(timings, time.perf_counter() - start) # Renders the timings. # Rendert die Zeiten.
+                headers.append((b"server-timing", value.encode("latin-1"))) # Adds Server-Timing. # Fügt Server-Timing hinzu.
+                if profiler is not None: # Tells the client where to find the profile. # Teilt dem Client mit, wo das Profil zu finden ist.
+                    headers.append((b"x-profile-id", profiler.profile_id.encode("latin-1")))
+                message = {**message, "headers": headers} # Replaces the headers. # Ersetzt die Header.
+            await send(message) # Forwards the message. # Leitet die Nachricht weiter.
+
+        try: # Runs the application. # Führt die Anwendung aus.
+            await self.app(scope, receive, send_wrapper)
+        finally: # Always resets the context and stops the profiler. # Setzt immer den Kontext zurück und stoppt den Profiler.
+            _timings.reset(token) # Restores the previous context. # Stellt den vorherigen Kontext wieder her.
+            if profiler is not None: # Stores the profile off the event loop. # Speichert das Profil außerhalb der Ereignisschleife.
+                profiler.stop() # Stops sampling. # Stoppt das Sampling.
+                await asyncio.get_event_loop().run_in_executor(None, profiler.save, time.perf_counter() - start) # Writes the profile. # Schreibt das Profil.
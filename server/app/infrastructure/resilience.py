@@ -0,0 +1,181 @@
+# Upstream Resilience
+#
+# Runs each Gemini and Azure TTS call with a timeout, retries failed idempotent calls with jittered exponential backoff and can hedge slow ones. # Führt jeden Gemini- und Azure-TTS-Aufruf mit einem Timeout aus, wiederholt fehlgeschlagene idempotente Aufrufe mit gestreutem exponentiellem Backoff und kann langsame absichern.
+# A hedge is a second attempt started once the first is slower than the recent latency percentile; whichever finishes first wins and the other is cancelled. # Eine Absicherung ist ein zweiter Versuch, der startet, sobald der erste langsamer als das aktuelle Latenzperzentil ist; wer zuerst fertig ist, gewinnt, der andere wird abgebrochen.
+#
+# Usage:
+# text = await resilient_call("gemini", lambda: ask(prompt)) # Each call of the factory is one attempt. # Jeder Aufruf der Fabrik ist ein Versuch.
+# await resilient_call("azure_tts", lambda: speak(ssml), idempotent=False) # Timeout only, for calls that write shared state. # Nur Timeout, für Aufrufe, die gemeinsamen Zustand schreiben.
+# UPSTREAM_GEMINI_TIMEOUT_SECONDS=30 UPSTREAM_GEMINI_ATTEMPTS=2 UPSTREAM_GEMINI_HEDGE=true # Settings per upstream. # Einstellungen pro Upstream.
+# resilience_status() # Timeouts, retries and hedge wins per upstream, shown by /health. # Timeouts, Wiederholungen und Absicherungsgewinne pro Upstream, angezeigt von /health.
+#
+# EN: Hedges only use idle admission slots, so they never queue behind or crowd out first attempts.
+# DE: Absicherungen nutzen nur freie Zulassungsplätze, sodass sie sich nie hinter ersten Versuchen einreihen oder diese verdrängen.
+
+import asyncio # For racing and cancelling attempts. # Zum Wettlauf und Abbrechen von Versuchen.
+import logging # For retry logging. # Für das Protokollieren von Wiederholungen.
+import os # For configuration. # Für die Konfiguration.
+import random # For backoff jitter. # Für die Backoff-Streuung.
+import time # For attempt latencies. # Für Versuchslatenzen.
+from collections import deque # For the latency window. # Für das Latenzfenster.
+from typing import Awaitable, Callable, Optional, TypeVar # For type hinting. # Für Typhinweise.
+
+from fastapi import HTTPException # The timeout error is also the HTTP response. # Der Timeout-Fehler ist zugleich die HTTP-Antwort.
+from prometheus_client import Counter # For retry and hedge metrics. # Für Wiederholungs- und Absicherungsmetriken.
+
+from .admission import UpstreamOverloaded, try_admit # Hedges take idle slots only. # Absicherungen nehmen nur freie Plätze.
+from .deadline import DeadlineExceeded, bounded, check_deadline, expired, remaining # Keeps tries and retries within the request's budget. # Hält Versuche und Wiederholungen im Budget der Anfrage.
+
+logger = logging.getLogger(__name__) # Logger of this module. # Logger dieses Moduls.
+
+T = TypeVar("T") # Result of an attempt. # Ergebnis eines Versuchs.
+
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95")) # A hedge starts once the first attempt is slower than this share of recent calls. # Eine Absicherung startet, sobald der erste Versuch langsamer als dieser Anteil der letzten Aufrufe ist.
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20")) # Calls observed before the first hedge. # Beobachtete Aufrufe vor der ersten Absicherung.
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.05")) # Never hedges sooner than this. # Sichert nie früher ab.
+RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.2")) # First backoff ceiling, doubled per retry. # Erste Backoff-Obergrenze, pro Wiederholung verdoppelt.
+RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "2")) # Largest backoff ceiling. # Größte Backoff-Obergrenze.
+LATENCY_WINDOW = 200 # Recent successful attempts per upstream. # Letzte erfolgreiche Versuche pro Upstream.
+DEFAULT_POLICIES = { # Upstream -> (timeout seconds, attempts, hedging). # Upstream -> (Timeout in Sekunden, Versuche, Absicherung).
+    "gemini": (30.0, 2, False), "azure_tts": (15.0, 2, False),
+}
+
+RETRIES = Counter("speak_upstream_retries_total", "Upstream calls retried after a failure", ["upstream"]) # Retries after failures. # Wiederholungen nach Fehlern.
+TIMEOUTS = Counter("speak_upstream_timeouts_total", "Upstream attempts that hit their timeout", ["upstream"]) # Attempts cut off by the timeout. # Durch das Timeout abgebrochene Versuche.
+HEDGES = Counter( # Hedged calls by the attempt that won. # Abgesicherte Aufrufe nach dem Versuch, der gewonnen hat.
+    "speak_upstream_hedges_total", "Hedged upstream calls by winning attempt", ["upstream", "winner"]
+)
+
+
+class UpstreamTimeout(HTTPException): # 504 raised when an upstream didn't answer in time. # 504, ausgelöst, wenn ein Upstream nicht rechtzeitig geantwortet hat.
+    def __init__(self, upstream: str, timeout: float): # Builds the response. # Erstellt die Antwort.
+        super().__init__(status_code=504, detail=f"{upstream} did not answer within {timeout:g} s")
+        self.upstream = upstream # Upstream that timed out. # Upstream, der das Timeout ausgelöst hat.
+
+
+class UpstreamPolicy: # Timeout, retry and hedging settings of one upstream. # Timeout-, Wiederholungs- und Absicherungseinstellungen eines Upstreams.
+    """Settings and recent latencies of one upstream"""
+
+    def __init__(self, name: str, timeout: float, attempts: int, hedge: bool): # Stores the settings. # Speichert die Einstellungen.
+        self.name = name # Upstream name. # Upstream-Name.
+        self.timeout = timeout # Seconds per try, hedge included. # Sekunden pro Versuch, Absicherung eingeschlossen.
+        self.attempts = max(1, attempts) # Tries of an idempotent call. # Versuche eines idempotenten Aufrufs.
+        self.hedge = hedge # Whether slow tries get a hedge. # Ob langsame Versuche abgesichert werden.
+        self._latencies = deque(maxlen=LATENCY_WINDOW) # Seconds of recent successful attempts. # Sekunden der letzten erfolgreichen Versuche.
+        self.stats = {"calls": 0, "retries": 0, "timeouts": 0, "hedges": 0, "hedge_wins": 0} # Counters of this process. # Zähler dieses Prozesses.
+
+    def observe(self, seconds: float) -> None: # Records a successful attempt. # Erfasst einen erfolgreichen Versuch.
+        self._latencies.append(seconds)
+
+    def hedge_delay(self) -> Optional[float]: # When to start a hedge. # Wann eine Absicherung startet.
+        """Return the latency quantile of recent attempts, or None while hedging is off or unlearned"""
+        if not self.hedge or len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies) # At most LATENCY_WINDOW values. # Höchstens LATENCY_WINDOW Werte.
+        return max(HEDGE_MIN_DELAY_SECONDS, ordered[int(HEDGE_QUANTILE * (len(ordered) - 1))])
+
+    def backoff(self, retry: int) -> float: # Pause before a retry. # Pause vor einer Wiederholung.
+        """Full jitter: a uniform pause up to an exponentially growing ceiling, so retries don't arrive in waves"""
+        return random.uniform(0, min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** retry))
+
+    def status(self) -> dict: # Settings and counters. # Einstellungen und Zähler.
+        delay = self.hedge_delay()
+        return dict(
+            self.stats, timeout=self.timeout, attempts=self.attempts, hedge=self.hedge,
+            hedge_delay=round(delay, 3) if delay is not None else None,
+        )
+
+
+def _policy_from_env(name: str, timeout: float, attempts: int, hedge: bool) -> UpstreamPolicy: # Reads UPSTREAM_<NAME>_* overrides. # Liest UPSTREAM_<NAME>_*-Überschreibungen.
+    prefix = f"UPSTREAM_{name.upper()}"
+    return UpstreamPolicy(
+        name,
+        float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", str(timeout))),
+        int(os.getenv(f"{prefix}_ATTEMPTS", str(attempts))),
+        os.getenv(f"{prefix}_HEDGE", str(hedge)).lower() == "true",
+    )
+
+
+policies = {name: _policy_from_env(name, *settings) for name, settings in DEFAULT_POLICIES.items()} # Policies of this process. # Richtlinien dieses Prozesses.
+
+
+async def _timed(policy: UpstreamPolicy, attempt: Callable[[], Awaitable[T]]) -> T: # Runs one attempt and learns its latency. # Führt einen Versuch aus und lernt seine Latenz.
+    started = time.perf_counter()
+    result = await attempt()
+    policy.observe(time.perf_counter() - started) # Only successes, so failing fast doesn't lower the threshold. # Nur Erfolge, damit schnelles Scheitern die Schwelle nicht senkt.
+    return result
+
+
+async def _race(policy: UpstreamPolicy, attempt: Callable[[], Awaitable[T]], hedge: bool) -> T: # One try, possibly hedged. # Ein Versuch, eventuell abgesichert.
+    """Run an attempt and, if it is slower than usual, a hedge; return the first success within the timeout"""
+    check_deadline(policy.name) # No try starts after the request's deadline. # Nach der Frist der Anfrage startet kein Versuch.
+    loop = asyncio.get_running_loop()
+    timeout = bounded(policy.timeout) # The upstream timeout, shortened by the request's deadline. # Das Upstream-Timeout, verkürzt durch die Frist der Anfrage.
+    deadline = loop.time() + timeout
+    primary = asyncio.ensure_future(_timed(policy, attempt))
+    tasks = {primary: "primary"} # Running attempts by role. # Laufende Versuche nach Rolle.
+    try:
+        delay = policy.hedge_delay() if hedge else None
+        if delay is not None and delay < timeout:
+            await asyncio.wait({primary}, timeout=delay)
+            release = None if primary.done() else try_admit(policy.name) # Hedges only with an idle slot. # Absichert nur mit freiem Platz.
+            if release is not None:
+                hedge_task = asyncio.ensure_future(_timed(policy, attempt))
+                hedge_task.add_done_callback(lambda _: release()) # Frees the slot when the hedge ends or is cancelled. # Gibt den Platz frei, wenn die Absicherung endet oder abgebrochen wird.
+                tasks[hedge_task] = "hedge"
+                policy.stats["hedges"] += 1
+
+        pending, error = set(tasks), None
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(0.0, deadline - loop.time()), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done: # Out of time. # Keine Zeit mehr.
+                break
+            for task in done:
+                if task.exception() is None: # The first success wins. # Der erste Erfolg gewinnt.
+                    if len(tasks) > 1:
+                        HEDGES.labels(policy.name, tasks[task]).inc()
+                        policy.stats["hedge_wins"] += tasks[task] == "hedge"
+                    return task.result()
+                error = task.exception() # Waits for the other attempt, if any. # Wartet auf den anderen Versuch, falls vorhanden.
+        if pending or error is None: # Still running at the deadline. # Beim Ablauf noch laufend.
+            if expired(): # The request's budget ran out first. # Das Budget der Anfrage lief zuerst ab.
+                raise DeadlineExceeded(policy.name)
+            TIMEOUTS.labels(policy.name).inc()
+            policy.stats["timeouts"] += 1
+            raise UpstreamTimeout(policy.name, policy.timeout)
+        raise error
+    finally:
+        for task in tasks: # Cancels the losers; their SDK calls are stopped by the attempt's cleanup. # Bricht die Verlierer ab; ihre SDK-Aufrufe stoppt die Bereinigung des Versuchs.
+            if not task.done():
+                task.cancel()
+
+
+async def resilient_call( # Calls an upstream with timeout, retries and hedging. # Ruft einen Upstream mit Timeout, Wiederholungen und Absicherung auf.
+    upstream: str, attempt: Callable[[], Awaitable[T]], idempotent: bool = True,
+) -> T:
+    """Run attempt() under the upstream's policy; only idempotent calls are retried or hedged"""
+    policy = policies.get(upstream)
+    if policy is None: # Unknown upstreams run unchanged. # Unbekannte Upstreams laufen unverändert.
+        return await attempt()
+    policy.stats["calls"] += 1
+    attempts = policy.attempts if idempotent else 1
+    for number in range(attempts):
+        try:
+            return await _race(policy, attempt, hedge=idempotent)
+        except (UpstreamOverloaded, DeadlineExceeded): # Retrying would only add load, or come too late. # Eine Wiederholung würde nur Last hinzufügen oder zu spät kommen.
+            raise
+        except Exception as e: # Timeouts and upstream errors. # Timeouts und Upstream-Fehler.
+            pause = policy.backoff(number)
+            left = remaining()
+            if number + 1 >= attempts or (left is not None and pause >= left): # No tries left, or no time for one. # Keine Versuche mehr oder keine Zeit für einen.
+                raise
+            logger.warning("%s attempt %d failed (%s), retrying in %.2f s", upstream, number + 1, e, pause)
+            RETRIES.labels(upstream).inc()
+            policy.stats["retries"] += 1
+            await asyncio.sleep(pause)
+
+
+def resilience_status() -> dict: # Settings and counters of every upstream. # Einstellungen und Zähler jedes Upstreams.
+    return {name: policy.status() for name, policy in policies.items()}
@@ -0,0 +1,202 @@
+# Upload Ingestion
+#
+# Bounds what an audio upload may cost: the request body is capped and, for single uploads, sniffed while it arrives, and each file is copied chunk by chunk. # Begrenzt, was ein Audio-Upload kosten darf: Der Anfragerumpf wird beim Eintreffen gedeckelt und bei Einzel-Uploads geprüft, und jede Datei wird Stück für Stück kopiert.
+# Content that isn't WAV, MP3, AAC, OGG or MP4 audio is rejected with 415, oversized or overlong uploads with 413. # Inhalte, die kein WAV-, MP3-, AAC-, OGG- oder MP4-Audio sind, werden mit 415 abgewiesen, zu große oder zu lange Uploads mit 413.
+#
+# Usage:
+# app.add_middleware(UploadLimitMiddleware) # Caps the bodies of /api/speech-to-text and /api/voice-command and rejects non-audio before the form is parsed. # Deckelt die Rümpfe von /api/speech-to-text und /api/voice-command und weist Nicht-Audio ab, bevor das Formular geparst wird.
+# path, fmt = await spool_upload(file) # Copies an upload to a temporary file named after its real format. # Kopiert einen Upload in eine temporäre Datei, benannt nach seinem echten Format.
+# fmt, data = await read_upload(file) # Reads an upload into memory within the same caps. # Liest einen Upload innerhalb derselben Grenzen in den Speicher.
+#
+# EN: A huge or hostile upload costs a worker at most UPLOAD_MAX_BYTES and one chunk of memory, and a non-audio file costs one chunk.
+# DE: Ein riesiger oder böswilliger Upload kostet einen Worker höchstens UPLOAD_MAX_BYTES und einen Chunk Speicher, und eine Nicht-Audio-Datei kostet einen Chunk.
+
+import json # For the 413 body. # Für den 413-Rumpf.
+import os # For configuration and file handling. # Für die Konfiguration und Dateibehandlung.
+import tempfile # For spooling uploads to disk. # Zum Auslagern von Uploads auf die Festplatte.
+from typing import Callable, Optional # For type hinting. # Für Typhinweise.
+
+from fastapi import HTTPException, UploadFile # The rejections are also the HTTP responses. # Die Abweisungen sind zugleich die HTTP-Antworten.
+from prometheus_client import Counter # For rejection metrics. # Für Abweisungsmetriken.
+
+from ..application.services.audio_decoding import MAX_CLIP_SECONDS # Longest clip accepted, also checked after decoding. # Längster akzeptierter Clip, auch nach dem Dekodieren geprüft.
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024))) # Largest audio file. # Größte Audiodatei.
+UPLOAD_MAX_BATCH_BYTES = int(os.getenv("UPLOAD_MAX_BATCH_BYTES", str(50 * 1024 * 1024))) # Largest body of a batch request. # Größter Rumpf einer Stapelanfrage.
+UPLOAD_CHUNK_BYTES = 64 * 1024 # Bytes copied at a time. # Auf einmal kopierte Bytes.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024 # Room for the form field headers around a file. # Platz für die Formularfeld-Header um eine Datei.
+UPLOAD_PATHS = ("/api/speech-to-text", "/api/voice-command") # Path prefixes whose bodies are capped. # Pfadpräfixe, deren Rümpfe gedeckelt werden.
+SNIFFED_PATHS = ("/api/speech-to-text", "/api/voice-command") # Single uploads, sniffed while streaming; a batch reports bad clips per clip instead. # Einzel-Uploads, beim Streamen geprüft; ein Stapel meldet schlechte Clips stattdessen pro Clip.
+SNIFF_BYTES = 12 # Bytes sniff_format looks at. # Bytes, die sniff_format betrachtet.
+PART_HEADER_MAX_BYTES = 16 * 1024 # Longest header block of a form part that is scanned. # Längster Header-Block eines Formularteils, der durchsucht wird.
+WAV_HEADER_BYTES = 44 # Canonical RIFF header before the samples. # Kanonischer RIFF-Header vor den Samples.
+
+REJECTED = Counter( # Uploads turned away. # Abgewiesene Uploads.
+    "speak_uploads_rejected_total", "Uploads rejected before processing", ["reason"]
+)
+
+
+def sniff_format(head: bytes) -> Optional[str]: # Recognizes audio by its magic bytes. # Erkennt Audio an seinen Magic Bytes.
+    """Return "wav", "ogg", "m4a", "mp3" or "aac" for the first bytes of an audio file, or None for anything else"""
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE": # RIFF/WAVE container. # RIFF/WAVE-Container.
+        return "wav"
+    if head[:4] == b"OggS": # Ogg page. # Ogg-Seite.
+        return "ogg"
+    if head[4:8] == b"ftyp": # ISO base media (MP4, M4A). # ISO-Basismedien (MP4, M4A).
+        return "m4a"
+    if head[:3] == b"ID3": # MP3 with an ID3v2 tag. # MP3 mit ID3v2-Tag.
+        return "mp3"
+    if head[:4] == b"ADIF": # AAC with an ADIF header. # AAC mit ADIF-Header.
+        return "aac"
+    if len(head) >= 2 and head[0] == 0xFF: # Frame sync of a raw MPEG stream. # Frame-Synchronisation eines rohen MPEG-Streams.
+        if head[1] & 0xF6 == 0xF0: # ADTS: 12 sync bits and layer 0. # ADTS: 12 Sync-Bits und Layer 0.
+            return "aac"
+        if head[1] & 0xE0 == 0xE0 and head[1] & 0x06: # MPEG audio: 11 sync bits and a layer. # MPEG-Audio: 11 Sync-Bits und ein Layer.
+            return "mp3"
+    return None
+
+
+def _reject(reason: str, status_code: int, detail: str) -> HTTPException: # Counts and builds a rejection. # Zählt und erstellt eine Abweisung.
+    REJECTED.labels(reason).inc()
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+async def stream_upload(file: UploadFile, write: Callable[[bytes], None]) -> str: # Copies an upload chunk by chunk. # Kopiert einen Upload Stück für Stück.
+    """Check the first bytes, then pass the upload to write in chunks within the size and duration caps; returns the format"""
+    chunk = await file.read(UPLOAD_CHUNK_BYTES)
+    if not chunk: # Nothing uploaded. # Nichts hochgeladen.
+        raise _reject("empty", 400, "Empty upload")
+    fmt = sniff_format(chunk)
+    if fmt is None: # Not audio, or a format the converter can't read. # Kein Audio oder ein Format, das der Konverter nicht lesen kann.
+        raise _reject("format", 415, "Unsupported or invalid audio content")
+    byte_rate = int.from_bytes(chunk[28:32], "little") if fmt == "wav" else 0 # Bytes per second of a WAV file. # Bytes pro Sekunde einer WAV-Datei.
+
+    size = 0
+    while chunk:
+        size += len(chunk)
+        if size > UPLOAD_MAX_BYTES: # Stops before the rest arrives. # Stoppt, bevor der Rest ankommt.
+            raise _reject("size", 413, f"Upload larger than {UPLOAD_MAX_BYTES} bytes")
+        if byte_rate and (size - WAV_HEADER_BYTES) / byte_rate > MAX_CLIP_SECONDS: # Compressed clips are checked after decoding. # Komprimierte Clips werden nach dem Dekodieren geprüft.
+            raise _reject("duration", 413, f"Audio longer than {MAX_CLIP_SECONDS:.0f} seconds")
+        write(chunk)
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+    return fmt
+
+
+async def spool_upload(file: UploadFile) -> tuple[str, str]: # Copies an upload to disk. # Kopiert einen Upload auf die Festplatte.
+    """Return (path, format) of a temporary copy whose extension names the detected format; the caller deletes it"""
+    with tempfile.NamedTemporaryFile(delete=False) as tmp: # Creates the temporary file. # Erstellt die temporäre Datei.
+        try:
+            fmt = await stream_upload(file, tmp.write)
+        except BaseException: # Leaves no partial file behind. # Hinterlässt keine unvollständige Datei.
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    path = f"{tmp.name}.{fmt}" # The converter picks the format by extension. # Der Konverter wählt das Format anhand der Erweiterung.
+    os.rename(tmp.name, path)
+    return path, fmt
+
+
+async def read_upload(file: UploadFile) -> tuple[str, bytes]: # Reads an upload into memory. # Liest einen Upload in den Speicher.
+    """Return (format, content) of an upload within the same checks and caps as spool_upload"""
+    content = bytearray()
+    fmt = await stream_upload(file, content.extend)
+    return fmt, bytes(content)
+
+
+class MultipartSniffer: # Incremental scanner of a multipart body. # Inkrementeller Scanner eines Multipart-Rumpfs.
+    """Find the first bytes of every file part while the body streams in, across chunk boundaries"""
+
+    def __init__(self, boundary: bytes): # Starts before the first delimiter. # Beginnt vor dem ersten Begrenzer.
+        self.delimiter = b"\r\n--" + boundary # Separates parts. # Trennt Teile.
+        self.buffer = b"\r\n" # The first delimiter has no leading line break. # Der erste Begrenzer hat keinen vorangestellten Zeilenumbruch.
+        self.state = "body" # "body", "headers", "head" (first bytes of a file) or "done". # "body", "headers", "head" (erste Bytes einer Datei) oder "done".
+
+    def feed(self, chunk: bytes) -> bool: # Scans one chunk. # Durchsucht einen Chunk.
+        """Return False as soon as a file part starts with bytes that aren't a supported audio format"""
+        self.buffer += chunk
+        while self.state != "done":
+            if self.state == "body": # Skips content up to the next delimiter. # Überspringt Inhalt bis zum nächsten Begrenzer.
+                found = self.buffer.find(self.delimiter)
+                if found < 0:
+                    self.buffer = self.buffer[-(len(self.delimiter) - 1):] # Keeps a delimiter split across chunks. # Behält einen über Chunks geteilten Begrenzer.
+                    return True
+                self.buffer, self.state = self.buffer[found + len(self.delimiter):], "headers"
+            elif self.state == "headers": # Reads the header block of a part. # Liest den Header-Block eines Teils.
+                if self.buffer.startswith(b"--"): # Closing delimiter. # Schließender Begrenzer.
+                    self.state = "done"
+                    break
+                end = self.buffer.find(b"\r\n\r\n")
+                if end < 0:
+                    if len(self.buffer) > PART_HEADER_MAX_BYTES: # Malformed; left to the form parser. # Fehlerhaft; dem Formularparser überlassen.
+                        self.state = "done"
+                    return True
+                headers, self.buffer = self.buffer[:end], self.buffer[end + 4:]
+                self.state = "head" if b"filename=" in headers else "body"
+            else: # Sniffs the first bytes of a file part. # Prüft die ersten Bytes eines Dateiteils.
+                end = self.buffer.find(self.delimiter)
+                if end < 0 and len(self.buffer) < SNIFF_BYTES + len(self.delimiter): # Waits for more bytes. # Wartet auf weitere Bytes.
+                    return True
+                head = self.buffer[:end] if 0 <= end < SNIFF_BYTES else self.buffer[:SNIFF_BYTES]
+                if head and sniff_format(head) is None: # An empty file is answered with 400 by stream_upload. # Eine leere Datei wird von stream_upload mit 400 beantwortet.
+                    return False
+                self.state = "body"
+        self.buffer = b""
+        return True
+
+
+def _multipart_boundary(headers: list) -> Optional[bytes]: # Reads the boundary of a form upload. # Liest den Begrenzer eines Formular-Uploads.
+    for name, value in headers:
+        if name == b"content-type" and value.lower().startswith(b"multipart/form-data"):
+            for parameter in value.split(b";")[1:]:
+                key, _, boundary = parameter.strip().partition(b"=")
+                if key.lower() == b"boundary" and boundary:
+                    return boundary.strip(b'"')
+    return None
+
+
+def _body_limit(path: str) -> int: # Largest body of a request. # Größter Rumpf einer Anfrage.
+    return UPLOAD_MAX_BATCH_BYTES if path.endswith("/batch") else UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD_BYTES
+
+
+class UploadLimitMiddleware: # Pure ASGI middleware capping upload bodies. # Reine ASGI-Middleware, die Upload-Rümpfe deckelt.
+    """Answer 413 to an upload whose declared length is too large, and stop reading one that grows too large"""
+
+    def __init__(self, app, paths: Optional[tuple] = None): # Wraps the next ASGI application. # Umschließt die nächste ASGI-Anwendung.
+        self.app = app # Next application. # Nächste Anwendung.
+        self.paths = paths or UPLOAD_PATHS # Path prefixes with a cap. # Pfadpräfixe mit Deckel.
+
+    async def __call__(self, scope, receive, send): # Handles one ASGI connection. # Bearbeitet eine ASGI-Verbindung.
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths): # Other requests pass through untouched. # Andere Anfragen werden unverändert durchgereicht.
+            await self.app(scope, receive, send)
+            return
+
+        limit = _body_limit(scope["path"])
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > limit: # Rejected before a byte of the body is read. # Abgewiesen, bevor ein Byte des Rumpfs gelesen wird.
+                REJECTED.labels("size").inc()
+                body = json.dumps({"detail": f"Request body larger than {limit} bytes"}).encode("utf-8")
+                await send({"type": "http.response.start", "status": 413, "headers": [
+                    (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"connection", b"close"),
+                ]})
+                await send({"type": "http.response.body", "body": body})
+                return
+
+        received = 0 # Body bytes so far. # Bisherige Rumpf-Bytes.
+        boundary = _multipart_boundary(scope.get("headers", [])) if scope["path"] in SNIFFED_PATHS else None
+        sniffer = MultipartSniffer(boundary) if boundary else None # Checks the file before the form parser spools it. # Prüft die Datei, bevor der Formularparser sie auslagert.
+
+        async def receive_wrapper(): # Counts and sniffs a body while it arrives. # Zählt und prüft einen Rumpf beim Eintreffen.
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if received > limit: # Ends the form parsing; the exception handler answers 413. # Beendet das Formular-Parsen; der Ausnahmehandler antwortet mit 413.
+                    raise _reject("size", 413, f"Request body larger than {limit} bytes")
+                if sniffer and not sniffer.feed(body): # Not audio: rejected on the first chunk of the file, not after the whole body. # Kein Audio: beim ersten Chunk der Datei abgewiesen, nicht nach dem ganzen Rumpf.
+                    raise _reject("format", 415, "Unsupported or invalid audio content")
+            return message
+
+        await self.app(scope, receive_wrapper, send)
@@ -6,6 +6,7 @@
 # Usage:
 # python main.py  # Starts the server with default settings. # Startet den Server mit Standardeinstellungen.
 # PORT=9000 python main.py  # Starts the server on a custom port. # Startet den Server auf einem benutzerdefinierten Port.
+# gunicorn -c gunicorn.conf.py  # Starts one worker process per core instead, as the container does. # Startet stattdessen einen Worker-Prozess pro Kern, wie es der Container tut.
 #
 # EN: Sets up and launches the FastAPI server for the translation application with proper configuration and error handling.
 # DE: Richtet den FastAPI-Server für die Übersetzungsanwendung ein und startet ihn mit korrekter Konfiguration und Fehlerbehandlung.
@@ -14,19 +15,10 @@ import uvicorn # Imports the ASGI server implementation for FastAPI. # Importier
 from app.infrastructure.api.routes import app # Imports the FastAPI application from routes module. # Importiert die FastAPI-Anwendung aus dem Routes-Modul.
 import os # Imports operating system interfaces for environment and file operations. # Importiert Betriebssystemschnittstellen für Umgebungs- und Dateioperationen.
 import logging # Imports logging functionality for application monitoring. # Importiert Protokollierungsfunktionalität für Anwendungsüberwachung.
+from app.infrastructure.observability.logging_setup import configure_logging # Imports the shared logging pipeline. # Importiert die gemeinsame Logging-Pipeline.
 from datetime import datetime # Imports datetime for timestamp handling. # Importiert datetime für die Verarbeitung von Zeitstempeln.
 
-# Configure logging first to capture all events
-logging.basicConfig( # Configures the logging system for the application. # Konfiguriert das Protokollierungssystem für die Anwendung.
-    level=logging.DEBUG, # Sets logging level to capture all messages including debug information. # Setzt die Protokollierungsstufe, um alle Nachrichten einschließlich Debug-Informationen zu erfassen.
-    format='%(asctime)s.%(msecs)03d - %(name)s - %(levelname)s - %(message)s', # Defines log message format with millisecond precision. # Definiert das Format der Protokollnachrichten mit Millisekundengenauigkeit.
-    datefmt='%Y-%m-%d %H:%M:%S', # Sets the date format for timestamp. # Legt das Datumsformat für den Zeitstempel fest.
-    handlers=[ # Configures where logs will be sent. # Konfiguriert, wohin Protokolle gesendet werden.
-        logging.StreamHandler(), # Sends logs to the console output. # Sendet Protokolle an die Konsolenausgabe.
-        logging.FileHandler("api.log") # Saves logs to the api.log file. # Speichert Protokolle in der Datei api.log.
-    ],
-    force=True # Forces reconfiguration of the root logger. # Erzwingt die Neukonfiguration des Root-Loggers.
-)
+configure_logging() # Uses the same non-blocking JSON logging as the app (already active once routes is imported). # Verwendet dasselbe nicht blockierende JSON-Logging wie die App (bereits aktiv, sobald routes importiert ist).
 logger = logging.getLogger(__name__) # Creates a logger instance for this module. # Erstellt eine Logger-Instanz für dieses Modul.
 
 if __name__ == "__main__": # Checks if this script is being run directly. # Prüft, ob dieses Skript direkt ausgeführt wird.
@@ -34,7 +26,6 @@ if __name__ == "__main__": # Checks if this script is being run directly. # Prü
     logger.info("🔧 Initializing SpeakAndTranslate Azure Server") # Logs server initialization with an emoji indicator. # Protokolliert Server-Initialisierung mit einem Emoji-Indikator.
     logger.debug(f"Python version: {os.sys.version}") # Logs Python version for debugging. # Protokolliert Python-Version zur Fehlersuche.
     logger.debug(f"Current working directory: {os.getcwd()}") # Logs current working directory for path references. # Protokolliert aktuelles Arbeitsverzeichnis für Pfadreferenzen.
-    logger.debug(f"Environment variables: {dict(os.environ)}") # Logs all environment variables for configuration validation. # Protokolliert alle Umgebungsvariablen zur Konfigurationsvalidierung.
 
     # Create audio directory with proper permissions
     audio_dir = "/tmp/tts_audio" if os.name != "nt" else os.path.join( # Sets audio directory path based on operating system. # Legt den Audio-Verzeichnispfad basierend auf dem Betriebssystem fest.
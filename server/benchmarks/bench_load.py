@@ -0,0 +1,173 @@
+# Load Benchmark
+#
+# An end-to-end load benchmark of the HTTP API running against local upstream fakes. # Ein End-to-End-Lastbenchmark der HTTP-API, die gegen lokale Upstream-Attrappen läuft.
+# Starts the server in a subprocess, drives each endpoint at several concurrency levels and reports latency percentiles and throughput. # Startet den Server in einem Unterprozess, belastet jeden Endpunkt mit mehreren Nebenläufigkeitsstufen und meldet Latenzperzentile und Durchsatz.
+#
+# Usage:
+# python -m benchmarks.bench_load # Runs all endpoints at concurrency 1, 8 and 32. # Führt alle Endpunkte mit Nebenläufigkeit 1, 8 und 32 aus.
+# python -m benchmarks.bench_load --endpoints conversation --concurrency 16 --requests 400 # Runs one scenario. # Führt ein Szenario aus.
+# python -m benchmarks.bench_load --url http://localhost:8000 # Drives an already running server. # Belastet einen bereits laufenden Server.
+# FAKE_GEMINI_LATENCY_MS=1500 FAKE_TTS_ERROR_RATE=0.02 python -m benchmarks.bench_load # Shapes the fakes (see benchmarks/fakes.py). # Formt die Attrappen (siehe benchmarks/fakes.py).
+#
+# EN: Gives performance work a repeatable p50/p95/p99 and requests/s baseline; requires httpx (pip install httpx).
+# DE: Gibt Performance-Arbeit eine wiederholbare Basis für p50/p95/p99 und Anfragen/s; erfordert httpx (pip install httpx).
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import asyncio # For concurrent clients. # Für gleichzeitige Clients.
+import io # For the in-memory WAV sample. # Für die WAV-Probe im Speicher.
+import itertools # For cycling through prompts. # Zum Durchlaufen der Eingaben.
+import json # For the optional JSON report. # Für den optionalen JSON-Bericht.
+import os # For the server environment. # Für die Serverumgebung.
+import subprocess # For the server process. # Für den Serverprozess.
+import sys # For the Python interpreter path. # Für den Pfad des Python-Interpreters.
+import time # For timing. # Zur Zeitmessung.
+import wave # For generating the speech sample. # Zum Erzeugen der Sprachprobe.
+
+import httpx # Async HTTP client. # Asynchroner HTTP-Client.
+
+from .bench_text_normalizer import load_corpus # Realistic user prompts. # Realistische Benutzereingaben.
+
+ENDPOINTS = ("conversation", "speech-to-text", "voice-command", "audio") # Scenarios in run order. # Szenarien in Ausführungsreihenfolge.
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Working directory of the server process. # Arbeitsverzeichnis des Serverprozesses.
+
+
+def make_wav(seconds: float = 1.0, rate: int = 16000) -> bytes: # Builds a silent mono 16-bit WAV file. # Erstellt eine stille Mono-16-Bit-WAV-Datei.
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as f: # Same format the server converts uploads to. # Dasselbe Format, in das der Server Uploads konvertiert.
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes(bytes(int(seconds * rate) * 2))
+    return buffer.getvalue()
+
+
+def percentile(sorted_values: list, share: float) -> float: # Nearest-rank percentile. # Perzentil nach dem Nearest-Rank-Verfahren.
+    if not sorted_values:
+        return float("nan")
+    index = max(0, min(len(sorted_values) - 1, int(round(share * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Scenario: # Builds the requests of one endpoint. # Erstellt die Anfragen eines Endpunkts.
+    def __init__(self, name: str, prompts: list, wav: bytes, audio_files: list): # Stores the request inputs. # Speichert die Anfrageeingaben.
+        self.name = name
+        self._prompts = itertools.cycle(prompts) # Rotates through the corpus. # Rotiert durch den Korpus.
+        self._wav = wav
+        self._audio_files = itertools.cycle(audio_files or [""])
+
+    def request(self, client: httpx.AsyncClient): # Returns the coroutine of one request. # Gibt die Coroutine einer Anfrage zurück.
+        if self.name == "conversation":
+            return client.post("/api/conversation", json={"text": next(self._prompts), "source_lang": "en", "target_lang": "de"})
+        if self.name in ("speech-to-text", "voice-command"):
+            return client.post(f"/api/{self.name}", files={"file": ("sample.wav", self._wav, "audio/wav")})
+        return client.get(f"/api/audio/{next(self._audio_files)}")
+
+
+async def run_level(client: httpx.AsyncClient, scenario: Scenario, concurrency: int, requests: int) -> dict: # Runs one endpoint at one concurrency. # Führt einen Endpunkt mit einer Nebenläufigkeit aus.
+    latencies, statuses = [], {} # Per-request results. # Ergebnisse pro Anfrage.
+    remaining = iter(range(requests)) # Shared work counter; the event loop makes next() safe. # Gemeinsamer Arbeitszähler; die Ereignisschleife macht next() sicher.
+
+    async def worker(): # One closed-loop client. # Ein Client mit geschlossener Schleife.
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                status = (await scenario.request(client)).status_code
+            except httpx.HTTPError as e: # Timeouts and connection errors count as failures. # Zeitüberschreitungen und Verbindungsfehler zählen als Fehler.
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "endpoint": scenario.name, "concurrency": concurrency, "requests": len(latencies),
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000, "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000, "max_ms": latencies[-1] * 1000 if latencies else float("nan"),
+        "errors": sum(count for status, count in statuses.items() if status != 200), "statuses": {str(k): v for k, v in statuses.items()},
+    }
+
+
+async def collect_audio_files(client: httpx.AsyncClient, prompts: list, count: int = 8) -> list: # Produces audio for the /api/audio scenario. # Erzeugt Audio für das /api/audio-Szenario.
+    files = []
+    for prompt in prompts[:count]:
+        response = await client.post("/api/conversation", json={"text": prompt, "source_lang": "en", "target_lang": "de"})
+        if response.status_code == 200 and response.json().get("audio_path"):
+            files.append(os.path.basename(response.json()["audio_path"]))
+    return files
+
+
+async def run(url: str, endpoints: list, levels: list, requests: int, warmup: int, timeout: float) -> list: # Runs all scenarios. # Führt alle Szenarien aus.
+    prompts, wav = load_corpus(), make_wav()
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels)) # One connection per client. # Eine Verbindung pro Client.
+    async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+        audio_files = await collect_audio_files(client, prompts) if "audio" in endpoints else []
+        results = []
+        for name in endpoints:
+            scenario = Scenario(name, prompts, wav, audio_files)
+            if warmup: # Fills pools and caches before measuring. # Füllt Pools und Caches vor der Messung.
+                await run_level(client, scenario, min(levels), warmup)
+            for concurrency in levels:
+                result = await run_level(client, scenario, concurrency, requests)
+                results.append(result)
+                print(
+                    f"{name:>15} c={concurrency:<4} {result['rps']:8.1f} req/s  p50 {result['p50_ms']:8.1f} ms"
+                    f"  p95 {result['p95_ms']:8.1f} ms  p99 {result['p99_ms']:8.1f} ms  errors {result['errors']}",
+                    flush=True,
+                )
+        return results
+
+
+def start_server(port: int, verbose: bool = False) -> subprocess.Popen: # Starts the API against the fakes. # Startet die API gegen die Attrappen.
+    output = None if verbose else subprocess.DEVNULL # Server logs would interleave with the report. # Serverprotokolle würden sich mit dem Bericht vermischen.
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fakes", "serve", "--port", str(port)], cwd=SERVER_DIR, stdout=output, stderr=output
+    )
+    deadline = time.time() + 60 # Startup includes the spelling index. # Der Start umfasst den Rechtschreibindex.
+    while time.time() < deadline: # Waits for /health. # Wartet auf /health.
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not become healthy within 60 s")
+
+
+def main() -> None: # Parses the options and runs the benchmark. # Analysiert die Optionen und führt den Benchmark aus.
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark against local upstream fakes")
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8765, help="port of the started server")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="comma-separated scenarios")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=60.0, help="request timeout in seconds")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the output of the started server")
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(",") if name.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    process = None if args.url else start_server(args.port, args.verbose)
+    try:
+        results = asyncio.run(run(args.url or f"http://127.0.0.1:{args.port}", endpoints, levels, args.requests, args.warmup, args.timeout))
+    finally:
+        if process is not None: # Stops the server. # Stoppt den Server.
+            process.terminate()
+            process.wait()
+    if args.json: # Machine-readable results for comparisons. # Maschinenlesbare Ergebnisse für Vergleiche.
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+# Pipeline Micro-Benchmark
+#
+# Micro-benchmarks of the CPU-bound request stages over a recorded corpus of Gemini responses. # Mikro-Benchmarks der CPU-gebundenen Anfragestufen über einen aufgezeichneten Korpus von Gemini-Antworten.
+# Times each stage in a fresh interpreter, measures its allocations with tracemalloc and fails when a stage regresses past a threshold against the stored baseline. # Misst jede Stufe in einem frischen Interpreter, erfasst ihre Allokationen mit tracemalloc und schlägt fehl, wenn eine Stufe gegenüber der gespeicherten Basislinie über einen Schwellenwert hinaus schlechter wird.
+#
+# Usage:
+# python -m benchmarks.bench_pipeline # Compares against benchmarks/baselines/pipeline.json; exits 1 on regressions. # Vergleicht mit benchmarks/baselines/pipeline.json; endet bei Verschlechterungen mit 1.
+# python -m benchmarks.bench_pipeline --save-baseline # Records a new baseline on this machine. # Zeichnet auf diesem Rechner eine neue Basislinie auf.
+# python -m benchmarks.bench_pipeline --only ssml --threshold 0.1 # Runs matching stages with a stricter threshold. # Führt passende Stufen mit einem strengeren Schwellenwert aus.
+#
+# EN: Timings are compared relative to a fixed calibration workload measured in the same run, which cancels most CPU speed and frequency differences.
+# DE: Zeiten werden relativ zu einer festen, im selben Lauf gemessenen Kalibrierungslast verglichen, was die meisten Unterschiede in CPU-Geschwindigkeit und Taktfrequenz ausgleicht.
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import json # For the corpus and the baseline. # Für den Korpus und die Basislinie.
+import os # For file paths. # Für Dateipfade.
+import platform # For describing the machine in the baseline. # Zur Beschreibung des Rechners in der Basislinie.
+import subprocess # For isolating stages from each other. # Zum Isolieren der Stufen voneinander.
+import sys # For the exit code. # Für den Exit-Code.
+import timeit # For timing. # Zur Zeitmessung.
+import tracemalloc # For allocation tracking. # Zur Verfolgung von Allokationen.
+
+from .fakes import install # Offline SDK stand-ins, so the services can be constructed. # Offline-SDK-Ersatz, damit die Dienste erstellt werden können.
+
+STAGES = ( # Benchmarked stages in run order. # Gemessene Stufen in Ausführungsreihenfolge.
+    "translation.extract_text_and_pairs", "translation.extract_word_pairs", "translation.auto_fix_spelling",
+    "translation.generate_word_by_word", "tts.generate_enhanced_ssml", "tts.generate_language_section",
+)
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Working directory of the stage processes. # Arbeitsverzeichnis der Stufenprozesse.
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "recordings", "responses.jsonl") # Recorded Gemini outputs with their prompts. # Aufgezeichnete Gemini-Ausgaben mit ihren Eingaben.
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "pipeline.json") # Stored reference results. # Gespeicherte Referenzergebnisse.
+MIN_TIME = 0.5 # Seconds each timing run should last. # Sekunden, die jeder Messlauf dauern sollte.
+ALLOC_SLACK_KIB = 2.0 # Absolute allowance so tiny stages don't fail on noise. # Absoluter Spielraum, damit winzige Stufen nicht an Rauschen scheitern.
+CALIBRATION_TEXT = "Ich (Yo) suche (busco) einen (un) Job (trabajo) " * 8 # Input of the calibration workload. # Eingabe der Kalibrierungslast.
+
+
+def load_corpus() -> list: # Reads the recorded responses. # Liest die aufgezeichneten Antworten.
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def calibration_workload(): # Fixed pure-Python work mixing string, dict and list operations like the stages do. # Feste reine Python-Arbeit, die wie die Stufen Zeichenketten-, Wörterbuch- und Listenoperationen mischt.
+    counts = {}
+    for word in CALIBRATION_TEXT.split():
+        key = word.strip("()").lower()
+        counts[key] = counts.get(key, 0) + 1
+    return sorted(counts.items())
+
+
+def build_cases(corpus: list) -> dict: # Prepares each stage with its inputs. # Bereitet jede Stufe mit ihren Eingaben vor.
+    """Return {stage name: (function, list of argument tuples)} derived from the corpus"""
+    install(patch_recognizer=False) # Must happen before the services are imported. # Muss vor dem Import der Dienste geschehen.
+    from app.application.services.translation_service import TranslationService # Imported after the fakes are installed. # Nach der Installation der Attrappen importiert.
+
+    translation = TranslationService() # Builds the services exactly as the API does. # Erstellt die Dienste genau wie die API.
+    tts = translation.tts_service
+
+    parsed = [translation._extract_text_and_pairs(record["response"]) for record in corpus] # Inputs of the TTS stages. # Eingaben der TTS-Stufen.
+    sections = [ # Every section the SSML builder renders. # Jeder Abschnitt, den der SSML-Builder rendert.
+        section for translations, pairs in parsed for section in tts._iter_sections("\n".join(translations), pairs)
+    ]
+    return {
+        "translation.extract_text_and_pairs": (translation._extract_text_and_pairs, [(r["response"],) for r in corpus]),
+        "translation.extract_word_pairs": (translation._extract_word_pairs, [(r["response"],) for r in corpus]),
+        "translation.auto_fix_spelling": (translation._auto_fix_spelling, [(r["prompt"], r["source_lang"]) for r in corpus]),
+        "translation.generate_word_by_word": (translation._generate_word_by_word, [(r["prompt"], r["response"]) for r in corpus]),
+        "tts.generate_enhanced_ssml": (
+            tts.generate_enhanced_ssml,
+            [("\n".join(translations), pairs) for translations, pairs in parsed if translations],
+        ),
+        "tts.generate_language_section": (
+            tts._generate_language_section, [(sentence, pairs, voice, lang) for sentence, pairs, voice, lang in sections],
+        ),
+    }
+
+
+def best_time(func) -> float: # Best time of one call in seconds. # Beste Zeit eines Aufrufs in Sekunden.
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange() # Passes per run so that a run lasts at least 0.2 s, scaled to MIN_TIME below. # Durchläufe pro Lauf, sodass ein Lauf mindestens 0,2 s dauert, unten auf MIN_TIME skaliert.
+    number = max(number, int(number * MIN_TIME / 0.2))
+    return min(timer.repeat(repeat=7, number=number)) / number # Best of seven filters scheduler noise. # Bester von sieben filtert Scheduler-Rauschen.
+
+
+def measure(func, inputs: list) -> dict: # Times one stage and tracks its allocations. # Misst eine Stufe und verfolgt ihre Allokationen.
+    def corpus_pass(): # Calls the stage once per input. # Ruft die Stufe einmal pro Eingabe auf.
+        for args in inputs:
+            func(*args)
+
+    corpus_pass() # Warms caches such as the spelling index. # Wärmt Caches wie den Rechtschreibindex auf.
+    per_call = best_time(corpus_pass) / len(inputs)
+    calibration = best_time(calibration_workload) # Measured next to each stage, so frequency drift affects both alike. # Neben jeder Stufe gemessen, damit Taktschwankungen beide gleich treffen.
+
+    tracemalloc.start() # Allocations of one corpus pass. # Allokationen eines Korpusdurchlaufs.
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    corpus_pass()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "calls": len(inputs),
+        "us_per_call": per_call * 1e6,
+        "relative": per_call / calibration, # Cost in calibration units, compared against the baseline. # Kosten in Kalibrierungseinheiten, mit der Basislinie verglichen.
+        "peak_kib": (peak - before) / 1024, # Highest extra memory during a pass. # Höchster zusätzlicher Speicher während eines Durchlaufs.
+        "retained_kib": (after - before) / 1024, # Memory still held after the pass, e.g. cache growth. # Nach dem Durchlauf noch gehaltener Speicher, z. B. Cache-Wachstum.
+    }
+
+
+def run_isolated(name: str) -> dict: # Measures one stage in its own interpreter. # Misst eine Stufe in einem eigenen Interpreter.
+    """Heap and cache state left by earlier stages otherwise shifts the timings of later ones"""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_pipeline", "--worker", name], cwd=SERVER_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1]) # The result is the last line; services may print before it. # Das Ergebnis ist die letzte Zeile; Dienste können davor ausgeben.
+
+
+def compare(name: str, result: dict, reference: dict, threshold: float, alloc_threshold: float) -> list: # Checks one stage against its baseline. # Prüft eine Stufe gegen ihre Basislinie.
+    problems = []
+    if result["relative"] > reference["relative"] * (1 + threshold): # Slower than allowed. # Langsamer als erlaubt.
+        problems.append(f"{name}: {result['relative']:.2f} calibration units vs baseline {reference['relative']:.2f} (+{threshold:.0%} allowed)")
+    allowed_kib = reference["peak_kib"] * (1 + alloc_threshold) + ALLOC_SLACK_KIB # More memory than allowed. # Mehr Speicher als erlaubt.
+    if result["peak_kib"] > allowed_kib:
+        problems.append(f"{name}: peak {result['peak_kib']:.1f} KiB vs baseline {reference['peak_kib']:.1f} KiB (+{alloc_threshold:.0%} allowed)")
+    return problems
+
+
+def main() -> None: # Parses the options and runs the suite. # Analysiert die Optionen und führt die Suite aus.
+    parser = argparse.ArgumentParser(description="Micro-benchmark the CPU-bound request stages")
+    parser.add_argument("--only", default="", help="run only stages whose name contains this text")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown as a fraction of the baseline")
+    parser.add_argument("--alloc-threshold", type=float, default=0.10, help="allowed peak allocation growth as a fraction")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--worker", help=argparse.SUPPRESS) # Internal: measure one stage and print JSON. # Intern: eine Stufe messen und JSON ausgeben.
+    args = parser.parse_args()
+
+    if args.worker: # Child process of run_isolated. # Kindprozess von run_isolated.
+        func, inputs = build_cases(load_corpus())[args.worker]
+        print(json.dumps(measure(func, inputs)))
+        return
+
+    stages = [name for name in STAGES if args.only in name]
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline: # Reference results. # Referenzergebnisse.
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["stages"]
+
+    results, problems = {}, []
+    print(f"{'stage':<38}{'calls':>6}{'us/call':>10}{'units':>9}{'baseline':>10}{'peak KiB':>10}{'retained':>10}")
+    for name in stages:
+        result = results[name] = run_isolated(name)
+        reference = baseline.get(name)
+        print(
+            f"{name:<38}{result['calls']:>6}{result['us_per_call']:>10.1f}{result['relative']:>9.2f}"
+            f"{reference['relative'] if reference else float('nan'):>10.2f}{result['peak_kib']:>10.1f}{result['retained_kib']:>10.1f}"
+        )
+        if reference: # Stages without a baseline are reported only. # Stufen ohne Basislinie werden nur gemeldet.
+            problems += compare(name, result, reference, args.threshold, args.alloc_threshold)
+
+    if args.save_baseline: # Writes the reference results. # Schreibt die Referenzergebnisse.
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"machine": f"{platform.python_implementation()} {platform.python_version()} {platform.machine()}", "stages": results}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif problems: # Fails the run on regressions. # Lässt den Lauf bei Verschlechterungen fehlschlagen.
+        print("\nRegressions:\n  " + "\n  ".join(problems))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+# Soak Test
+#
+# Runs the API in-process against the local fakes for hours of simulated traffic and records RSS, object counts by type and open file descriptors over time. # Führt die API prozessintern gegen die lokalen Attrappen für Stunden simulierten Verkehrs aus und zeichnet RSS, Objektanzahlen nach Typ und offene Dateideskriptoren über die Zeit auf.
+# Ends with a report of the growing series and the allocation sites whose memory kept growing, from tracemalloc snapshots. # Endet mit einem Bericht der wachsenden Reihen und der Allokationsstellen, deren Speicher weiter wuchs, aus tracemalloc-Momentaufnahmen.
+#
+# Usage:
+# python -m benchmarks.bench_soak --duration 3600 # Soaks for one hour; the fakes answer without latency by default. # Testet eine Stunde lang; die Attrappen antworten standardmäßig ohne Latenz.
+# python -m benchmarks.bench_soak --duration 600 --interval 15 --json soak.json # Shorter run with a machine-readable report. # Kürzerer Lauf mit maschinenlesbarem Bericht.
+# python -m benchmarks.bench_soak --max-rss-growth 64 # Exits 1 when RSS grows more than 64 KiB per 1000 requests. # Endet mit 1, wenn der RSS um mehr als 64 KiB pro 1000 Anfragen wächst.
+#
+# EN: Bounded caches (clip library, spelling cache) grow until they are full, so read the report after a warm-up long enough to fill them.
+# DE: Begrenzte Caches (Clip-Bibliothek, Rechtschreib-Cache) wachsen, bis sie voll sind; lesen Sie den Bericht daher nach einer Aufwärmphase, die lang genug ist, um sie zu füllen.
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import contextlib # For silencing the service output. # Zum Stummschalten der Dienstausgabe.
+import gc # For object counts. # Für Objektanzahlen.
+import itertools # For cycling through prompts. # Zum Durchlaufen der Eingaben.
+import json # For the optional JSON report. # Für den optionalen JSON-Bericht.
+import logging # For silencing the service logs. # Zum Stummschalten der Dienstprotokolle.
+import os # For the fake configuration and /proc. # Für die Attrappenkonfiguration und /proc.
+import sys # For the exit code. # Für den Exit-Code.
+import threading # For the thread count. # Für die Thread-Anzahl.
+import time # For timing. # Zur Zeitmessung.
+import tracemalloc # For allocation sites. # Für Allokationsstellen.
+from collections import Counter # For counting objects by type. # Zum Zählen von Objekten nach Typ.
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Root of the shown source paths. # Wurzel der angezeigten Quellpfade.
+SERIES = ("rss_kib", "tracemalloc_kib", "open_fds", "threads", "gc_objects") # Process-wide series of every sample. # Prozessweite Reihen jeder Stichprobe.
+MIN_SITE_GROWTH = 16 * 1024 # Sites growing less than this over the run are noise. # Stellen, die über den Lauf weniger wachsen, sind Rauschen.
+OWN_OBJECTS_PER_SAMPLE = 2 # The soak test itself keeps a dict and a Counter per sample. # Der Soak-Test selbst behält ein Dict und einen Counter pro Stichprobe.
+
+
+def read_rss_kib() -> int: # Current resident set size. # Aktuelle Resident Set Size.
+    try:
+        with open("/proc/self/status", encoding="ascii") as f: # Linux only. # Nur Linux.
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError: # Falls back to the peak RSS elsewhere. # Fällt anderswo auf den Spitzen-RSS zurück.
+        pass
+    import resource # Not available on Windows. # Unter Windows nicht verfügbar.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak # macOS reports bytes. # macOS meldet Bytes.
+
+
+def count_open_fds() -> int: # Open file descriptors, -1 if unknown. # Offene Dateideskriptoren, -1 wenn unbekannt.
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return -1
+
+
+def count_objects() -> Counter: # GC-tracked objects by type. # Vom GC verfolgte Objekte nach Typ.
+    gc.collect() # Counts only live objects. # Zählt nur lebende Objekte.
+    return Counter(f"{type(obj).__module__}.{type(obj).__qualname__}" for obj in gc.get_objects())
+
+
+def slope_per_1k(points: list) -> float: # Least-squares growth per 1000 requests. # Wachstum pro 1000 Anfragen nach kleinsten Quadraten.
+    if len(points) < 2:
+        return 0.0
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    return 1000 * sum((x - mean_x) * (y - mean_y) for x, y in points) / spread if spread else 0.0
+
+
+class Traffic: # Cycles through the endpoints like a mix of app users. # Durchläuft die Endpunkte wie eine Mischung von App-Nutzern.
+    def __init__(self, client, prompts: list, wav: bytes): # Stores the request inputs. # Speichert die Anfrageeingaben.
+        self._client = client
+        self._prompts = itertools.cycle(prompts)
+        self._wav = wav
+        self._steps = itertools.cycle(("conversation", "conversation", "speech-to-text", "voice-command", "audio"))
+        self._last_audio = None # Audio file served by the next /api/audio request. # Von der nächsten /api/audio-Anfrage ausgelieferte Audiodatei.
+        self.requests = 0
+        self.statuses = Counter()
+
+    def step(self) -> None: # Sends one request. # Sendet eine Anfrage.
+        name = next(self._steps)
+        if name == "conversation":
+            response = self._client.post("/api/conversation", json={"text": next(self._prompts), "source_lang": "en", "target_lang": "de"})
+            if response.status_code == 200 and response.json().get("audio_path"):
+                self._last_audio = os.path.basename(response.json()["audio_path"])
+        elif name == "audio":
+            response = self._client.get(f"/api/audio/{self._last_audio or 'missing.mp3'}")
+        else:
+            response = self._client.post(f"/api/{name}", files={"file": ("sample.wav", self._wav, "audio/wav")})
+        self.requests += 1
+        self.statuses[response.status_code] += 1
+
+
+def take_sample(traffic: Traffic, started: float) -> dict: # Records the process state. # Erfasst den Prozesszustand.
+    objects = count_objects()
+    return {
+        "elapsed_s": round(time.perf_counter() - started, 1), "requests": traffic.requests,
+        "rss_kib": read_rss_kib(), "open_fds": count_open_fds(), "threads": threading.active_count(),
+        "gc_objects": sum(objects.values()), "tracemalloc_kib": tracemalloc.get_tracemalloc_memory() // 1024, "objects": objects,
+    }
+
+
+def take_snapshot() -> dict: # Allocation sizes by traceback, without the soak test's own bookkeeping. # Allokationsgrößen nach Traceback, ohne die eigene Buchführung des Soak-Tests.
+    if not tracemalloc.is_tracing(): # Disabled with --frames 0. # Mit --frames 0 deaktiviert.
+        return {}
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__, all_frames=True),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"), tracemalloc.Filter(False, "<unknown>"),
+    ))
+    return { # Much smaller than the snapshot, which is dropped; string tuples also stay out of the object counts. # Viel kleiner als die Momentaufnahme, die verworfen wird; String-Tupel bleiben auch aus den Objektanzahlen heraus.
+        tuple(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback): (stat.size, stat.count)
+        for stat in snapshot.statistics("traceback")
+    }
+
+
+def _short_path(location: str) -> str: # Source location relative to the server directory. # Quellort relativ zum Serververzeichnis.
+    return os.path.relpath(location, SERVER_DIR) if location.startswith(SERVER_DIR) else location
+
+
+def _site_name(traceback: tuple) -> str: # Innermost application frame, or the leaf frame. # Innerste Anwendungs-Frame oder das Blatt-Frame.
+    app_frames = [location for location in traceback if location.startswith(os.path.join(SERVER_DIR, "app"))] # Oldest frame first. # Ältestes Frame zuerst.
+    return _short_path((app_frames or traceback)[-1])
+
+
+def growing_sites(snapshots: list, requests: int, limit: int) -> list: # Sites whose memory grew in every interval. # Stellen, deren Speicher in jedem Intervall wuchs.
+    """Compare snapshots by traceback and return the sites that grew between each pair, largest growth first"""
+    sites = []
+    for traceback, (size, count) in snapshots[-1].items():
+        history = [per_snapshot.get(traceback, (0, 0)) for per_snapshot in snapshots]
+        growth = size - history[0][0]
+        if growth < MIN_SITE_GROWTH or any(later[0] <= earlier[0] for earlier, later in zip(history, history[1:])):
+            continue # Steady or fluctuating sites are not leaks. # Stabile oder schwankende Stellen sind keine Lecks.
+        sites.append({
+            "site": _site_name(traceback), "growth_kib": round(growth / 1024, 1), "blocks": count - history[0][1],
+            "kib_per_1k_requests": round(growth / 1024 * 1000 / max(requests, 1), 2),
+            "traceback": [_short_path(location) for location in reversed(traceback)], # Innermost first. # Innerstes zuerst.
+        })
+    sites.sort(key=lambda site: site["growth_kib"], reverse=True)
+    return sites[:limit]
+
+
+def build_report(samples: list, snapshots: list, traffic: Traffic, duration: float, requests_per_hour: float, limit: int) -> dict: # Summarizes the run. # Fasst den Lauf zusammen.
+    measured = samples[-1]["requests"] - samples[0]["requests"] # Requests after the warm-up. # Anfragen nach der Aufwärmphase.
+    series = {
+        name: {
+            "start": samples[0][name], "end": samples[-1][name],
+            "per_1k_requests": round(slope_per_1k([(s["requests"], s[name]) for s in samples]), 2),
+        }
+        for name in SERIES
+    }
+    first, mid, last = samples[0]["objects"], samples[len(samples) // 2]["objects"], samples[-1]["objects"]
+    types = [
+        {"type": name, "start": first.get(name, 0), "end": count, "growth": count - first.get(name, 0),
+         "per_1k_requests": round(slope_per_1k([(s["requests"], s["objects"].get(name, 0)) for s in samples]), 2)}
+        for name, count in last.items()
+        if count > mid.get(name, 0) > first.get(name, 0) # Grew in both halves of the run. # In beiden Hälften des Laufs gewachsen.
+        and count - first.get(name, 0) > OWN_OBJECTS_PER_SAMPLE * len(samples) # More than the soak test's own objects. # Mehr als die eigenen Objekte des Soak-Tests.
+        and not name.startswith("tracemalloc.")
+    ]
+    types.sort(key=lambda entry: entry["growth"], reverse=True)
+    return {
+        "duration_s": round(duration, 1), "requests": traffic.requests, "measured_requests": measured,
+        "simulated_hours": round(traffic.requests / requests_per_hour, 1) if requests_per_hour else None,
+        "statuses": {str(status): count for status, count in sorted(traffic.statuses.items())},
+        "series": series, "growing_types": types[:limit], "growing_sites": growing_sites(snapshots, measured, limit),
+        "samples": [{key: value for key, value in sample.items() if key != "objects"} for sample in samples],
+    }
+
+
+def print_report(report: dict) -> None: # Human-readable report. # Menschenlesbarer Bericht.
+    simulated = f", {report['simulated_hours']} simulated hours" if report["simulated_hours"] is not None else ""
+    print(f"\nSoak test: {report['requests']} requests in {report['duration_s']} s{simulated}; statuses {report['statuses']}")
+    print(f"\n{'series':<12} {'start':>12} {'end':>12} {'per 1k req':>12}")
+    for name, values in report["series"].items():
+        print(f"{name:<12} {values['start']:>12} {values['end']:>12} {values['per_1k_requests']:>12}")
+    print("\nGrowing object types:" if report["growing_types"] else "\nNo object type grew in both halves of the run.")
+    for entry in report["growing_types"]:
+        print(f"  {entry['type']:<60} {entry['start']:>8} -> {entry['end']:<8} {entry['per_1k_requests']:>8} per 1k req")
+    print("\nGrowing allocation sites:" if report["growing_sites"] else "\nNo allocation site grew between every snapshot.")
+    for site in report["growing_sites"]:
+        print(f"  +{site['growth_kib']} KiB in {site['blocks']} blocks ({site['kib_per_1k_requests']} KiB per 1k req) at {site['site']}")
+        for line in site["traceback"][:6]:
+            print(f"      {line}")
+
+
+def run(args) -> dict: # Drives the app and samples it. # Belastet die App und zieht Stichproben.
+    for name in ("GEMINI", "TTS", "STT"): # Instant fakes turn hours of traffic into minutes. # Sofortige Attrappen machen aus Stunden Verkehr Minuten.
+        os.environ.setdefault(f"FAKE_{name}_LATENCY_MS", "0")
+        os.environ.setdefault(f"FAKE_{name}_ERROR_RATE", "0.02") # Exercises the failure paths too. # Durchläuft auch die Fehlerpfade.
+    from .fakes import install # Reads the FAKE_* variables at import. # Liest die FAKE_*-Variablen beim Import.
+    install() # Must happen before the app import. # Muss vor dem App-Import geschehen.
+    os.environ["SERVICE_WARMUP"] = "false" # Warmed up below instead of in the background, so it finishes before the baseline. # Unten statt im Hintergrund aufgewärmt, damit es vor der Basislinie fertig ist.
+    from fastapi.testclient import TestClient # In-process client, so the samples describe the server. # Prozessinterner Client, damit die Stichproben den Server beschreiben.
+    from app.infrastructure.api.routes import app # The real application. # Die echte Anwendung.
+    from app.infrastructure.container import services # The services the lifespan would warm up. # Die Dienste, die der Lebenszyklus aufwärmen würde.
+    from .bench_load import make_wav # Same speech sample as the load benchmark. # Dieselbe Sprachprobe wie der Lastbenchmark.
+    from .bench_text_normalizer import load_corpus # Realistic user prompts. # Realistische Benutzereingaben.
+
+    progress = sys.stdout # Service prints would bury the samples. # Dienstausgaben würden die Stichproben verdecken.
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    if not args.verbose:
+        logging.disable(logging.CRITICAL)
+    if args.frames: # Tracing slows requests and its own memory shows up in RSS (see tracemalloc_kib). # Das Tracing verlangsamt Anfragen und sein eigener Speicher erscheint im RSS (siehe tracemalloc_kib).
+        tracemalloc.start(args.frames) # Deep enough tracebacks to name the caller. # Tief genug, um den Aufrufer zu benennen.
+    with quiet, TestClient(app) as client: # Runs the lifespan like uvicorn. # Führt den Lebenszyklus wie uvicorn aus.
+        services.warm_up() # Services, spelling indexes and pools exist before any request or sample. # Dienste, Rechtschreibindizes und Pools existieren vor jeder Anfrage und Stichprobe.
+        traffic = Traffic(client, load_corpus(), make_wav())
+        for _ in range(args.warmup): # Fills pools and caches before the baseline. # Füllt Pools und Caches vor der Basislinie.
+            traffic.step()
+        started = time.perf_counter()
+        samples, snapshots = [take_sample(traffic, started)], [take_snapshot()]
+        deadline, next_sample = started + args.duration, started + args.interval
+        snapshot_times = [started + args.duration * share for share in (1 / 3, 2 / 3)] # Intermediate snapshots; the last one is taken at the end. # Zwischenaufnahmen; die letzte wird am Ende gemacht.
+        while time.perf_counter() < deadline and (not args.requests or traffic.requests < args.warmup + args.requests):
+            traffic.step()
+            now = time.perf_counter()
+            if now >= next_sample:
+                samples.append(take_sample(traffic, started))
+                last = samples[-1]
+                print(f"{last['elapsed_s']:>8} s {last['requests']:>8} req  rss {last['rss_kib']} KiB  fds {last['open_fds']}"
+                      f"  threads {last['threads']}  objects {last['gc_objects']}", file=progress, flush=True)
+                next_sample = now + args.interval
+            if snapshot_times and now >= snapshot_times[0]:
+                snapshots.append(take_snapshot())
+                snapshot_times.pop(0)
+        samples.append(take_sample(traffic, started))
+        snapshots.append(take_snapshot())
+        duration = time.perf_counter() - started
+    if args.frames:
+        tracemalloc.stop()
+    return build_report(samples, snapshots, traffic, duration, args.requests_per_hour, args.top)
+
+
+def main() -> None: # Parses the options and runs the soak test. # Analysiert die Optionen und führt den Soak-Test aus.
+    parser = argparse.ArgumentParser(description="Soak test of the API against local upstream fakes")
+    parser.add_argument("--duration", type=float, default=3600, help="seconds of traffic after the warm-up")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many measured requests (0 = no limit)")
+    parser.add_argument("--interval", type=float, default=30, help="seconds between samples")
+    parser.add_argument("--warmup", type=int, default=200, help="requests before the baseline sample")
+    parser.add_argument("--frames", type=int, default=10, help="tracemalloc traceback depth (0 = no allocation sites, undisturbed RSS)")
+    parser.add_argument("--top", type=int, default=15, help="growing types and sites to report")
+    parser.add_argument("--requests-per-hour", type=float, default=1800, help="production rate used to express the run in simulated hours")
+    parser.add_argument("--max-rss-growth", type=float, help="exit 1 when RSS grows more than this many KiB per 1000 requests")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show the output and logs of the service")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.json: # Machine-readable report, including every sample. # Maschinenlesbarer Bericht mit allen Stichproben.
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.max_rss_growth is not None and report["series"]["rss_kib"]["per_1k_requests"] > args.max_rss_growth:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Startup Benchmark
+#
+# Measures the cold start of the API in fresh interpreters: import time, resident memory, service warm-up and the first request. # Misst den Kaltstart der API in frischen Interpretern: Importzeit, residenter Speicher, Aufwärmen der Dienste und die erste Anfrage.
+# Each run also counts the service instances the process ended up with, which shows duplicated initialization work. # Jeder Lauf zählt außerdem die Dienstinstanzen, die der Prozess am Ende hat, was doppelte Initialisierungsarbeit zeigt.
+#
+# Usage:
+# python -m benchmarks.bench_startup # Five runs each of a lazy start and a warmed-up start, against the fakes. # Je fünf Läufe eines verzögerten und eines aufgewärmten Starts, gegen die Attrappen.
+# python -m benchmarks.bench_startup --runs 10 --json startup.json # More runs and a machine-readable report. # Mehr Läufe und ein maschinenlesbarer Bericht.
+# python -m benchmarks.bench_startup --real # Uses the installed Gemini and Azure SDKs; their import cost is part of a real cold start. # Verwendet die installierten Gemini- und Azure-SDKs; deren Importkosten gehören zu einem echten Kaltstart.
+#
+# EN: The fakes make the SDK imports almost free, so --real gives the production numbers; no upstream call is made during startup either way.
+# DE: Die Attrappen machen die SDK-Importe fast kostenlos, daher liefert --real die Produktionszahlen; so oder so erfolgt beim Start kein Upstream-Aufruf.
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import json # For the worker results and the report. # Für die Worker-Ergebnisse und den Bericht.
+import os # For the worker environment. # Für die Worker-Umgebung.
+import statistics # For medians. # Für Mediane.
+import subprocess # For fresh interpreters. # Für frische Interpreter.
+import sys # For the Python interpreter path. # Für den Pfad des Python-Interpreters.
+import time # For timing. # Zur Zeitmessung.
+
+from .bench_soak import read_rss_kib # Current resident set size. # Aktuelle Resident Set Size.
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Working directory of the workers. # Arbeitsverzeichnis der Worker.
+MODES = ("lazy", "warm") # First request builds the services, or an explicit warm-up does. # Die erste Anfrage erstellt die Dienste, oder ein explizites Aufwärmen tut es.
+FIELDS = ("process_ms", "import_ms", "import_rss_kib", "warm_up_ms", "first_request_ms", "rss_kib", "services") # Reported columns. # Gemeldete Spalten.
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def worker(mode: str, real: bool) -> dict: # Runs one cold start in this interpreter. # Führt einen Kaltstart in diesem Interpreter aus.
+    import gc # For counting service instances. # Zum Zählen von Dienstinstanzen.
+
+    if not real: # Must happen before the app import. # Muss vor dem App-Import geschehen.
+        from .fakes import install
+        install()
+    started = time.perf_counter()
+    from app.infrastructure.api.routes import app # Everything importing the API does at module level. # Alles, was der Import der API auf Modulebene tut.
+    result = {"import_ms": _elapsed_ms(started), "import_rss_kib": read_rss_kib(), "warm_up_ms": 0.0}
+
+    if mode == "warm": # Explicit warm-up, as the lifespan runs it. # Explizites Aufwärmen, wie es der Lebenszyklus ausführt.
+        from app.infrastructure.container import services
+        started = time.perf_counter()
+        services.warm_up()
+        result["warm_up_ms"] = _elapsed_ms(started)
+
+    from fastapi.testclient import TestClient # Without the lifespan, so nothing is warmed up implicitly. # Ohne Lebenszyklus, damit nichts implizit aufgewärmt wird.
+    client = TestClient(app)
+    started = time.perf_counter()
+    response = client.post("/api/conversation", json={"text": "I am looking for a job", "source_lang": "en", "target_lang": "de"})
+    result["first_request_ms"] = _elapsed_ms(started)
+    result["status"] = response.status_code
+    result["rss_kib"] = read_rss_kib()
+    result["services"] = sum(1 for obj in gc.get_objects() if type(obj).__name__.endswith("Service")) # Service instances alive in the process. # Im Prozess lebende Dienstinstanzen.
+    return result
+
+
+def run_worker(mode: str, real: bool) -> dict: # Runs one cold start in a fresh interpreter. # Führt einen Kaltstart in einem frischen Interpreter aus.
+    env = dict(os.environ, LOG_LEVEL="WARNING", LOG_FILE="", SERVICE_WARMUP="false") # Quiet and without the background warm-up. # Leise und ohne Hintergrund-Aufwärmen.
+    for upstream in ("GEMINI", "TTS", "STT"): # Zero fake latency, so the first request shows only startup work. # Keine Attrappenlatenz, damit die erste Anfrage nur Startarbeit zeigt.
+        env.setdefault(f"FAKE_{upstream}_LATENCY_MS", "0")
+    command = [sys.executable, "-m", "benchmarks.bench_startup", "--worker", mode] + (["--real"] if real else [])
+    started = time.perf_counter()
+    output = subprocess.run(command, cwd=SERVER_DIR, env=env, capture_output=True, text=True)
+    process_ms = _elapsed_ms(started) # Interpreter start, imports, warm-up, first request and exit. # Interpreterstart, Importe, Aufwärmen, erste Anfrage und Beenden.
+    if output.returncode != 0:
+        raise SystemExit(f"{mode} worker failed:\n{output.stderr[-2000:]}")
+    result = json.loads(output.stdout.strip().splitlines()[-1]) # The result is the last line; services may print. # Das Ergebnis ist die letzte Zeile; Dienste können ausgeben.
+    result["process_ms"] = process_ms
+    return result
+
+
+def main() -> None: # Parses the options and runs the benchmark. # Analysiert die Optionen und führt den Benchmark aus.
+    parser = argparse.ArgumentParser(description="Cold start benchmark of the API")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode")
+    parser.add_argument("--real", action="store_true", help="use the installed SDKs instead of the fakes")
+    parser.add_argument("--json", help="write the medians to this file")
+    parser.add_argument("--worker", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker: # Inside a fresh interpreter. # Innerhalb eines frischen Interpreters.
+        print(json.dumps(worker(args.worker, args.real)))
+        return
+
+    report = {}
+    print(f"{'mode':<6}" + "".join(f"{field:>18}" for field in FIELDS))
+    for mode in MODES:
+        results = [run_worker(mode, args.real) for _ in range(args.runs)]
+        if any(result["status"] != 200 for result in results):
+            print(f"warning: {mode} first request returned {sorted({result['status'] for result in results})}")
+        report[mode] = {field: statistics.median(result[field] for result in results) for field in FIELDS} # Medians resist a slow run. # Mediane sind robust gegen einen langsamen Lauf.
+        print(f"{mode:<6}" + "".join(f"{report[mode][field]:>18}" for field in FIELDS), flush=True)
+    if args.json: # Machine-readable medians. # Maschinenlesbare Mediane.
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Text Normalizer Benchmark
+#
+# A micro-benchmark of the text normalization stage over a corpus of realistic user prompts. # Ein Mikro-Benchmark der Textnormalisierungsstufe über einen Korpus realistischer Benutzereingaben.
+# Compares the single-pass implementation with the previous per-pattern and multi-pass code. # Vergleicht die Implementierung in einem Durchlauf mit dem vorherigen Code mit einer Schleife pro Muster und mehreren Durchläufen.
+#
+# Usage:
+# python -m benchmarks.bench_text_normalizer # Runs from the server directory. # Wird aus dem Server-Verzeichnis ausgeführt.
+# python -m benchmarks.bench_text_normalizer --repeat 50 # Uses more repetitions. # Verwendet mehr Wiederholungen.
+#
+# EN: Reports the time per prompt of both implementations and checks that their output is identical.
+# DE: Meldet die Zeit pro Eingabe beider Implementierungen und prüft, dass ihre Ausgabe identisch ist.
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import os # For locating the corpus. # Zum Auffinden des Korpus.
+import re # For the previous implementation. # Für die vorherige Implementierung.
+import timeit # For timing. # Zur Zeitmessung.
+import unicodedata # For the previous implementation. # Für die vorherige Implementierung.
+
+from app.application.services.text_normalizer import normalize_text # The stage being measured. # Die gemessene Stufe.
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus", "prompts.txt") # Realistic user prompts in English, German and Spanish. # Realistische Benutzereingaben auf Englisch, Deutsch und Spanisch.
+
+LEGACY_ACCENT_MAP = {"a": "á", "e": "é", "i": "í", "o": "ó", "u": "ú", "A": "Á", "E": "É", "I": "Í", "O": "Ó", "U": "Ú"} # Previous accent map. # Vorherige Akzentzuordnung.
+LEGACY_PATTERNS = { # Previous uncompiled patterns. # Vorherige unkompilierte Muster.
+    r"([aeiou])´": lambda m: LEGACY_ACCENT_MAP[m.group(1)],
+    r"([AEIOU])´": lambda m: LEGACY_ACCENT_MAP[m.group(1)],
+    r"n~": "ñ",
+    r"N~": "Ñ",
+}
+
+
+def legacy_normalize(text: str) -> str: # Previous _restore_accents followed by _ensure_unicode. # Vorheriges _restore_accents gefolgt von _ensure_unicode.
+    for pattern, replacement in LEGACY_PATTERNS.items(): # One re.sub call per pattern. # Ein re.sub-Aufruf pro Muster.
+        text = re.sub(pattern, replacement, text)
+    if isinstance(text, bytes): # Previous bytes handling. # Vorherige Behandlung von Bytes.
+        text = text.decode("utf-8")
+    return unicodedata.normalize("NFKC", text) # Unconditional normalization. # Bedingungslose Normalisierung.
+
+
+def load_corpus() -> list: # Reads the prompts. # Liest die Eingaben.
+    with open(CORPUS_PATH, encoding="utf-8") as f: # Opens the corpus. # Öffnet den Korpus.
+        return [line.rstrip("\n") for line in f if line.strip()] # One prompt per line. # Eine Eingabe pro Zeile.
+
+
+def run(repeat: int) -> None: # Runs the benchmark. # Führt den Benchmark aus.
+    prompts = load_corpus() # Loads the corpus. # Lädt den Korpus.
+    mismatches = [p for p in prompts if normalize_text(p) != legacy_normalize(p)] # Both must agree. # Beide müssen übereinstimmen.
+    if mismatches: # Reports behavior changes. # Meldet Verhaltensänderungen.
+        raise SystemExit(f"Output differs for {len(mismatches)} prompts, e.g. {mismatches[0]!r}")
+
+    ascii_share = sum(p.isascii() for p in prompts) / len(prompts) # Share of prompts on the fast path. # Anteil der Eingaben auf dem schnellen Pfad.
+    print(f"{len(prompts)} prompts, {ascii_share:.0%} pure ASCII, {repeat} repetitions") # Describes the run. # Beschreibt den Lauf.
+    for name, func in (("legacy", legacy_normalize), ("single-pass", normalize_text)): # Times both implementations. # Misst beide Implementierungen.
+        seconds = min(timeit.repeat(lambda: [func(p) for p in prompts], number=repeat, repeat=5)) # Best of five runs. # Bester von fünf Läufen.
+        print(f"{name:>12}: {seconds / (repeat * len(prompts)) * 1e6:7.2f} us/prompt") # Time per prompt. # Zeit pro Eingabe.
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the text normalization stage") # Parses the options. # Analysiert die Optionen.
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus per timing run")
+    run(parser.parse_args().repeat)
@@ -0,0 +1,374 @@
+# Benchmark Fakes
+#
+# Local stand-ins for the Gemini, Azure Speech and Google speech recognition clients used by the server. # Lokale Ersatzimplementierungen für die Gemini-, Azure-Speech- und Google-Spracherkennungs-Clients des Servers.
+# Each fake sleeps for a configurable latency with jitter and fails at a configurable rate, without any network access. # Jede Attrappe schläft für eine konfigurierbare Latenz mit Schwankung und schlägt mit einer konfigurierbaren Rate fehl, ganz ohne Netzwerkzugriff.
+#
+# Usage:
+# python -m benchmarks.fakes serve --port 8765 # Runs the real FastAPI app against the fakes. # Führt die echte FastAPI-App gegen die Attrappen aus.
+# FAKE_GEMINI_LATENCY_MS=800 FAKE_GEMINI_JITTER_MS=200 FAKE_GEMINI_ERROR_RATE=0.01 # Shapes one upstream (GEMINI, TTS, STT). # Formt einen Upstream (GEMINI, TTS, STT).
+# install() # Registers the fakes in sys.modules before the app is imported. # Registriert die Attrappen in sys.modules, bevor die App importiert wird.
+# TRANSLATION_CACHE=true python -m benchmarks.fakes serve # Keeps the translation cache, which the fakes disable by default. # Behält den Übersetzungs-Cache, den die Attrappen standardmäßig deaktivieren.
+# A push-stream recognizer (live dictation) reports one more word per half second of audio and a final result every three seconds. # Ein Push-Stream-Erkenner (Live-Diktat) meldet pro halber Sekunde Audio ein weiteres Wort und alle drei Sekunden ein Endergebnis.
+#
+# EN: Lets throughput and latency work be measured on a plain Linux box without paying for or depending on live Gemini and Azure.
+# DE: Ermöglicht die Messung von Durchsatz und Latenz auf einem einfachen Linux-Rechner, ohne für Gemini und Azure zu bezahlen oder von ihnen abzuhängen.
+
+import argparse # For command line options. # Für Kommandozeilenoptionen.
+import os # For configuration and file access. # Für Konfiguration und Dateizugriff.
+import queue # For audio pushed into a fake stream. # Für in einen Attrappen-Stream geschobenes Audio.
+import random # For jitter and errors. # Für Schwankung und Fehler.
+import sys # For registering the fake modules. # Zum Registrieren der Attrappenmodule.
+import threading # For asynchronous recognition callbacks. # Für asynchrone Erkennungs-Callbacks.
+import time # For simulated latency. # Für simulierte Latenz.
+import types # For building module objects. # Zum Erstellen von Modulobjekten.
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(__file__), "recordings") # Recorded upstream responses. # Aufgezeichnete Upstream-Antworten.
+STREAM_CHUNK_CHARS = 160 # Size of the chunks a streamed fake answer arrives in. # Größe der Chunks, in denen eine gestreamte Attrappen-Antwort eintrifft.
+MP3_FRAME = bytes([0xFF, 0xF3, 0x48, 0xC0]) + bytes(140) # One silent 16 kHz / 32 kbps MPEG-2 Layer III frame (36 ms). # Ein stiller MPEG-2-Layer-III-Frame mit 16 kHz / 32 kbps (36 ms).
+DICTATION_WORDS = "hola mundo esto es una prueba del dictado en vivo".split() # Words a fake push-stream recognizer hears, in a loop. # Wörter, die ein Push-Stream-Erkenner-Dummy hört, in einer Schleife.
+SECONDS_PER_WORD = 0.5 # Audio per recognized word. # Audio pro erkanntem Wort.
+WORDS_PER_PHRASE = 6 # Words before a fake final result. # Wörter vor einem Attrappen-Endergebnis.
+
+
+class FakeUpstreamError(RuntimeError): # Raised by fakes to simulate upstream failures. # Wird von Attrappen ausgelöst, um Upstream-Fehler zu simulieren.
+    pass
+
+
+class UpstreamProfile: # Latency and error behaviour of one fake upstream. # Latenz- und Fehlerverhalten eines Upstream-Dummys.
+    """Sleep for latency ± jitter and fail with the given probability"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0): # Stores the settings. # Speichert die Einstellungen.
+        self.latency = latency_ms / 1000 # Mean latency in seconds. # Mittlere Latenz in Sekunden.
+        self.jitter = jitter_ms / 1000 # Uniform jitter in seconds. # Gleichverteilte Schwankung in Sekunden.
+        self.error_rate = error_rate # Share of failing calls. # Anteil fehlschlagender Aufrufe.
+
+    @classmethod
+    def from_env(cls, name: str, latency_ms: float) -> "UpstreamProfile": # Reads FAKE_<NAME>_* variables. # Liest FAKE_<NAME>_*-Variablen.
+        return cls(
+            float(os.getenv(f"FAKE_{name}_LATENCY_MS", str(latency_ms))),
+            float(os.getenv(f"FAKE_{name}_JITTER_MS", str(latency_ms / 4))),
+            float(os.getenv(f"FAKE_{name}_ERROR_RATE", "0")),
+        )
+
+    def delay(self) -> float: # Draws one latency. # Zieht eine Latenz.
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)) # Jittered latency. # Latenz mit Schwankung.
+
+    def wait(self) -> bool: # Simulates one call; returns False if it should fail. # Simuliert einen Aufruf; gibt False zurück, wenn er fehlschlagen soll.
+        delay = self.delay()
+        if delay > 0: # Blocks like the real SDK calls do. # Blockiert wie die echten SDK-Aufrufe.
+            time.sleep(delay)
+        return random.random() >= self.error_rate # Draws the outcome. # Zieht das Ergebnis.
+
+
+GEMINI = UpstreamProfile.from_env("GEMINI", 800) # Default latencies roughly match production medians. # Standardlatenzen entsprechen grob den Produktionsmedianen.
+TTS = UpstreamProfile.from_env("TTS", 250)
+STT = UpstreamProfile.from_env("STT", 400)
+
+
+def _read_recording(name: str) -> str: # Loads a recorded response. # Lädt eine aufgezeichnete Antwort.
+    with open(os.path.join(RECORDINGS_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _gemini_module() -> types.ModuleType: # Builds google.generativeai. # Erstellt google.generativeai.
+    response_text = _read_recording("gemini_conversation.txt") # Canned model answer in the expected format. # Vorgefertigte Modellantwort im erwarteten Format.
+
+    class GenerateContentResponse: # Minimal response with .text. # Minimale Antwort mit .text.
+        def __init__(self, text):
+            self.text = text
+
+    class ChatSession: # Chat with a growing history, like the real client. # Chat mit wachsender Historie, wie der echte Client.
+        def __init__(self, history=None):
+            self.history = list(history or [])
+
+        def send_message(self, content, **kwargs):
+            if not GEMINI.wait(): # Simulated quota or server error. # Simulierter Kontingent- oder Serverfehler.
+                raise FakeUpstreamError("503 The model is overloaded (fake)")
+            self.history.append({"role": "user", "parts": [content]}) # Keeps the client's memory behaviour. # Behält das Speicherverhalten des Clients bei.
+            self.history.append({"role": "model", "parts": [response_text]})
+            return GenerateContentResponse(response_text)
+
+    class GenerativeModel: # Model factory. # Modellfabrik.
+        def __init__(self, model_name=None, generation_config=None, **kwargs):
+            self.model_name = model_name
+
+        def start_chat(self, history=None):
+            return ChatSession(history)
+
+        def generate_content(self, contents, stream=False, **kwargs):
+            if stream: # Chunks spread over the latency, like a generating model. # Über die Latenz verteilte Chunks, wie bei einem generierenden Modell.
+                return self._stream()
+            if not GEMINI.wait():
+                raise FakeUpstreamError("503 The model is overloaded (fake)")
+            return GenerateContentResponse(response_text)
+
+        def _stream(self):
+            chunks = [response_text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(response_text), STREAM_CHUNK_CHARS)]
+            pause = GEMINI.delay() / len(chunks)
+            if random.random() < GEMINI.error_rate:
+                raise FakeUpstreamError("503 The model is overloaded (fake)")
+            for chunk in chunks:
+                time.sleep(pause)
+                yield GenerateContentResponse(chunk)
+
+    module = types.ModuleType("google.generativeai") # Assembles the module. # Setzt das Modul zusammen.
+    module.configure = lambda **kwargs: None
+    module.GenerativeModel = GenerativeModel
+    return module
+
+
+def _azure_speech_modules() -> tuple: # Builds azure.cognitiveservices.speech and its audio submodule. # Erstellt azure.cognitiveservices.speech und sein audio-Untermodul.
+    class _Names: # Enum stand-in returning member names. # Enum-Ersatz, der Mitgliedsnamen zurückgibt.
+        def __init__(self, prefix):
+            self._prefix = prefix
+
+        def __getattr__(self, name):
+            return f"{self._prefix}.{name}"
+
+    class ResultReason: # Result reasons used by the services. # Von den Diensten verwendete Ergebnisgründe.
+        SynthesizingAudioCompleted = "SynthesizingAudioCompleted"
+        Canceled = "Canceled"
+        RecognizedSpeech = "RecognizedSpeech"
+        RecognizingSpeech = "RecognizingSpeech"
+        NoMatch = "NoMatch"
+
+    class CancellationReason: # Cancellation reasons. # Abbruchgründe.
+        Error = "Error"
+        EndOfStream = "EndOfStream"
+
+    class SpeechConfig: # Holds settings only. # Hält nur Einstellungen.
+        def __init__(self, subscription=None, region=None, **kwargs):
+            self.speech_recognition_language = None
+            self.speech_synthesis_voice_name = None
+            self.output_format = None
+
+        def set_speech_synthesis_output_format(self, output_format):
+            self.output_format = output_format
+
+        def set_property(self, *args, **kwargs):
+            pass
+
+    class AudioConfig: # Input audio. # Eingabe-Audio.
+        def __init__(self, filename=None, stream=None, use_default_microphone=False, **kwargs):
+            self.filename = filename
+            self.stream = stream
+
+    class AudioStreamFormat: # PCM layout of a push stream. # PCM-Aufbau eines Push-Streams.
+        def __init__(self, samples_per_second=16000, bits_per_sample=16, channels=1, **kwargs):
+            self.bytes_per_second = samples_per_second * bits_per_sample // 8 * channels
+
+    class PushAudioInputStream: # Audio written by the application while it is captured. # Von der Anwendung während der Aufnahme geschriebenes Audio.
+        def __init__(self, stream_format=None, **kwargs):
+            self.format = stream_format or AudioStreamFormat()
+            self._frames = queue.Queue()
+
+        def write(self, buffer):
+            self._frames.put(bytes(buffer))
+
+        def close(self): # End of the audio. # Ende des Audios.
+            self._frames.put(None)
+
+        def read(self, timeout): # Next frame, None at the end; raises queue.Empty. # Nächster Frame, None am Ende; löst queue.Empty aus.
+            return self._frames.get(timeout=timeout)
+
+    class AudioOutputConfig: # Output audio. # Ausgabe-Audio.
+        def __init__(self, filename=None, use_default_speaker=False, **kwargs):
+            self.filename = filename
+
+    class CancellationDetails: # Details of a failed synthesis or an ended recognition. # Details einer fehlgeschlagenen Synthese oder einer beendeten Erkennung.
+        def __init__(self, error_details, reason=CancellationReason.Error):
+            self.reason = reason
+            self.error_details = error_details
+
+    class SpeechSynthesisResult: # Synthesis outcome. # Syntheseergebnis.
+        def __init__(self, audio_data, error=None):
+            self.reason = ResultReason.Canceled if error else ResultReason.SynthesizingAudioCompleted
+            self.audio_data = audio_data
+            self.cancellation_details = CancellationDetails(error) if error else None
+
+    class ResultFuture: # Future returned by the *_async methods. # Von den *_async-Methoden zurückgegebenes Future.
+        def __init__(self, func):
+            self._func = func
+
+        def get(self):
+            return self._func()
+
+    class SpeechSynthesizer: # Produces silent MP3 frames proportional to the SSML length. # Erzeugt stille MP3-Frames proportional zur SSML-Länge.
+        def __init__(self, speech_config=None, audio_config=None):
+            self._filename = getattr(audio_config, "filename", None)
+
+        def _speak(self, ssml):
+            if not TTS.wait(): # Simulated synthesis failure. # Simulierter Synthesefehler.
+                return SpeechSynthesisResult(b"", "Connection was closed by the remote host (fake)")
+            audio = MP3_FRAME * max(1, len(ssml) // 40) # Longer texts produce longer audio. # Längere Texte erzeugen längeres Audio.
+            if self._filename: # File output like AudioOutputConfig(filename=...). # Dateiausgabe wie AudioOutputConfig(filename=...).
+                with open(self._filename, "wb") as f:
+                    f.write(audio)
+            return SpeechSynthesisResult(audio)
+
+        def speak_ssml_async(self, ssml):
+            return ResultFuture(lambda: self._speak(ssml))
+
+        def speak_text_async(self, text):
+            return ResultFuture(lambda: self._speak(text))
+
+        def stop_speaking_async(self):
+            return ResultFuture(lambda: None)
+
+    class EventSignal: # Callback list. # Callback-Liste.
+        def __init__(self):
+            self._callbacks = []
+
+        def connect(self, callback):
+            self._callbacks.append(callback)
+
+        def disconnect_all(self):
+            self._callbacks = []
+
+        def fire(self, event):
+            for callback in list(self._callbacks):
+                callback(event)
+
+    class RecognitionResult: # Recognition outcome. # Erkennungsergebnis.
+        def __init__(self, text, reason):
+            self.text = text
+            self.reason = reason
+
+    class RecognitionEvent: # Event passed to callbacks. # An Callbacks übergebenes Ereignis.
+        def __init__(self, text, reason):
+            self.result = RecognitionResult(text, reason)
+
+    class CanceledEvent: # Event passed to canceled callbacks. # An Abbruch-Callbacks übergebenes Ereignis.
+        def __init__(self, reason, error_details=""):
+            self.cancellation_details = CancellationDetails(error_details, reason)
+
+    class SpeechRecognizer: # Recognizes the wake word "open" after the STT latency. # Erkennt das Aktivierungswort "open" nach der STT-Latenz.
+        """Like the SDK, a continuous session keeps its worker thread and the input file open until it is stopped"""
+
+        def __init__(self, speech_config=None, audio_config=None, **kwargs):
+            self._filename = getattr(audio_config, "filename", None)
+            self._stream = getattr(audio_config, "stream", None)
+            self.recognizing = EventSignal()
+            self.recognized = EventSignal()
+            self.canceled = EventSignal()
+            self.session_started = EventSignal()
+            self.session_stopped = EventSignal()
+            self._stopped = threading.Event()
+
+        def _run(self, audio_file):
+            try:
+                ok = STT.wait() # Recognition latency. # Erkennungslatenz.
+                if not self._stopped.is_set(): # Stopped recognizers don't fire. # Gestoppte Erkenner feuern nicht.
+                    self.recognized.fire(RecognitionEvent("open" if ok else "", ResultReason.RecognizedSpeech if ok else ResultReason.NoMatch))
+                self._stopped.wait() # The session lasts until stop_continuous_recognition(). # Die Sitzung dauert bis stop_continuous_recognition().
+                self.session_stopped.fire(None)
+            finally:
+                if audio_file is not None:
+                    audio_file.close()
+
+        def _run_stream(self): # Recognizes pushed audio until the stream is closed or recognition stops. # Erkennt geschobenes Audio, bis der Stream geschlossen wird oder die Erkennung stoppt.
+            received, words = 0, [] # Audio bytes and words of the current phrase. # Audio-Bytes und Wörter der aktuellen Phrase.
+            closed = False
+            while not closed and not self._stopped.is_set():
+                try:
+                    frame = self._stream.read(timeout=0.1)
+                except queue.Empty:
+                    continue
+                closed = frame is None
+                received += len(frame or b"")
+                heard = int(received / self._stream.format.bytes_per_second / SECONDS_PER_WORD) # Words in the audio so far. # Wörter im bisherigen Audio.
+                if heard > len(words) + self._spoken:
+                    words = [DICTATION_WORDS[i % len(DICTATION_WORDS)] for i in range(self._spoken, heard)]
+                    self.recognizing.fire(RecognitionEvent(" ".join(words), ResultReason.RecognizingSpeech)) # Partial hypothesis. # Teilhypothese.
+                if words and (len(words) >= WORDS_PER_PHRASE or closed): # End of a phrase. # Ende einer Phrase.
+                    if not STT.wait(): # Simulated service failure. # Simulierter Dienstfehler.
+                        self.canceled.fire(CanceledEvent(CancellationReason.Error, "Connection was closed by the remote host (fake)"))
+                        break
+                    self.recognized.fire(RecognitionEvent(" ".join(words), ResultReason.RecognizedSpeech))
+                    self._spoken += len(words)
+                    words = []
+            else:
+                if closed: # The SDK reports the end of a push stream as a cancellation. # Das SDK meldet das Ende eines Push-Streams als Abbruch.
+                    self.canceled.fire(CanceledEvent(CancellationReason.EndOfStream))
+            self.session_stopped.fire(None)
+
+        def start_continuous_recognition(self):
+            if self._stream is not None: # Live audio from a push stream. # Live-Audio aus einem Push-Stream.
+                self._spoken = 0 # Words already reported as final. # Bereits als endgültig gemeldete Wörter.
+                threading.Thread(target=self._run_stream, daemon=True).start()
+                return
+            audio_file = open(self._filename, "rb") if self._filename else None # Held like the SDK's file reader. # Gehalten wie der Dateileser des SDK.
+            threading.Thread(target=self._run, args=(audio_file,), daemon=True).start()
+
+        def stop_continuous_recognition(self):
+            self._stopped.set()
+
+        def start_continuous_recognition_async(self):
+            self.start_continuous_recognition()
+            return ResultFuture(lambda: None)
+
+        def stop_continuous_recognition_async(self):
+            self.stop_continuous_recognition()
+            return ResultFuture(lambda: None)
+
+        def recognize_once(self):
+            ok = STT.wait()
+            return RecognitionResult("open" if ok else "", ResultReason.RecognizedSpeech if ok else ResultReason.NoMatch)
+
+    speech = types.ModuleType("azure.cognitiveservices.speech") # Assembles the SDK module. # Setzt das SDK-Modul zusammen.
+    audio = types.ModuleType("azure.cognitiveservices.speech.audio")
+    audio.AudioConfig = AudioConfig
+    audio.AudioOutputConfig = AudioOutputConfig
+    audio.AudioStreamFormat = AudioStreamFormat
+    audio.PushAudioInputStream = PushAudioInputStream
+    for name, value in {
+        "SpeechConfig": SpeechConfig, "SpeechSynthesizer": SpeechSynthesizer, "SpeechRecognizer": SpeechRecognizer,
+        "AudioConfig": AudioConfig, "ResultReason": ResultReason, "CancellationReason": CancellationReason,
+        "SpeechSynthesisOutputFormat": _Names("SpeechSynthesisOutputFormat"), "PropertyId": _Names("PropertyId"), "audio": audio,
+    }.items():
+        setattr(speech, name, value)
+    return speech, audio
+
+
+def _patch_speech_recognition() -> None: # Replaces only the network call of SpeechRecognition. # Ersetzt nur den Netzwerkaufruf von SpeechRecognition.
+    import speech_recognition as sr # The real package still reads the uploaded WAV files. # Das echte Paket liest weiterhin die hochgeladenen WAV-Dateien.
+
+    def recognize_google(self, audio_data, key=None, language="en-US", **kwargs): # Fake Google Web Speech call. # Attrappe des Google-Web-Speech-Aufrufs.
+        if not STT.wait():
+            raise sr.RequestError("recognition connection failed (fake)")
+        return "hola mundo"
+
+    sr.Recognizer.recognize_google = recognize_google
+
+
+def install(patch_recognizer: bool = True) -> None: # Registers all fakes. # Registriert alle Attrappen.
+    """Replace the upstream clients before the app modules are imported"""
+    speech, audio = _azure_speech_modules()
+    for name in ("azure", "azure.cognitiveservices", "google"): # Parent packages, kept if installed. # Elternpakete, beibehalten, falls installiert.
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules["azure.cognitiveservices.speech"] = speech
+    sys.modules["azure.cognitiveservices.speech.audio"] = audio
+    sys.modules["google.generativeai"] = _gemini_module()
+    sys.modules["google"].generativeai = sys.modules["google.generativeai"] # Makes "import google.generativeai as genai" resolve. # Lässt "import google.generativeai as genai" auflösen.
+    if patch_recognizer: # Micro-benchmarks don't import the speech service. # Mikro-Benchmarks importieren den Sprachdienst nicht.
+        _patch_speech_recognition()
+    os.environ.setdefault("GEMINI_API_KEY", "fake") # The services refuse to start without credentials. # Die Dienste starten nicht ohne Zugangsdaten.
+    os.environ.setdefault("AZURE_SPEECH_KEY", "fake")
+    os.environ.setdefault("AZURE_SPEECH_REGION", "fake")
+    os.environ.setdefault("TRANSLATION_CACHE", "false") # Every request reaches the Gemini fake unless a run opts into the shared cache. # Jede Anfrage erreicht die Gemini-Attrappe, sofern ein Lauf nicht den gemeinsamen Cache wählt.
+
+
+def serve(host: str, port: int) -> None: # Runs the app against the fakes. # Führt die App gegen die Attrappen aus.
+    install() # Must happen before the app import. # Muss vor dem App-Import geschehen.
+    import uvicorn # ASGI server used in production. # In der Produktion verwendeter ASGI-Server.
+    from app.infrastructure.api.routes import app # The real application. # Die echte Anwendung.
+    uvicorn.run(app, host=host, port=port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the API against local upstream fakes") # Parses the options. # Analysiert die Optionen.
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    serve(args.host, args.port)
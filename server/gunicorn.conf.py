@@ -0,0 +1,54 @@
+# Gunicorn Configuration
+#
+# Multi-worker production mode: one Uvicorn worker process per available core, so parsing, SSML building, spellchecking and audio conversion scale across cores. # Mehrprozess-Produktionsmodus: ein Uvicorn-Worker-Prozess pro verfügbarem Kern, damit Parsen, SSML-Erstellung, Rechtschreibprüfung und Audiokonvertierung über Kerne skalieren.
+# The master imports the app and maps the spelling indexes before forking; each worker then builds its own Gemini and Azure clients. # Der Master importiert die App und mappt die Rechtschreibindizes vor dem Forken; jeder Worker erstellt danach seine eigenen Gemini- und Azure-Clients.
+#
+# Usage:
+# gunicorn -c gunicorn.conf.py # Starts one worker per available core on $PORT. # Startet einen Worker pro verfügbarem Kern auf $PORT.
+# WEB_CONCURRENCY=2 gunicorn -c gunicorn.conf.py # Starts a fixed number of workers. # Startet eine feste Anzahl von Workern.
+# GUNICORN_PRELOAD=false gunicorn -c gunicorn.conf.py # Imports the app in every worker instead. # Importiert die App stattdessen in jedem Worker.
+#
+# EN: gRPC and the Azure Speech SDK don't survive a fork, so only fork-safe work (imports, memory-mapped indexes) happens in the master; translation and audio caches live on disk and are shared by all workers.
+# DE: gRPC und das Azure Speech SDK überstehen keinen Fork, daher findet nur forksichere Arbeit (Importe, Memory-gemappte Indizes) im Master statt; Übersetzungs- und Audio-Caches liegen auf dem Datenträger und werden von allen Workern geteilt.
+
+import os # For configuration. # Für die Konfiguration.
+import shutil # For clearing stale metric files. # Zum Leeren veralteter Metrikdateien.
+import tempfile # For the default metrics directory. # Für das Standard-Metrikverzeichnis.
+
+
+def available_cores() -> int: # Cores this process may run on. # Kerne, auf denen dieser Prozess laufen darf.
+    """Return the cores in the CPU affinity mask, which respects container CPU sets, or the machine's core count"""
+    try:
+        return len(os.sched_getaffinity(0)) # Linux only. # Nur Linux.
+    except AttributeError: # macOS and Windows. # macOS und Windows.
+        return os.cpu_count() or 1
+
+
+wsgi_app = "app.infrastructure.api.routes:app" # The FastAPI application. # Die FastAPI-Anwendung.
+worker_class = "uvicorn.workers.UvicornWorker" # Runs the ASGI app on uvloop/asyncio in each worker. # Führt die ASGI-App in jedem Worker auf uvloop/asyncio aus.
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}" # Binds to all interfaces in the container. # Bindet im Container an alle Schnittstellen.
+workers = int(os.getenv("WEB_CONCURRENCY") or available_cores()) # Request handling is mostly async, so one worker per core saturates the CPU. # Die Anfragebearbeitung ist überwiegend asynchron, daher lastet ein Worker pro Kern die CPU aus.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true" # Imports the app once; workers share its pages copy-on-write. # Importiert die App einmal; Worker teilen ihre Seiten per Copy-on-Write.
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120")) # Restarts a worker whose event loop stalls this long. # Startet einen Worker neu, dessen Ereignisschleife so lange hängt.
+graceful_timeout = 30 # Lets running syntheses finish on restart. # Lässt laufende Synthesen beim Neustart beenden.
+keepalive = 300 # Same keep-alive as the single-process launcher. # Dasselbe Keep-Alive wie der Einzelprozess-Starter.
+forwarded_allow_ips = "*" # Trusts forwarded headers from the ingress proxy. # Vertraut Forward-Headern vom Ingress-Proxy.
+accesslog = None # Request metrics and logs come from the app. # Anfragemetriken und Logs kommen von der App.
+
+metrics_dir = os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "speak_metrics")) # Set before the preloaded app imports prometheus_client. # Gesetzt, bevor die vorab geladene App prometheus_client importiert.
+shutil.rmtree(metrics_dir, ignore_errors=True) # Drops the values of a previous run. # Verwirft die Werte eines früheren Laufs.
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server): # Runs in the master after loading the app, before forking workers. # Läuft im Master nach dem Laden der App, vor dem Forken der Worker.
+    if not preload_app: # Workers load everything themselves. # Worker laden alles selbst.
+        return
+    from app.application.services.spell_index import SUPPORTED_LANGUAGES, SpellIndex
+    for lang in SUPPORTED_LANGUAGES: # Builds missing indexes once instead of in every worker, and maps them into shared pages. # Erstellt fehlende Indizes einmal statt in jedem Worker und mappt sie in gemeinsame Seiten.
+        SpellIndex.open(lang)
+    server.log.info("Spell indexes mapped before forking %d workers", workers)
+
+
+def child_exit(server, worker): # Runs in the master when a worker exits. # Läuft im Master, wenn ein Worker endet.
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid) # Drops the worker's in-flight gauges. # Verwirft die In-Flight-Messwerte des Workers.
@@ -0,0 +1,27 @@
+# Test Configuration
+#
+# Makes the server packages importable and swaps the Azure Speech SDK for the local fakes of the benchmarks. # Macht die Serverpakete importierbar und ersetzt das Azure Speech SDK durch die lokalen Attrappen der Benchmarks.
+#
+# Usage:
+# cd server && python -m pytest -q # Runs the tests without Azure credentials or network access. # Führt die Tests ohne Azure-Zugangsdaten und Netzwerkzugriff aus.
+#
+# EN: The tests exercise the real session logic against a recognizer that behaves like the SDK's push-stream recognizer.
+# DE: Die Tests prüfen die echte Sitzungslogik gegen einen Erkenner, der sich wie der Push-Stream-Erkenner des SDK verhält.
+
+import os # For the server directory. # Für das Serververzeichnis.
+import sys # For the import path and the fake modules. # Für den Importpfad und die Attrappenmodule.
+import types # For the fake parent packages. # Für die Eltern-Paket-Attrappen.
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) # Holds app and benchmarks. # Enthält app und benchmarks.
+if SERVER_DIR not in sys.path:
+    sys.path.insert(0, SERVER_DIR)
+
+from benchmarks import fakes # Fake Azure Speech SDK with a push-stream recognizer. # Azure-Speech-SDK-Attrappe mit Push-Stream-Erkenner.
+
+FAKE_SPEECH, FAKE_AUDIO = fakes._azure_speech_modules() # One fake SDK for the whole test run. # Eine SDK-Attrappe für den ganzen Testlauf.
+if "azure.cognitiveservices.speech" not in sys.modules: # Lets the services import without the real SDK. # Lässt die Dienste ohne das echte SDK importieren.
+    for name in ("azure", "azure.cognitiveservices"):
+        sys.modules.setdefault(name, types.ModuleType(name))
+    sys.modules["azure.cognitiveservices.speech"] = FAKE_SPEECH
+    sys.modules["azure.cognitiveservices.speech.audio"] = FAKE_AUDIO
+    sys.modules["azure.cognitiveservices"].speech = FAKE_SPEECH
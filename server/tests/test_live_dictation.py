@@ -0,0 +1,126 @@
+# Live Dictation Tests
+#
+# Drives DictationSession against the fake push-stream recognizer of the benchmarks, without Azure. # Steuert DictationSession gegen den Push-Stream-Erkenner-Dummy der Benchmarks, ohne Azure.
+#
+# Usage:
+# python -m pytest -q tests/test_live_dictation.py # Runs these tests. # Führt diese Tests aus.
+#
+# EN: Covers result ordering, the idle, wall-clock and audio limits, and the cleanup of the recognizer.
+# DE: Deckt die Reihenfolge der Ergebnisse, die Leerlauf-, Echtzeit- und Audiogrenzen sowie die Bereinigung des Erkenners ab.
+
+import asyncio # For running the sessions. # Zum Ausführen der Sitzungen.
+import time # For the wall-clock limit. # Für die Echtzeitgrenze.
+
+import pytest # For fixtures. # Für Fixtures.
+
+from benchmarks import fakes # Fake recognizer timing. # Zeitverhalten des Erkenner-Dummys.
+from app.application.services import live_dictation # Module under test. # Getestetes Modul.
+from conftest import FAKE_SPEECH # The fake SDK. # Die SDK-Attrappe.
+
+SECOND = 16000 * 2 # Bytes of one second of 16 kHz 16-bit mono PCM. # Bytes einer Sekunde 16-kHz-16-Bit-Mono-PCM.
+
+
+@pytest.fixture(autouse=True)
+def fake_sdk(monkeypatch): # Uses the fake SDK with instant, reliable recognition. # Verwendet die SDK-Attrappe mit sofortiger, zuverlässiger Erkennung.
+    monkeypatch.setattr(live_dictation, "speechsdk", FAKE_SPEECH)
+    monkeypatch.setattr(fakes, "STT", fakes.UpstreamProfile())
+
+
+async def _session(**limits) -> live_dictation.DictationSession: # Opens a started session. # Öffnet eine gestartete Sitzung.
+    session = live_dictation.DictationSession(FAKE_SPEECH.SpeechConfig(), "es-ES", 16000)
+    await session.start()
+    return session
+
+
+async def _collect(session) -> list: # Reads every event until the session ends. # Liest jedes Ereignis bis zum Ende der Sitzung.
+    return [event async for event in session.events()]
+
+
+def test_partials_grow_before_each_final():
+    async def run():
+        session = await _session()
+        try:
+            for _ in range(8): # Four seconds: one full phrase of six words, then two more. # Vier Sekunden: eine volle Phrase aus sechs Wörtern, dann zwei weitere.
+                assert session.write(bytes(SECOND // 2))
+            session.finish()
+            return await _collect(session)
+        finally:
+            await session.close()
+
+    events = asyncio.run(run())
+    assert [event["type"] for event in events] == ["partial"] * 6 + ["final"] + ["partial"] * 2 + ["final"]
+    assert events[5]["text"] == events[6]["text"] == " ".join(fakes.DICTATION_WORDS[:6])
+    assert all(events[i + 1]["text"].startswith(events[i]["text"]) for i in range(5)) # Each partial extends the previous one. # Jede Teilhypothese erweitert die vorige.
+    assert events[-1]["text"] == " ".join(fakes.DICTATION_WORDS[6:8])
+
+
+def test_idle_session_expires(monkeypatch):
+    monkeypatch.setattr(live_dictation, "DICTATION_IDLE_SECONDS", 0.05)
+
+    async def run():
+        session = await _session()
+        try:
+            assert session.receive_timeout() <= 0.05
+            with pytest.raises(asyncio.TimeoutError): # What the route does with a silent client. # Was die Route mit einem stillen Client macht.
+                await asyncio.wait_for(asyncio.Event().wait(), session.receive_timeout())
+            session.expire()
+            return await _collect(session)
+        finally:
+            await session.close()
+
+    assert asyncio.run(run()) == [{"type": "error", "detail": "No audio for 0 seconds"}]
+
+
+def test_session_expires_at_wall_clock_limit(monkeypatch):
+    monkeypatch.setattr(live_dictation, "DICTATION_SESSION_SECONDS", 2.0)
+
+    async def run():
+        session = await _session()
+        try:
+            session.write(bytes(320)) # A trickle of audio doesn't extend the session. # Ein Tröpfeln von Audio verlängert die Sitzung nicht.
+            session.expires = time.perf_counter() - 0.01 # The two seconds have passed. # Die zwei Sekunden sind vergangen.
+            assert session.receive_timeout() == 0.0
+            session.expire()
+            return await _collect(session)
+        finally:
+            await session.close()
+
+    assert asyncio.run(run()) == [{"type": "error", "detail": "Dictation session longer than 2 seconds"}]
+
+
+def test_audio_beyond_max_seconds_ends_the_session(monkeypatch):
+    monkeypatch.setattr(live_dictation, "DICTATION_MAX_SECONDS", 1.0)
+
+    async def run():
+        session = await _session()
+        try:
+            assert session.write(bytes(SECOND // 2))
+            assert not session.write(bytes(SECOND)) # Over the cap: not pushed, and the audio ends. # Über der Grenze: nicht geschoben, und das Audio endet.
+            assert not session.write(bytes(320)) # Later frames are refused. # Spätere Frames werden abgelehnt.
+            return session.received, await _collect(session)
+        finally:
+            await session.close()
+
+    received, events = asyncio.run(run())
+    assert received == SECOND // 2
+    assert {"type": "partial", "text": fakes.DICTATION_WORDS[0]} in events
+    assert {"type": "error", "detail": "Dictation longer than 1 seconds"} in events
+    assert events[-1] == {"type": "final", "text": fakes.DICTATION_WORDS[0]} # What arrived before the cap is still recognized. # Was vor der Grenze ankam, wird trotzdem erkannt.
+
+
+def test_close_stops_recognition_and_disconnects_callbacks():
+    async def run():
+        session = await _session()
+        active = live_dictation.ACTIVE_SESSIONS._value.get()
+        recognizer = session._recognizer
+        session.write(bytes(SECOND))
+        await session.close()
+        return active, recognizer
+
+    before = live_dictation.ACTIVE_SESSIONS._value.get()
+    active, recognizer = asyncio.run(run())
+    assert active == before + 1
+    assert live_dictation.ACTIVE_SESSIONS._value.get() == before
+    assert recognizer._stopped.is_set()
+    for signal in (recognizer.recognizing, recognizer.recognized, recognizer.canceled, recognizer.session_stopped):
+        assert signal._callbacks == []